@@ -53,13 +53,19 @@ def analyze_stock(
     # 根据full_report参数设置报告类型
     report_type = ReportType.FULL if full_report else ReportType.SIMPLE
     
+    # 单只股票直接推送，不经合并缓冲（进程退出时计时线程可能来不及推送）
+    pipeline.coalesce_single_stock_notify = False
+    
     # 运行单只股票分析
-    result = pipeline.process_single_stock(
-        code=stock_code,
-        skip_analysis=False,
-        single_stock_notify=notifier is not None,
-        report_type=report_type
-    )
+    try:
+        result = pipeline.process_single_stock(
+            code=stock_code,
+            skip_analysis=False,
+            single_stock_notify=notifier is not None,
+            report_type=report_type
+        )
+    finally:
+        pipeline.flush_single_stock_notifications()
     
     return result
 
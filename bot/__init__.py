@@ -13,6 +13,7 @@
 - commands/: 命令处理器
 - platforms/: 平台适配器
 - handler.py: Webhook 处理器
+- reply_pool.py: Stream 模式回复工作池（按会话保序）
 
 使用方式：
 1. 配置环境变量（各平台的 Token 等）
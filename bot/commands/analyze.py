@@ -90,8 +90,14 @@ class AnalyzeCommand(BotCommand):
             
             if result.get("success"):
                 task_id = result.get("task_id", "")
+                if result.get("cached"):
+                    title = "已复用最近的分析结果"
+                elif result.get("coalesced"):
+                    title = "已合并到进行中的分析任务"
+                else:
+                    title = "分析任务已提交"
                 return BotResponse.markdown_response(
-                    f"✅ **分析任务已提交**\n\n"
+                    f"✅ **{title}**\n\n"
                     f"• 股票代码: `{code}`\n"
                     f"• 报告类型: {ReportType.from_str(report_type).display_name}\n"
                     f"• 任务 ID: `{task_id[:20]}...`\n\n"
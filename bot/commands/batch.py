@@ -8,7 +8,6 @@
 """
 
 import logging
-import threading
 from typing import List
 
 from bot.commands.base import BotCommand
@@ -79,13 +78,18 @@ class BatchCommand(BotCommand):
         
         logger.info(f"[BatchCommand] 开始批量分析 {len(stock_list)} 只股票")
         
-        # 在后台线程中执行分析
-        thread = threading.Thread(
-            target=self._run_batch_analysis,
-            args=(stock_list, message),
-            daemon=True
-        )
-        thread.start()
+        # 提交到任务调度器（批量优先级，不抢占交互式单股分析）
+        from src.core.job_queue import JobPriority, QueueFullError, get_job_scheduler
+        try:
+            get_job_scheduler().submit(
+                self._run_batch_analysis, stock_list, message,
+                priority=JobPriority.BATCH,
+                user_id=message.user_id,
+                name="batch_analysis",
+            )
+        except QueueFullError as e:
+            logger.warning(f"[BatchCommand] 批量分析任务被拒绝: {e}")
+            return BotResponse.error_response(f"批量分析任务排队已满: {e}")
         
         return BotResponse.markdown_response(
             f"✅ **批量分析任务已启动**\n\n"
@@ -98,13 +102,10 @@ class BatchCommand(BotCommand):
     def _run_batch_analysis(self, stock_list: List[str], message: BotMessage) -> None:
         """后台执行批量分析"""
         try:
-            from src.config import get_config
-            from main import StockAnalysisPipeline
-            
-            config = get_config()
+            from src.core.container import get_service_container
             
-            # 创建分析管道
-            pipeline = StockAnalysisPipeline(config=config)
+            # 创建分析管道（复用进程级共享组件）
+            pipeline = get_service_container().create_pipeline()
             
             # 执行分析（会自动推送汇总报告）
             results = pipeline.run(
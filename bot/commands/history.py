@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+分析历史命令
+===================================
+
+从数据库查询股票最近的分析结果与评分走势，无需重新调用 AI。
+"""
+
+import logging
+from typing import List, Optional
+
+from bot.commands.base import BotCommand
+from bot.models import BotMessage, BotResponse
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCommand(BotCommand):
+    """
+    分析历史命令
+
+    用法：
+        /history 600519     - 查看最近 30 天的评分历史
+        /history 600519 90  - 查看最近 90 天的评分历史
+    """
+
+    @property
+    def name(self) -> str:
+        return "history"
+
+    @property
+    def aliases(self) -> List[str]:
+        return ["hist", "历史", "走势"]
+
+    @property
+    def description(self) -> str:
+        return "查看股票历史分析评分"
+
+    @property
+    def usage(self) -> str:
+        return "/history <股票代码> [天数]"
+
+    def validate_args(self, args: List[str]) -> Optional[str]:
+        """验证参数"""
+        if not args:
+            return "请输入股票代码"
+        if len(args) > 1 and not args[1].isdigit():
+            return f"无效的天数: {args[1]}"
+        return None
+
+    def execute(self, message: BotMessage, args: List[str]) -> BotResponse:
+        """执行历史查询命令"""
+        code = args[0].strip()
+        days = int(args[1]) if len(args) > 1 else 30
+
+        try:
+            from src.storage import get_db
+
+            db = get_db()
+            history = db.get_score_history(code, days=days)
+            latest = db.get_latest_results([code]).get(code) or (history[-1] if history else None)
+        except Exception as e:
+            logger.error(f"[HistoryCommand] 查询失败: {e}")
+            return BotResponse.error_response(f"查询失败: {str(e)[:100]}")
+
+        if not latest:
+            return BotResponse.markdown_response(
+                f"📭 **{code}** 暂无分析记录\n\n使用 `/analyze {code}` 发起分析。"
+            )
+
+        lines = [
+            f"📈 **{latest['name'] or code}({latest['code']}) 分析历史**",
+            "",
+            f"• 最新评分: {latest['sentiment_score']}（{latest['date']}）",
+            f"• 操作建议: {latest['operation_advice']}",
+            f"• 趋势预测: {latest['trend_prediction']}",
+        ]
+        if latest.get('analysis_summary'):
+            lines.append(f"• 摘要: {latest['analysis_summary'][:80]}")
+
+        if len(history) > 1:
+            lines += ["", f"**近 {days} 天评分**"]
+            for item in history[-10:]:
+                lines.append(f"• {item['date']}: {item['sentiment_score']} {item['operation_advice']}")
+            scores = [item['sentiment_score'] for item in history if item['sentiment_score'] is not None]
+            if scores:
+                change = scores[-1] - scores[0]
+                lines.append(f"\n共 {len(history)} 次分析，评分变化 {change:+d}")
+
+        return BotResponse.markdown_response("\n".join(lines))
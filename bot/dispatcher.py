@@ -8,6 +8,7 @@
 """
 
 import logging
+import threading
 import time
 from collections import defaultdict
 from typing import Dict, List, Optional, Type, Callable
@@ -23,6 +24,7 @@ class RateLimiter:
     简单的频率限制器
     
     基于滑动窗口算法，限制每个用户的请求频率。
+    同时供后台任务调度器读取各用户的额度使用率（线程安全）。
     """
     
     def __init__(self, max_requests: int = 10, window_seconds: int = 60):
@@ -34,6 +36,7 @@ class RateLimiter:
         self.max_requests = max_requests
         self.window_seconds = window_seconds
         self._requests: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
     
     def is_allowed(self, user_id: str) -> bool:
         """
@@ -48,32 +51,34 @@ class RateLimiter:
         now = time.time()
         window_start = now - self.window_seconds
         
-        # 清理过期记录
-        self._requests[user_id] = [
-            t for t in self._requests[user_id] 
-            if t > window_start
-        ]
-        
-        # 检查是否超限
-        if len(self._requests[user_id]) >= self.max_requests:
-            return False
-        
-        # 记录本次请求
-        self._requests[user_id].append(now)
-        return True
+        with self._lock:
+            # 清理过期记录
+            self._requests[user_id] = [
+                t for t in self._requests[user_id] 
+                if t > window_start
+            ]
+            
+            # 检查是否超限
+            if len(self._requests[user_id]) >= self.max_requests:
+                return False
+            
+            # 记录本次请求
+            self._requests[user_id].append(now)
+            return True
     
     def get_remaining(self, user_id: str) -> int:
         """获取剩余可用请求数"""
         now = time.time()
         window_start = now - self.window_seconds
         
-        # 清理过期记录
-        self._requests[user_id] = [
-            t for t in self._requests[user_id] 
-            if t > window_start
-        ]
-        
-        return max(0, self.max_requests - len(self._requests[user_id]))
+        with self._lock:
+            # 清理过期记录
+            self._requests[user_id] = [
+                t for t in self._requests[user_id] 
+                if t > window_start
+            ]
+            
+            return max(0, self.max_requests - len(self._requests[user_id]))
 
 
 class CommandDispatcher:
@@ -115,6 +120,10 @@ class CommandDispatcher:
         self._aliases: Dict[str, str] = {}
         self._rate_limiter = RateLimiter(rate_limit_requests, rate_limit_window)
         
+        # 频率限制器的额度使用率参与后台任务调度的用户公平排序
+        from src.core.job_queue import get_job_scheduler
+        get_job_scheduler().set_rate_limiter(self._rate_limiter)
+        
         # 回调函数：获取帮助命令的命令列表
         self._help_command_getter: Optional[Callable] = None
     
@@ -22,6 +22,7 @@ https://github.com/open-dingtalk/dingtalk-stream-sdk-python
 import logging
 import asyncio
 import threading
+import time
 from datetime import datetime
 from typing import Optional, Callable, Any
 
@@ -39,6 +40,7 @@ except ImportError:
     logger.warning("[DingTalk Stream] 请运行: pip install dingtalk-stream")
 
 from bot.models import BotMessage, BotResponse, ChatType
+from bot.reply_pool import get_reply_pool
 
 
 class DingtalkStreamHandler:
@@ -86,7 +88,13 @@ class DingtalkStreamHandler:
                 self.logger = logger
 
             async def process(self, callback: dingtalk_stream.CallbackMessage):
-                """处理收到的消息"""
+                """
+                处理收到的消息
+
+                这里只解析消息并提交到回复工作池，随即返回 ACK；
+                命令执行与回复在工作线程中进行，不阻塞 Stream 事件循环
+                """
+                started = time.monotonic()
                 try:
                     # 解析消息
                     incoming = dingtalk_stream.ChatbotMessage.from_dict(callback.data)
@@ -96,21 +104,10 @@ class DingtalkStreamHandler:
 
                     if bot_message:
                         self._parent._log_incoming_message(bot_message)
-                        # 调用消息处理回调
-                        response = self._parent._on_message(bot_message)
-
-                        # 发送回复
-                        if response and response.text:
-                            # 构建 @用户 前缀（群聊场景下需要在文本中包含 @用户名）
-                            if response.at_user and incoming.sender_nick:
-                                if response.markdown:
-                                    self.reply_markdown(
-                                        title="股票分析助手",
-                                        text=f"@{incoming.sender_nick} " + response.text,
-                                        incoming_message=incoming
-                                    )
-                                else:
-                                    self.reply_text(response.text, incoming)
+                        pool = get_reply_pool()
+                        key = f"dingtalk:{bot_message.chat_id}"
+                        if pool.submit(key, self._handle_and_reply, bot_message, incoming) is None:
+                            self.reply_text("⚠️ 当前请求较多，请稍后再试", incoming)
 
                     return AckMessage.STATUS_OK, 'OK'
 
@@ -118,6 +115,26 @@ class DingtalkStreamHandler:
                     self.logger.error(f"[DingTalk Stream] 处理消息失败: {e}")
                     self.logger.exception(e)
                     return AckMessage.STATUS_SYSTEM_EXCEPTION, str(e)
+                finally:
+                    get_reply_pool().record_ack(time.monotonic() - started)
+
+            def _handle_and_reply(self, bot_message: BotMessage, incoming: Any) -> None:
+                """执行命令并发送回复（在回复工作池中运行）"""
+                # 调用消息处理回调
+                response = self._parent._on_message(bot_message)
+
+                # 发送回复
+                if response and response.text:
+                    # 构建 @用户 前缀（群聊场景下需要在文本中包含 @用户名）
+                    if response.at_user and incoming.sender_nick:
+                        if response.markdown:
+                            self.reply_markdown(
+                                title="股票分析助手",
+                                text=f"@{incoming.sender_nick} " + response.text,
+                                incoming_message=incoming
+                            )
+                        else:
+                            self.reply_text(response.text, incoming)
 
         def create_handler(self) -> '_ChatbotHandler':
             """创建 SDK 需要的处理器实例"""
@@ -300,7 +317,6 @@ class DingtalkStreamClient:
                 logger.error(f"[DingTalk Stream] 运行异常: {e}")
                 if self._running:
                     logger.info("[DingTalk Stream] 5 秒后重连...")
-                    import time
                     time.sleep(5)
 
     def stop(self) -> None:
@@ -24,8 +24,9 @@ https://open.feishu.cn/document/uAjLw4CM/ukTMukTMukTM/server-side-sdk/python--sd
 import json
 import logging
 import threading
+import time
 from datetime import datetime
-from typing import Optional, Callable
+from typing import Callable, Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +49,7 @@ except ImportError:
     logger.warning("[Feishu Stream] 请运行: pip install lark-oapi")
 
 from bot.models import BotMessage, BotResponse, ChatType
+from bot.reply_pool import get_reply_pool
 from src.formatters import format_feishu_markdown, chunk_feishu_content
 from src.config import get_config
 
@@ -277,10 +279,14 @@ class FeishuStreamHandler:
     def handle_message(self, event: 'P2ImMessageReceiveV1') -> None:
         """
         处理接收到的消息事件
+
+        只解析消息并提交到回复工作池后立即返回（SDK 随即 ACK），
+        命令执行与分段回复在工作线程中按会话顺序进行
         
         Args:
             event: 飞书消息接收事件
         """
+        started = time.monotonic()
         try:
             # 解析消息
             bot_message = self._parse_event_message(event)
@@ -290,21 +296,32 @@ class FeishuStreamHandler:
 
             self._log_incoming_message(bot_message)
 
-            # 调用消息处理回调
-            response = self._on_message(bot_message)
-
-            # 发送回复
-            if response and response.text:
+            pool = get_reply_pool()
+            if pool.submit(f"feishu:{bot_message.chat_id}", self._handle_and_reply, bot_message) is None:
                 self._reply_client.reply_text(
                     message_id=bot_message.message_id,
-                    text=response.text,
-                    at_user=response.at_user,
-                    user_id=bot_message.user_id if response.at_user else None
+                    text="⚠️ 当前请求较多，请稍后再试",
                 )
 
         except Exception as e:
             self._logger.error(f"[Feishu Stream] 处理消息失败: {e}")
             self._logger.exception(e)
+        finally:
+            get_reply_pool().record_ack(time.monotonic() - started)
+
+    def _handle_and_reply(self, bot_message: BotMessage) -> None:
+        """执行命令并发送回复（在回复工作池中运行）"""
+        # 调用消息处理回调
+        response = self._on_message(bot_message)
+
+        # 发送回复
+        if response and response.text:
+            self._reply_client.reply_text(
+                message_id=bot_message.message_id,
+                text=response.text,
+                at_user=response.at_user,
+                user_id=bot_message.user_id if response.at_user else None
+            )
 
     def _parse_event_message(self, event: 'P2ImMessageReceiveV1') -> Optional[BotMessage]:
         """
@@ -486,8 +503,8 @@ class FeishuStreamClient:
 
     def _create_event_handler(self) -> 'lark.EventDispatcherHandler':
         """创建事件分发处理器"""
-        # 创建回复客户端
-        self._reply_client = FeishuReplyClient(self._app_id, self._app_secret)
+        # 回复客户端（与通知服务的会话回复共用）
+        self._reply_client = get_feishu_reply_client(self._app_id, self._app_secret)
 
         # 创建消息处理器
         handler = FeishuStreamHandler(
@@ -561,8 +578,6 @@ class FeishuStreamClient:
 
     def _run_in_background(self) -> None:
         """后台运行（处理异常和重连）"""
-        import time
-
         while self._running:
             try:
                 self.start()
@@ -585,6 +600,18 @@ class FeishuStreamClient:
 
 # 全局客户端实例
 _stream_client: Optional[FeishuStreamClient] = None
+_reply_clients: Dict[Tuple[str, str], FeishuReplyClient] = {}
+_reply_clients_lock = threading.Lock()
+
+
+def get_feishu_reply_client(app_id: str, app_secret: str) -> FeishuReplyClient:
+    """获取共享回复客户端（同一应用复用 SDK 客户端及其 token 缓存）"""
+    with _reply_clients_lock:
+        client = _reply_clients.get((app_id, app_secret))
+        if client is None:
+            client = FeishuReplyClient(app_id, app_secret)
+            _reply_clients[(app_id, app_secret)] = client
+        return client
 
 
 def get_feishu_stream_client() -> Optional[FeishuStreamClient]:
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+机器人回复工作池
+===================================
+
+Stream 模式（钉钉 / 飞书）下，命令执行与回复发送不在 SDK 事件回调里同步完成，
+而是交给有界工作池：
+
+1. 回调线程只做解析 + 入队，立即返回 ACK，长连接在多人同时使用时仍能及时确认事件
+2. 同一会话的任务按到达顺序串行执行（一个会话同时只占用一个工作线程），
+   回复不会乱序；不同会话之间并发
+3. 排队总数达到 BOT_REPLY_MAX_PENDING 时拒绝新任务，由调用方回复"繁忙"
+4. 记录 ACK 耗时与排队等待时间的 p50 / p99，可通过 /health 查看
+
+使用方式：
+    pool = get_reply_pool()
+    if pool.submit(f"dingtalk:{chat_id}", handle, message) is None:
+        ...  # 队列已满
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    """最近邻百分位（samples 已排序）"""
+    if not samples:
+        return 0.0
+    index = max(0, math.ceil(pct / 100.0 * len(samples)) - 1)
+    return samples[index]
+
+
+class _LatencyWindow:
+    """最近 N 次耗时的滚动窗口（秒）"""
+
+    def __init__(self, size: int):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._samples)
+        return {
+            'samples': len(samples),
+            'p50_ms': round(_percentile(samples, 50) * 1000, 1),
+            'p99_ms': round(_percentile(samples, 99) * 1000, 1),
+            'max_ms': round(samples[-1] * 1000, 1) if samples else 0.0,
+        }
+
+
+class ChatWorkerPool:
+    """
+    按会话保序的有界工作池（线程安全）
+
+    每个会话一条 FIFO 队列；会话有任务时占用一个工作线程，
+    每执行完一个任务就让出线程，避免单个会话长期霸占
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, latency_window: int = 1000):
+        """
+        Args:
+            max_workers: 工作线程数
+            max_pending: 全部会话排队（含执行中）任务总数上限
+            latency_window: 延迟统计保留的最近样本数
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bot_reply")
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[Tuple[Future, Callable[[], Any], float]]] = {}
+        self._pending = 0
+        self._local = threading.local()
+
+        self._ack_latency = _LatencyWindow(latency_window)
+        self._queue_wait = _LatencyWindow(latency_window)
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def submit(self, key: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Optional[Future]:
+        """
+        提交任务到 key 对应的会话队列
+
+        Returns:
+            任务 Future；队列已满时返回 None
+        """
+        future: Future = Future()
+        task = (future, lambda: func(*args, **kwargs), time.monotonic())
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                logger.warning(f"[ReplyPool] 排队任务已达上限 {self.max_pending}，拒绝会话 {key} 的新任务")
+                return None
+            self._pending += 1
+            self._submitted += 1
+            queue = self._queues.get(key)
+            if queue is not None:
+                # 会话已有任务在执行 / 排队，由其工作线程依次处理
+                queue.append(task)
+                return future
+            self._queues[key] = deque([task])
+        self._executor.submit(self._run_next, key)
+        return future
+
+    def call(self, key: str, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        在会话队列中执行并等待结果（与该会话的其他回复保持顺序）
+
+        当前线程正在执行同一会话的任务时直接执行，避免自己等自己；
+        队列已满时也直接在当前线程执行
+        """
+        if getattr(self._local, 'key', None) == key:
+            return func(*args, **kwargs)
+        future = self.submit(key, func, *args, **kwargs)
+        if future is None:
+            return func(*args, **kwargs)
+        return future.result(timeout=timeout)
+
+    def _run_next(self, key: str) -> None:
+        with self._lock:
+            future, fn, enqueued_at = self._queues[key][0]
+        self._queue_wait.record(time.monotonic() - enqueued_at)
+
+        self._local.key = key
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+                    logger.error(f"[ReplyPool] 会话 {key} 的任务执行失败: {e}")
+        finally:
+            self._local.key = None
+
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+            queue = self._queues[key]
+            queue.popleft()
+            if not queue:
+                del self._queues[key]
+                return
+        # 同一会话还有任务：重新排到线程池末尾，让其他会话也有机会执行
+        self._executor.submit(self._run_next, key)
+
+    def record_ack(self, seconds: float) -> None:
+        """记录一次事件回调从收到到返回 ACK 的耗时"""
+        self._ack_latency.record(seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """任务计数、当前排队数与延迟分位数"""
+        with self._lock:
+            stats = {
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'active_chats': len(self._queues),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+            }
+        stats['ack_latency'] = self._ack_latency.summary()
+        stats['queue_wait'] = self._queue_wait.summary()
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """停止接收新任务；wait=True 时等待已排队任务完成"""
+        self._executor.shutdown(wait=wait)
+
+
+# 全局工作池实例
+_reply_pool: Optional[ChatWorkerPool] = None
+_reply_pool_lock = threading.Lock()
+
+
+def get_reply_pool() -> ChatWorkerPool:
+    """获取全局机器人回复工作池"""
+    global _reply_pool
+    if _reply_pool is None:
+        with _reply_pool_lock:
+            if _reply_pool is None:
+                from src.config import get_config
+                config = get_config()
+                _reply_pool = ChatWorkerPool(
+                    max_workers=config.bot_reply_workers,
+                    max_pending=config.bot_reply_max_pending,
+                )
+    return _reply_pool
+
+
+def get_reply_pool_stats() -> Dict[str, Any]:
+    """返回全局工作池的统计（尚未创建时返回空字典，不触发创建）"""
+    pool = _reply_pool
+    return pool.get_stats() if pool is not None else {}
+
+
+def reset_reply_pool() -> None:
+    """关闭并重置全局工作池（主要用于测试）"""
+    global _reply_pool
+    with _reply_pool_lock:
+        if _reply_pool is not None:
+            _reply_pool.shutdown(wait=False)
+        _reply_pool = None
@@ -38,6 +38,7 @@ if os.getenv("GITHUB_ACTIONS") != "true" and os.getenv("USE_PROXY", "false").low
 import argparse
 import logging
 import sys
+import threading
 import time
 from datetime import datetime, timezone, timedelta
 from logging.handlers import RotatingFileHandler
@@ -137,6 +138,12 @@ def parse_arguments() -> argparse.Namespace:
   python main.py --single-notify    # 启用单股推送模式（每分析完一只立即推送）
   python main.py --schedule         # 启用定时任务模式
   python main.py --market-review    # 仅运行大盘复盘
+  python main.py --watch            # 盘中盯盘，关键指标越过阈值时重新分析
+  python main.py --outbox-status    # 查看通知发件箱（待发送 / 死信）
+  python main.py --outbox-replay    # 重新投递全部死信消息
+  python main.py --shards 4         # 个股分析分 4 个进程执行
+  python main.py --resume           # 从最近一次中断的运行继续（跳过已完成阶段）
+  python main.py --shard-worker RUN_ID  # 作为工作者加入其他机器发起的分片运行
         '''
     )
     
@@ -177,12 +184,63 @@ def parse_arguments() -> argparse.Namespace:
         help='并发线程数（默认使用配置值）'
     )
     
+    parser.add_argument(
+        '--resume',
+        nargs='?',
+        const='latest',
+        default=None,
+        metavar='RUN_ID',
+        help='从检查点恢复运行，跳过已完成的阶段（不指定 RUN_ID 时恢复最近一次运行）'
+    )
+    
+    parser.add_argument(
+        '--shards',
+        type=int,
+        default=None,
+        help='分片进程数，>1 时个股分析分多进程执行（默认使用配置值 SHARD_COUNT）'
+    )
+    
+    parser.add_argument(
+        '--shard-worker',
+        type=str,
+        metavar='RUN_ID',
+        help='作为工作者加入指定的分片运行，处理完队列后退出'
+    )
+    
+    parser.add_argument(
+        '--shard-queue',
+        type=str,
+        default=None,
+        help='分片工作队列文件路径（默认使用配置值 SHARD_QUEUE_PATH）'
+    )
+    
     parser.add_argument(
         '--schedule',
         action='store_true',
         help='启用定时任务模式，每日定时执行'
     )
     
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='盘中盯盘模式：交易时段内轮询实时行情，指标越过阈值时重新分析并推送'
+    )
+    
+    parser.add_argument(
+        '--outbox-status',
+        action='store_true',
+        help='查看通知发件箱各状态消息数与待发送 / 死信消息'
+    )
+    
+    parser.add_argument(
+        '--outbox-replay',
+        nargs='*',
+        type=int,
+        default=None,
+        metavar='ID',
+        help='重新投递死信消息（不指定 ID 时重放全部死信），等待投递完成后退出'
+    )
+    
     parser.add_argument(
         '--market-review',
         action='store_true',
@@ -210,6 +268,35 @@ def parse_arguments() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def run_outbox_command(config: Config, args: argparse.Namespace) -> None:
+    """查看通知发件箱，或重放死信消息"""
+    from src.core.outbox import get_notification_outbox
+    from src.storage import get_db
+
+    db = get_db()
+    if args.outbox_replay is not None:
+        outbox = get_notification_outbox()
+        count = outbox.replay(args.outbox_replay or None)
+        logger.info(f"已重新放入发件箱: {count} 条死信消息")
+        if count:
+            outbox.flush(timeout=config.outbox_flush_timeout)
+
+    counts = db.get_outbox_counts()
+    summary = ", ".join(f"{status} {n}" for status, n in sorted(counts.items()))
+    print(f"\n发件箱: {summary or '空'}")
+    for status in ('pending', 'sending', 'dead'):
+        items = db.list_notifications(status=status, limit=20)
+        if not items:
+            continue
+        print(f"\n[{status}]")
+        for item in items:
+            print(
+                f"  #{item['id']:<6} {item['channel']:<10} 尝试 {item['attempts']} 次  "
+                f"创建 {item['created_at'][:19]}  下次 {(item['next_attempt_at'] or '-')[:19]}  "
+                f"{(item['last_error'] or '')[:60]}"
+            )
+
+
 def run_full_analysis(
     config: Config,
     args: argparse.Namespace,
@@ -235,7 +322,9 @@ def run_full_analysis(
         results = pipeline.run(
             stock_codes=stock_codes,
             dry_run=args.dry_run,
-            send_notification=not args.no_notify
+            send_notification=not args.no_notify,
+            num_shards=args.shards,
+            resume=args.resume
         )
 
         # Issue #128: 分析间隔 - 在个股分析和大盘分析之间添加延迟
@@ -373,15 +462,26 @@ def main() -> int:
         stock_codes = [code.strip() for code in args.stocks.split(',') if code.strip()]
         logger.info(f"使用命令行指定的股票列表: {stock_codes}")
     
+    if args.shard_queue:
+        config.shard_queue_path = args.shard_queue
+    
     # === 启动 WebUI (如果启用) ===
     # 优先级: 命令行参数 > 配置文件
-    start_webui = (args.webui or args.webui_only or config.webui_enabled) and os.getenv("GITHUB_ACTIONS") != "true"
+    start_webui = (
+        (args.webui or args.webui_only or config.webui_enabled)
+        and not args.shard_worker
+        and os.getenv("GITHUB_ACTIONS") != "true"
+    )
     
     if start_webui:
         try:
             from webui import run_server_in_thread
             run_server_in_thread(host=config.webui_host, port=config.webui_port)
             start_bot_stream_clients(config)
+            # 后台预热共享服务容器，首个 WebUI/机器人请求无需等待组件初始化
+            from src.core.container import get_service_container
+            container = get_service_container()
+            threading.Thread(target=container.warm_up, name="container_warm_up", daemon=True).start()
         except Exception as e:
             logger.error(f"启动 WebUI 失败: {e}")
     
@@ -399,6 +499,18 @@ def main() -> int:
         return 0
 
     try:
+        # 模式0: 分片工作者（加入其他进程 / 机器发起的分片运行）
+        if args.shard_worker:
+            logger.info(f"模式: 分片工作者 (运行 {args.shard_worker})")
+            from src.core.sharding import run_shard_worker
+            run_shard_worker(config.shard_queue_path, args.shard_worker)
+            return 0
+        
+        # 通知发件箱检查 / 重放
+        if args.outbox_status or args.outbox_replay is not None:
+            run_outbox_command(config, args)
+            return 0
+        
         # 模式1: 仅大盘复盘
         if args.market_review:
             logger.info("模式: 仅大盘复盘")
@@ -431,7 +543,19 @@ def main() -> int:
             )
             return 0
         
-        # 模式2: 定时任务模式
+        # 模式2: 盘中盯盘
+        if args.watch:
+            logger.info("模式: 盘中盯盘")
+            from src.core.intraday import run_intraday_watch
+            run_intraday_watch(
+                config,
+                stock_codes=stock_codes,
+                max_workers=args.workers,
+                send_notification=not args.no_notify,
+            )
+            return 0
+        
+        # 模式3: 定时任务模式
         if args.schedule or config.schedule_enabled:
             logger.info("模式: 定时任务")
             logger.info(f"每日执行时间: {config.schedule_time}")
@@ -439,7 +563,21 @@ def main() -> int:
             from src.scheduler import run_with_schedule
             
             def scheduled_task():
-                run_full_analysis(config, args, stock_codes)
+                # 经任务调度器以最低优先级执行：与 WebUI / 机器人的交互式请求共用线程预算，
+                # 交互式请求优先出队（调度器线程数 >= 2 时始终保留一个线程给交互式请求）
+                from src.core.job_queue import JobPriority, QueueFullError, get_job_scheduler
+                try:
+                    future = get_job_scheduler().submit(
+                        run_full_analysis, config, args, stock_codes,
+                        priority=JobPriority.BULK,
+                        user_id='scheduler',
+                        name='scheduled_daily_analysis',
+                    )
+                except QueueFullError as e:
+                    logger.warning(f"定时任务未能进入任务队列（{e}），直接执行")
+                    run_full_analysis(config, args, stock_codes)
+                    return
+                future.result()
             
             run_with_schedule(
                 task=scheduled_task,
@@ -448,9 +586,14 @@ def main() -> int:
             )
             return 0
         
-        # 模式3: 正常单次运行
+        # 模式4: 正常单次运行
         run_full_analysis(config, args, stock_codes)
         
+        # 退出前等待发件箱中的推送发送完成（超时未发完的消息下次启动继续发送）
+        if config.outbox_enabled and not args.no_notify:
+            from src.core.outbox import get_notification_outbox
+            get_notification_outbox().flush(timeout=config.outbox_flush_timeout)
+        
         logger.info("\n程序执行完成")
         
         # 如果启用了 WebUI 且是非定时任务模式，保持程序运行以便访问 WebUI
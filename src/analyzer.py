@@ -12,9 +12,12 @@ A股自选股智能分析系统 - AI分析层
 
 import json
 import logging
+import threading
 import time
-from dataclasses import dataclass
-from typing import Optional, Dict, Any, List
+import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, fields
+from typing import Optional, Dict, Any, List, Callable, Tuple, TYPE_CHECKING
 
 from tenacity import (
     retry,
@@ -25,9 +28,41 @@ from tenacity import (
 )
 
 from src.config import get_config
+from src.llm_cache import LLMResponseCache, get_llm_cache
+from src.llm_dispatcher import estimate_tokens, get_llm_dispatcher, is_rate_limit_error, parse_retry_after
+from src.llm_json import IncrementalJSONScanner, extract_json, validate_dashboard
+from src.llm_usage import extract_gemini_usage, extract_openai_usage, get_llm_usage_tracker
+from src.prompt_budget import PromptSection, fit_sections, truncate_intel_report
+
+if TYPE_CHECKING:
+    from src.core.checkpoint import StockCheckpoint
 
 logger = logging.getLogger(__name__)
 
+# 流式进度回调：参数为 {'stage': 'llm', 'received_chars': int, 'json_complete': bool}
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# Gemini 显式上下文缓存：按模型缓存系统提示词，进程内所有 GeminiAnalyzer 共享
+# {模型名: (基于 CachedContent 的 GenerativeModel, 刷新时间 monotonic)}
+_context_cache_models: Dict[str, Tuple[Any, float]] = {}
+_context_cache_unsupported: set = set()  # 明确不支持的模型（400/404，如低于最小 token 数），改用隐式前缀缓存
+_context_cache_retry_at: Dict[str, float] = {}  # 临时失败（超时、429 等）后的重试时间 monotonic
+_context_cache_lock = threading.Lock()  # 只保护上面几个字典，不在持锁期间发起网络请求
+_context_cache_create_locks: Dict[str, threading.Lock] = {}  # 按模型串行创建缓存
+# 临时失败后暂停尝试创建的时长（秒）
+CONTEXT_CACHE_RETRY_DELAY = 60.0
+
+
+def _is_context_cache_unsupported(error: Exception) -> bool:
+    """400 / 404：模型不支持显式缓存或内容低于最小 token 数，重试也不会成功"""
+    code = getattr(error, 'code', None)
+    if callable(code):
+        code = code()
+    try:
+        return int(code) in (400, 404)
+    except (TypeError, ValueError):
+        return False
+
 
 # 股票名称映射（常见股票）
 STOCK_NAME_MAP = {
@@ -228,10 +263,17 @@ class AnalysisResult:
             'risk_warning': self.risk_warning,
             'buy_reason': self.buy_reason,
             'search_performed': self.search_performed,
+            'data_sources': self.data_sources,
             'success': self.success,
             'error_message': self.error_message,
         }
     
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'AnalysisResult':
+        """从字典还原（忽略未知字段，兼容 to_dict 输出）"""
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+    
     def get_core_conclusion(self) -> str:
         """获取核心结论（一句话）"""
         if self.dashboard and 'core_conclusion' in self.dashboard:
@@ -497,6 +539,10 @@ class GeminiAnalyzer:
         self._using_fallback = False  # 是否正在使用备选模型
         self._use_openai = False  # 是否使用 OpenAI 兼容 API
         self._openai_client = None  # OpenAI 客户端
+        # 实例由服务容器跨线程共享：备选模型只按单次调用切换，不改写上面的当前模型；
+        # 懒加载的备选模型 / OpenAI 客户端在锁内创建
+        self._lock = threading.Lock()
+        self._fallback_model: Optional[Tuple[str, Any]] = None
         
         # 检查 Gemini API Key 是否有效（过滤占位符）
         gemini_key_valid = self._api_key and not self._api_key.startswith('your_') and len(self._api_key) > 10
@@ -616,134 +662,395 @@ class GeminiAnalyzer:
             logger.error(f"Gemini 模型初始化失败: {e}")
             self._model = None
     
-    def _switch_to_fallback_model(self) -> bool:
+    def _get_fallback_model(self) -> Optional[Tuple[str, Any]]:
         """
-        切换到备选模型
+        获取备选模型（首次调用时创建，之后复用）
+        
+        只用于本次调用的后续重试，不修改实例的当前模型：其他线程上正在进行的调用不受影响
         
         Returns:
-            是否成功切换
+            (模型名称, 模型)，创建失败时返回 None
         """
-        try:
-            import google.generativeai as genai
-            config = get_config()
-            fallback_model = config.gemini_model_fallback
-            
-            logger.warning(f"[LLM] 切换到备选模型: {fallback_model}")
-            self._model = genai.GenerativeModel(
-                model_name=fallback_model,
-                system_instruction=self.SYSTEM_PROMPT,
-            )
-            self._current_model_name = fallback_model
-            self._using_fallback = True
-            logger.info(f"[LLM] 备选模型 {fallback_model} 初始化成功")
-            return True
-        except Exception as e:
-            logger.error(f"[LLM] 切换备选模型失败: {e}")
-            return False
+        with self._lock:
+            if self._fallback_model is not None:
+                return self._fallback_model
+            try:
+                import google.generativeai as genai
+                config = get_config()
+                fallback_model = config.gemini_model_fallback
+                
+                logger.warning(f"[LLM] 切换到备选模型: {fallback_model}")
+                self._fallback_model = (fallback_model, genai.GenerativeModel(
+                    model_name=fallback_model,
+                    system_instruction=self.SYSTEM_PROMPT,
+                ))
+                logger.info(f"[LLM] 备选模型 {fallback_model} 初始化成功")
+                return self._fallback_model
+            except Exception as e:
+                logger.error(f"[LLM] 切换备选模型失败: {e}")
+                return None
     
     def is_available(self) -> bool:
         """检查分析器是否可用"""
         return self._model is not None or self._openai_client is not None
     
-    def _call_openai_api(self, prompt: str, generation_config: dict) -> str:
+    def _build_openai_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """
+        构建 OpenAI 兼容 API 的消息列表
+        
+        静态前缀（系统提示词）固定放在首位且逐字不变，动态的个股数据只出现在其后的 user 消息中，
+        以命中 OpenAI / DeepSeek 等平台的自动前缀缓存
+        """
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ]
+    
+    def _get_gemini_model(self, model_name: Optional[str] = None, base_model: Any = None) -> Any:
+        """
+        获取用于生成的 Gemini 模型
+        
+        启用上下文缓存时，系统提示词（静态前缀）通过 CachedContent 只上传一次，
+        后续请求只发送个股数据（动态后缀）；缓存不可用时回退到普通模型（依赖平台隐式前缀缓存）
+        
+        Args:
+            model_name: 模型名称（默认当前模型；备选模型重试时由调用方传入）
+            base_model: 与 model_name 对应的普通模型
+        """
+        config = get_config()
+        if model_name is None:
+            model_name, base_model = self._current_model_name, self._model
+        if not config.gemini_context_cache_enabled or not model_name:
+            return base_model
+        
+        with _context_cache_lock:
+            if model_name in _context_cache_unsupported:
+                return base_model
+            entry = _context_cache_models.get(model_name)
+            if entry and time.monotonic() < entry[1]:
+                return entry[0]
+            create_lock = _context_cache_create_locks.setdefault(model_name, threading.Lock())
+        
+        # 网络请求只持有该模型的创建锁：同一模型只创建一次，其他模型与已命中缓存的请求不受影响
+        with create_lock:
+            with _context_cache_lock:
+                entry = _context_cache_models.get(model_name)
+                if entry and time.monotonic() < entry[1]:
+                    return entry[0]
+                if model_name in _context_cache_unsupported:
+                    return base_model
+                if time.monotonic() < _context_cache_retry_at.get(model_name, 0):
+                    return base_model
+            
+            try:
+                cached_model = self._create_context_cached_model(model_name)
+            except Exception as e:
+                with _context_cache_lock:
+                    if _is_context_cache_unsupported(e):
+                        _context_cache_unsupported.add(model_name)
+                        logger.info(f"[Gemini] 模型 {model_name} 不支持显式上下文缓存，使用隐式前缀缓存: {str(e)[:100]}")
+                    else:
+                        _context_cache_retry_at[model_name] = time.monotonic() + CONTEXT_CACHE_RETRY_DELAY
+                        logger.warning(
+                            f"[Gemini] 创建上下文缓存失败，{CONTEXT_CACHE_RETRY_DELAY:.0f}s 后重试: {str(e)[:100]}"
+                        )
+                return base_model
+            
+            with _context_cache_lock:
+                # 提前于 TTL 到期刷新，避免请求落在缓存过期的边界上
+                _context_cache_models[model_name] = (cached_model, time.monotonic() + config.gemini_context_cache_ttl * 0.9)
+                _context_cache_retry_at.pop(model_name, None)
+            return cached_model
+    
+    def _create_context_cached_model(self, model_name: str) -> Any:
+        """创建基于系统提示词上下文缓存的模型（失败时抛出异常，由调用方区分是否可重试）"""
+        import datetime
+        import google.generativeai as genai
+        from google.generativeai import caching
+        
+        config = get_config()
+        cached_content = caching.CachedContent.create(
+            model=model_name if model_name.startswith('models/') else f'models/{model_name}',
+            display_name='stock-analysis-system-prompt',
+            system_instruction=self.SYSTEM_PROMPT,
+            ttl=datetime.timedelta(seconds=config.gemini_context_cache_ttl),
+        )
+        logger.info(f"[Gemini] 系统提示词上下文缓存已创建 (模型: {model_name}, TTL: {config.gemini_context_cache_ttl}s)")
+        return genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+    
+    def _invalidate_context_cache(self, model_name: Optional[str] = None) -> None:
+        """丢弃模型（默认当前模型）的上下文缓存，下次请求时重建"""
+        with _context_cache_lock:
+            _context_cache_models.pop(model_name or self._current_model_name, None)
+    
+    def _estimate_request_tokens(self, prompt: str, generation_config: dict) -> int:
+        """预估单次请求的 token 消耗（系统提示词 + 用户提示词 + 预期输出）"""
+        expected_output = min(generation_config.get('max_output_tokens', 8192), 2048)
+        return estimate_tokens(self.SYSTEM_PROMPT) + estimate_tokens(prompt) + expected_output
+    
+    def _stream_gemini(
+        self,
+        prompt: str,
+        generation_config: dict,
+        progress_callback: Optional[ProgressCallback] = None,
+        stop_at_json: bool = True,
+        on_usage: Optional[Callable[[int], None]] = None,
+        model_name: Optional[str] = None,
+        model: Any = None
+    ) -> str:
+        """
+        流式调用 Gemini，仪表盘 JSON 闭合后立即停止接收
+        
+        Args:
+            on_usage: 收到实际 token 用量时回调（用于修正调度器的 TPM 预估）
+            model_name: 本次调用使用的模型名称（默认当前模型）
+            model: 与 model_name 对应的普通模型
+        
+        Returns:
+            已接收的响应文本
+        """
+        if model_name is None:
+            model_name, model = self._current_model_name, self._model
+        scanner = IncrementalJSONScanner()
+        usage_metadata = None
+        response = self._get_gemini_model(model_name, model).generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={"timeout": 120},
+            stream=True,
+        )
+        try:
+            for chunk in response:
+                # 每个分块都携带截至当前的用量（含缓存命中数），保留最后一份
+                usage_metadata = getattr(chunk, 'usage_metadata', None) or usage_metadata
+                try:
+                    chunk_text = chunk.text
+                except ValueError:
+                    # 无文本内容的分块（如安全过滤元数据）
+                    continue
+                done = scanner.feed(chunk_text)
+                self._report_progress(progress_callback, scanner)
+                if done and stop_at_json:
+                    logger.debug(f"[Gemini] JSON 已完整，提前结束流式接收 ({scanner.received_chars} 字符)")
+                    break
+        finally:
+            # 提前结束时关闭底层流，释放连接并停止接收剩余输出；
+            # SDK 的流式响应未提供 close()，取其内部 gRPC / REST 迭代器的 cancel() / close()
+            stream = getattr(response, '_iterator', None)
+            close = (
+                getattr(response, 'close', None)
+                or getattr(stream, 'cancel', None)
+                or getattr(stream, 'close', None)
+            )
+            if close:
+                close()
+        if on_usage is not None:
+            on_usage(getattr(usage_metadata, 'total_token_count', 0) or 0)
+        get_llm_usage_tracker().record(model_name, extract_gemini_usage(usage_metadata))
+        return scanner.text
+    
+    def _stream_openai(
+        self,
+        prompt: str,
+        generation_config: dict,
+        progress_callback: Optional[ProgressCallback] = None,
+        stop_at_json: bool = True,
+        on_usage: Optional[Callable[[int], None]] = None
+    ) -> str:
+        """
+        流式调用 OpenAI 兼容 API，仪表盘 JSON 闭合后关闭连接，不再为多余输出付费
+        
+        Args:
+            on_usage: 收到实际 token 用量时回调（用于修正调度器的 TPM 预估）
+        
+        Returns:
+            已接收的响应文本
+        """
+        config = get_config()
+        scanner = IncrementalJSONScanner()
+        usage = None
+        stream = self._openai_client.chat.completions.create(
+            model=self._current_model_name,
+            messages=self._build_openai_messages(prompt),
+            temperature=generation_config.get('temperature', config.openai_temperature),
+            max_tokens=generation_config.get('max_output_tokens', 8192),
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                # 部分平台在流中附带用量（通常位于最后一个分块，提前结束时可能收不到）
+                usage = getattr(chunk, 'usage', None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                done = scanner.feed(delta)
+                self._report_progress(progress_callback, scanner)
+                if done and stop_at_json:
+                    logger.debug(f"[OpenAI] JSON 已完整，提前结束流式接收 ({scanner.received_chars} 字符)")
+                    break
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                close()
+        if on_usage is not None:
+            on_usage(getattr(usage, 'total_tokens', 0) or 0)
+        get_llm_usage_tracker().record(self._current_model_name, extract_openai_usage(usage))
+        return scanner.text
+    
+    @staticmethod
+    def _report_progress(
+        progress_callback: Optional[ProgressCallback],
+        scanner: IncrementalJSONScanner
+    ) -> None:
+        """向调用方（机器人/WebUI 任务）转发流式进度，回调异常不影响分析"""
+        if progress_callback is None:
+            return
+        try:
+            progress_callback({
+                'stage': 'llm',
+                'received_chars': scanner.received_chars,
+                'json_complete': scanner.complete,
+            })
+        except Exception as e:
+            logger.debug(f"[LLM] 进度回调失败: {e}")
+    
+    def _call_openai_api(
+        self,
+        prompt: str,
+        generation_config: dict,
+        progress_callback: Optional[ProgressCallback] = None,
+        stop_at_json: bool = True
+    ) -> str:
         """
         调用 OpenAI 兼容 API
         
+        通过共享调度器申请 RPM/TPM 预算，仅在 429 时进入冷却
+        
         Args:
             prompt: 提示词
             generation_config: 生成配置
+            progress_callback: 流式进度回调（可选）
+            stop_at_json: 流式模式下最外层 JSON 闭合后是否立即停止接收（纯文本输出需关闭）
             
         Returns:
             响应文本
         """
         config = get_config()
         max_retries = config.gemini_max_retries
-        base_delay = config.gemini_retry_delay
+        dispatcher = get_llm_dispatcher(self._current_model_name)
+        estimated_tokens = self._estimate_request_tokens(prompt, generation_config)
         
         for attempt in range(max_retries):
             try:
-                if attempt > 0:
-                    delay = base_delay * (2 ** (attempt - 1))
-                    delay = min(delay, 60)
-                    logger.info(f"[OpenAI] 第 {attempt + 1} 次重试，等待 {delay:.1f} 秒...")
-                    time.sleep(delay)
+                with dispatcher.slot(estimated_tokens) as slot:
+                    if config.llm_stream_enabled:
+                        text = self._stream_openai(
+                            prompt, generation_config, progress_callback, stop_at_json,
+                            on_usage=slot.record_tokens,
+                        )
+                    else:
+                        response = self._openai_client.chat.completions.create(
+                            model=self._current_model_name,
+                            messages=self._build_openai_messages(prompt),
+                            temperature=generation_config.get('temperature', config.openai_temperature),
+                            max_tokens=generation_config.get('max_output_tokens', 8192),
+                        )
+                        usage = getattr(response, 'usage', None)
+                        slot.record_tokens(getattr(usage, 'total_tokens', 0) or 0)
+                        get_llm_usage_tracker().record(self._current_model_name, extract_openai_usage(usage))
+                        text = response.choices[0].message.content if response and response.choices else None
                 
-                config = get_config()
-                response = self._openai_client.chat.completions.create(
-                    model=self._current_model_name,
-                    messages=[
-                        {"role": "system", "content": self.SYSTEM_PROMPT},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=generation_config.get('temperature', config.openai_temperature),
-                    max_tokens=generation_config.get('max_output_tokens', 8192),
-                )
-                
-                if response and response.choices and response.choices[0].message.content:
-                    return response.choices[0].message.content
+                if text:
+                    dispatcher.report_success()
+                    return text
                 else:
                     raise ValueError("OpenAI API 返回空响应")
                     
             except Exception as e:
                 error_str = str(e)
-                is_rate_limit = '429' in error_str or 'rate' in error_str.lower() or 'quota' in error_str.lower()
                 
-                if is_rate_limit:
+                if is_rate_limit_error(e):
                     logger.warning(f"[OpenAI] API 限流，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
+                    dispatcher.report_rate_limit(parse_retry_after(e))
                 else:
                     logger.warning(f"[OpenAI] API 调用失败，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
                 
                 if attempt == max_retries - 1:
                     raise
+                
+                if not is_rate_limit_error(e):
+                    # 5xx / 连接错误等：指数退避 + 抖动（限流冷却由调度器负责）
+                    delay = dispatcher.error_backoff(attempt)
+                    logger.info(f"[OpenAI] 第 {attempt + 2} 次重试，等待 {delay:.1f} 秒...")
+                    time.sleep(delay)
         
         raise Exception("OpenAI API 调用失败，已达最大重试次数")
     
-    def _call_api_with_retry(self, prompt: str, generation_config: dict) -> str:
+    def _call_api_with_retry(
+        self,
+        prompt: str,
+        generation_config: dict,
+        progress_callback: Optional[ProgressCallback] = None,
+        stop_at_json: bool = True
+    ) -> str:
         """
         调用 AI API，带有重试和模型切换机制
         
         优先级：Gemini > Gemini 备选模型 > OpenAI 兼容 API
         
         处理 429 限流错误：
-        1. 先指数退避重试
-        2. 多次失败后切换到备选模型
+        1. 调度器按 Retry-After / 指数退避冷却后重试（不再每次请求前固定等待）
+        2. 多次失败后切换到备选模型（备选模型有独立的预算）
         3. Gemini 完全失败后尝试 OpenAI
         
         Args:
             prompt: 提示词
             generation_config: 生成配置
+            progress_callback: 流式进度回调（可选）
+            stop_at_json: 流式模式下最外层 JSON 闭合后是否立即停止接收（纯文本输出需关闭）
             
         Returns:
             响应文本
         """
         # 如果已经在使用 OpenAI 模式，直接调用 OpenAI
         if self._use_openai:
-            return self._call_openai_api(prompt, generation_config)
+            return self._call_openai_api(prompt, generation_config, progress_callback, stop_at_json)
         
         config = get_config()
         max_retries = config.gemini_max_retries
-        base_delay = config.gemini_retry_delay
+        estimated_tokens = self._estimate_request_tokens(prompt, generation_config)
         
         last_error = None
         tried_fallback = getattr(self, '_using_fallback', False)
+        # 本次调用使用的模型：切换备选模型只影响本次调用，共享实例的当前模型保持不变
+        model_name, model = self._current_model_name, self._model
         
         for attempt in range(max_retries):
+            # 切换备选模型后调度器随之切换
+            dispatcher = get_llm_dispatcher(model_name)
             try:
-                # 请求前增加延时（防止请求过快触发限流）
-                if attempt > 0:
-                    delay = base_delay * (2 ** (attempt - 1))  # 指数退避: 5, 10, 20, 40...
-                    delay = min(delay, 60)  # 最大60秒
-                    logger.info(f"[Gemini] 第 {attempt + 1} 次重试，等待 {delay:.1f} 秒...")
-                    time.sleep(delay)
-                
-                response = self._model.generate_content(
-                    prompt,
-                    generation_config=generation_config,
-                    request_options={"timeout": 120}
-                )
+                with dispatcher.slot(estimated_tokens) as slot:
+                    if config.llm_stream_enabled:
+                        text = self._stream_gemini(
+                            prompt, generation_config, progress_callback, stop_at_json,
+                            on_usage=slot.record_tokens, model_name=model_name, model=model,
+                        )
+                    else:
+                        response = self._get_gemini_model(model_name, model).generate_content(
+                            prompt,
+                            generation_config=generation_config,
+                            request_options={"timeout": 120}
+                        )
+                        usage = getattr(response, 'usage_metadata', None)
+                        slot.record_tokens(getattr(usage, 'total_token_count', 0) or 0)
+                        get_llm_usage_tracker().record(model_name, extract_gemini_usage(usage))
+                        text = response.text if response else None
                 
-                if response and response.text:
-                    return response.text
+                if text:
+                    dispatcher.report_success()
+                    return text
                 else:
                     raise ValueError("Gemini 返回空响应")
                     
@@ -752,14 +1059,15 @@ class GeminiAnalyzer:
                 error_str = str(e)
                 
                 # 检查是否是 429 限流错误
-                is_rate_limit = '429' in error_str or 'quota' in error_str.lower() or 'rate' in error_str.lower()
-                
-                if is_rate_limit:
+                if is_rate_limit_error(e):
                     logger.warning(f"[Gemini] API 限流 (429)，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
+                    dispatcher.report_rate_limit(parse_retry_after(e))
                     
                     # 如果已经重试了一半次数且还没切换过备选模型，尝试切换
                     if attempt >= max_retries // 2 and not tried_fallback:
-                        if self._switch_to_fallback_model():
+                        fallback = self._get_fallback_model()
+                        if fallback is not None:
+                            model_name, model = fallback
                             tried_fallback = True
                             logger.info("[Gemini] 已切换到备选模型，继续重试")
                         else:
@@ -767,22 +1075,32 @@ class GeminiAnalyzer:
                 else:
                     # 非限流错误，记录并继续重试
                     logger.warning(f"[Gemini] API 调用失败，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
+                    # 上下文缓存可能已过期或被删除，下次重试时重建
+                    self._invalidate_context_cache(model_name)
+                    
+                    if attempt < max_retries - 1:
+                        # 5xx / 连接错误等：指数退避 + 抖动（限流冷却由调度器负责）
+                        delay = dispatcher.error_backoff(attempt)
+                        logger.info(f"[Gemini] 第 {attempt + 2} 次重试，等待 {delay:.1f} 秒...")
+                        time.sleep(delay)
         
         # Gemini 所有重试都失败，尝试 OpenAI 兼容 API
         if self._openai_client:
             logger.warning("[Gemini] 所有重试失败，切换到 OpenAI 兼容 API")
             try:
-                return self._call_openai_api(prompt, generation_config)
+                return self._call_openai_api(prompt, generation_config, progress_callback, stop_at_json)
             except Exception as openai_error:
                 logger.error(f"[OpenAI] 备选 API 也失败: {openai_error}")
                 raise last_error or openai_error
         elif config.openai_api_key and config.openai_base_url:
             # 尝试懒加载初始化 OpenAI
             logger.warning("[Gemini] 所有重试失败，尝试初始化 OpenAI 兼容 API")
-            self._init_openai_fallback()
+            with self._lock:
+                if not self._openai_client:
+                    self._init_openai_fallback()
             if self._openai_client:
                 try:
-                    return self._call_openai_api(prompt, generation_config)
+                    return self._call_openai_api(prompt, generation_config, progress_callback, stop_at_json)
                 except Exception as openai_error:
                     logger.error(f"[OpenAI] 备选 API 也失败: {openai_error}")
                     raise last_error or openai_error
@@ -793,7 +1111,9 @@ class GeminiAnalyzer:
     def analyze(
         self, 
         context: Dict[str, Any],
-        news_context: Optional[str] = None
+        news_context: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        checkpoint: Optional['StockCheckpoint'] = None
     ) -> AnalysisResult:
         """
         分析单只股票
@@ -807,54 +1127,63 @@ class GeminiAnalyzer:
         Args:
             context: 从 storage.get_analysis_context() 获取的上下文数据
             news_context: 预先搜索的新闻内容（可选）
+            progress_callback: 流式进度回调（可选），参数为 {'stage', 'received_chars', 'json_complete'}
+            checkpoint: 运行检查点（可选），复用已保存的提示词 / LLM 原始响应，并保存新产生的
             
         Returns:
             AnalysisResult 对象
         """
         code = context.get('code', 'Unknown')
         config = get_config()
-        
-        # 请求前增加延时（防止连续请求触发限流）
-        request_delay = config.gemini_request_delay
-        if request_delay > 0:
-            logger.debug(f"[LLM] 请求前等待 {request_delay:.1f} 秒...")
-            time.sleep(request_delay)
-        
-        # 优先从上下文获取股票名称（由 main.py 传入）
-        name = context.get('stock_name')
-        if not name or name.startswith('股票'):
-            # 备选：从 realtime 中获取
-            if 'realtime' in context and context['realtime'].get('name'):
-                name = context['realtime']['name']
-            else:
-                # 最后从映射表获取
-                name = STOCK_NAME_MAP.get(code, f'股票{code}')
+        name = self._resolve_stock_name(context)
         
         # 如果模型不可用，返回默认结果
         if not self.is_available():
-            return AnalysisResult(
-                code=code,
-                name=name,
-                sentiment_score=50,
-                trend_prediction='震荡',
-                operation_advice='持有',
-                confidence_level='低',
-                analysis_summary='AI 分析功能未启用（未配置 API Key）',
-                risk_warning='请配置 Gemini API Key 后重试',
-                success=False,
-                error_message='Gemini API Key 未配置',
-            )
+            return self._unavailable_result(code, name)
         
         try:
             # 格式化输入（包含技术面数据和新闻）
-            prompt = self._format_prompt(context, name, news_context)
+            if checkpoint is not None and checkpoint.has('prompt'):
+                prompt = checkpoint.get('prompt')
+            else:
+                prompt = self._format_prompt(context, name, news_context)
+                if checkpoint is not None:
+                    checkpoint.save('prompt', prompt)
+            
+            # 恢复运行：已保存 LLM 原始响应时只重新解析
+            if checkpoint is not None and checkpoint.get('llm_response'):
+                logger.info(f"[检查点] {name}({code}) 复用已保存的 LLM 响应，跳过模型调用")
+                result = self._parse_response(checkpoint.get('llm_response'), code, name)
+                result.raw_response = checkpoint.get('llm_response')
+                result.search_performed = bool(news_context)
+                return result
             
             # 获取模型名称
-            model_name = getattr(self, '_current_model_name', None)
-            if not model_name:
-                model_name = getattr(self._model, '_model_name', 'unknown')
-                if hasattr(self._model, 'model_name'):
-                    model_name = self._model.model_name
+            model_name = self._get_model_name()
+            
+            # 设置生成配置（从配置文件读取温度参数）
+            generation_config = {
+                "temperature": config.gemini_temperature,
+                "max_output_tokens": 8192,
+            }
+            
+            # 查询响应缓存：相同模型 + 温度 + prompt 直接返回，不再调用模型
+            cache = get_llm_cache()
+            cache_key = None
+            if cache is not None:
+                cache_key = LLMResponseCache.make_key(
+                    model=model_name,
+                    temperature=generation_config['temperature'],
+                    prompt=prompt,
+                    system_prompt=self.SYSTEM_PROMPT,
+                    max_output_tokens=generation_config['max_output_tokens'],
+                )
+                cached = cache.get(cache_key)
+                if cached:
+                    result = AnalysisResult.from_dict(cached['result'])
+                    result.raw_response = cached.get('raw_response')
+                    logger.info(f"[LLM缓存] {name}({code}) 命中缓存，跳过模型调用 (key={cache_key[:12]})")
+                    return result
             
             logger.info(f"========== AI 分析 {name}({code}) ==========")
             logger.info(f"[LLM配置] 模型: {model_name}")
@@ -866,21 +1195,16 @@ class GeminiAnalyzer:
             logger.info(f"[LLM Prompt 预览]\n{prompt_preview}")
             logger.debug(f"=== 完整 Prompt ({len(prompt)}字符) ===\n{prompt}\n=== End Prompt ===")
 
-            # 设置生成配置（从配置文件读取温度参数）
-            config = get_config()
-            generation_config = {
-                "temperature": config.gemini_temperature,
-                "max_output_tokens": 8192,
-            }
-
             # 根据实际使用的 API 显示日志
             api_provider = "OpenAI" if self._use_openai else "Gemini"
             logger.info(f"[LLM调用] 开始调用 {api_provider} API...")
             
             # 使用带重试的 API 调用
             start_time = time.time()
-            response_text = self._call_api_with_retry(prompt, generation_config)
+            response_text = self._call_api_with_retry(prompt, generation_config, progress_callback)
             elapsed = time.time() - start_time
+            if checkpoint is not None:
+                checkpoint.save('llm_response', response_text)
 
             # 记录响应信息
             logger.info(f"[LLM返回] {api_provider} API 响应成功, 耗时 {elapsed:.2f}s, 响应长度 {len(response_text)} 字符")
@@ -895,6 +1219,10 @@ class GeminiAnalyzer:
             result.raw_response = response_text
             result.search_performed = bool(news_context)
             
+            # 仅缓存成功解析出 JSON 的结果（文本兜底解析的结果不缓存，下次重试模型）
+            if cache is not None and cache_key and result.dashboard is not None:
+                cache.set(cache_key, response_text, result.to_dict(), model=model_name)
+            
             logger.info(f"[LLM解析] {name}({code}) 分析完成: {result.trend_prediction}, 评分 {result.sentiment_score}")
             
             return result
@@ -914,6 +1242,46 @@ class GeminiAnalyzer:
                 error_message=str(e),
             )
     
+    def _resolve_stock_name(self, context: Dict[str, Any]) -> str:
+        """解析股票名称：上下文 > 实时行情 > 映射表"""
+        code = context.get('code', 'Unknown')
+        
+        # 优先从上下文获取股票名称（由 main.py 传入）
+        name = context.get('stock_name')
+        if not name or name.startswith('股票'):
+            # 备选：从 realtime 中获取
+            if 'realtime' in context and context['realtime'].get('name'):
+                name = context['realtime']['name']
+            else:
+                # 最后从映射表获取
+                name = STOCK_NAME_MAP.get(code, f'股票{code}')
+        return name
+    
+    def _get_model_name(self) -> str:
+        """获取当前使用的模型名称"""
+        model_name = getattr(self, '_current_model_name', None)
+        if not model_name:
+            model_name = getattr(self._model, '_model_name', 'unknown')
+            if hasattr(self._model, 'model_name'):
+                model_name = self._model.model_name
+        return model_name
+    
+    @staticmethod
+    def _unavailable_result(code: str, name: str) -> AnalysisResult:
+        """模型不可用时的默认结果"""
+        return AnalysisResult(
+            code=code,
+            name=name,
+            sentiment_score=50,
+            trend_prediction='震荡',
+            operation_advice='持有',
+            confidence_level='低',
+            analysis_summary='AI 分析功能未启用（未配置 API Key）',
+            risk_warning='请配置 Gemini API Key 后重试',
+            success=False,
+            error_message='Gemini API Key 未配置',
+        )
+    
     def _format_prompt(
         self, 
         context: Dict[str, Any], 
@@ -930,6 +1298,23 @@ class GeminiAnalyzer:
             name: 股票名称（默认值，可能被上下文覆盖）
             news_context: 预先搜索的新闻内容
         """
+        body, task = self._format_prompt_parts(context, name, news_context)
+        return body + task
+    
+    def _format_prompt_parts(
+        self,
+        context: Dict[str, Any],
+        name: str,
+        news_context: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        生成提示词的数据区块与单股分析任务说明（已按 token 预算压缩）
+        
+        单股提示词 = 数据区块 + 任务说明；批量模式复用同一数据区块，任务由批量提示词统一给出
+        
+        Returns:
+            (数据区块, 任务说明)
+        """
         code = context.get('code', 'Unknown')
         
         # 优先使用上下文中的股票名称（从 realtime_quote 获取）
@@ -940,7 +1325,9 @@ class GeminiAnalyzer:
         today = context.get('today', {})
         
         # ========== 构建决策仪表盘格式的输入 ==========
-        prompt = f"""# 决策仪表盘分析请求
+        # 按段落组织，超出 token 预算时按优先级从低到高压缩（priority 越小越先压缩）
+        sections: List[PromptSection] = []
+        sections.append(PromptSection('basic', f"""# 决策仪表盘分析请求
 
 ## 📊 股票基础信息
 | 项目 | 数据 |
@@ -971,12 +1358,12 @@ class GeminiAnalyzer:
 | MA10 | {today.get('ma10', 'N/A')} | 中短期趋势线 |
 | MA20 | {today.get('ma20', 'N/A')} | 中期趋势线 |
 | 均线形态 | {context.get('ma_status', '未知')} | 多头/空头/缠绕 |
-"""
+""", required=True))
         
         # 添加实时行情数据（量比、换手率等）
         if 'realtime' in context:
             rt = context['realtime']
-            prompt += f"""
+            sections.append(PromptSection('realtime', f"""
 ### 实时行情增强数据
 | 指标 | 数值 | 解读 |
 |------|------|------|
@@ -988,13 +1375,13 @@ class GeminiAnalyzer:
 | 总市值 | {self._format_amount(rt.get('total_mv'))} | |
 | 流通市值 | {self._format_amount(rt.get('circ_mv'))} | |
 | 60日涨跌幅 | {rt.get('change_60d', 'N/A')}% | 中期表现 |
-"""
+""", priority=3))
         
         # 添加筹码分布数据
         if 'chip' in context:
             chip = context['chip']
             profit_ratio = chip.get('profit_ratio', 0)
-            prompt += f"""
+            sections.append(PromptSection('chip', f"""
 ### 筹码分布数据（效率指标）
 | 指标 | 数值 | 健康标准 |
 |------|------|----------|
@@ -1003,13 +1390,13 @@ class GeminiAnalyzer:
 | 90%筹码集中度 | {chip.get('concentration_90', 0):.2%} | <15%为集中 |
 | 70%筹码集中度 | {chip.get('concentration_70', 0):.2%} | |
 | 筹码状态 | {chip.get('chip_status', '未知')} | |
-"""
+""", priority=2))
         
         # 添加趋势分析结果（基于交易理念的预判）
         if 'trend_analysis' in context:
             trend = context['trend_analysis']
             bias_warning = "🚨 超过5%，严禁追高！" if trend.get('bias_ma5', 0) > 5 else "✅ 安全范围"
-            prompt += f"""
+            sections.append(PromptSection('trend', f"""
 ### 趋势分析预判（基于交易理念）
 | 指标 | 数值 | 判定 |
 |------|------|------|
@@ -1028,50 +1415,60 @@ class GeminiAnalyzer:
 
 **风险因素**：
 {chr(10).join('- ' + r for r in trend.get('risk_factors', ['无'])) if trend.get('risk_factors') else '- 无'}
-"""
+""", priority=4))
         
         # 添加昨日对比数据
         if 'yesterday' in context:
             volume_change = context.get('volume_change_ratio', 'N/A')
-            prompt += f"""
+            sections.append(PromptSection('yesterday', f"""
 ### 量价变化
 - 成交量较昨日变化：{volume_change}倍
 - 价格较昨日变化：{context.get('price_change_ratio', 'N/A')}%
-"""
+""", priority=1))
         
-        # 添加新闻搜索结果（重点区域）
-        prompt += """
+        # 添加新闻搜索结果（重点区域）：优先级最高，其他数据段都压缩后仍超预算才截断低排名新闻
+        def build_news(news_text: Optional[str]) -> str:
+            text = """
 ---
 
 ## 📰 舆情情报
 """
-        if news_context:
-            prompt += f"""
+            if news_text:
+                text += f"""
 以下是 **{stock_name}({code})** 近7日的新闻搜索结果，请重点提取：
 1. 🚨 **风险警报**：减持、处罚、利空
 2. 🎯 **利好催化**：业绩、合同、政策
 3. 📊 **业绩预期**：年报预告、业绩快报
 
 ```
-{news_context}
+{news_text}
 ```
 """
-        else:
-            prompt += """
+            else:
+                text += """
 未搜索到该股票近期的相关新闻。请主要依据技术面数据进行分析。
 """
+            return text
+        
+        news_section = PromptSection('news', build_news(news_context), priority=5)
+        if news_context:
+            wrapper_tokens = estimate_tokens(build_news(' '))
+            news_section.shrink = lambda target: build_news(
+                truncate_intel_report(news_context, max(0, target - wrapper_tokens))
+            )
+        sections.append(news_section)
 
         # 注入缺失数据警告
         if context.get('data_missing'):
-            prompt += """
+            sections.append(PromptSection('data_missing', """
 ⚠️ **数据缺失警告**
 由于接口限制，当前无法获取完整的实时行情和技术指标数据。
 请 **忽略上述表格中的 N/A 数据**，重点依据 **【📰 舆情情报】** 中的新闻进行基本面和情绪面分析。
 在回答技术面问题（如均线、乖离率）时，请直接说明“数据缺失，无法判断”，**严禁编造数据**。
-"""
+""", required=True))
         
         # 明确的输出要求
-        prompt += f"""
+        task = f"""
 ---
 
 ## ✅ 分析任务
@@ -1097,7 +1494,17 @@ class GeminiAnalyzer:
 
 请输出完整的 JSON 格式决策仪表盘。"""
         
-        return prompt
+        # 任务说明必需保留，预算扣除其 token 数后用于数据区块
+        budget = get_config().llm_prompt_token_budget
+        task_tokens = estimate_tokens(task)
+        body, before, after = fit_sections(sections, max(1, budget - task_tokens) if budget > 0 else 0)
+        before, after = before + task_tokens, after + task_tokens
+        if after < before:
+            logger.info(f"[Prompt预算] {stock_name}({code}) 压缩 {before} -> {after} tokens (预算 {budget})")
+        else:
+            logger.debug(f"[Prompt预算] {stock_name}({code}) {before} tokens (预算 {budget or '不限'})")
+        
+        return body, task
     
     def _format_volume(self, volume: Optional[float]) -> str:
         """格式化成交量显示"""
@@ -1133,97 +1540,90 @@ class GeminiAnalyzer:
         尝试从响应中提取 JSON 格式的分析结果，包含 dashboard 字段
         如果解析失败，尝试智能提取或返回默认结果
         """
+        # 单遍提取最外层 JSON 对象（同时清理注释、尾随逗号等常见格式问题）
+        json_str = extract_json(response_text)
+        if json_str is None:
+            # 没有找到 JSON，尝试从纯文本中提取信息
+            logger.warning(f"无法从响应中提取 JSON，使用原始文本分析")
+            return self._parse_text_response(response_text, code, name)
+        
         try:
-            # 清理响应文本：移除 markdown 代码块标记
-            cleaned_text = response_text
-            if '```json' in cleaned_text:
-                cleaned_text = cleaned_text.replace('```json', '').replace('```', '')
-            elif '```' in cleaned_text:
-                cleaned_text = cleaned_text.replace('```', '')
-            
-            # 尝试找到 JSON 内容
-            json_start = cleaned_text.find('{')
-            json_end = cleaned_text.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_str = cleaned_text[json_start:json_end]
-                
-                # 尝试修复常见的 JSON 问题
-                json_str = self._fix_json_string(json_str)
-                
-                data = json.loads(json_str)
-                
-                # 提取 dashboard 数据
-                dashboard = data.get('dashboard', None)
-
-                # 优先使用 AI 返回的股票名称（如果原名称无效或包含代码）
-                ai_stock_name = data.get('stock_name')
-                if ai_stock_name and (name.startswith('股票') or name == code or 'Unknown' in name):
-                    name = ai_stock_name
-
-                # 解析所有字段，使用默认值防止缺失
-                return AnalysisResult(
-                    code=code,
-                    name=name,
-                    # 核心指标
-                    sentiment_score=int(data.get('sentiment_score', 50)),
-                    trend_prediction=data.get('trend_prediction', '震荡'),
-                    operation_advice=data.get('operation_advice', '持有'),
-                    confidence_level=data.get('confidence_level', '中'),
-                    # 决策仪表盘
-                    dashboard=dashboard,
-                    # 走势分析
-                    trend_analysis=data.get('trend_analysis', ''),
-                    short_term_outlook=data.get('short_term_outlook', ''),
-                    medium_term_outlook=data.get('medium_term_outlook', ''),
-                    # 技术面
-                    technical_analysis=data.get('technical_analysis', ''),
-                    ma_analysis=data.get('ma_analysis', ''),
-                    volume_analysis=data.get('volume_analysis', ''),
-                    pattern_analysis=data.get('pattern_analysis', ''),
-                    # 基本面
-                    fundamental_analysis=data.get('fundamental_analysis', ''),
-                    sector_position=data.get('sector_position', ''),
-                    company_highlights=data.get('company_highlights', ''),
-                    # 情绪面/消息面
-                    news_summary=data.get('news_summary', ''),
-                    market_sentiment=data.get('market_sentiment', ''),
-                    hot_topics=data.get('hot_topics', ''),
-                    # 综合
-                    analysis_summary=data.get('analysis_summary', '分析完成'),
-                    key_points=data.get('key_points', ''),
-                    risk_warning=data.get('risk_warning', ''),
-                    buy_reason=data.get('buy_reason', ''),
-                    # 元数据
-                    search_performed=data.get('search_performed', False),
-                    data_sources=data.get('data_sources', '技术面数据'),
-                    success=True,
-                )
-            else:
-                # 没有找到 JSON，尝试从纯文本中提取信息
-                logger.warning(f"无法从响应中提取 JSON，使用原始文本分析")
-                return self._parse_text_response(response_text, code, name)
-                
+            data = json.loads(json_str)
         except json.JSONDecodeError as e:
             logger.warning(f"JSON 解析失败: {e}，尝试从文本提取")
             return self._parse_text_response(response_text, code, name)
-    
-    def _fix_json_string(self, json_str: str) -> str:
-        """修复常见的 JSON 格式问题"""
-        import re
         
-        # 移除注释
-        json_str = re.sub(r'//.*?\n', '\n', json_str)
-        json_str = re.sub(r'/\*.*?\*/', '', json_str, flags=re.DOTALL)
-        
-        # 修复尾随逗号
-        json_str = re.sub(r',\s*}', '}', json_str)
-        json_str = re.sub(r',\s*]', ']', json_str)
+        data = self._validate_data(data, code)
+        if data is None:
+            return self._parse_text_response(response_text, code, name)
+        return self._build_result(data, code, name)
+    
+    @staticmethod
+    def _validate_data(data: Any, code: str) -> Optional[Dict[str, Any]]:
+        """
+        按决策仪表盘结构校验模型返回的 JSON
         
-        # 确保布尔值是小写
-        json_str = json_str.replace('True', 'true').replace('False', 'false')
+        Returns:
+            可用于构造结果的字典（类型错误的顶层字段已移除，使用默认值）；顶层不是对象时返回 None
+        """
+        problems = validate_dashboard(data)
+        if not problems:
+            return data
+        if '$' in problems:
+            logger.warning(f"[{code}] 仪表盘 JSON 无效: {problems['$']}")
+            return None
         
-        return json_str
+        logger.warning(f"[{code}] 仪表盘字段校验未通过: " + '; '.join(f"{k} {v}" for k, v in problems.items()))
+        return {k: v for k, v in data.items() if k not in problems}
+    
+    def _build_result(self, data: Dict[str, Any], code: str, name: str) -> AnalysisResult:
+        """由模型返回的 JSON 对象构造 AnalysisResult（单股与批量解析共用）"""
+        # 提取 dashboard 数据
+        dashboard = data.get('dashboard', None)
+
+        # 优先使用 AI 返回的股票名称（如果原名称无效或包含代码）
+        ai_stock_name = data.get('stock_name')
+        if ai_stock_name and (name.startswith('股票') or name == code or 'Unknown' in name):
+            name = ai_stock_name
+
+        # 解析所有字段，使用默认值防止缺失
+        return AnalysisResult(
+            code=code,
+            name=name,
+            # 核心指标
+            sentiment_score=int(float(data.get('sentiment_score', 50))),  # 模型可能给出 "72.5" 之类的字符串
+            trend_prediction=data.get('trend_prediction', '震荡'),
+            operation_advice=data.get('operation_advice', '持有'),
+            confidence_level=data.get('confidence_level', '中'),
+            # 决策仪表盘
+            dashboard=dashboard,
+            # 走势分析
+            trend_analysis=data.get('trend_analysis', ''),
+            short_term_outlook=data.get('short_term_outlook', ''),
+            medium_term_outlook=data.get('medium_term_outlook', ''),
+            # 技术面
+            technical_analysis=data.get('technical_analysis', ''),
+            ma_analysis=data.get('ma_analysis', ''),
+            volume_analysis=data.get('volume_analysis', ''),
+            pattern_analysis=data.get('pattern_analysis', ''),
+            # 基本面
+            fundamental_analysis=data.get('fundamental_analysis', ''),
+            sector_position=data.get('sector_position', ''),
+            company_highlights=data.get('company_highlights', ''),
+            # 情绪面/消息面
+            news_summary=data.get('news_summary', ''),
+            market_sentiment=data.get('market_sentiment', ''),
+            hot_topics=data.get('hot_topics', ''),
+            # 综合
+            analysis_summary=data.get('analysis_summary', '分析完成'),
+            key_points=data.get('key_points', ''),
+            risk_warning=data.get('risk_warning', ''),
+            buy_reason=data.get('buy_reason', ''),
+            # 元数据
+            search_performed=data.get('search_performed', False),
+            data_sources=data.get('data_sources', '技术面数据'),
+            success=True,
+        )
     
     def _parse_text_response(
         self, 
@@ -1275,31 +1675,280 @@ class GeminiAnalyzer:
     def batch_analyze(
         self, 
         contexts: List[Dict[str, Any]],
-        delay_between: float = 2.0
+        delay_between: Optional[float] = None,
+        max_workers: Optional[int] = None
     ) -> List[AnalysisResult]:
         """
         批量分析多只股票
         
-        注意：为避免 API 速率限制，每次分析之间会有延迟
+        并发提交，由共享的 LLM 调度器按 RPM/TPM 预算放行，不再在每次分析之间固定等待
         
         Args:
             contexts: 上下文数据列表
-            delay_between: 每次分析之间的延迟（秒）
+            delay_between: 已废弃，保留以兼容旧调用；请求速率改由 LLM_RPM_LIMIT / LLM_TPM_LIMIT 控制
+            max_workers: 最大并发数（默认使用 LLM_MAX_CONCURRENCY）
+            
+        Returns:
+            AnalysisResult 列表（顺序与 contexts 一致）
+        """
+        if delay_between is not None:
+            warnings.warn(
+                "batch_analyze(delay_between=...) 已废弃且不再生效，请求速率由 LLM_RPM_LIMIT / LLM_TPM_LIMIT 控制",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+        if not contexts:
+            return []
+        
+        workers = max_workers or get_config().llm_max_concurrency
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="llm_") as executor:
+            return list(executor.map(self.analyze, contexts))
+
+    
+    def analyze_batch(
+        self,
+        items: List[Tuple[Dict[str, Any], Optional[str]]],
+        batch_size: Optional[int] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        on_result: Optional[Callable[[int, AnalysisResult], None]] = None
+    ) -> List[AnalysisResult]:
+        """
+        多股合并分析
+        
+        将多只股票的上下文打包进同一次请求并要求返回 JSON 数组，
+        系统提示词（交易理念 + 输出格式）每批只发送一次，以延迟换 token 成本。
+        合并结果中缺失或解析失败的股票自动回退为单股 analyze()。
+        
+        Args:
+            items: [(context, news_context), ...]
+            batch_size: 每批股票数（默认使用 LLM_BATCH_SIZE），<=1 时逐只分析
+            progress_callback: 流式进度回调（可选）
+            on_result: 单只结果就绪回调 (items 下标, 结果)，每批请求返回即调用，
+                便于调用方逐批保存检查点 / 写报告，不必等全部批次结束
             
         Returns:
-            AnalysisResult 列表
+            AnalysisResult 列表（顺序与 items 一致）
         """
-        results = []
+        if not items:
+            return []
+        
+        results: List[Optional[AnalysisResult]] = [None] * len(items)
         
-        for i, context in enumerate(contexts):
-            if i > 0:
-                logger.debug(f"等待 {delay_between} 秒后继续...")
-                time.sleep(delay_between)
+        def emit(index: int, result: Optional[AnalysisResult]) -> None:
+            results[index] = result
+            if result is not None and on_result is not None:
+                try:
+                    on_result(index, result)
+                except Exception as e:
+                    logger.warning(f"[LLM批量] 结果回调异常: {e}")
+        
+        config = get_config()
+        size = batch_size if batch_size is not None else config.llm_batch_size
+        if size <= 1 or not self.is_available():
+            for index, (context, news_context) in enumerate(items):
+                emit(index, self.analyze(context, news_context=news_context, progress_callback=progress_callback))
+            return results
+        
+        model_name = self._get_model_name()
+        cache = get_llm_cache()
+        
+        # 先按单股缓存键查询：与 analyze() 共用缓存，合并/逐只两种模式可互相命中
+        pending: List[Dict[str, Any]] = []
+        for index, (context, news_context) in enumerate(items):
+            code = context.get('code', 'Unknown')
+            name = self._resolve_stock_name(context)
+            # 每只股票只生成一次提示词：完整单股提示词用于缓存键，数据区块用于合并请求
+            body, task = self._format_prompt_parts(context, name, news_context)
+            cache_key = None
+            if cache is not None:
+                cache_key = LLMResponseCache.make_key(
+                    model=model_name,
+                    temperature=config.gemini_temperature,
+                    prompt=body + task,
+                    system_prompt=self.SYSTEM_PROMPT,
+                    max_output_tokens=8192,
+                )
+                cached = cache.get(cache_key)
+                if cached:
+                    result = AnalysisResult.from_dict(cached['result'])
+                    result.raw_response = cached.get('raw_response')
+                    emit(index, result)
+                    logger.info(f"[LLM缓存] {name}({code}) 命中缓存，跳过模型调用 (key={cache_key[:12]})")
+                    continue
+            pending.append({
+                'index': index,
+                'code': code,
+                'name': name,
+                'context': context,
+                'news_context': news_context,
+                'prompt_block': body,
+                'cache_key': cache_key,
+            })
+        
+        if pending:
+            chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+            logger.info(f"[LLM批量] {len(pending)} 只股票合并为 {len(chunks)} 次请求（每批 {size} 只）")
             
-            result = self.analyze(context)
-            results.append(result)
+            workers = max(1, min(config.llm_max_concurrency, len(chunks)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm_batch_") as executor:
+                futures = [
+                    executor.submit(self._analyze_chunk, chunk, model_name, progress_callback)
+                    for chunk in chunks
+                ]
+                # 按完成顺序处理：先返回的批次先回调，慢批次不拖住已完成的结果
+                for future in as_completed(futures):
+                    for index, result in future.result().items():
+                        emit(index, result)
+        
+        # 回退：合并结果中缺失的股票单独分析
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            logger.warning(f"[LLM批量] {len(missing)} 只股票未从合并结果中解析出，回退为单股分析")
+            for index in missing:
+                context, news_context = items[index]
+                emit(index, self.analyze(context, news_context=news_context, progress_callback=progress_callback))
         
         return results
+    
+    def _analyze_chunk(
+        self,
+        chunk: List[Dict[str, Any]],
+        model_name: str,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[int, AnalysisResult]:
+        """
+        执行一次合并请求
+        
+        Returns:
+            {items 下标: AnalysisResult}，仅包含成功解析出仪表盘的股票
+        """
+        config = get_config()
+        label = ', '.join(f"{item['name']}({item['code']})" for item in chunk)
+        prompt = self._format_batch_prompt(chunk)
+        generation_config = {
+            "temperature": config.gemini_temperature,
+            "max_output_tokens": min(config.llm_batch_max_output_tokens, 8192 * len(chunk)),
+        }
+        
+        logger.info(f"========== AI 合并分析 {label} ==========")
+        logger.info(f"[LLM配置] 模型: {model_name}, Prompt 长度: {len(prompt)} 字符")
+        logger.debug(f"=== 完整 Prompt ({len(prompt)}字符) ===\n{prompt}\n=== End Prompt ===")
+        
+        try:
+            start_time = time.time()
+            # 响应为 JSON 数组，不能在第一个对象闭合时提前结束
+            response_text = self._call_api_with_retry(
+                prompt, generation_config, progress_callback, stop_at_json=False
+            )
+            elapsed = time.time() - start_time
+        except Exception as e:
+            logger.error(f"[LLM批量] 合并请求失败 ({label}): {e}")
+            return {}
+        
+        logger.info(f"[LLM返回] 合并请求成功, 耗时 {elapsed:.2f}s, 响应长度 {len(response_text)} 字符")
+        logger.debug(f"=== 合并请求完整响应 ({len(response_text)}字符) ===\n{response_text}\n=== End Response ===")
+        
+        cache = get_llm_cache()
+        results: Dict[int, AnalysisResult] = {}
+        for item, data in self._parse_batch_response(response_text, chunk):
+            data = self._validate_data(data, item['code'])
+            try:
+                result = self._build_result(data, item['code'], item['name'])
+            except (TypeError, ValueError) as e:
+                logger.warning(f"[LLM批量] {item['name']}({item['code']}) 结果字段异常: {e}")
+                continue
+            if result.dashboard is None:
+                continue
+            
+            raw_response = json.dumps(data, ensure_ascii=False)
+            result.raw_response = raw_response
+            result.search_performed = bool(item['news_context'])
+            results[item['index']] = result
+            
+            if cache is not None and item['cache_key']:
+                cache.set(item['cache_key'], raw_response, result.to_dict(), model=model_name)
+            logger.info(f"[LLM解析] {item['name']}({item['code']}) 分析完成: {result.trend_prediction}, 评分 {result.sentiment_score}")
+        
+        return results
+    
+    def _format_batch_prompt(self, chunk: List[Dict[str, Any]]) -> str:
+        """格式化多股合并提示词：各股数据区块 + 统一的数组输出要求"""
+        total = len(chunk)
+        blocks = []
+        for position, item in enumerate(chunk, 1):
+            block = item['prompt_block'].replace(
+                '# 决策仪表盘分析请求',
+                f"# 股票 {position}/{total}：{item['name']}({item['code']})",
+                1,
+            )
+            blocks.append(block.strip())
+        
+        order = '\n'.join(
+            f"{position}. {item['name']}({item['code']})" for position, item in enumerate(chunk, 1)
+        )
+        
+        return f"""# 批量决策仪表盘分析请求
+
+本次请求包含 **{total}** 只股票，各股票数据区块以「# 股票 序号/{total}」标题分隔。
+
+""" + '\n\n---\n\n'.join(blocks) + f"""
+
+---
+
+## ✅ 分析任务
+
+请为以下 **{total}** 只股票分别生成【决策仪表盘】：
+{order}
+
+### 输出要求（必须严格遵守）：
+1. 只输出 **一个 JSON 数组**，包含 {total} 个元素，顺序与上方股票顺序一致
+2. 每个元素都是系统提示词中定义的完整决策仪表盘 JSON 对象
+3. 每个元素必须额外包含 `"stock_code"` 字段，值为对应的股票代码
+4. 每只股票只能依据其自身数据区块中的数据分析，**严禁混用其他股票的数据**
+5. 数组前后不要输出任何其他文字
+
+请输出完整的 JSON 数组。"""
+    
+    def _parse_batch_response(
+        self,
+        response_text: str,
+        chunk: List[Dict[str, Any]]
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        解析合并请求的 JSON 数组响应
+        
+        优先按 stock_code 字段匹配；模型未返回任何代码且元素数一致时按顺序匹配
+        
+        Returns:
+            [(chunk 条目, 该股 JSON 对象), ...]，未匹配的股票不返回
+        """
+        json_str = extract_json(response_text, container='[')
+        if json_str is None:
+            logger.warning("[LLM批量] 响应中未找到 JSON 数组")
+            return []
+        
+        try:
+            data = json.loads(json_str)
+        except json.JSONDecodeError as e:
+            logger.warning(f"[LLM批量] JSON 数组解析失败: {e}")
+            return []
+        if not isinstance(data, list):
+            return []
+        
+        objects = [obj for obj in data if isinstance(obj, dict)]
+        by_code = {
+            str(obj['stock_code']).strip().upper(): obj
+            for obj in objects if obj.get('stock_code')
+        }
+        
+        matched = []
+        for position, item in enumerate(chunk):
+            obj = by_code.get(str(item['code']).strip().upper())
+            if obj is None and not by_code and len(objects) == len(chunk):
+                obj = objects[position]
+            if obj is not None:
+                matched.append((item, obj))
+        return matched
 
 
 # 便捷函数
@@ -1334,6 +1983,43 @@ if __name__ == "__main__":
         'price_change_ratio': 1.5,
     }
     
+    # 共享实例并发调用：限流后切换备选模型只影响本次调用，其他线程仍使用主模型
+    import sys
+    import types
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+    from unittest import mock
+
+    def fake_model(name: str) -> Any:
+        def generate_content(prompt, **kwargs):
+            if name == 'primary' and prompt == 'limited':
+                raise type('ResourceExhausted', (Exception,), {})('429 quota')
+            return SimpleNamespace(text=f"{name}:{prompt}", usage_metadata=None)
+        return SimpleNamespace(generate_content=generate_content)
+
+    fake_genai = types.ModuleType('google.generativeai')
+    fake_genai.GenerativeModel = lambda model_name, **kwargs: fake_model(model_name)
+    fake_google = types.ModuleType('google')
+    fake_google.generativeai = fake_genai
+    shared = GeminiAnalyzer.__new__(GeminiAnalyzer)
+    shared._model, shared._current_model_name = fake_model('primary'), 'primary'
+    shared._using_fallback, shared._use_openai, shared._openai_client = False, False, None
+    shared._lock, shared._fallback_model = threading.Lock(), None
+    demo_config = get_config()
+    with mock.patch.dict(sys.modules, {'google': fake_google, 'google.generativeai': fake_genai}), \
+            mock.patch.object(demo_config, 'gemini_model_fallback', 'fallback'), \
+            mock.patch.object(demo_config, 'gemini_max_retries', 3), \
+            mock.patch.object(demo_config, 'llm_stream_enabled', False), \
+            mock.patch.object(demo_config, 'gemini_context_cache_enabled', False), \
+            mock.patch.object(sys.modules[__name__], 'get_llm_dispatcher') as fake_dispatcher:
+        fake_dispatcher.return_value.slot.return_value.__enter__.return_value = mock.MagicMock()
+        prompts = ['limited' if i % 2 else f'ok{i}' for i in range(20)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            texts = list(pool.map(lambda p: shared._call_api_with_retry(p, {}), prompts))
+    assert all(t == ('fallback:limited' if p == 'limited' else f'primary:{p}') for p, t in zip(prompts, texts))
+    assert shared._current_model_name == 'primary' and shared._model.generate_content is not None
+    print("共享分析器并发切换备选模型验证通过")
+    
     analyzer = GeminiAnalyzer()
     
     if analyzer.is_available():
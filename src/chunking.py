@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 消息分段引擎
+===================================
+
+职责：
+1. 为所有推送渠道提供统一的长消息分段（企业微信 / 飞书 / 钉钉 / Telegram / Pushover 等）
+2. 内容只编码一次：按字节限制时在 UTF-8 字节串上直接查找分隔符，
+   分隔符位置即累计字节偏移，无需对每段反复 encode
+3. 线性时间贪心：每段在预算内选择优先级最高的最后一个分隔位置，
+   整段超长时逐级退化到次级分隔符（标题 → 段落 → 行），最后按字符边界硬切，不丢内容
+4. 可选的分段进度跟踪：发件箱重试时跳过已送达的分段，不重复发送
+
+使用方式：
+    chunks = chunk_text(content, max_bytes=4000, reserve=page_marker_reserve("\\n\\n📄 ({index}/{total})"))
+    ok = send_chunked(content, send_func, max_bytes=20000, label="飞书")
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 当前线程的分段进度（track_chunk_progress 内有效）
+_progress_local = threading.local()
+
+
+class Separator(NamedTuple):
+    """
+    分隔符
+
+    text: 分隔文本（标题类分隔符以换行开头，如 "\\n### "）
+    consume: True 表示在分段处丢弃整个分隔符（如 "---" 分隔线）；
+             False 表示只丢弃开头的换行，其余部分（标题）保留在下一段开头
+    """
+    text: str
+    consume: bool = True
+
+
+# 报告类 Markdown 的默认分隔优先级：股票分隔线 > 标题 > 加粗标题 > 空行 > 换行
+MARKDOWN_SEPARATORS = (
+    Separator("\n---\n"),
+    Separator("\n────────\n"),  # 飞书格式化后的分隔线
+    Separator("\n### ", consume=False),
+    Separator("\n## ", consume=False),
+    Separator("\n**", consume=False),
+    Separator("\n\n"),
+    Separator("\n"),
+)
+
+# 纯文本（Pushover 等）分隔优先级
+PLAIN_SEPARATORS = (
+    Separator("────────"),
+    Separator("\n\n"),
+    Separator("\n"),
+)
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+
+class _Level:
+    """
+    单级分隔符的位置表
+
+    positions 为分隔符字符位置，offsets 为对应的累计计量偏移（字节模式下即前缀字节和），
+    整段内容只分片编码一次；游标随窗口单调前进
+    """
+
+    __slots__ = ('positions', 'offsets', 'drop', 'drop_units', 'total', 'cursor')
+
+    def __init__(self, content: str, separator: Separator, size: Callable[[str], int]):
+        positions = []
+        index = content.find(separator.text)
+        while index != -1:
+            positions.append(index)
+            index = content.find(separator.text, index + 1)
+
+        if size is len:
+            offsets = positions
+            total = len(content)
+        else:
+            offsets = []
+            acc = prev = 0
+            for position in positions:
+                acc += size(content[prev:position])
+                offsets.append(acc)
+                prev = position
+            total = acc + size(content[prev:])
+
+        self.positions = positions
+        self.offsets = offsets
+        self.total = total
+        self.drop = len(separator.text) if separator.consume else 1
+        self.drop_units = size(separator.text) if separator.consume else 1
+        self.cursor = -1
+
+    def last_within(self, start: int, window_end: int):
+        """返回 (位置, 计量偏移, 丢弃字符数, 丢弃计量) —— 位于 start 之后、window_end 之内的最后一个分隔符"""
+        offsets = self.offsets
+        i = self.cursor
+        while i + 1 < len(offsets) and offsets[i + 1] <= window_end:
+            i += 1
+        self.cursor = i
+        if i >= 0 and self.positions[i] > start:
+            return self.positions[i], offsets[i], self.drop, self.drop_units
+        return None
+
+
+def chunk_text(
+    content: str,
+    max_bytes: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    separators: Sequence[Separator] = MARKDOWN_SEPARATORS,
+    reserve: int = 0,
+) -> List[str]:
+    """
+    将长文本按预算分段
+
+    Args:
+        content: 完整内容
+        max_bytes: 每段 UTF-8 字节上限（与 max_chars 二选一）
+        max_chars: 每段字符上限
+        separators: 分隔符优先级（靠前的优先）
+        reserve: 每段预留的预算（用于分页标记等后缀）
+
+    Returns:
+        分段列表（不含空段），内容未超限时返回 [content]
+    """
+    if not content:
+        return []
+    by_bytes = max_bytes is not None
+    limit = max_bytes if by_bytes else max_chars
+    if limit is None:
+        raise ValueError("必须指定 max_bytes 或 max_chars")
+    budget = max(16, limit - reserve)
+
+    # 纯 ASCII 或按字符计数时，字符位置即计量位置
+    size = _utf8_len if by_bytes and not content.isascii() else len
+    levels: List[Optional[_Level]] = [None] * len(separators)
+
+    def level_at(index: int) -> _Level:
+        level = levels[index]
+        if level is None:
+            level = levels[index] = _Level(content, separators[index], size)
+        return level
+
+    first = level_at(0)
+    total = first.total
+    if total <= budget:
+        return [content]
+
+    chunks: List[str] = []
+    start = 0  # 字符位置
+    start_units = 0  # 对应的计量位置（字节或字符）
+    while total - start_units > budget:
+        window_end = start_units + budget
+        cut = None
+        for index in range(len(separators)):
+            found = level_at(index).last_within(start, window_end)
+            if found is not None:
+                cut, cut_units, drop, drop_units = found
+                break
+
+        if cut is None:
+            # 预算内无任何分隔符：按字符边界硬切
+            piece = content[start:start + budget]
+            if size is not len:
+                piece = truncate_to_bytes(piece, budget)
+            cut, cut_units = start + len(piece), start_units + size(piece)
+            drop = drop_units = 0
+
+        chunks.append(content[start:cut])
+        start, start_units = cut + drop, cut_units + drop_units
+    chunks.append(content[start:])
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def truncate_to_bytes(text: str, max_bytes: int) -> str:
+    """按 UTF-8 字节数截断，不截断多字节字符"""
+    encoded = text.encode('utf-8')
+    if len(encoded) <= max_bytes:
+        return text
+    cut = max(0, max_bytes)
+    while cut > 0 and (encoded[cut] & 0xC0) == 0x80:
+        cut -= 1
+    return encoded[:cut].decode('utf-8')
+
+
+def page_marker_reserve(marker: str, by_bytes: bool = True) -> int:
+    """分页标记可能占用的最大长度（按四位页码估算）"""
+    text = marker.format(index=9999, total=9999)
+    return len(text.encode('utf-8')) if by_bytes else len(text)
+
+
+class ChunkProgress:
+    """
+    一次发送中的分段进度
+
+    skip: 之前已送达、本次跳过的分段数
+    sent: 从第一段起连续送达的分段数（失败时记录，下次重试从这里继续）
+    """
+
+    def __init__(self, skip: int = 0):
+        self.skip = max(0, skip)
+        self.sent = self.skip
+        self._position = 0
+
+    def next_position(self) -> int:
+        position = self._position
+        self._position += 1
+        return position
+
+
+@contextmanager
+def track_chunk_progress(skip: int = 0) -> Iterator[ChunkProgress]:
+    """
+    在当前线程内跟踪 send_chunked 的分段进度（同一次发送多次调用时分段序号连续）
+
+    跟踪期间跳过前 skip 段，且某段失败后立即停止，保证已送达的分段始终是前缀
+
+    使用方式：
+        with track_chunk_progress(skip=row['chunks_sent']) as progress:
+            ok = notifier.send_to_channel(channel, content)
+        if not ok:
+            save(chunks_sent=progress.sent)
+    """
+    previous = getattr(_progress_local, 'current', None)
+    progress = ChunkProgress(skip)
+    _progress_local.current = progress
+    try:
+        yield progress
+    finally:
+        _progress_local.current = previous
+
+
+def send_chunked(
+    content: str,
+    send_func: Callable[[str], bool],
+    max_bytes: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    separators: Sequence[Separator] = MARKDOWN_SEPARATORS,
+    marker: Optional[str] = "\n\n📄 ({index}/{total})",
+    interval: float = 1.0,
+    label: str = "消息",
+) -> bool:
+    """
+    分段并按顺序发送
+
+    Args:
+        content: 完整内容
+        send_func: 发送单段的函数，返回是否成功
+        max_bytes / max_chars: 每段上限（含分页标记）
+        separators: 分隔符优先级
+        marker: 分页标记模板（{index} / {total}），None 表示不加
+        interval: 段间隔（秒），避免触发平台频率限制
+        label: 日志中的渠道名称
+
+    Returns:
+        是否全部发送成功
+    """
+    reserve = page_marker_reserve(marker, by_bytes=max_bytes is not None) if marker else 0
+    chunks = chunk_text(content, max_bytes=max_bytes, max_chars=max_chars, separators=separators, reserve=reserve)
+    total = len(chunks)
+    if total > 1:
+        logger.info(f"{label}分批发送：共 {total} 批")
+
+    progress: Optional[ChunkProgress] = getattr(_progress_local, 'current', None)
+    success_count = 0
+    for i, chunk in enumerate(chunks):
+        position = progress.next_position() if progress is not None else i
+        if progress is not None and position < progress.skip:
+            success_count += 1
+            logger.info(f"{label}第 {i+1}/{total} 批此前已送达，跳过")
+            continue
+
+        text = chunk + marker.format(index=i + 1, total=total) if marker and total > 1 else chunk
+        ok = False
+        try:
+            ok = bool(send_func(text))
+            if ok:
+                success_count += 1
+                if total > 1:
+                    logger.info(f"{label}第 {i+1}/{total} 批发送成功")
+            else:
+                logger.error(f"{label}第 {i+1}/{total} 批发送失败")
+        except Exception as e:
+            logger.error(f"{label}第 {i+1}/{total} 批发送异常: {e}")
+
+        if progress is not None:
+            if not ok:
+                # 跟踪进度时失败即停：后续分段留待重试，保持顺序且不重复
+                break
+            progress.sent = position + 1
+
+        if interval > 0 and i < total - 1:
+            time.sleep(interval)
+
+    return total > 0 and success_count == total
+
+
+if __name__ == "__main__":
+    # 基准：100 只股票的仪表盘报告，对比旧实现（每段 encode + 超长段逐字节回退截断）
+    import random
+    import timeit
+
+    random.seed(7)
+
+    def build_report(stocks: int) -> str:
+        sections = ["# 🎯 2026-01-19 决策仪表盘\n\n> 共分析 100 只股票"]
+        for n in range(stocks):
+            lines = [f"### 🟢 买入 股票{n:03d}({600000 + n})", "", "**📰 重要信息速览**", ""]
+            lines += [f"- 第 {k} 条要点：主力资金净流入，均线多头排列，量能温和放大。" * random.randint(1, 3)
+                      for k in range(random.randint(6, 14))]
+            lines += ["", "| 指标 | 数值 |", "|---|---|", "| 现价 | 1820.00 |", "| MA5 | 1810.00 |"]
+            sections.append("\n".join(lines))
+        return "\n---\n".join(sections)
+
+    def legacy_chunk(content: str, max_bytes: int) -> List[str]:
+        def get_bytes(s: str) -> int:
+            return len(s.encode('utf-8'))
+
+        def legacy_truncate(text: str, limit: int) -> str:
+            truncated = text.encode('utf-8')[:limit]
+            while truncated:
+                try:
+                    return truncated.decode('utf-8')
+                except UnicodeDecodeError:
+                    truncated = truncated[:-1]
+            return ""
+
+        sections = content.split("\n---\n")
+        separator = "\n---\n"
+        chunks, current, current_bytes = [], [], 0
+        for section in sections:
+            section_bytes = get_bytes(section) + get_bytes(separator)
+            if section_bytes > max_bytes:
+                if current:
+                    chunks.append(separator.join(current))
+                    current, current_bytes = [], 0
+                chunks.append(legacy_truncate(section, max_bytes - 200) + "\n\n...(本段内容过长已截断)")
+                continue
+            if current_bytes + section_bytes > max_bytes:
+                if current:
+                    chunks.append(separator.join(current))
+                current, current_bytes = [section], section_bytes
+            else:
+                current.append(section)
+                current_bytes += section_bytes
+        if current:
+            chunks.append(separator.join(current))
+        return chunks
+
+    def legacy_force_chunk(content: str, max_bytes: int) -> List[str]:
+        # 旧的按行兜底（飞书格式化后没有 "---"，走的就是这条路径）：每加一行重新编码整个当前块
+        chunks, current = [], ""
+        for line in content.split('\n'):
+            test_chunk = current + ('\n' if current else '') + line
+            if len(test_chunk.encode('utf-8')) > max_bytes - 100:
+                if current:
+                    chunks.append(current)
+                current = line
+            else:
+                current = test_chunk
+        if current:
+            chunks.append(current)
+        return chunks
+
+    report = build_report(100)
+    size = len(report.encode('utf-8'))
+    print(f"报告: {len(report)} 字符 / {size} 字节")
+
+    for label, kwargs in (("企业微信 4000B", {'max_bytes': 4000}), ("飞书 20000B", {'max_bytes': 20000}),
+                          ("Telegram 4096 字符", {'max_chars': 4096})):
+        chunks = chunk_text(report, **kwargs)
+        if 'max_bytes' in kwargs:
+            assert all(len(c.encode('utf-8')) <= kwargs['max_bytes'] for c in chunks)
+        else:
+            assert all(len(c) <= kwargs['max_chars'] for c in chunks)
+        elapsed = min(timeit.repeat(lambda: chunk_text(report, **kwargs), number=20, repeat=3)) / 20
+        print(f"{label:<18} {len(chunks):>3} 段  {elapsed * 1000:7.2f} ms")
+
+    for max_bytes in (4000, 20000):
+        legacy = legacy_chunk(report, max_bytes)
+        truncated = sum(1 for c in legacy if c.endswith("(本段内容过长已截断)"))
+        elapsed = min(timeit.repeat(lambda: legacy_chunk(report, max_bytes), number=20, repeat=3)) / 20
+        print(f"旧实现 {max_bytes:>5}B      {len(legacy):>3} 段  {elapsed * 1000:7.2f} ms  截断丢失 {truncated} 段")
+
+    feishu_report = report.replace("\n---\n", "\n────────\n").replace("### ", "**")
+    for label, func in (("飞书格式 新实现", lambda: chunk_text(feishu_report, max_bytes=20000)),
+                        ("飞书格式 旧实现", lambda: legacy_force_chunk(feishu_report, 20000))):
+        elapsed = min(timeit.repeat(func, number=5, repeat=3)) / 5
+        print(f"{label:<16} {len(func()):>3} 段  {elapsed * 1000:7.2f} ms")
+
+    # 无分隔符的超长单行：硬切不丢字、不截断多字节字符
+    text = "量价齐升" * 5000
+    chunks = chunk_text(text, max_bytes=4000)
+    assert "".join(chunks) == text and all(len(c.encode('utf-8')) <= 4000 for c in chunks)
+
+    # 线性扩展：报告放大 10 倍，耗时应近似放大 10 倍
+    big = build_report(1000)
+    t_small = min(timeit.repeat(lambda: chunk_text(report, max_bytes=4000), number=10, repeat=3))
+    t_big = min(timeit.repeat(lambda: chunk_text(big, max_bytes=4000), number=10, repeat=3))
+    print(f"规模 x10 耗时比: {t_big / t_small:.1f}")
+    print("分段验证通过")
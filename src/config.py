@@ -53,15 +53,34 @@ class Config:
     gemini_temperature: float = 0.7  # 温度参数（0.0-2.0，控制输出随机性，默认0.7）
 
     # Gemini API 请求配置（防止 429 限流）
-    gemini_request_delay: float = 2.0  # 请求间隔（秒）
+    gemini_request_delay: float = 2.0  # 请求间隔（秒），未配置 LLM_RPM_LIMIT 时折算为 RPM 上限
     gemini_max_retries: int = 5  # 最大重试次数
     gemini_retry_delay: float = 5.0  # 重试基础延时（秒）
 
+    # LLM 调用预算（按模型共享，替代固定 sleep）
+    llm_rpm_limit: int = 0  # 每分钟最大请求数，0 表示由 gemini_request_delay 推导
+    llm_tpm_limit: int = 250000  # 每分钟最大 token 数，0 表示不限制
+    llm_max_concurrency: int = 3  # 最大在途请求数
+    llm_stream_enabled: bool = True  # 流式接收响应，仪表盘 JSON 完整后提前结束
+    llm_batch_size: int = 1  # 多股合并请求的每批股票数，1 表示逐只分析
+    llm_batch_max_output_tokens: int = 32768  # 合并请求的最大输出 token 数
+    llm_prompt_token_budget: int = 0  # 单股提示词 token 预算（不含系统提示词），0 表示不限制（默认）
+
+    # Gemini 上下文缓存：系统提示词只上传一次，后续请求按缓存价计费
+    gemini_context_cache_enabled: bool = True
+    gemini_context_cache_ttl: int = 3600  # 缓存有效期（秒），到期前自动重建
+
     # OpenAI 兼容 API（备选，当 Gemini 不可用时使用）
     openai_api_key: Optional[str] = None
     openai_base_url: Optional[str] = None  # 如: https://api.openai.com/v1
     openai_model: str = "gpt-4o-mini"  # OpenAI 兼容模型名称
     openai_temperature: float = 0.7  # OpenAI 温度参数（0.0-2.0，默认0.7）
+
+    # LLM 响应缓存（相同 prompt 直接返回，不再调用模型；默认关闭）
+    llm_cache_enabled: bool = False
+    llm_cache_dir: str = "./data/llm_cache"
+    llm_cache_ttl: int = 86400  # 缓存有效期（秒），默认 1 天
+    llm_cache_max_entries: int = 2000  # 最大缓存条目数
     
     # === 搜索引擎配置（支持多 Key 负载均衡）===
     bocha_api_keys: List[str] = field(default_factory=list)  # Bocha API Keys
@@ -84,6 +103,8 @@ class Config:
     email_sender: Optional[str] = None  # 发件人邮箱
     email_password: Optional[str] = None  # 邮箱密码/授权码
     email_receivers: List[str] = field(default_factory=list)  # 收件人列表（留空则发给自己）
+    smtp_keepalive_interval: float = 60.0  # SMTP 连接空闲多久发送 NOOP 保活（秒）
+    smtp_idle_timeout: float = 300.0  # SMTP 连接空闲超过该时长后断开（秒），0 表示一直保持
     
     # Pushover 配置（手机/桌面推送通知）
     pushover_user_key: Optional[str] = None  # 用户 Key（https://pushover.net 获取）
@@ -101,6 +122,8 @@ class Config:
     
     # 单股推送模式：每分析完一只股票立即推送，而不是汇总后推送
     single_stock_notify: bool = False
+    single_stock_notify_window: float = 30.0  # 合并推送窗口（秒）：窗口内完成的股票合并为一条消息，0 表示逐只立即推送
+    single_stock_notify_batch: int = 10  # 攒满该数量立即推送，不等窗口到期
 
     # 报告类型：simple(精简) 或 full(完整)
     report_type: str = "simple"
@@ -115,6 +138,10 @@ class Config:
     feishu_max_bytes: int = 20000  # 飞书限制约 20KB，默认 20000 字节
     wechat_max_bytes: int = 4000   # 企业微信限制 4096 字节，默认 4000 字节
     wechat_msg_type: str = "markdown"  # 企业微信消息类型，默认 markdown 类型
+    notify_channel_timeout: float = 60.0  # 单个通知渠道的发送时限（秒），各渠道并发发送
+    outbox_enabled: bool = True  # 推送先写入发件箱，由后台线程投递（失败重试、死信）
+    outbox_max_attempts: int = 6  # 单条消息最大发送次数，超过后进入死信
+    outbox_flush_timeout: float = 120.0  # 单次运行退出前等待发件箱投递的最长时间（秒）
     
     # === 数据库配置 ===
     database_path: str = "./data/stock_analysis.db"
@@ -125,6 +152,10 @@ class Config:
     
     # === 系统配置 ===
     max_workers: int = 3  # 低并发防封禁
+    shard_count: int = 1  # 分片进程数，>1 时个股分析分多进程执行（速率预算按分片均分）
+    shard_queue_path: str = "./data/shard_queue.db"  # 分片工作队列文件（多机协作时放在共享存储上）
+    checkpoint_enabled: bool = True  # 记录各阶段检查点，中断后可 --resume 继续
+    checkpoint_retention_days: int = 7  # 检查点保留天数，0 表示永久保留
     debug: bool = False
     http_proxy: Optional[str] = None  # HTTP 代理 (例如: http://127.0.0.1:10809)
     https_proxy: Optional[str] = None # HTTPS 代理
@@ -134,11 +165,18 @@ class Config:
     schedule_time: str = "18:00"              # 每日推送时间（HH:MM 格式）
     market_review_enabled: bool = True        # 是否启用大盘复盘
 
+    # === 盘中盯盘配置（--watch）===
+    intraday_interval: int = 300                   # 实时行情轮询间隔（秒）
+    intraday_volume_ratio_threshold: float = 2.0   # 量比上穿该值时触发重新分析
+    intraday_cooldown: int = 1800                  # 同一股票两次重新分析的最小间隔（秒）
+
     # === 实时行情增强数据配置 ===
     # 实时行情开关（关闭后使用历史收盘价进行分析）
     enable_realtime_quote: bool = True
     # 筹码分布开关（该接口不稳定，云端部署建议关闭）
     enable_chip_distribution: bool = True
+    # 日常分析中的均线趋势分析开关（结果写入提示词，会改变 AI 分析输入；盘中盯盘不受影响）
+    enable_trend_analysis: bool = False
     # 实时行情数据源优先级（逗号分隔）
     realtime_source_priority: str = "akshare_sina,tencent,efinance,akshare_em"
     # 实时行情缓存时间（秒）
@@ -166,6 +204,12 @@ class Config:
     webui_enabled: bool = False
     webui_host: str = "127.0.0.1"
     webui_port: int = 8000
+    analysis_pool_size: int = 3  # WebUI/机器人后台分析任务调度器线程数
+    job_queue_max_depth: int = 50  # 每个优先级的最大排队任务数，超出立即拒绝
+    job_queue_max_per_user: int = 5  # 单用户在同一优先级的最大排队任务数
+    analysis_result_cache_ttl: int = 600  # 同一股票分析结果的复用时间（秒），0 表示只合并进行中的请求
+    analysis_task_memory_limit: int = 200  # 内存中保留的最近任务数（全部任务持久化到数据库）
+    analysis_task_retention_days: int = 30  # 任务记录保留天数，0 表示永久保留
     
     # === 机器人配置 ===
     bot_enabled: bool = True              # 是否启用机器人功能
@@ -173,6 +217,8 @@ class Config:
     bot_rate_limit_requests: int = 10     # 频率限制：窗口内最大请求数
     bot_rate_limit_window: int = 60       # 频率限制：窗口时间（秒）
     bot_admin_users: List[str] = field(default_factory=list)  # 管理员用户 ID 列表
+    bot_reply_workers: int = 4            # Stream 模式命令执行 / 回复工作线程数
+    bot_reply_max_pending: int = 100      # 回复工作池排队任务上限，超出回复"繁忙"
     
     # 飞书机器人（事件订阅）- 已有 feishu_app_id, feishu_app_secret
     feishu_verification_token: Optional[str] = None  # 事件订阅验证 Token
@@ -313,10 +359,23 @@ class Config:
             gemini_request_delay=float(os.getenv('GEMINI_REQUEST_DELAY', '2.0')),
             gemini_max_retries=int(os.getenv('GEMINI_MAX_RETRIES', '5')),
             gemini_retry_delay=float(os.getenv('GEMINI_RETRY_DELAY', '5.0')),
+            llm_rpm_limit=int(os.getenv('LLM_RPM_LIMIT', '0')),
+            llm_tpm_limit=int(os.getenv('LLM_TPM_LIMIT', '250000')),
+            llm_max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '3')),
+            llm_stream_enabled=os.getenv('LLM_STREAM_ENABLED', 'true').lower() == 'true',
+            llm_batch_size=int(os.getenv('LLM_BATCH_SIZE', '1')),
+            llm_batch_max_output_tokens=int(os.getenv('LLM_BATCH_MAX_OUTPUT_TOKENS', '32768')),
+            llm_prompt_token_budget=int(os.getenv('LLM_PROMPT_TOKEN_BUDGET', '0')),
+            gemini_context_cache_enabled=os.getenv('GEMINI_CONTEXT_CACHE_ENABLED', 'true').lower() == 'true',
+            gemini_context_cache_ttl=int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', '3600')),
             openai_api_key=os.getenv('OPENAI_API_KEY'),
             openai_base_url=os.getenv('OPENAI_BASE_URL'),
             openai_model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
             openai_temperature=float(os.getenv('OPENAI_TEMPERATURE', '0.7')),
+            llm_cache_enabled=os.getenv('LLM_CACHE_ENABLED', 'false').lower() == 'true',
+            llm_cache_dir=os.getenv('LLM_CACHE_DIR', './data/llm_cache'),
+            llm_cache_ttl=int(os.getenv('LLM_CACHE_TTL', '86400')),
+            llm_cache_max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '2000')),
             bocha_api_keys=bocha_api_keys,
             tavily_api_keys=tavily_api_keys,
             serpapi_keys=serpapi_keys,
@@ -327,6 +386,8 @@ class Config:
             email_sender=os.getenv('EMAIL_SENDER'),
             email_password=os.getenv('EMAIL_PASSWORD'),
             email_receivers=[r.strip() for r in os.getenv('EMAIL_RECEIVERS', '').split(',') if r.strip()],
+            smtp_keepalive_interval=float(os.getenv('SMTP_KEEPALIVE_INTERVAL', '60')),
+            smtp_idle_timeout=float(os.getenv('SMTP_IDLE_TIMEOUT', '300')),
             pushover_user_key=os.getenv('PUSHOVER_USER_KEY'),
             pushover_api_token=os.getenv('PUSHOVER_API_TOKEN'),
             pushplus_token=os.getenv('PUSHPLUS_TOKEN'),
@@ -336,30 +397,51 @@ class Config:
             discord_main_channel_id=os.getenv('DISCORD_MAIN_CHANNEL_ID'),
             discord_webhook_url=os.getenv('DISCORD_WEBHOOK_URL'),
             single_stock_notify=os.getenv('SINGLE_STOCK_NOTIFY', 'false').lower() == 'true',
+            single_stock_notify_window=float(os.getenv('SINGLE_STOCK_NOTIFY_WINDOW', '30')),
+            single_stock_notify_batch=int(os.getenv('SINGLE_STOCK_NOTIFY_BATCH', '10')),
             report_type=os.getenv('REPORT_TYPE', 'simple').lower(),
             analysis_delay=float(os.getenv('ANALYSIS_DELAY', '0')),
             feishu_max_bytes=int(os.getenv('FEISHU_MAX_BYTES', '20000')),
             wechat_max_bytes=wechat_max_bytes,
+            notify_channel_timeout=float(os.getenv('NOTIFY_CHANNEL_TIMEOUT', '60')),
+            outbox_enabled=os.getenv('OUTBOX_ENABLED', 'true').lower() == 'true',
+            outbox_max_attempts=int(os.getenv('OUTBOX_MAX_ATTEMPTS', '6')),
+            outbox_flush_timeout=float(os.getenv('OUTBOX_FLUSH_TIMEOUT', '120')),
             wechat_msg_type=wechat_msg_type_lower,
             database_path=os.getenv('DATABASE_PATH', './data/stock_analysis.db'),
             log_dir=os.getenv('LOG_DIR', './logs'),
             log_level=os.getenv('LOG_LEVEL', 'INFO'),
             max_workers=int(os.getenv('MAX_WORKERS', '3')),
+            shard_count=int(os.getenv('SHARD_COUNT', '1')),
+            shard_queue_path=os.getenv('SHARD_QUEUE_PATH', './data/shard_queue.db'),
+            checkpoint_enabled=os.getenv('CHECKPOINT_ENABLED', 'true').lower() == 'true',
+            checkpoint_retention_days=int(os.getenv('CHECKPOINT_RETENTION_DAYS', '7')),
             debug=os.getenv('DEBUG', 'false').lower() == 'true',
             http_proxy=os.getenv('HTTP_PROXY'),
             https_proxy=os.getenv('HTTPS_PROXY'),
             schedule_enabled=os.getenv('SCHEDULE_ENABLED', 'false').lower() == 'true',
             schedule_time=os.getenv('SCHEDULE_TIME', '18:00'),
             market_review_enabled=os.getenv('MARKET_REVIEW_ENABLED', 'true').lower() == 'true',
+            intraday_interval=int(os.getenv('INTRADAY_INTERVAL', '300')),
+            intraday_volume_ratio_threshold=float(os.getenv('INTRADAY_VOLUME_RATIO_THRESHOLD', '2.0')),
+            intraday_cooldown=int(os.getenv('INTRADAY_COOLDOWN', '1800')),
             webui_enabled=os.getenv('WEBUI_ENABLED', 'false').lower() == 'true',
             webui_host=os.getenv('WEBUI_HOST', '127.0.0.1'),
             webui_port=int(os.getenv('WEBUI_PORT', '8000')),
+            analysis_pool_size=int(os.getenv('ANALYSIS_POOL_SIZE', '3')),
+            job_queue_max_depth=int(os.getenv('JOB_QUEUE_MAX_DEPTH', '50')),
+            job_queue_max_per_user=int(os.getenv('JOB_QUEUE_MAX_PER_USER', '5')),
+            analysis_result_cache_ttl=int(os.getenv('ANALYSIS_RESULT_CACHE_TTL', '600')),
+            analysis_task_memory_limit=int(os.getenv('ANALYSIS_TASK_MEMORY_LIMIT', '200')),
+            analysis_task_retention_days=int(os.getenv('ANALYSIS_TASK_RETENTION_DAYS', '30')),
             # 机器人配置
             bot_enabled=os.getenv('BOT_ENABLED', 'true').lower() == 'true',
             bot_command_prefix=os.getenv('BOT_COMMAND_PREFIX', '/'),
             bot_rate_limit_requests=int(os.getenv('BOT_RATE_LIMIT_REQUESTS', '10')),
             bot_rate_limit_window=int(os.getenv('BOT_RATE_LIMIT_WINDOW', '60')),
             bot_admin_users=[u.strip() for u in os.getenv('BOT_ADMIN_USERS', '').split(',') if u.strip()],
+            bot_reply_workers=int(os.getenv('BOT_REPLY_WORKERS', '4')),
+            bot_reply_max_pending=int(os.getenv('BOT_REPLY_MAX_PENDING', '100')),
             # 飞书机器人
             feishu_verification_token=os.getenv('FEISHU_VERIFICATION_TOKEN'),
             feishu_encrypt_key=os.getenv('FEISHU_ENCRYPT_KEY'),
@@ -380,6 +462,7 @@ class Config:
             # 实时行情增强数据配置
             enable_realtime_quote=os.getenv('ENABLE_REALTIME_QUOTE', 'true').lower() == 'true',
             enable_chip_distribution=os.getenv('ENABLE_CHIP_DISTRIBUTION', 'true').lower() == 'true',
+            enable_trend_analysis=os.getenv('ENABLE_TREND_ANALYSIS', 'false').lower() == 'true',
             # 实时行情数据源优先级：
             # - akshare_sina/tencent: 单股票直连查询，轻量级，推荐放前面
             # - efinance/akshare_em: 全量拉取，数据丰富但负载大
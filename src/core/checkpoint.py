@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 运行检查点
+===================================
+
+职责：
+1. 按 (run_id, 股票代码, 阶段) 持久化流水线各阶段输出（pipeline_checkpoint 表）
+2. --resume 运行时跳过已完成阶段：已有结果的股票直接还原，
+   已有 LLM 原始响应的只重新解析，已有情报 / 上下文的不再重复搜索与取数
+
+阶段（按流水线顺序）：
+    fetch        日线数据已获取并写入 stock_daily
+    search       多维度情报搜索结果（news_context）
+    context      增强后的分析上下文
+    prompt       发送给 LLM 的提示词
+    llm_response LLM 原始响应
+    result       解析后的 AnalysisResult.to_dict()
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from src.storage import get_db
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('fetch', 'search', 'context', 'prompt', 'llm_response', 'result')
+
+
+class StockCheckpoint:
+    """单只股票在一次运行中的阶段检查点"""
+
+    def __init__(self, run_id: str, code: str, stages: Optional[Dict[str, Any]] = None):
+        self.run_id = run_id
+        self.code = code
+        self._stages: Dict[str, Any] = dict(stages or {})
+
+    def has(self, stage: str) -> bool:
+        return stage in self._stages
+
+    def get(self, stage: str, default: Any = None) -> Any:
+        return self._stages.get(stage, default)
+
+    def save(self, stage: str, payload: Any) -> None:
+        """保存阶段输出，写库失败只记录日志，不影响分析流程"""
+        self._stages[stage] = payload
+        try:
+            get_db().save_pipeline_checkpoint(self.run_id, self.code, stage, payload)
+        except Exception as e:
+            logger.warning(f"[检查点] {self.code} 阶段 {stage} 保存失败: {e}")
+
+
+class RunCheckpoint:
+    """
+    一次批量运行的检查点
+
+    使用方式：
+        checkpoint = RunCheckpoint.start(resume=args.resume)
+        stock = checkpoint.for_stock(code)
+        if not stock.has('search'):
+            stock.save('search', {'news_context': news})
+    """
+
+    def __init__(self, run_id: str, stages: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.run_id = run_id
+        self._stages = stages or {}
+
+    @classmethod
+    def start(cls, resume: Optional[str] = None) -> 'RunCheckpoint':
+        """
+        开始新运行或恢复已有运行
+
+        Args:
+            resume: None 表示新运行；'latest' 恢复最近一次运行；其他值视为 run_id
+        """
+        if resume:
+            db = get_db()
+            run_id = db.get_latest_checkpoint_run_id() if resume == 'latest' else resume
+            if run_id:
+                stages = db.get_pipeline_checkpoints(run_id)
+                done = sum(1 for item in stages.values() if 'result' in item)
+                logger.info(f"[检查点] 恢复运行 {run_id}: {len(stages)} 只股票有检查点, {done} 只已完成")
+                return cls(run_id, stages)
+            logger.warning("[检查点] 未找到可恢复的运行，开始新运行")
+
+        run_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        logger.info(f"[检查点] 新运行 {run_id}（中断后可通过 --resume 继续）")
+        return cls(run_id)
+
+    def for_stock(self, code: str) -> StockCheckpoint:
+        return StockCheckpoint(self.run_id, code, self._stages.get(code))
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 进程级服务容器
+===================================
+
+职责：
+1. 在进程内共享重量级组件（数据源管理器、AI 分析器、搜索服务、趋势分析器），
+   WebUI / 机器人请求不再每次重建 6 个数据源与各类 SDK 客户端
+2. 保留各组件内部缓存（实时行情、熔断器状态、搜索 Key 轮换等）跨请求复用
+3. 后台分析任务的并发与排队由 src.core.job_queue 统一调度
+
+使用方式：
+    container = get_service_container()
+    pipeline = container.create_pipeline(source_message=message)
+    pipeline.process_single_stock(code)
+
+说明：
+    通知服务（NotificationService）与请求来源消息绑定，每个请求单独创建
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
+
+from src.config import Config, get_config
+
+if TYPE_CHECKING:
+    from bot.models import BotMessage
+    from data_provider import DataFetcherManager
+    from src.analyzer import GeminiAnalyzer
+    from src.core.pipeline import StockAnalysisPipeline
+    from src.search_service import SearchService
+    from src.stock_analyzer import StockTrendAnalyzer
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """
+    共享服务容器
+
+    各组件首次访问时创建（双重检查加锁），此后所有请求复用同一实例。
+    这些组件本身已被 StockAnalysisPipeline.run 的线程池并发使用，可跨线程共享。
+    """
+
+    def __init__(self, config: Optional[Config] = None):
+        self.config = config or get_config()
+        self._lock = threading.Lock()
+        self._components: Dict[str, Any] = {}
+        self._pipelines_created = 0
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        """获取组件，不存在时创建"""
+        component = self._components.get(name)
+        if component is None:
+            with self._lock:
+                component = self._components.get(name)
+                if component is None:
+                    start = time.time()
+                    component = factory()
+                    self._components[name] = component
+                    logger.info(f"[服务容器] {name} 初始化完成，耗时 {time.time() - start:.2f}s")
+        return component
+
+    @property
+    def fetcher_manager(self) -> 'DataFetcherManager':
+        from data_provider import DataFetcherManager
+        return self._get('fetcher_manager', DataFetcherManager)
+
+    @property
+    def trend_analyzer(self) -> 'StockTrendAnalyzer':
+        from src.stock_analyzer import StockTrendAnalyzer
+        return self._get('trend_analyzer', StockTrendAnalyzer)
+
+    @property
+    def analyzer(self) -> 'GeminiAnalyzer':
+        from src.analyzer import GeminiAnalyzer
+        return self._get('analyzer', GeminiAnalyzer)
+
+    @property
+    def search_service(self) -> 'SearchService':
+        from src.search_service import SearchService
+        return self._get('search_service', lambda: SearchService(
+            bocha_keys=self.config.bocha_api_keys,
+            tavily_keys=self.config.tavily_api_keys,
+            serpapi_keys=self.config.serpapi_keys,
+        ))
+
+    def warm_up(self) -> None:
+        """预先创建全部共享组件（服务启动时在后台调用，首个请求无需等待）"""
+        start = time.time()
+        _ = self.fetcher_manager, self.trend_analyzer, self.analyzer, self.search_service
+        logger.info(f"[服务容器] 预热完成，耗时 {time.time() - start:.2f}s")
+
+    def create_pipeline(
+        self,
+        max_workers: Optional[int] = None,
+        source_message: Optional['BotMessage'] = None
+    ) -> 'StockAnalysisPipeline':
+        """
+        创建复用共享组件的分析流水线（仅通知服务按请求新建）
+
+        Args:
+            max_workers: 流水线内部并发数（可选，默认从配置读取）
+            source_message: 来源消息（机器人场景，用于回复到原会话）
+        """
+        from src.core.pipeline import StockAnalysisPipeline
+        pipeline = StockAnalysisPipeline(
+            config=self.config,
+            max_workers=max_workers,
+            source_message=source_message,
+            services=self,
+        )
+        with self._lock:
+            self._pipelines_created += 1
+        return pipeline
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取容器状态"""
+        with self._lock:
+            return {
+                'components': sorted(self._components.keys()),
+                'pipelines_created': self._pipelines_created,
+            }
+
+
+# 全局容器实例
+_container: Optional[ServiceContainer] = None
+_container_lock = threading.Lock()
+
+
+def get_service_container() -> ServiceContainer:
+    """获取进程级服务容器"""
+    global _container
+    if _container is None:
+        with _container_lock:
+            if _container is None:
+                _container = ServiceContainer()
+    return _container
+
+
+def reset_service_container() -> None:
+    """重置服务容器（配置变更后重建组件，或用于测试）"""
+    global _container
+    with _container_lock:
+        _container = None
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 盘中盯盘模式
+===================================
+
+职责：
+1. 交易时段内按固定间隔轮询全市场实时行情快照（数据源自带缓存，一次拉取全部自选股共享）
+2. 增量更新自选股的盘中均线（前 N-1 日收盘价之和预先计算，每次轮询 O(1)）
+3. 只有状态越过阈值的股票才重新执行搜索 + LLM 分析：
+   - 均线排列翻转（多头 / 空头 / 缠绕之间切换）
+   - 量比放大（上穿 INTRADAY_VOLUME_RATIO_THRESHOLD）
+   - 价格突破压力位或跌破支撑位（来自 TrendAnalysisResult）
+4. 同一股票重新分析后进入冷却期，避免价格在阈值附近反复触发
+
+使用方式：
+    python main.py --watch
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from src.enums import ReportType
+
+if TYPE_CHECKING:
+    from data_provider.realtime_types import UnifiedRealtimeQuote
+    from src.core.pipeline import StockAnalysisPipeline
+
+logger = logging.getLogger(__name__)
+
+# A 股交易时段（北京时间）
+_TZ_CN = timezone(timedelta(hours=8))
+_SESSIONS = ((dt_time(9, 30), dt_time(11, 30)), (dt_time(13, 0), dt_time(15, 0)))
+
+ALIGN_BULL = "多头排列"
+ALIGN_BEAR = "空头排列"
+ALIGN_MIXED = "均线缠绕"
+
+
+def is_trading_time(now: Optional[datetime] = None) -> bool:
+    """是否处于 A 股交易时段（不含节假日判断）"""
+    now = now or datetime.now(_TZ_CN)
+    if now.weekday() >= 5:
+        return False
+    current = now.time()
+    return any(start <= current <= end for start, end in _SESSIONS)
+
+
+def _alignment(ma5: float, ma10: float, ma20: float) -> str:
+    if ma5 > ma10 > ma20:
+        return ALIGN_BULL
+    if ma5 < ma10 < ma20:
+        return ALIGN_BEAR
+    return ALIGN_MIXED
+
+
+@dataclass
+class _WatchState:
+    """单只股票的盘中状态"""
+    code: str
+    name: str = ""
+    # 前 4 / 9 / 19 个交易日收盘价之和，盘中 MAn = (前 n-1 日之和 + 现价) / n
+    sum4: float = 0.0
+    sum9: float = 0.0
+    sum19: float = 0.0
+    support_levels: List[float] = field(default_factory=list)
+    resistance_levels: List[float] = field(default_factory=list)
+    alignment: str = ALIGN_MIXED
+    price: Optional[float] = None
+    volume_ratio: float = 0.0
+    last_analysis: float = 0.0  # 上次重新分析的 monotonic 时间
+
+    def moving_averages(self, price: float):
+        return (self.sum4 + price) / 5, (self.sum9 + price) / 10, (self.sum19 + price) / 20
+
+
+@dataclass
+class IntradayTrigger:
+    """触发重新分析的事件"""
+    code: str
+    reasons: List[str]
+
+
+class IntradayWatcher:
+    """
+    盘中盯盘器
+
+    基线（前一交易日为止的均线前缀和、支撑压力位）每个交易日加载一次，
+    轮询时只读取实时行情缓存并做常数时间的增量计算。
+    """
+
+    def __init__(
+        self,
+        pipeline: 'StockAnalysisPipeline',
+        stock_codes: List[str],
+        interval: int = 300,
+        volume_ratio_threshold: float = 2.0,
+        cooldown: int = 1800,
+        report_type: ReportType = ReportType.SIMPLE,
+        send_notification: bool = True,
+    ):
+        """
+        Args:
+            pipeline: 分析流水线（复用其数据源、趋势分析器与通知服务）
+            stock_codes: 自选股列表
+            interval: 轮询间隔（秒）
+            volume_ratio_threshold: 量比触发阈值
+            cooldown: 同一股票两次重新分析的最小间隔（秒）
+            report_type: 重新分析后推送的报告类型
+            send_notification: 重新分析完成后是否立即推送
+        """
+        self.pipeline = pipeline
+        self.stock_codes = list(stock_codes)
+        self.interval = max(10, interval)
+        self.volume_ratio_threshold = volume_ratio_threshold
+        self.cooldown = cooldown
+        self.report_type = report_type
+        self.send_notification = send_notification
+
+        self._states: Dict[str, _WatchState] = {}
+        self._baseline_date: Optional[date] = None
+        self._executor = ThreadPoolExecutor(max_workers=pipeline.max_workers, thread_name_prefix="intraday_")
+        self._inflight: Dict[str, Future] = {}
+        self._stop = threading.Event()
+        self._stats = {'polls': 0, 'triggers': 0, 'reanalyses': 0}
+
+    def load_baseline(self) -> None:
+        """加载各股票截至上一交易日的均线前缀和与支撑压力位"""
+        today = datetime.now(_TZ_CN).date()
+        states: Dict[str, _WatchState] = {}
+        for code in self.stock_codes:
+            try:
+                df = self.pipeline.db.get_history_df(code, days=60)
+                if df is None:
+                    logger.warning(f"[盯盘] {code} 无历史数据，跳过")
+                    continue
+                df = df[df['date'] < today]  # 今日数据由实时行情增量计算
+                if len(df) < 20:
+                    logger.warning(f"[盯盘] {code} 历史数据不足 20 个交易日，跳过")
+                    continue
+
+                trend = self.pipeline.trend_analyzer.analyze(df, code)
+                closes = [float(c) for c in df['close'].iloc[-19:]]
+                state = _WatchState(
+                    code=code,
+                    sum4=sum(closes[-4:]),
+                    sum9=sum(closes[-9:]),
+                    sum19=sum(closes),
+                    support_levels=sorted(trend.support_levels),
+                    resistance_levels=sorted(trend.resistance_levels),
+                    alignment=_alignment(trend.ma5, trend.ma10, trend.ma20),
+                    price=float(closes[-1]),
+                )
+                previous = self._states.get(code)
+                if previous is not None:
+                    state.last_analysis = previous.last_analysis
+                states[code] = state
+            except Exception as e:
+                logger.warning(f"[盯盘] {code} 加载基线失败: {e}")
+
+        self._states = states
+        self._baseline_date = today
+        logger.info(f"[盯盘] 基线已加载: {len(states)}/{len(self.stock_codes)} 只股票")
+
+    def _evaluate(self, state: _WatchState, quote: 'UnifiedRealtimeQuote') -> List[str]:
+        """根据最新行情更新状态，返回越过阈值的原因"""
+        price = float(quote.price)
+        reasons: List[str] = []
+
+        alignment = _alignment(*state.moving_averages(price))
+        if alignment != state.alignment:
+            reasons.append(f"均线排列翻转: {state.alignment} → {alignment}")
+        state.alignment = alignment
+
+        volume_ratio = float(getattr(quote, 'volume_ratio', None) or 0.0)
+        if state.volume_ratio < self.volume_ratio_threshold <= volume_ratio:
+            reasons.append(f"量比放大: {volume_ratio:.2f}")
+        state.volume_ratio = volume_ratio
+
+        previous = state.price
+        if previous is not None:
+            for level in state.resistance_levels:
+                if previous <= level < price:
+                    reasons.append(f"突破压力位 {level:.2f}")
+            for level in state.support_levels:
+                if previous >= level > price:
+                    reasons.append(f"跌破支撑位 {level:.2f}")
+        state.price = price
+        if quote.name:
+            state.name = quote.name
+        return reasons
+
+    def poll_once(self) -> List[IntradayTrigger]:
+        """轮询一次实时行情，返回需要重新分析的股票"""
+        fetcher = self.pipeline.fetcher_manager
+        codes = list(self._states)
+        # 全量数据源一次拉取全市场快照并缓存，之后逐只读取均命中缓存
+        fetcher.prefetch_realtime_quotes(codes)
+
+        triggers: List[IntradayTrigger] = []
+        for code in codes:
+            state = self._states[code]
+            try:
+                quote = fetcher.get_realtime_quote(code)
+            except Exception as e:
+                logger.debug(f"[盯盘] {code} 获取实时行情失败: {e}")
+                continue
+            if quote is None or not quote.price:
+                continue
+            reasons = self._evaluate(state, quote)
+            if reasons:
+                triggers.append(IntradayTrigger(code=code, reasons=reasons))
+
+        self._stats['polls'] += 1
+        self._stats['triggers'] += len(triggers)
+        return triggers
+
+    def _dispatch(self, triggers: List[IntradayTrigger]) -> None:
+        """为触发的股票提交重新分析（跳过冷却期内与进行中的股票）"""
+        now = time.monotonic()
+        self._inflight = {code: f for code, f in self._inflight.items() if not f.done()}
+        for trigger in triggers:
+            state = self._states[trigger.code]
+            label = f"{state.name}({trigger.code})" if state.name else trigger.code
+            if trigger.code in self._inflight:
+                continue
+            if state.last_analysis and now - state.last_analysis < self.cooldown:
+                logger.info(f"[盯盘] {label} {'; '.join(trigger.reasons)}（冷却中，暂不重新分析）")
+                continue
+            logger.info(f"[盯盘] {label} 触发重新分析: {'; '.join(trigger.reasons)}")
+            state.last_analysis = now
+            self._stats['reanalyses'] += 1
+            self._inflight[trigger.code] = self._executor.submit(self._reanalyze, trigger.code)
+
+    def _reanalyze(self, code: str) -> None:
+        result = self.pipeline.process_single_stock(
+            code,
+            single_stock_notify=self.send_notification,
+            report_type=self.report_type,
+        )
+        if result:
+            self.pipeline.save_results([result])
+
+    def run(self) -> None:
+        """阻塞运行，交易时段内轮询，收到退出信号后停止"""
+        from src.scheduler import GracefulShutdown
+
+        shutdown = GracefulShutdown()
+        logger.info(
+            f"[盯盘] 启动: {len(self.stock_codes)} 只股票, 间隔 {self.interval}s, "
+            f"量比阈值 {self.volume_ratio_threshold}, 冷却 {self.cooldown}s"
+        )
+        idle_logged = False
+        while not shutdown.should_shutdown and not self._stop.is_set():
+            if not is_trading_time():
+                if not idle_logged:
+                    logger.info("[盯盘] 非交易时段，等待开盘...")
+                    idle_logged = True
+                self._sleep(60, shutdown)
+                continue
+            idle_logged = False
+
+            if self._baseline_date != datetime.now(_TZ_CN).date():
+                self.load_baseline()
+
+            started = time.monotonic()
+            try:
+                self._dispatch(self.poll_once())
+            except Exception as e:
+                logger.exception(f"[盯盘] 轮询失败: {e}")
+            if self._stats['polls'] % 12 == 0:
+                logger.info(f"[盯盘] 统计: {self.get_stats()}")
+            self._sleep(self.interval - (time.monotonic() - started), shutdown)
+
+        self._executor.shutdown(wait=True)
+        self.pipeline.flush_single_stock_notifications()
+        logger.info(f"[盯盘] 已停止: {self.get_stats()}")
+
+    def _sleep(self, seconds: float, shutdown) -> None:
+        deadline = time.monotonic() + max(0.0, seconds)
+        while time.monotonic() < deadline and not shutdown.should_shutdown and not self._stop.is_set():
+            time.sleep(min(1.0, deadline - time.monotonic()))
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def get_stats(self) -> Dict[str, int]:
+        """轮询次数、触发次数、实际重新分析次数"""
+        return dict(self._stats)
+
+
+def run_intraday_watch(
+    config,
+    stock_codes: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    send_notification: bool = True,
+) -> None:
+    """
+    盘中盯盘入口（main.py --watch）
+
+    Args:
+        config: 配置对象
+        stock_codes: 自选股列表，None 时使用配置 STOCK_LIST
+        max_workers: 重新分析的并发数
+        send_notification: 触发重新分析后是否推送
+    """
+    from src.core.pipeline import StockAnalysisPipeline
+
+    if stock_codes is None:
+        config.refresh_stock_list()
+        stock_codes = config.stock_list
+    if not stock_codes:
+        logger.error("[盯盘] 未配置自选股列表，请在 .env 文件中设置 STOCK_LIST")
+        return
+
+    pipeline = StockAnalysisPipeline(config=config, max_workers=max_workers)
+    report_type = ReportType.FULL if getattr(config, 'report_type', 'simple').lower() == 'full' else ReportType.SIMPLE
+    watcher = IntradayWatcher(
+        pipeline,
+        stock_codes,
+        interval=config.intraday_interval,
+        volume_ratio_threshold=config.intraday_volume_ratio_threshold,
+        cooldown=config.intraday_cooldown,
+        report_type=report_type,
+        send_notification=send_notification,
+    )
+    watcher.run()
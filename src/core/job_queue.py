@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 后台任务调度器
+===================================
+
+职责：
+1. 统一承接 WebUI / 机器人的后台分析任务，替代无界线程池队列与裸线程
+2. 优先级：交互式单股分析 > 批量分析 > 定时任务等后台批量任务，高优先级任务先出队
+3. 准入控制：队列深度与单用户排队数超限时立即拒绝，不再积压数小时的任务
+4. 同一优先级内按用户公平调度（虚拟时间），高频用户不会饿死其他用户；
+   机器人 RateLimiter 的额度使用率参与计算调度代价
+
+并发约束：
+    workers >= 2 时，批量 / 后台任务最多占用 workers - 1 个线程，始终为交互式请求保留一个线程；
+    workers = 1 时无法保留，后台任务运行期间交互式请求需排队等待
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class JobPriority(IntEnum):
+    """任务优先级（数值越小越优先）"""
+    INTERACTIVE = 0  # 交互式单股分析（WebUI / 机器人 /analyze）
+    BATCH = 1  # 批量分析（机器人 /batch）
+    BULK = 2  # 后台批量任务（定时任务的每日分析）
+
+
+class QueueFullError(Exception):
+    """任务队列已满，请求被拒绝"""
+    pass
+
+
+class _Job:
+    """排队中的任务"""
+
+    __slots__ = ('fn', 'args', 'kwargs', 'future', 'priority', 'user_id', 'name', 'enqueued_at')
+
+    def __init__(self, fn, args, kwargs, priority: JobPriority, user_id: str, name: str):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.priority = priority
+        self.user_id = user_id
+        self.name = name
+        self.enqueued_at = time.monotonic()
+
+
+class _FairQueue:
+    """
+    单优先级内的用户公平队列（虚拟时间公平排队）
+
+    每个用户一个 FIFO；出队时选择虚拟时间最小的用户，出队后该用户虚拟时间增加其调度代价。
+    空闲用户记录超过上限时整体清理（重新活跃时从当前时钟起算，最多少计一次调度代价），
+    记录数不随历史用户数无限增长
+    """
+
+    # 空闲用户记录上限（超过后清理）
+    IDLE_USERS_KEPT = 256
+
+    def __init__(self):
+        self._queues: Dict[str, Deque[_Job]] = {}
+        self._vtime: Dict[str, float] = {}
+        self._heap: List[Tuple[float, int, str]] = []  # (虚拟时间, 序号, 用户)
+        self._counter = itertools.count()
+        self._clock = 0.0
+        self.size = 0
+
+    def push(self, job: _Job) -> None:
+        queue = self._queues.get(job.user_id)
+        if queue is None:
+            queue = self._queues[job.user_id] = deque()
+        if not queue:
+            # 用户从空闲变为活跃：虚拟时间不早于当前时钟，避免积攒"信用"后独占
+            vtime = max(self._vtime.get(job.user_id, 0.0), self._clock)
+            self._vtime[job.user_id] = vtime
+            heapq.heappush(self._heap, (vtime, next(self._counter), job.user_id))
+        queue.append(job)
+        self.size += 1
+
+    def pop(self, cost_of: Callable[[str], float]) -> Optional[_Job]:
+        if not self._heap:
+            return None
+        vtime, _, user_id = heapq.heappop(self._heap)
+        queue = self._queues[user_id]
+        job = queue.popleft()
+        self.size -= 1
+
+        self._clock = vtime
+        self._vtime[user_id] = vtime + cost_of(user_id)
+        if queue:
+            heapq.heappush(self._heap, (self._vtime[user_id], next(self._counter), user_id))
+        else:
+            del self._queues[user_id]
+            self._prune_idle()
+        return job
+
+    def _prune_idle(self) -> None:
+        """空闲用户记录过多时清理（只保留仍有任务排队的用户）"""
+        if len(self._vtime) <= 2 * len(self._queues) + self.IDLE_USERS_KEPT:
+            return
+        self._vtime = {user_id: self._vtime[user_id] for user_id in self._queues}
+
+    def count_for(self, user_id: str) -> int:
+        queue = self._queues.get(user_id)
+        return len(queue) if queue else 0
+
+
+class JobScheduler:
+    """
+    优先级 + 公平调度的后台任务执行器
+
+    使用方式：
+        scheduler = get_job_scheduler()
+        future = scheduler.submit(fn, arg, priority=JobPriority.INTERACTIVE, user_id=message.user_id)
+    """
+
+    def __init__(
+        self,
+        workers: int = 3,
+        max_depth: int = 50,
+        max_per_user: int = 5,
+    ):
+        """
+        Args:
+            workers: 工作线程数
+            max_depth: 每个优先级的最大排队数（超出立即拒绝）
+            max_per_user: 单用户在同一优先级的最大排队数（超出立即拒绝）
+        """
+        self.workers = max(1, workers)
+        self.max_depth = max_depth
+        self.max_per_user = max_per_user
+        # 非交互式任务最多占用的线程数：workers >= 2 时保留一个线程给交互式请求；
+        # 只有一个线程时无法保留（否则后台任务永远无法执行）
+        self._background_limit = max(1, self.workers - 1)
+        if self.workers < 2:
+            logger.warning("[任务调度] 仅 1 个工作线程，无法为交互式请求保留线程，建议 ANALYSIS_POOL_SIZE >= 2")
+
+        self._cond = threading.Condition()
+        self._queues: Dict[JobPriority, _FairQueue] = {p: _FairQueue() for p in JobPriority}
+        self._running: Dict[JobPriority, int] = {p: 0 for p in JobPriority}
+        self._rate_limiter = None
+        self._threads: List[threading.Thread] = []
+        self._shutdown = False
+
+        # 统计
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._total_wait = 0.0
+
+    def set_rate_limiter(self, rate_limiter: Any) -> None:
+        """
+        接入机器人命令的 RateLimiter
+
+        调度代价 = 1 + 该用户窗口内额度使用率，额度用得越多的用户在同级队列中越靠后
+        """
+        self._rate_limiter = rate_limiter
+
+    def _cost_of(self, user_id: str) -> float:
+        limiter = self._rate_limiter
+        if limiter is None or not getattr(limiter, 'max_requests', 0):
+            return 1.0
+        try:
+            used = limiter.max_requests - limiter.get_remaining(user_id)
+            return 1.0 + max(0, used) / limiter.max_requests
+        except Exception:
+            return 1.0
+
+    def _ensure_workers(self) -> None:
+        """懒启动工作线程（调用方需持有锁）"""
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f"job_{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: JobPriority = JobPriority.INTERACTIVE,
+        user_id: Optional[str] = None,
+        name: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Future:
+        """
+        提交任务
+
+        Args:
+            fn: 任务函数
+            priority: 优先级
+            user_id: 用户标识（公平调度与单用户限额），None 视为匿名
+            name: 任务名称（用于日志）
+
+        Returns:
+            concurrent.futures.Future
+
+        Raises:
+            QueueFullError: 队列深度或单用户排队数超限
+        """
+        user_id = user_id or 'anonymous'
+        job = _Job(fn, args, kwargs, priority, user_id, name or getattr(fn, '__name__', 'job'))
+        with self._cond:
+            if self._shutdown:
+                raise QueueFullError("任务调度器已关闭")
+            queue = self._queues[priority]
+            if self.max_depth > 0 and queue.size >= self.max_depth:
+                self._rejected += 1
+                raise QueueFullError(f"{priority.name} 队列已满（{queue.size} 个任务排队），请稍后重试")
+            if self.max_per_user > 0 and queue.count_for(user_id) >= self.max_per_user:
+                self._rejected += 1
+                raise QueueFullError(f"您已有 {self.max_per_user} 个任务在排队，请等待完成后再提交")
+
+            queue.push(job)
+            self._submitted += 1
+            self._ensure_workers()
+            self._cond.notify()
+
+        logger.debug(f"[任务调度] 提交 {job.name} (优先级 {priority.name}, 用户 {user_id})")
+        return job.future
+
+    def _next_job(self) -> Optional[_Job]:
+        """按优先级取下一个可运行任务（调用方需持有锁）"""
+        for priority in JobPriority:
+            queue = self._queues[priority]
+            if not queue.size:
+                continue
+            if priority != JobPriority.INTERACTIVE:
+                background = sum(n for p, n in self._running.items() if p != JobPriority.INTERACTIVE)
+                if background >= self._background_limit:
+                    continue
+            return queue.pop(self._cost_of)
+        return None
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    job = self._next_job()
+                self._running[job.priority] += 1
+                self._total_wait += time.monotonic() - job.enqueued_at
+
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(job.fn(*job.args, **job.kwargs))
+                    except BaseException as e:
+                        logger.error(f"[任务调度] 任务 {job.name} 执行失败: {e}")
+                        job.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[job.priority] -= 1
+                    self._completed += 1
+                    # 释放的线程可能让被并发上限挡住的后台任务继续执行
+                    self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计"""
+        with self._cond:
+            dispatched = self._submitted - sum(q.size for q in self._queues.values())
+            return {
+                'workers': self.workers,
+                'queued': {p.name: self._queues[p].size for p in JobPriority},
+                'running': {p.name: self._running[p] for p in JobPriority},
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'completed': self._completed,
+                'avg_wait_seconds': round(self._total_wait / dispatched, 2) if dispatched else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """停止接收新任务，排队中的任务执行完后工作线程退出"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+
+
+# 全局调度器实例
+_scheduler: Optional[JobScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_job_scheduler() -> JobScheduler:
+    """获取进程级任务调度器"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from src.config import get_config
+                config = get_config()
+                _scheduler = JobScheduler(
+                    workers=config.analysis_pool_size,
+                    max_depth=config.job_queue_max_depth,
+                    max_per_user=config.job_queue_max_per_user,
+                )
+                logger.info(
+                    f"[任务调度] 已启动: 线程 {_scheduler.workers}, 每级队列上限 {config.job_queue_max_depth}, "
+                    f"单用户排队上限 {config.job_queue_max_per_user}"
+                )
+    return _scheduler
+
+
+def reset_job_scheduler() -> None:
+    """重置任务调度器（主要用于测试）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.shutdown()
+        _scheduler = None
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 单股推送合并缓冲
+===================================
+
+职责：
+1. 单股推送模式下收集陆续完成的分析结果，时间窗口到期或攒满 N 只后合并为一条消息推送
+2. 首个结果入队即开始计时，推送延迟不超过窗口时长
+3. 合并推送串行执行，消息顺序与分析完成顺序一致
+
+大自选股列表逐只推送会触发 Webhook 限流（429）并刷屏，合并后每个渠道每个窗口只发一条。
+"""
+
+import logging
+import threading
+from typing import Callable, Generic, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class CoalescingBuffer(Generic[T]):
+    """
+    按时间窗口 / 条数合并的缓冲区（线程安全）
+
+    window <= 0 或 max_items <= 1 时不缓冲，add() 立即推送（与逐只推送行为一致）
+    """
+
+    def __init__(self, flush_func: Callable[[List[T]], None], window: float = 30.0, max_items: int = 10):
+        """
+        Args:
+            flush_func: 推送一批结果的函数（在调用 add/flush 的线程或计时线程中执行）
+            window: 首个结果入队后最长等待时间（秒）
+            max_items: 攒满该数量立即推送
+        """
+        self._flush_func = flush_func
+        self.window = window
+        self.max_items = max_items
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._items: List[T] = []
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_items > 1
+
+    def add(self, item: T) -> None:
+        """加入一条结果；攒满时在当前线程推送"""
+        if not self.enabled:
+            with self._flush_lock:
+                self._emit([item])
+            return
+        with self._lock:
+            self._items.append(item)
+            full = len(self._items) >= self.max_items
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """立即推送缓冲中的全部结果（运行结束 / 窗口到期时调用）"""
+        # 取批次与推送都在推送锁内，保证批次按入队顺序发出
+        with self._flush_lock:
+            with self._lock:
+                batch, self._items = self._items, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if batch:
+                self._emit(batch)
+
+    def _emit(self, batch: List[T]) -> None:
+        try:
+            self._flush_func(batch)
+        except Exception as e:
+            logger.error(f"合并推送失败（{len(batch)} 条）: {e}")
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._items)
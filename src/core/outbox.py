@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 通知发件箱
+===================================
+
+职责：
+1. 渲染好的消息按渠道写入 notification_outbox 表后立即返回，流水线不再阻塞于网络推送
+2. 后台线程按渠道并发投递，同一渠道内严格按入队顺序发送（失败的消息重试成功或进入死信前，
+   该渠道后续消息不会发出）
+3. 失败按指数退避重试，超过 OUTBOX_MAX_ATTEMPTS 次进入死信（dead），可检查与重放；
+   分段消息记录已送达段数，重试时从第一个未送达的分段继续
+4. 幂等键 = 哈希(作用域, 渠道, 内容)：同一运行重复推送（如 --resume）不会重复入队
+
+使用方式：
+    outbox = get_notification_outbox()
+    outbox.enqueue(report, channels, scope=run_id)
+    outbox.flush(timeout=120)  # 单次运行退出前尽量发完，剩余消息下次启动继续发送
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from src.chunking import track_chunk_progress
+from src.notification import NotificationChannel, NotificationService
+from src.storage import get_db
+
+logger = logging.getLogger(__name__)
+
+# 已送达消息保留天数
+SENT_RETENTION_DAYS = 7
+# sending 状态超过该时长未更新视为进程中断遗留（秒）；
+# 分片运行时各进程各有投递线程，较新的 sending 消息可能正由其他进程发送
+STALE_SENDING_SECONDS = 600
+
+
+def make_idempotency_key(scope: str, channel: str, content: str) -> str:
+    """生成幂等键（同一作用域、渠道、内容只入队一次）"""
+    return hashlib.sha256(f"{scope}\x00{channel}\x00{content}".encode('utf-8')).hexdigest()
+
+
+class NotificationOutbox:
+    """
+    持久化通知发件箱 + 后台投递线程
+
+    消息至少投递一次：进程在发送后、标记前中断时，重启后会再次发送该条消息
+    """
+
+    def __init__(
+        self,
+        notifier_factory: Callable[[], NotificationService] = NotificationService,
+        max_attempts: int = 6,
+        backoff_base: float = 30.0,
+        backoff_max: float = 3600.0,
+        poll_interval: float = 5.0,
+    ):
+        """
+        Args:
+            notifier_factory: 创建投递用通知服务的工厂（渠道配置读取全局配置）
+            max_attempts: 最大发送次数，超过后进入死信
+            backoff_base: 重试退避基数（秒），第 n 次失败后等待 base * 2^(n-1)
+            backoff_max: 重试等待上限（秒）
+            poll_interval: 空闲时检查到期消息的间隔（秒）
+        """
+        self._notifier_factory = notifier_factory
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+
+        self._notifier: Optional[NotificationService] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._busy_channels: Set[str] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def enqueue(
+        self,
+        content: str,
+        channels: List[NotificationChannel],
+        overrides: Optional[Dict[NotificationChannel, str]] = None,
+        scope: str = '',
+    ) -> int:
+        """
+        将消息按渠道写入发件箱并唤醒投递线程
+
+        Args:
+            content: 消息内容（Markdown）
+            channels: 目标渠道
+            overrides: 指定渠道使用的替代内容
+            scope: 幂等作用域（如运行 ID），相同作用域内重复入队的相同消息会被忽略
+
+        Returns:
+            新入队条数
+        """
+        overrides = overrides or {}
+        items = []
+        for channel in channels:
+            text = overrides.get(channel, content)
+            items.append({
+                'idempotency_key': make_idempotency_key(scope, channel.value, text),
+                'channel': channel.value,
+                'content': text,
+            })
+        count = get_db().enqueue_notifications(items)
+        if count < len(items):
+            logger.info(f"[发件箱] {len(items) - count} 条消息已入队过，跳过（幂等）")
+        self.start()
+        self._wake.set()
+        return count
+
+    def start(self) -> None:
+        """启动后台投递线程（幂等），并恢复进程中断遗留（长时间未更新）的 sending 消息"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            db = get_db()
+            recovered = db.requeue_notifications(
+                status='sending',
+                stale_before=datetime.now() - timedelta(seconds=STALE_SENDING_SECONDS),
+            )
+            if recovered:
+                logger.info(f"[发件箱] 恢复 {recovered} 条中断的投递")
+            db.prune_notifications(SENT_RETENTION_DAYS)
+
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(max_workers=len(NotificationChannel), thread_name_prefix="outbox_")
+            self._thread = threading.Thread(target=self._run, name="outbox_drainer", daemon=True)
+            self._thread.start()
+
+    def _get_notifier(self) -> NotificationService:
+        if self._notifier is None:
+            self._notifier = self._notifier_factory()
+        return self._notifier
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.drain_once()
+            except Exception as e:
+                logger.error(f"[发件箱] 投递循环异常: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def drain_once(self) -> int:
+        """领取到期消息，按渠道提交投递（不等待发送完成），返回领取条数"""
+        with self._lock:
+            busy = list(self._busy_channels)
+        items = get_db().claim_due_notifications(exclude_channels=busy)
+        if not items:
+            return 0
+
+        groups: Dict[str, List[Dict]] = {}
+        for item in items:
+            groups.setdefault(item['channel'], []).append(item)
+        with self._lock:
+            self._busy_channels.update(groups)
+        for channel, group in groups.items():
+            self._executor.submit(self._deliver_channel, channel, group)
+        return len(items)
+
+    def _deliver_channel(self, channel: str, items: List[Dict]) -> None:
+        """按顺序投递同一渠道的消息，失败后本批剩余消息放回队列，保持渠道内顺序"""
+        db = get_db()
+        try:
+            notifier = self._get_notifier()
+            for index, item in enumerate(items):
+                error = None
+                with track_chunk_progress(skip=item['chunks_sent']) as progress:
+                    try:
+                        ok = notifier.send_to_channel(NotificationChannel(channel), item['content'])
+                    except Exception as e:
+                        ok, error = False, str(e)
+
+                if ok:
+                    db.update_notification(item['id'], status='sent', attempts=item['attempts'] + 1,
+                                           sent_at=datetime.now(), last_error=None)
+                    logger.info(f"[发件箱] 消息 #{item['id']} ({channel}) 推送成功")
+                    continue
+
+                self._record_failure(item, error or "发送失败", chunks_sent=progress.sent)
+                # 放回队列的后续消息排在失败消息之后，领取时会等它重试成功或进入死信
+                rest = [other['id'] for other in items[index + 1:]]
+                if rest:
+                    db.requeue_notifications(ids=rest)
+                break
+        except Exception as e:
+            logger.error(f"[发件箱] {channel} 投递异常: {e}")
+            db.requeue_notifications(ids=[item['id'] for item in items])
+        finally:
+            with self._lock:
+                self._busy_channels.discard(channel)
+            self._wake.set()
+
+    def _record_failure(self, item: Dict, error: str, chunks_sent: int = 0) -> None:
+        attempts = item['attempts'] + 1
+        if attempts >= self.max_attempts:
+            get_db().update_notification(item['id'], status='dead', attempts=attempts, chunks_sent=chunks_sent,
+                                         last_error=error[:500])
+            logger.error(f"[发件箱] 消息 #{item['id']} ({item['channel']}) 连续失败 {attempts} 次，进入死信")
+            return
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        get_db().update_notification(
+            item['id'],
+            status='pending',
+            attempts=attempts,
+            chunks_sent=chunks_sent,
+            next_attempt_at=datetime.now() + timedelta(seconds=delay),
+            last_error=error[:500],
+        )
+        logger.warning(f"[发件箱] 消息 #{item['id']} ({item['channel']}) 第 {attempts} 次发送失败，{delay:.0f}s 后重试")
+
+    def flush(self, timeout: float) -> bool:
+        """
+        等待已到期的消息投递完成
+
+        Returns:
+            True 表示没有剩余到期消息；退避中的消息留待后续（或下次启动）发送
+        """
+        self.start()
+        deadline = time.monotonic() + max(0.0, timeout)
+        db = get_db()
+        while True:
+            with self._lock:
+                busy = bool(self._busy_channels)
+            next_time = db.get_next_notification_time()
+            if not busy and (next_time is None or next_time > datetime.now()):
+                return True
+            if time.monotonic() >= deadline:
+                counts = db.get_outbox_counts()
+                logger.warning(f"[发件箱] 等待投递超时，剩余消息下次启动继续发送: {counts}")
+                return False
+            self._wake.set()
+            time.sleep(0.2)
+
+    def replay(self, ids: Optional[List[int]] = None) -> int:
+        """将死信消息（或指定死信 ID）重新放入队列，返回条数"""
+        count = get_db().requeue_notifications(ids=ids, status='dead', reset_attempts=True)
+        if count:
+            self.start()
+            self._wake.set()
+        return count
+
+    def stop(self) -> None:
+        """停止投递线程（发送中的消息完成后退出）"""
+        self._stop.set()
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+# 全局发件箱实例
+_outbox: Optional[NotificationOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_notification_outbox() -> NotificationOutbox:
+    """获取进程级通知发件箱"""
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                from src.config import get_config
+                _outbox = NotificationOutbox(max_attempts=get_config().outbox_max_attempts)
+    return _outbox
+
+
+def reset_notification_outbox() -> None:
+    """停止并重置通知发件箱（主要用于测试）"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is not None:
+            _outbox.stop()
+        _outbox = None
+
+
+if __name__ == "__main__":
+    # 回归检查（临时数据库 + 假渠道）：幂等去重、渠道内顺序、分段消息失败后从未送达的分段续发
+    import tempfile
+
+    from src.chunking import send_chunked
+    from src.storage import DatabaseManager
+
+    logging.basicConfig(level=logging.INFO)
+    tmp_dir = tempfile.TemporaryDirectory()
+    DatabaseManager.reset_instance()
+    DatabaseManager(db_url=f"sqlite:///{tmp_dir.name}/outbox.db")
+
+    received: List[str] = []  # 企业微信渠道收到的分段
+    fail_once = {'第一条第二段内容'}
+
+    class FakeNotifier:
+        def send_to_channel(self, channel: NotificationChannel, content: str) -> bool:
+            def send(text: str) -> bool:
+                if channel != NotificationChannel.WECHAT:
+                    return True
+                if text in fail_once:
+                    fail_once.discard(text)
+                    return False
+                received.append(text)
+                return True
+            return send_chunked(content, send, max_chars=12, marker=None, interval=0)
+
+    first = '第一条第一段内容\n\n第一条第二段内容'
+    outbox = NotificationOutbox(notifier_factory=FakeNotifier, backoff_base=0.5, poll_interval=0.05)
+    assert outbox.enqueue(first, [NotificationChannel.WECHAT], scope='run-1') == 1
+    assert outbox.enqueue(first, [NotificationChannel.WECHAT], scope='run-1') == 0, "同一作用域重复入队应被忽略"
+    assert outbox.enqueue('第二条', [NotificationChannel.WECHAT], scope='run-1') == 1
+    item = {'idempotency_key': 'race', 'channel': NotificationChannel.EMAIL.value, 'content': 'x'}
+    assert get_db().enqueue_notifications([item]) == 1
+    assert get_db().enqueue_notifications([item]) == 0, "幂等键冲突应视为已入队而非报错"
+
+    deadline = time.monotonic() + 15
+    while get_db().get_outbox_counts().get('sent', 0) < 3 and time.monotonic() < deadline:
+        outbox.flush(timeout=1)
+        time.sleep(0.1)
+    outbox.stop()
+
+    # 第二段失败后：第一段不重发，第二条消息等第一条重试成功后才发出
+    assert received == ['第一条第一段内容', '第一条第二段内容', '第二条'], received
+    print("发件箱顺序 / 去重 / 分段续发验证通过")
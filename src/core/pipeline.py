@@ -12,22 +12,34 @@ A股自选股智能分析系统 - 核心分析流水线
 """
 
 import logging
+import threading
 import time
+import uuid
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple, TYPE_CHECKING
 
 from src.config import get_config, Config
+from src.core.checkpoint import RunCheckpoint, StockCheckpoint
+from src.core.notify_buffer import CoalescingBuffer
+from src.core.outbox import get_notification_outbox
 from src.storage import get_db
 from data_provider import DataFetcherManager
 from data_provider.realtime_types import ChipDistribution
-from src.analyzer import GeminiAnalyzer, AnalysisResult, STOCK_NAME_MAP
+from src.analyzer import GeminiAnalyzer, AnalysisResult, ProgressCallback, STOCK_NAME_MAP
+from src.http_client import get_http_client
+from src.smtp_client import get_smtp_client
+from src.llm_usage import get_llm_usage_tracker
 from src.notification import NotificationService, NotificationChannel
+from src.report_writer import IncrementalReportWriter
 from src.search_service import SearchService
 from src.enums import ReportType
 from src.stock_analyzer import StockTrendAnalyzer, TrendAnalysisResult
 from bot.models import BotMessage
 
+if TYPE_CHECKING:
+    from src.core.container import ServiceContainer
+
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +58,8 @@ class StockAnalysisPipeline:
         self,
         config: Optional[Config] = None,
         max_workers: Optional[int] = None,
-        source_message: Optional[BotMessage] = None
+        source_message: Optional[BotMessage] = None,
+        services: Optional['ServiceContainer'] = None
     ):
         """
         初始化调度器
@@ -54,18 +67,41 @@ class StockAnalysisPipeline:
         Args:
             config: 配置对象（可选，默认使用全局配置）
             max_workers: 最大并发线程数（可选，默认从配置读取）
+            source_message: 来源消息（机器人场景，用于回复到原会话）
+            services: 共享服务容器（可选）；传入时复用容器中的数据源、分析器与搜索服务，
+                仅通知服务按请求新建
         """
         self.config = config or get_config()
         self.max_workers = max_workers or self.config.max_workers
         self.source_message = source_message
+        # 运行检查点（run() 中创建；为 None 时不记录阶段输出）
+        self.checkpoint: Optional[RunCheckpoint] = None
+        # 发件箱幂等作用域：有检查点时用运行 ID，否则每个调度器实例（一次 WebUI / 机器人请求）独立，
+        # 调用方可改为任务 ID；同一天重复请求同一股票不会因报告内容相同被当作重复消息丢弃
+        self.push_scope = uuid.uuid4().hex
+        # 单股推送合并缓冲（按报告类型，首次推送时创建）；
+        # 只分析一只股票的请求（WebUI / 机器人 /analyze）应关闭合并，结果立即推送
+        self.coalesce_single_stock_notify = True
+        self._notify_buffers: Dict[ReportType, CoalescingBuffer] = {}
+        self._notify_buffers_lock = threading.Lock()
+        # 单股推送前的过滤（股票代码 -> 是否推送）；分片模式下跳过已由其他工作者完成的股票
+        self.single_stock_notify_filter: Optional[Callable[[str], bool]] = None
         
         # 初始化各模块
         self.db = get_db()
+        self.notifier = NotificationService(source_message=source_message)
+        if services is not None:
+            self.fetcher_manager = services.fetcher_manager
+            self.trend_analyzer = services.trend_analyzer
+            self.analyzer = services.analyzer
+            self.search_service = services.search_service
+            logger.debug(f"调度器复用共享服务容器，最大并发数: {self.max_workers}")
+            return
+        
         self.fetcher_manager = DataFetcherManager()
         # 不再单独创建 akshare_fetcher，统一使用 fetcher_manager 获取增强数据
         self.trend_analyzer = StockTrendAnalyzer()  # 趋势分析器
         self.analyzer = GeminiAnalyzer()
-        self.notifier = NotificationService(source_message=source_message)
         
         # 初始化搜索服务
         self.search_service = SearchService(
@@ -75,7 +111,8 @@ class StockAnalysisPipeline:
         )
         
         logger.info(f"调度器初始化完成，最大并发数: {self.max_workers}")
-        logger.info("已启用趋势分析器 (MA5>MA10>MA20 多头判断)")
+        if self.config.enable_trend_analysis:
+            logger.info("已启用趋势分析器 (MA5>MA10>MA20 多头判断)")
         # 打印实时行情/筹码配置状态
         if self.config.enable_realtime_quote:
             logger.info(f"实时行情已启用 (优先级: {self.config.realtime_source_priority})")
@@ -136,24 +173,74 @@ class StockAnalysisPipeline:
             logger.error(f"[{code}] {error_msg}")
             return False, error_msg
     
-    def analyze_stock(self, code: str) -> Optional[AnalysisResult]:
+    def analyze_stock(
+        self,
+        code: str,
+        progress_callback: Optional[ProgressCallback] = None,
+        checkpoint: Optional[StockCheckpoint] = None
+    ) -> Optional[AnalysisResult]:
         """
         分析单只股票（增强版：含量比、换手率、筹码分析、多维度情报）
         
+        流程：
+        1. 准备分析输入（实时行情、筹码、趋势、情报搜索、技术面上下文）
+        2. 调用 AI 进行综合分析
+        
+        Args:
+            code: 股票代码
+            progress_callback: LLM 流式进度回调（可选，转发给 WebUI/机器人任务）
+            checkpoint: 运行检查点（可选），跳过已完成阶段并保存新阶段输出
+            
+        Returns:
+            AnalysisResult 或 None（如果分析失败）
+        """
+        inputs = self.prepare_analysis_inputs(code, checkpoint=checkpoint)
+        if inputs is None:
+            return None
+        
+        enhanced_context, news_context = inputs
+        try:
+            # 调用 AI 分析（传入增强的上下文和新闻）
+            result = self.analyzer.analyze(
+                enhanced_context,
+                news_context=news_context,
+                progress_callback=progress_callback,
+                checkpoint=checkpoint
+            )
+            if checkpoint is not None and result and result.success:
+                checkpoint.save('result', result.to_dict())
+            return result
+        except Exception as e:
+            logger.error(f"[{code}] 分析失败: {e}")
+            logger.exception(f"[{code}] 详细错误信息:")
+            return None
+    
+    def prepare_analysis_inputs(
+        self,
+        code: str,
+        checkpoint: Optional[StockCheckpoint] = None
+    ) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+        """
+        准备单只股票的 AI 分析输入
+        
         流程：
         1. 获取实时行情（量比、换手率）- 通过 DataFetcherManager 自动故障切换
         2. 获取筹码分布 - 通过 DataFetcherManager 带熔断保护
         3. 进行趋势分析（基于交易理念）
         4. 多维度情报搜索（最新消息+风险排查+业绩预期）
-        5. 从数据库获取分析上下文
-        6. 调用 AI 进行综合分析
+        5. 从数据库获取分析上下文，并合并以上增强数据
         
         Args:
             code: 股票代码
+            checkpoint: 运行检查点（可选），已保存上下文 / 情报时直接复用
             
         Returns:
-            AnalysisResult 或 None（如果分析失败）
+            (增强后的上下文, 新闻情报文本) 或 None（如果准备失败）
         """
+        if checkpoint is not None and checkpoint.has('context'):
+            logger.info(f"[{code}] 复用检查点中的分析上下文与情报（断点续传）")
+            return checkpoint.get('context'), checkpoint.get('search', {}).get('news_context')
+        
         try:
             # 获取股票名称（优先从实时行情获取真实名称）
             stock_name = STOCK_NAME_MAP.get(code, '')
@@ -195,23 +282,23 @@ class StockAnalysisPipeline:
             
             # Step 3: 趋势分析（基于交易理念）
             trend_result: Optional[TrendAnalysisResult] = None
-            try:
-                # 获取历史数据进行趋势分析
-                context = self.db.get_analysis_context(code)
-                if context and 'raw_data' in context:
-                    import pandas as pd
-                    raw_data = context['raw_data']
-                    if isinstance(raw_data, list) and len(raw_data) > 0:
-                        df = pd.DataFrame(raw_data)
+            if self.config.enable_trend_analysis:
+                try:
+                    # 获取历史数据进行趋势分析
+                    df = self.db.get_history_df(code, days=60)
+                    if df is not None:
                         trend_result = self.trend_analyzer.analyze(df, code)
                         logger.info(f"[{code}] 趋势分析: {trend_result.trend_status.value}, "
                                   f"买入信号={trend_result.buy_signal.value}, 评分={trend_result.signal_score}")
-            except Exception as e:
-                logger.warning(f"[{code}] 趋势分析失败: {e}")
+                except Exception as e:
+                    logger.warning(f"[{code}] 趋势分析失败: {e}")
             
             # Step 4: 多维度情报搜索（最新消息+风险排查+业绩预期）
             news_context = None
-            if self.search_service.is_available:
+            if checkpoint is not None and checkpoint.has('search'):
+                news_context = checkpoint.get('search', {}).get('news_context')
+                logger.info(f"[{code}] 复用检查点中的情报搜索结果（断点续传）")
+            elif self.search_service.is_available:
                 logger.info(f"[{code}] 开始多维度情报搜索...")
                 
                 # 使用多维度搜索（最多5次搜索）
@@ -229,6 +316,8 @@ class StockAnalysisPipeline:
                     )
                     logger.info(f"[{code}] 情报搜索完成: 共 {total_results} 条结果")
                     logger.debug(f"[{code}] 情报搜索结果:\n{news_context}")
+                if checkpoint is not None:
+                    checkpoint.save('search', {'news_context': news_context})
             else:
                 logger.info(f"[{code}] 搜索服务不可用，跳过情报搜索")
             
@@ -255,14 +344,13 @@ class StockAnalysisPipeline:
                 trend_result,
                 stock_name  # 传入股票名称
             )
+            if checkpoint is not None:
+                checkpoint.save('context', enhanced_context)
             
-            # Step 7: 调用 AI 分析（传入增强的上下文和新闻）
-            result = self.analyzer.analyze(enhanced_context, news_context=news_context)
-            
-            return result
+            return enhanced_context, news_context
             
         except Exception as e:
-            logger.error(f"[{code}] 分析失败: {e}")
+            logger.error(f"[{code}] 分析准备失败: {e}")
             logger.exception(f"[{code}] 详细错误信息:")
             return None
     
@@ -370,7 +458,8 @@ class StockAnalysisPipeline:
         code: str,
         skip_analysis: bool = False,
         single_stock_notify: bool = False,
-        report_type: ReportType = ReportType.SIMPLE
+        report_type: ReportType = ReportType.SIMPLE,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> Optional[AnalysisResult]:
         """
         处理单只股票的完整流程
@@ -388,26 +477,29 @@ class StockAnalysisPipeline:
             skip_analysis: 是否跳过 AI 分析
             single_stock_notify: 是否启用单股推送模式（每分析完一只立即推送）
             report_type: 报告类型枚举（从配置读取，Issue #119）
+            progress_callback: LLM 流式进度回调（可选）
 
         Returns:
             AnalysisResult 或 None
         """
         logger.info(f"========== 开始处理 {code} ==========")
+        checkpoint = self.checkpoint.for_stock(code) if self.checkpoint else None
         
         try:
-            # Step 1: 获取并保存数据
-            success, error = self.fetch_and_save_stock_data(code)
+            # 断点续传：上次运行已完成的股票直接还原结果（已推送过，不再单股推送）
+            restored = self._restore_result(checkpoint)
+            if restored is not None:
+                return restored
             
-            if not success:
-                logger.warning(f"[{code}] 数据获取失败: {error}")
-                # 即使获取失败，也尝试用已有数据分析
+            # Step 1: 获取并保存数据
+            self._fetch_stage(code, checkpoint)
             
             # Step 2: AI 分析
             if skip_analysis:
                 logger.info(f"[{code}] 跳过 AI 分析（dry-run 模式）")
                 return None
             
-            result = self.analyze_stock(code)
+            result = self.analyze_stock(code, progress_callback=progress_callback, checkpoint=checkpoint)
             
             if result:
                 logger.info(
@@ -416,24 +508,8 @@ class StockAnalysisPipeline:
                 )
                 
                 # 单股推送模式（#55）：每分析完一只股票立即推送
-                if single_stock_notify and self.notifier.is_available():
-                    try:
-                        # 根据报告类型选择生成方法
-                        if report_type == ReportType.FULL:
-                            # 完整报告：使用决策仪表盘格式
-                            report_content = self.notifier.generate_dashboard_report([result])
-                            logger.info(f"[{code}] 使用完整报告格式")
-                        else:
-                            # 精简报告：使用单股报告格式（默认）
-                            report_content = self.notifier.generate_single_stock_report(result)
-                            logger.info(f"[{code}] 使用精简报告格式")
-                        
-                        if self.notifier.send(report_content):
-                            logger.info(f"[{code}] 单股推送成功")
-                        else:
-                            logger.warning(f"[{code}] 单股推送失败")
-                    except Exception as e:
-                        logger.error(f"[{code}] 单股推送异常: {e}")
+                if single_stock_notify:
+                    self._notify_single_stock(result, report_type)
             
             return result
             
@@ -442,11 +518,148 @@ class StockAnalysisPipeline:
             logger.exception(f"[{code}] 处理过程发生未知异常: {e}")
             return None
     
+    def _fetch_stage(self, code: str, checkpoint: Optional[StockCheckpoint]) -> None:
+        """获取并保存日线数据（检查点中已完成时跳过）"""
+        if checkpoint is not None and checkpoint.has('fetch'):
+            logger.info(f"[{code}] 检查点显示数据已获取，跳过（断点续传）")
+            return
+        success, error = self.fetch_and_save_stock_data(code)
+        if not success:
+            logger.warning(f"[{code}] 数据获取失败: {error}")
+            # 即使获取失败，也尝试用已有数据分析
+        elif checkpoint is not None:
+            checkpoint.save('fetch', {'date': date.today().isoformat()})
+    
+    @staticmethod
+    def _restore_result(checkpoint: Optional[StockCheckpoint]) -> Optional[AnalysisResult]:
+        """从检查点还原已完成的分析结果"""
+        if checkpoint is None or not checkpoint.has('result'):
+            return None
+        result = AnalysisResult.from_dict(checkpoint.get('result'))
+        logger.info(f"[{checkpoint.code}] 复用检查点中的分析结果（断点续传）: 评分 {result.sentiment_score}")
+        return result
+    
+    def _notify_single_stock(self, result: AnalysisResult, report_type: ReportType) -> None:
+        """
+        单股推送（#55）：结果先进入合并缓冲，窗口到期或攒满后合并为一条消息推送
+
+        SINGLE_STOCK_NOTIFY_WINDOW=0 或 coalesce_single_stock_notify=False 时不合并，每只股票立即推送
+        """
+        if not self.notifier.is_available():
+            return
+        with self._notify_buffers_lock:
+            buffer = self._notify_buffers.get(report_type)
+            if buffer is None:
+                buffer = CoalescingBuffer(
+                    lambda results, rt=report_type: self._push_single_stock_batch(results, rt),
+                    window=(getattr(self.config, 'single_stock_notify_window', 0)
+                            if self.coalesce_single_stock_notify else 0),
+                    max_items=getattr(self.config, 'single_stock_notify_batch', 1),
+                )
+                self._notify_buffers[report_type] = buffer
+        buffer.add(result)
+
+    def _push_single_stock_batch(self, results: List[AnalysisResult], report_type: ReportType) -> None:
+        """按报告类型生成并推送一批单股报告（单只时与逐只推送格式相同）"""
+        if self.single_stock_notify_filter is not None:
+            skipped = [r.code for r in results if not self.single_stock_notify_filter(r.code)]
+            if skipped:
+                logger.info(f"[{', '.join(skipped)}] 已由其他工作者完成并推送，跳过重复推送")
+                results = [r for r in results if r.code not in skipped]
+            if not results:
+                return
+        codes = ", ".join(result.code for result in results)
+        try:
+            # 根据报告类型选择生成方法
+            if report_type == ReportType.FULL:
+                # 完整报告：使用决策仪表盘格式
+                report_content = self.notifier.generate_dashboard_report(results)
+            else:
+                # 精简报告：使用单股报告格式（默认）
+                report_content = self.notifier.generate_single_stock_digest(results)
+            logger.info(f"[{codes}] 使用{'完整' if report_type == ReportType.FULL else '精简'}报告格式")
+            
+            self._push(report_content, label=f"[{codes}] 单股推送（{len(results)} 只合并为 1 条）")
+        except Exception as e:
+            logger.error(f"[{codes}] 单股推送异常: {e}")
+
+    def flush_single_stock_notifications(self) -> None:
+        """立即推送合并缓冲中尚未发出的单股报告（运行结束时调用）"""
+        with self._notify_buffers_lock:
+            buffers = list(self._notify_buffers.values())
+        for buffer in buffers:
+            buffer.flush()
+    
+    def _run_batched(
+        self,
+        stock_codes: List[str],
+        single_stock_notify: bool,
+        report_type: ReportType,
+        report_writer: Optional[IncrementalReportWriter] = None
+    ) -> List[AnalysisResult]:
+        """
+        多股合并分析模式（LLM_BATCH_SIZE > 1）
+        
+        1. 线程池并发获取数据并准备各股分析输入
+        2. 按批次合并调用 LLM（系统提示词每批只发送一次）
+        3. 每批返回即保存 result 检查点、追加增量报告并单股推送（可选）
+
+        断点续传：合并请求的提示词 / 原始响应按批次而非按股票产生，不记录 prompt、llm_response 阶段，
+        中断后未完成批次的股票从 LLM 调用重新开始（fetch / search / context 阶段照常复用）
+        """
+        checkpoints = {
+            code: self.checkpoint.for_stock(code) if self.checkpoint else None
+            for code in stock_codes
+        }
+        restored: List[AnalysisResult] = []
+        pending: List[str] = []
+        for code in stock_codes:
+            result = self._restore_result(checkpoints[code])
+            if result is not None:
+                restored.append(result)
+                if report_writer is not None:
+                    report_writer.add(result)
+            else:
+                pending.append(code)
+        
+        def prepare(code: str) -> Optional[Tuple[Dict[str, Any], Optional[str]]]:
+            logger.info(f"========== 开始处理 {code} ==========")
+            try:
+                self._fetch_stage(code, checkpoints[code])
+                return self.prepare_analysis_inputs(code, checkpoint=checkpoints[code])
+            except Exception as e:
+                logger.exception(f"[{code}] 处理过程发生未知异常: {e}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            prepared = list(executor.map(prepare, pending))
+        
+        items = [inputs for inputs in prepared if inputs is not None]
+        logger.info(f"数据准备完成 {len(items)}/{len(pending)} 只，开始合并分析（每批 {self.config.llm_batch_size} 只）")
+        
+        def on_result(index: int, result: AnalysisResult) -> None:
+            logger.info(
+                f"[{result.code}] 分析完成: {result.operation_advice}, "
+                f"评分 {result.sentiment_score}"
+            )
+            checkpoint = checkpoints.get(result.code)
+            if checkpoint is not None and result.success:
+                checkpoint.save('result', result.to_dict())
+            if report_writer is not None:
+                report_writer.add(result)
+            if single_stock_notify:
+                self._notify_single_stock(result, report_type)
+        
+        results = [result for result in self.analyzer.analyze_batch(items, on_result=on_result) if result]
+        return restored + results
+    
     def run(
         self, 
         stock_codes: Optional[List[str]] = None,
         dry_run: bool = False,
-        send_notification: bool = True
+        send_notification: bool = True,
+        num_shards: Optional[int] = None,
+        resume: Optional[str] = None
     ) -> List[AnalysisResult]:
         """
         运行完整的分析流程
@@ -461,11 +674,14 @@ class StockAnalysisPipeline:
             stock_codes: 股票代码列表（可选，默认使用配置中的自选股）
             dry_run: 是否仅获取数据不分析
             send_notification: 是否发送推送通知
+            num_shards: 分片进程数（可选，默认从配置读取），>1 时分多进程执行
+            resume: 恢复的运行 ID（'latest' 表示最近一次），跳过检查点中已完成的阶段
             
         Returns:
             分析结果列表
         """
         start_time = time.time()
+        usage_before = get_llm_usage_tracker().snapshot()
         
         # 使用配置中的股票列表
         if stock_codes is None:
@@ -480,9 +696,24 @@ class StockAnalysisPipeline:
         logger.info(f"股票列表: {', '.join(stock_codes)}")
         logger.info(f"并发数: {self.max_workers}, 模式: {'仅获取数据' if dry_run else '完整分析'}")
         
+        # 运行检查点：记录各阶段输出，中断后可 --resume 继续（dry-run 不记录）
+        self.checkpoint = None
+        if not dry_run and (self.config.checkpoint_enabled or resume):
+            self.checkpoint = RunCheckpoint.start(resume=resume)
+            try:
+                pruned = self.db.prune_pipeline_checkpoints(self.config.checkpoint_retention_days)
+                if pruned:
+                    logger.info(f"[检查点] 已清理 {pruned} 条过期检查点")
+            except Exception as e:
+                logger.warning(f"[检查点] 清理过期检查点失败: {e}")
+        
+        num_shards = num_shards or self.config.shard_count
+        sharded = num_shards > 1 and len(stock_codes) > 1
+        
         # === 批量预取实时行情（优化：避免每只股票都触发全量拉取）===
         # 只有股票数量 >= 5 时才进行预取，少量股票直接逐个查询更高效
-        if len(stock_codes) >= 5:
+        # 分片模式下各工作进程在每次认领后预取（见 sharding._pipeline_process_fn）
+        if len(stock_codes) >= 5 and not sharded:
             prefetch_count = self.fetcher_manager.prefetch_realtime_quotes(stock_codes)
             if prefetch_count > 0:
                 logger.info(f"已启用批量预取架构：一次拉取全市场数据，{len(stock_codes)} 只股票共享缓存")
@@ -496,40 +727,85 @@ class StockAnalysisPipeline:
         analysis_delay = getattr(self.config, 'analysis_delay', 0)
 
         if single_stock_notify:
-            logger.info(f"已启用单股推送模式：每分析完一只股票立即推送（报告类型: {report_type_str}）")
+            window = getattr(self.config, 'single_stock_notify_window', 0)
+            if window > 0:
+                logger.info(
+                    f"已启用单股推送模式：{window:.0f} 秒内完成的股票合并推送（最多 "
+                    f"{getattr(self.config, 'single_stock_notify_batch', 1)} 只/条，报告类型: {report_type_str}）"
+                )
+            else:
+                logger.info(f"已启用单股推送模式：每分析完一只股票立即推送（报告类型: {report_type_str}）")
         
         results: List[AnalysisResult] = []
-        
-        # 使用线程池并发处理
-        # 注意：max_workers 设置较低（默认3）以避免触发反爬
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 提交任务
-            future_to_code = {
-                executor.submit(
-                    self.process_single_stock,
-                    code,
-                    skip_analysis=dry_run,
-                    single_stock_notify=single_stock_notify and send_notification,
-                    report_type=report_type  # Issue #119: 传递报告类型
-                ): code
-                for code in stock_codes
-            }
+        # 增量报告：每完成一只即追加写盘，中途退出时已完成的股票仍有报告
+        report_writer = self._open_report_writer() if send_notification and not dry_run else None
+        
+        if sharded:
+            # 多进程分片：各分片占用 1/N 速率预算，结果合并为一份报告
+            from src.core.sharding import run_sharded
+            merged = run_sharded(
+                stock_codes,
+                num_shards=min(num_shards, len(stock_codes)),
+                queue_path=self.config.shard_queue_path,
+                options={
+                    'dry_run': dry_run,
+                    'single_stock_notify': single_stock_notify and send_notification,
+                    'report_type': report_type.value,
+                    'checkpoint_run_id': self.checkpoint.run_id if self.checkpoint else None,
+                },
+                # 协调进程每次轮询收到新完成的股票即追加增量报告
+                on_result=(lambda data: report_writer.add(AnalysisResult.from_dict(data)))
+                if report_writer is not None else None,
+            )
+            results = [AnalysisResult.from_dict(data) for data in merged]
+        elif self.config.llm_batch_size > 1 and not dry_run:
+            # 多股合并分析：减少重复发送系统提示词的 token 开销
+            results = self._run_batched(
+                stock_codes,
+                single_stock_notify=single_stock_notify and send_notification,
+                report_type=report_type,
+                report_writer=report_writer
+            )
+        else:
+            # 使用线程池并发处理
+            # 注意：max_workers 设置较低（默认3）以避免触发反爬
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # 提交任务
+                future_to_code = {
+                    executor.submit(
+                        self.process_single_stock,
+                        code,
+                        skip_analysis=dry_run,
+                        single_stock_notify=single_stock_notify and send_notification,
+                        report_type=report_type  # Issue #119: 传递报告类型
+                    ): code
+                    for code in stock_codes
+                }
             
-            # 收集结果
-            for idx, future in enumerate(as_completed(future_to_code)):
-                code = future_to_code[future]
-                try:
-                    result = future.result()
-                    if result:
-                        results.append(result)
+                # 收集结果
+                for idx, future in enumerate(as_completed(future_to_code)):
+                    code = future_to_code[future]
+                    try:
+                        result = future.result()
+                        if result:
+                            results.append(result)
+                            if report_writer is not None:
+                                report_writer.add(result)
 
-                    # Issue #128: 分析间隔 - 在个股分析和大盘分析之间添加延迟
-                    if idx < len(stock_codes) - 1 and analysis_delay > 0:
-                        logger.debug(f"等待 {analysis_delay} 秒后继续下一只股票...")
-                        time.sleep(analysis_delay)
+                        # Issue #128: 分析间隔 - 在个股分析和大盘分析之间添加延迟
+                        if idx < len(stock_codes) - 1 and analysis_delay > 0:
+                            logger.debug(f"等待 {analysis_delay} 秒后继续下一只股票...")
+                            time.sleep(analysis_delay)
 
-                except Exception as e:
-                    logger.error(f"[{code}] 任务执行失败: {e}")
+                    except Exception as e:
+                        logger.error(f"[{code}] 任务执行失败: {e}")
+        
+        # 单股推送模式：发出合并缓冲中剩余的结果
+        self.flush_single_stock_notifications()
+        if report_writer is not None:
+            # 兜底补写（已写入的股票会跳过）
+            for result in results:
+                report_writer.add(result)
         
         # 统计
         elapsed_time = time.time() - start_time
@@ -545,19 +821,113 @@ class StockAnalysisPipeline:
         
         logger.info("===== 分析完成 =====")
         logger.info(f"成功: {success_count}, 失败: {fail_count}, 耗时: {elapsed_time:.2f} 秒")
+        get_llm_usage_tracker().log_summary(since=usage_before)
+        
+        # 批量持久化分析结果（供 WebUI / 机器人查询最新结果与评分历史）
+        if results and not dry_run:
+            self.save_results(results)
         
         # 发送通知（单股推送模式下跳过汇总推送，避免重复）
         if results and send_notification and not dry_run:
             if single_stock_notify:
                 # 单股推送模式：只保存汇总报告，不再重复推送
                 logger.info("单股推送模式：跳过汇总推送，仅保存报告到本地")
-                self._send_notifications(results, skip_push=True)
+                self._send_notifications(results, skip_push=True, report_writer=report_writer)
             else:
-                self._send_notifications(results)
+                self._send_notifications(results, report_writer=report_writer)
+            get_http_client().log_summary()
+            get_smtp_client().log_summary()
+        elif report_writer is not None:
+            report_writer.discard()
         
         return results
+
+    def _open_report_writer(self) -> Optional[IncrementalReportWriter]:
+        """创建增量报告写入器，失败时回退为运行结束后一次性保存"""
+        try:
+            return IncrementalReportWriter.open(run_id=self.checkpoint.run_id if self.checkpoint else None)
+        except OSError as e:
+            logger.warning(f"增量报告文件创建失败，运行结束后一次性保存: {e}")
+            return None
+    
+    def save_results(self, results: List[AnalysisResult]) -> int:
+        """
+        批量保存成功的分析结果到 analysis_result 表，写库失败不影响后续推送
+        
+        Returns:
+            保存条数
+        """
+        items = [result.to_dict() for result in results if result.success]
+        if not items:
+            return 0
+        try:
+            return self.db.save_analysis_results(
+                items,
+                run_id=self.checkpoint.run_id if self.checkpoint else None
+            )
+        except Exception as e:
+            logger.error(f"保存分析结果失败: {e}")
+            return 0
+    
+    def _push(
+        self,
+        content: str,
+        overrides: Optional[Dict[NotificationChannel, str]] = None,
+        label: str = "推送",
+    ) -> bool:
+        """
+        推送消息
+        
+        启用发件箱时写入 notification_outbox 后立即返回，由后台线程投递（失败重试、死信），
+        送达结果由投递线程记录；否则各渠道并发直接发送。
+        会话回复渠道（钉钉 / 飞书 Stream）的会话有时效，始终直接发送。
+        
+        Args:
+            label: 日志中的消息描述
+        
+        Returns:
+            直接发送时为是否有渠道发送成功；发件箱模式下为是否已入队
+        """
+        if not getattr(self.config, 'outbox_enabled', False):
+            return self._deliver_now(content, overrides, label)
+        
+        context_success = self.notifier.send_to_context(content)
+        channels = self.notifier.get_available_channels()
+        if not channels:
+            return context_success
+        scope = self.checkpoint.run_id if self.checkpoint else self.push_scope
+        try:
+            count = get_notification_outbox().enqueue(content, channels, overrides=overrides, scope=scope)
+            logger.info(f"{label}已入队: {count} 条（{self.notifier.get_channel_names()}），后台投递")
+            return True
+        except Exception as e:
+            logger.error(f"写入发件箱失败，改为直接发送: {e}")
+            return self._deliver_now(content, overrides, label)
+    
+    def _deliver_now(
+        self,
+        content: str,
+        overrides: Optional[Dict[NotificationChannel, str]],
+        label: str,
+    ) -> bool:
+        """各渠道并发直接发送并记录结果（超时渠道仍在后台发送，结果未知，不算失败）"""
+        delivery = self.notifier.deliver(content, overrides=overrides)
+        in_flight = [name for name, r in delivery.items() if r.in_flight]
+        if any(r.success for r in delivery.values()):
+            logger.info(f"{label}成功" + (f"（{', '.join(in_flight)} 仍在发送）" if in_flight else ""))
+            return True
+        if in_flight:
+            logger.warning(f"{label}结果未知：{', '.join(in_flight)} 超时仍在发送，不重发")
+            return True
+        logger.warning(f"{label}失败")
+        return False
     
-    def _send_notifications(self, results: List[AnalysisResult], skip_push: bool = False) -> None:
+    def _send_notifications(
+        self,
+        results: List[AnalysisResult],
+        skip_push: bool = False,
+        report_writer: Optional[IncrementalReportWriter] = None,
+    ) -> None:
         """
         发送分析结果通知
         
@@ -566,61 +936,38 @@ class StockAnalysisPipeline:
         Args:
             results: 分析结果列表
             skip_push: 是否跳过推送（仅保存到本地，用于单股推送模式）
+            report_writer: 增量报告写入器（有则由其逐段写出正式报告）
         """
         try:
             logger.info("生成决策仪表盘日报...")
             
-            # 生成决策仪表盘格式的详细日报
-            report = self.notifier.generate_dashboard_report(results)
-            
-            # 保存到本地
-            filepath = self.notifier.save_report_to_file(report)
+            # 保存到本地：增量写入器按段写出并原子替换，无需先拼接完整报告
+            if report_writer is not None:
+                filepath = report_writer.finalize(results)
+            else:
+                filepath = self.notifier.save_report_to_file(self.notifier.generate_dashboard_report(results))
             logger.info(f"决策仪表盘日报已保存: {filepath}")
             
             # 跳过推送（单股推送模式）
             if skip_push:
                 return
             
+            # 生成决策仪表盘格式的详细日报（各股段落已渲染缓存）
+            report = self.notifier.generate_dashboard_report(results)
+            
             # 推送通知
             if self.notifier.is_available():
                 channels = self.notifier.get_available_channels()
-                context_success = self.notifier.send_to_context(report)
 
-                # 企业微信：只发精简版（平台限制）
-                wechat_success = False
+                # 企业微信：只发精简版（平台限制）；其他渠道发完整报告（避免自定义 Webhook 被 wechat 截断逻辑污染）
+                overrides = {}
                 if NotificationChannel.WECHAT in channels:
                     dashboard_content = self.notifier.generate_wechat_dashboard(results)
                     logger.info(f"企业微信仪表盘长度: {len(dashboard_content)} 字符")
                     logger.debug(f"企业微信推送内容:\n{dashboard_content}")
-                    wechat_success = self.notifier.send_to_wechat(dashboard_content)
+                    overrides[NotificationChannel.WECHAT] = dashboard_content
 
-                # 其他渠道：发完整报告（避免自定义 Webhook 被 wechat 截断逻辑污染）
-                non_wechat_success = False
-                for channel in channels:
-                    if channel == NotificationChannel.WECHAT:
-                        continue
-                    if channel == NotificationChannel.FEISHU:
-                        non_wechat_success = self.notifier.send_to_feishu(report) or non_wechat_success
-                    elif channel == NotificationChannel.TELEGRAM:
-                        non_wechat_success = self.notifier.send_to_telegram(report) or non_wechat_success
-                    elif channel == NotificationChannel.EMAIL:
-                        non_wechat_success = self.notifier.send_to_email(report) or non_wechat_success
-                    elif channel == NotificationChannel.CUSTOM:
-                        non_wechat_success = self.notifier.send_to_custom(report) or non_wechat_success
-                    elif channel == NotificationChannel.PUSHPLUS:
-                        non_wechat_success = self.notifier.send_to_pushplus(report) or non_wechat_success
-                    elif channel == NotificationChannel.DISCORD:
-                        non_wechat_success = self.notifier.send_to_discord(report) or non_wechat_success
-                    elif channel == NotificationChannel.PUSHOVER:
-                        non_wechat_success = self.notifier.send_to_pushover(report) or non_wechat_success
-                    else:
-                        logger.warning(f"未知通知渠道: {channel}")
-
-                success = wechat_success or non_wechat_success or context_success
-                if success:
-                    logger.info("决策仪表盘推送成功")
-                else:
-                    logger.warning("决策仪表盘推送失败")
+                self._push(report, overrides=overrides, label="决策仪表盘推送")
             else:
                 logger.info("通知渠道未配置，跳过推送")
                 
@@ -0,0 +1,580 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 多进程分片执行
+===================================
+
+职责：
+1. 将股票列表写入共享 SQLite 工作队列，由 N 个工作进程（可分布在多台机器）认领处理，
+   绕开单进程内 pandas 指标计算、JSON 解析的 GIL 瓶颈
+2. 工作者在队列中登记并定期心跳；每个工作者只使用 LLM 速率预算（RPM / TPM / 并发）的 1/N，
+   N = max(分片数, 当前活跃工作者数)，其他机器加入后所有工作者在下次认领时收缩预算，
+   总体请求速率与单进程运行一致；数据源并发按本机分片数切分
+3. 各分片把 AnalysisResult.to_dict() 写回队列，协调进程按原始顺序合并为一份仪表盘报告
+
+使用方式：
+    本机 4 进程:       python main.py --shards 4
+    其他机器加入运行:  python main.py --shard-worker <run_id> --shard-queue /共享路径/shard_queue.db
+
+容错：
+    认领超过 stale_after 秒未完成的任务（进程崩溃、机器掉线）会被重新排队，
+    同一股票最多尝试 MAX_ATTEMPTS 次
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+# 同一股票最多认领次数（含崩溃后的重新排队）
+MAX_ATTEMPTS = 2
+
+# 处理函数：(股票代码列表, 运行参数) -> {股票代码: AnalysisResult.to_dict() 或 None}
+ProcessFn = Callable[[List[str], Dict[str, Any]], Dict[str, Optional[Dict[str, Any]]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shard_run (
+    run_id TEXT PRIMARY KEY,
+    num_shards INTEGER NOT NULL,
+    options TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shard_work (
+    run_id TEXT NOT NULL,
+    code TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT,
+    PRIMARY KEY (run_id, code)
+);
+CREATE INDEX IF NOT EXISTS ix_shard_work_status ON shard_work (run_id, status, position);
+CREATE TABLE IF NOT EXISTS shard_worker (
+    run_id TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (run_id, worker)
+);
+"""
+
+
+class ShardWorkQueue:
+    """
+    基于 SQLite 文件的分片工作队列
+
+    认领使用 BEGIN IMMEDIATE 事务，多进程 / 多机（共享文件系统）并发认领时不会重复分配
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def create_run(self, stock_codes: List[str], num_shards: int, options: Optional[Dict[str, Any]] = None) -> str:
+        """登记一次分片运行，返回 run_id"""
+        run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        codes = list(dict.fromkeys(stock_codes))  # 去重并保持顺序
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO shard_run (run_id, num_shards, options, created_at) VALUES (?, ?, ?, ?)",
+                (run_id, num_shards, json.dumps(options or {}), time.time())
+            )
+            conn.executemany(
+                "INSERT INTO shard_work (run_id, code, position) VALUES (?, ?, ?)",
+                [(run_id, code, i) for i, code in enumerate(codes)]
+            )
+        return run_id
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """获取运行信息（num_shards、options）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM shard_run WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'run_id': row['run_id'],
+            'num_shards': row['num_shards'],
+            'options': json.loads(row['options'] or '{}'),
+            'created_at': row['created_at'],
+        }
+
+    def requeue_stale(self, run_id: str, stale_after: float) -> int:
+        """将超时未完成的认领重新排队（超过最大尝试次数的标记为失败），返回处理条数"""
+        deadline = time.time() - stale_after
+        with self._transaction() as conn:
+            return self._requeue_stale(conn, run_id, deadline)
+
+    @staticmethod
+    def _requeue_stale(conn: sqlite3.Connection, run_id: str, deadline: float) -> int:
+        failed = conn.execute(
+            "UPDATE shard_work SET status = 'failed', error = '认领超时', finished_at = ? "
+            "WHERE run_id = ? AND status = 'claimed' AND claimed_at < ? AND attempts >= ?",
+            (time.time(), run_id, deadline, MAX_ATTEMPTS)
+        ).rowcount
+        requeued = conn.execute(
+            "UPDATE shard_work SET status = 'pending', worker = NULL "
+            "WHERE run_id = ? AND status = 'claimed' AND claimed_at < ?",
+            (run_id, deadline)
+        ).rowcount
+        if failed or requeued:
+            logger.warning(f"[分片] 运行 {run_id}: {requeued} 只股票认领超时已重新排队, {failed} 只超过重试次数")
+        return failed + requeued
+
+    def claim(self, run_id: str, worker: str, limit: int = 1, stale_after: float = 1800) -> List[str]:
+        """认领最多 limit 只待处理股票（按原始顺序）"""
+        with self._transaction() as conn:
+            self._requeue_stale(conn, run_id, time.time() - stale_after)
+            codes = [row['code'] for row in conn.execute(
+                "SELECT code FROM shard_work WHERE run_id = ? AND status = 'pending' "
+                "ORDER BY position LIMIT ?",
+                (run_id, max(1, limit))
+            )]
+            if codes:
+                conn.executemany(
+                    "UPDATE shard_work SET status = 'claimed', worker = ?, claimed_at = ?, attempts = attempts + 1 "
+                    "WHERE run_id = ? AND code = ?",
+                    [(worker, time.time(), run_id, code) for code in codes]
+                )
+        return codes
+
+    def heartbeat(self, run_id: str, worker: str, stale_after: float = 1800) -> int:
+        """登记 / 刷新工作者，返回当前活跃工作者数（stale_after 秒内有心跳，含自身）"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO shard_worker (run_id, worker, seen_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (run_id, worker) DO UPDATE SET seen_at = excluded.seen_at",
+                (run_id, worker, now)
+            )
+            return conn.execute(
+                "SELECT COUNT(*) FROM shard_worker WHERE run_id = ? AND seen_at >= ?",
+                (run_id, now - stale_after)
+            ).fetchone()[0]
+
+    def leave(self, run_id: str, worker: str) -> None:
+        """工作者退出时注销，其余工作者下次认领时可扩大预算"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM shard_worker WHERE run_id = ? AND worker = ?", (run_id, worker))
+
+    def is_done(self, run_id: str, code: str) -> bool:
+        """股票是否已由某个工作者完成（认领超时后被重复处理时用于跳过重复推送）"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status FROM shard_work WHERE run_id = ? AND code = ?", (run_id, code)
+            ).fetchone()
+        return row is not None and row['status'] == 'done'
+
+    def complete(self, run_id: str, code: str, result: Optional[Dict[str, Any]]) -> None:
+        """标记完成并写入结果（dry-run 等无结果场景 result 为 None）"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE shard_work SET status = 'done', result = ?, error = NULL, finished_at = ? "
+                "WHERE run_id = ? AND code = ?",
+                (json.dumps(result, ensure_ascii=False) if result is not None else None, time.time(), run_id, code)
+            )
+
+    def fail(self, run_id: str, code: str, error: str) -> None:
+        """标记失败"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE shard_work SET status = 'failed', error = ?, finished_at = ? WHERE run_id = ? AND code = ?",
+                (error[:500], time.time(), run_id, code)
+            )
+
+    def progress(self, run_id: str) -> Dict[str, int]:
+        """各状态的股票数 {pending, claimed, done, failed}"""
+        counts = dict.fromkeys(('pending', 'claimed', 'done', 'failed'), 0)
+        with self._connect() as conn:
+            for row in conn.execute(
+                "SELECT status, COUNT(*) AS n FROM shard_work WHERE run_id = ? GROUP BY status", (run_id,)
+            ):
+                counts[row['status']] = row['n']
+        return counts
+
+    def collect_finished_since(self, run_id: str, since: float) -> List[Dict[str, Any]]:
+        """返回 finished_at >= since 的已完成股票 [{code, finished_at, result}]（增量收集用）"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT code, finished_at, result FROM shard_work "
+                "WHERE run_id = ? AND status = 'done' AND result IS NOT NULL AND finished_at >= ? "
+                "ORDER BY finished_at",
+                (run_id, since)
+            ).fetchall()
+        return [
+            {'code': row['code'], 'finished_at': row['finished_at'], 'result': json.loads(row['result'])}
+            for row in rows
+        ]
+
+    def collect(self, run_id: str) -> List[Dict[str, Any]]:
+        """按原始顺序返回已完成股票的结果字典"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT result FROM shard_work WHERE run_id = ? AND status = 'done' AND result IS NOT NULL "
+                "ORDER BY position",
+                (run_id,)
+            ).fetchall()
+        return [json.loads(row['result']) for row in rows]
+
+
+def budget_snapshot(config: 'Config') -> Dict[str, int]:
+    """
+    切分前的单进程 LLM 速率预算
+
+    RPM 未显式配置时按 GEMINI_REQUEST_DELAY 折算，与 get_llm_dispatcher 的推导一致
+    """
+    rpm = config.llm_rpm_limit
+    if rpm <= 0 and config.gemini_request_delay > 0:
+        rpm = max(1, int(60 / config.gemini_request_delay))
+    return {'rpm': rpm, 'tpm': config.llm_tpm_limit, 'concurrency': config.llm_max_concurrency}
+
+
+def apply_budget_slice(config: 'Config', workers: int, base: Dict[str, int]) -> None:
+    """
+    将 LLM 速率预算切分为 1/workers（在工作进程内调用，可在运行中随工作者数量变化重复调用）
+
+    已创建的调度器就地调整预算，保留滑动窗口中的已用额度
+
+    Args:
+        workers: 切分份数（分片数与活跃工作者数的较大值）
+        base: budget_snapshot() 取得的切分前预算
+    """
+    workers = max(1, workers)
+    config.llm_rpm_limit = max(1, base['rpm'] // workers) if base['rpm'] > 0 else 0
+    config.llm_tpm_limit = max(1, base['tpm'] // workers) if base['tpm'] > 0 else 0
+    config.llm_max_concurrency = max(1, base['concurrency'] // workers)
+
+    from src.llm_dispatcher import update_llm_dispatcher_limits
+    update_llm_dispatcher_limits(config.llm_rpm_limit, config.llm_tpm_limit, config.llm_max_concurrency)
+    logger.info(
+        f"[分片] 速率预算 1/{workers}: RPM={config.llm_rpm_limit or '不限'}, "
+        f"TPM={config.llm_tpm_limit or '不限'}, LLM并发={config.llm_max_concurrency}"
+    )
+
+
+def _pipeline_process_fn(options: Dict[str, Any], queue: 'ShardWorkQueue', run_id: str) -> ProcessFn:
+    """默认处理函数：在本进程创建流水线并分析认领的股票"""
+    from src.config import get_config
+    from src.core.checkpoint import RunCheckpoint
+    from src.core.pipeline import StockAnalysisPipeline
+    from src.enums import ReportType
+
+    pipeline = StockAnalysisPipeline(config=get_config())
+    if options.get('checkpoint_run_id'):
+        # 与协调进程共用同一运行的检查点
+        pipeline.checkpoint = RunCheckpoint.start(resume=options['checkpoint_run_id'])
+    # 认领超时后被其他工作者重新处理的股票：对方已完成时不再重复推送
+    pipeline.single_stock_notify_filter = lambda code: not queue.is_done(run_id, code)
+
+    def process(codes: List[str], options: Dict[str, Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+        dry_run = options.get('dry_run', False)
+        single_stock_notify = options.get('single_stock_notify', False)
+        report_type = ReportType.from_str(options.get('report_type', 'simple'))
+
+        # 批量预取实时行情：全量数据源一次拉取全市场并填充本进程缓存，后续认领的批次直接命中
+        pipeline.fetcher_manager.prefetch_realtime_quotes(codes)
+
+        if pipeline.config.llm_batch_size > 1 and not dry_run:
+            results = pipeline._run_batched(codes, single_stock_notify=single_stock_notify, report_type=report_type)
+            pipeline.flush_single_stock_notifications()
+            by_code = {result.code: result.to_dict() for result in results}
+            return {code: by_code.get(code) for code in codes}
+
+        with ThreadPoolExecutor(max_workers=pipeline.max_workers) as executor:
+            results = list(executor.map(
+                lambda code: pipeline.process_single_stock(
+                    code,
+                    skip_analysis=dry_run,
+                    single_stock_notify=single_stock_notify,
+                    report_type=report_type
+                ),
+                codes
+            ))
+        pipeline.flush_single_stock_notifications()
+        return {code: result.to_dict() if result else None for code, result in zip(codes, results)}
+
+    return process
+
+
+def run_shard_worker(
+    queue_path: str,
+    run_id: str,
+    worker: Optional[str] = None,
+    process_fn: Optional[ProcessFn] = None,
+    stale_after: float = 1800,
+) -> int:
+    """
+    分片工作循环：持续认领并处理股票，直到队列中没有待处理项
+
+    Args:
+        queue_path: 工作队列文件路径
+        run_id: 运行 ID
+        worker: 工作者标识（默认 主机名-进程号）
+        process_fn: 处理函数（默认使用分析流水线，测试时可替换）
+        stale_after: 认领超时秒数
+
+    Returns:
+        本工作者处理的股票数
+    """
+    queue = ShardWorkQueue(queue_path)
+    run = queue.get_run(run_id)
+    if run is None:
+        logger.error(f"[分片] 运行 {run_id} 不存在于 {queue_path}")
+        return 0
+    options = run['options']
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+
+    config = None
+    base_budget: Dict[str, int] = {}
+    slices = 0
+    if process_fn is None:
+        from src.config import get_config
+        config = get_config()
+        base_budget = budget_snapshot(config)
+        # 数据源并发按本机分片数切分（本机 CPU / 连接数）
+        if run['num_shards'] > 1:
+            config.max_workers = max(1, config.max_workers // run['num_shards'])
+        process_fn = _pipeline_process_fn(options, queue, run_id)
+        claim_size = max(config.max_workers, config.llm_batch_size)
+    else:
+        claim_size = options.get('claim_size', 1)
+    dry_run = options.get('dry_run', False)
+
+    processed = 0
+    try:
+        while True:
+            # 每次认领前心跳：其他机器加入 / 退出后按活跃工作者数重新切分 LLM 预算
+            active = queue.heartbeat(run_id, worker, stale_after)
+            if config is not None and max(run['num_shards'], active) != slices:
+                slices = max(run['num_shards'], active)
+                apply_budget_slice(config, slices, base_budget)
+
+            codes = queue.claim(run_id, worker, limit=claim_size, stale_after=stale_after)
+            if not codes:
+                break
+            logger.info(f"[分片] {worker} 认领 {len(codes)} 只: {', '.join(codes)}")
+            try:
+                results = process_fn(codes, options)
+            except Exception as e:
+                logger.exception(f"[分片] {worker} 处理失败: {e}")
+                results = {}
+            for code in codes:
+                result = results.get(code)
+                if result is not None or (dry_run and code in results):
+                    queue.complete(run_id, code, result)
+                else:
+                    queue.fail(run_id, code, "分析失败")
+            processed += len(codes)
+    finally:
+        queue.leave(run_id, worker)
+
+    logger.info(f"[分片] {worker} 队列已空，共处理 {processed} 只")
+
+    # 退出前等待本进程入队的单股推送发送完成，避免已领取的消息停留在 sending 状态
+    if config is not None and config.outbox_enabled:
+        from src.core.outbox import get_notification_outbox
+        get_notification_outbox().flush(timeout=config.outbox_flush_timeout)
+    return processed
+
+
+def _shard_process_main(queue_path: str, run_id: str, worker: str, process_fn: Optional[ProcessFn] = None) -> None:
+    """子进程入口（spawn 方式启动，需为模块级函数）"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s | {worker} | %(levelname)-8s | %(name)-20s | %(message)s",
+    )
+    run_shard_worker(queue_path, run_id, worker=worker, process_fn=process_fn)
+
+
+def run_sharded(
+    stock_codes: List[str],
+    num_shards: int,
+    queue_path: str,
+    options: Optional[Dict[str, Any]] = None,
+    process_fn: Optional[ProcessFn] = None,
+    stale_after: float = 1800,
+    poll_interval: float = 5.0,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    协调一次分片运行：登记工作队列、启动本机工作进程、等待全部完成并收集结果
+
+    其他机器可通过 run_shard_worker（main.py --shard-worker）加入同一 run_id；
+    协调进程会等待远程认领的股票完成或超时。
+
+    Args:
+        stock_codes: 股票代码列表
+        num_shards: 分片（本机进程）数
+        queue_path: 工作队列文件路径
+        options: 运行参数（dry_run、single_stock_notify、report_type），随队列共享给所有工作者
+        process_fn: 处理函数（需可被 pickle，默认使用分析流水线）
+        on_result: 新完成股票的结果回调（在协调进程中按轮询间隔调用，每只股票一次）
+
+    Returns:
+        按原始顺序排列的 AnalysisResult.to_dict() 列表
+    """
+    queue = ShardWorkQueue(queue_path)
+    run_id = queue.create_run(stock_codes, num_shards, options)
+    logger.info(f"[分片] 运行 {run_id}: {len(stock_codes)} 只股票, {num_shards} 个分片, 队列 {queue_path}")
+    logger.info(f"[分片] 其他机器可加入: python main.py --shard-worker {run_id} --shard-queue {queue_path}")
+
+    ctx = multiprocessing.get_context('spawn')
+    host = socket.gethostname()
+    processes = []
+    spawned = 0
+
+    def spawn() -> None:
+        nonlocal spawned
+        worker = f"{host}-shard{spawned}"
+        process = ctx.Process(
+            target=_shard_process_main,
+            args=(queue_path, run_id, worker, process_fn),
+            name=worker,
+        )
+        process.start()
+        processes.append(process)
+        spawned += 1
+
+    for _ in range(num_shards):
+        spawn()
+
+    delivered: set = set()
+    since = 0.0
+
+    def deliver_finished() -> None:
+        """把上次轮询后新完成的结果交给 on_result（同一时间戳的行可能重复返回，按代码去重）"""
+        nonlocal since
+        if on_result is None:
+            return
+        for row in queue.collect_finished_since(run_id, since):
+            since = max(since, row['finished_at'])
+            if row['code'] in delivered:
+                continue
+            delivered.add(row['code'])
+            try:
+                on_result(row['result'])
+            except Exception as e:
+                logger.warning(f"[分片] {row['code']} 结果回调失败: {e}")
+
+    while True:
+        for process in processes:
+            process.join(timeout=poll_interval / max(1, len(processes)))
+        processes = [p for p in processes if p.is_alive()]
+        deliver_finished()
+        if processes:
+            continue
+
+        queue.requeue_stale(run_id, stale_after)
+        counts = queue.progress(run_id)
+        if counts['pending'] and spawned < num_shards * MAX_ATTEMPTS:
+            # 本机进程已退出但仍有待处理项（崩溃后重新排队）：补充一个工作进程
+            spawn()
+        elif counts['pending']:
+            logger.error(f"[分片] 工作进程反复退出，放弃剩余 {counts['pending']} 只股票")
+            break
+        elif counts['claimed']:
+            # 等待其他机器上的工作者
+            time.sleep(poll_interval)
+        else:
+            break
+
+    deliver_finished()
+    counts = queue.progress(run_id)
+    logger.info(f"[分片] 运行 {run_id} 结束: 完成 {counts['done']}, 失败 {counts['failed']}")
+    return queue.collect(run_id)
+
+
+def _demo_process(codes: List[str], options: Dict[str, Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """本地演示用处理函数：模拟 CPU 密集的指标计算"""
+    results = {}
+    for code in codes:
+        total = sum(i * i for i in range(200000))
+        results[code] = {'code': code, 'name': f"股票{code}", 'sentiment_score': total % 100, 'pid': os.getpid()}
+    return results
+
+
+if __name__ == "__main__":
+    # 本地多进程验证：4 个分片并发认领，每只股票恰好处理一次且按原始顺序合并
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO)
+    codes = [f"{600000 + i:06d}" for i in range(40)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'shard_queue.db')
+
+        start = time.time()
+        streamed = []
+        merged = run_sharded(codes, 4, path, options={'claim_size': 2}, process_fn=_demo_process, poll_interval=0.5,
+                             on_result=lambda data: streamed.append(data['code']))
+        elapsed = time.time() - start
+
+        assert [item['code'] for item in merged] == codes
+        assert sorted(streamed) == codes, "每只股票应恰好回调一次"
+        pids = {item['pid'] for item in merged}
+        print(f"{len(codes)} 只股票由 {len(pids)} 个进程处理完成，耗时 {elapsed:.2f}s，结果顺序正确")
+
+        # 预算切分：2 个分片 + 另一台机器登记的工作者 -> 按 3 份切分，已有调度器就地收缩
+        from types import SimpleNamespace
+        from src import llm_dispatcher
+
+        queue = ShardWorkQueue(path)
+        run_id = queue.create_run(codes[:3], 2, {})
+        assert queue.heartbeat(run_id, 'host-a:1') == 1
+        assert queue.heartbeat(run_id, 'host-b:1') == 2
+        active = queue.heartbeat(run_id, 'host-b:2')
+        cfg = SimpleNamespace(llm_rpm_limit=60, llm_tpm_limit=90000, llm_max_concurrency=4,
+                              gemini_request_delay=2.0)
+        base = budget_snapshot(cfg)
+        llm_dispatcher.reset_llm_dispatchers()
+        dispatcher = llm_dispatcher.LLMDispatcher(name='demo', rpm_limit=60, tpm_limit=90000, max_concurrency=4)
+        llm_dispatcher._dispatchers['demo'] = dispatcher
+        apply_budget_slice(cfg, max(2, active), base)
+        assert (cfg.llm_rpm_limit, cfg.llm_tpm_limit, cfg.llm_max_concurrency) == (20, 30000, 1)
+        assert (dispatcher.rpm_limit, dispatcher.tpm_limit, dispatcher.max_concurrency) == (20, 30000, 1)
+        queue.leave(run_id, 'host-b:2')
+        assert queue.heartbeat(run_id, 'host-a:1') == 2
+        llm_dispatcher.reset_llm_dispatchers()
+
+        # 认领超时后重复处理：已完成的股票不再推送
+        assert queue.claim(run_id, 'host-a:1', limit=1, stale_after=1800) == [codes[0]]
+        assert not queue.is_done(run_id, codes[0])
+        queue.complete(run_id, codes[0], {'code': codes[0]})
+        assert queue.is_done(run_id, codes[0]) and not queue.is_done(run_id, codes[1])
+        print("预算按活跃工作者切分、重复处理跳过推送验证通过")
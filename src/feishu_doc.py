@@ -2,13 +2,22 @@
 # -*- coding: utf-8 -*-
 import logging
 import json
+import time
+import uuid
 import lark_oapi as lark
 from lark_oapi.api.docx.v1 import *
-from typing import List, Dict, Any, Optional
+from typing import Any, Callable, List, Dict, Optional
 from src.config import get_config
 
 logger = logging.getLogger(__name__)
 
+# 创建子块接口单次最多 50 个 children
+MAX_CHILDREN_PER_REQUEST = 50
+# 创建嵌套块接口单次最多 1000 个块
+MAX_DESCENDANTS_PER_REQUEST = 1000
+# 单个批次失败后的最大重试次数（仅重试失败批次）
+BATCH_MAX_RETRIES = 3
+
 
 class FeishuDocManager:
     """飞书云文档管理器 (基于官方 SDK lark-oapi)"""
@@ -66,37 +75,158 @@ class FeishuDocManager:
             # 2. 解析 Markdown 并写入内容
             # 将 Markdown 转换为 SDK 需要的 Block 对象列表
             blocks = self._markdown_to_sdk_blocks(content_md)
+            failed = self._write_blocks(doc_id, blocks)
+            if failed:
+                logger.error(f"文档内容有 {failed} 个批次写入失败")
+            else:
+                logger.info(f"文档内容写入完成（{len(blocks)} 个块）")
+            return doc_url
 
-            # 飞书 API 限制每次写入 Block 数量（建议 50 个左右），分批写入
-            batch_size = 50
-            doc_block_id = doc_id  # 文档本身也是一个 block
+        except Exception as e:
+            logger.error(f"飞书文档操作异常: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return None
 
-            for i in range(0, len(blocks), batch_size):
-                batch_blocks = blocks[i:i + batch_size]
+    def _create_with_retry(self, send: Callable[[str], Any], label: str) -> Optional[List[str]]:
+        """
+        发送一批建块请求（失败只重试本批次）
 
-                # 构造批量添加块的请求
-                batch_add_request = CreateDocumentBlockChildrenRequest.builder() \
-                    .document_id(doc_id) \
-                    .block_id(doc_block_id) \
-                    .request_body(CreateDocumentBlockChildrenRequestBody.builder()
-                                  .children(batch_blocks)  # SDK 需要 Block 对象列表
-                                  .index(-1)  # 追加到末尾
-                                  .build()) \
-                    .build()
+        同一批次的重试使用相同 client_token，服务端已写入时不会重复插入
 
-                write_resp = self.client.docx.v1.document_block_children.create(batch_add_request)
+        Returns:
+            新建的顶层块 block_id 列表；重试耗尽返回 None
+        """
+        client_token = str(uuid.uuid4())
+        for attempt in range(BATCH_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(min(2 ** (attempt - 1), 8))
+            try:
+                response = send(client_token)
+                if response.success():
+                    children = (response.data.children if response.data else None) or []
+                    return [child.block_id for child in children]
+                error = f"{response.code} - {response.msg}"
+            except Exception as e:
+                error = str(e)
+            logger.warning(f"写入文档内容失败({label}, 第 {attempt + 1} 次): {error}")
+        return None
 
-                if not write_resp.success():
-                    logger.error(f"写入文档内容失败(批次{i}): {write_resp.code} - {write_resp.msg}")
+    def _create_children(self, doc_id: str, parent_id: str, blocks: List[Block], label: str) -> Optional[List[str]]:
+        """在 parent_id 下追加一批子块（单次最多 50 个）"""
+        def send(client_token: str):
+            request = CreateDocumentBlockChildrenRequest.builder() \
+                .document_id(doc_id) \
+                .block_id(parent_id) \
+                .client_token(client_token) \
+                .request_body(CreateDocumentBlockChildrenRequestBody.builder()
+                              .children(blocks)  # SDK 需要 Block 对象列表
+                              .index(-1)  # 追加到末尾
+                              .build()) \
+                .build()
+            return self.client.docx.v1.document_block_children.create(request)
+        return self._create_with_retry(send, label)
 
-            logger.info(f"文档内容写入完成")
-            return doc_url
+    def _create_descendants(self, doc_id: str, parent_id: str, blocks: List[Block], label: str) -> Optional[List[str]]:
+        """通过创建嵌套块接口在 parent_id 下追加一批平铺块（单次最多 1000 个）"""
+        temp_ids = [f"tmp_{index}" for index in range(len(blocks))]
+        for block, temp_id in zip(blocks, temp_ids):
+            block.block_id = temp_id
+            block.children = []
+
+        def send(client_token: str):
+            request = CreateDocumentBlockDescendantRequest.builder() \
+                .document_id(doc_id) \
+                .block_id(parent_id) \
+                .client_token(client_token) \
+                .request_body(CreateDocumentBlockDescendantRequestBody.builder()
+                              .children_id(temp_ids)  # 顶层块（平铺，即全部块）
+                              .index(-1)  # 追加到末尾
+                              .descendants(blocks)
+                              .build()) \
+                .build()
+            return self.client.docx.v1.document_block_descendant.create(request)
+        return self._create_with_retry(send, label)
 
+    def _write_blocks(self, doc_id: str, blocks: List[Block]) -> int:
+        """
+        按原样平铺写入文档内容，返回失败批次数
+
+        SDK 支持创建嵌套块接口时每批最多 1000 个块（完整日报通常一次请求写完），
+        否则退回子块接口每批 50 个。同一父块内的追加只有顺序执行才能保持顺序，批次之间不并发。
+        批次重试耗尽后按文档实际子块数核对，见 _reconcile_batch
+        """
+        if hasattr(self.client.docx.v1, 'document_block_descendant'):
+            create, size = self._create_descendants, MAX_DESCENDANTS_PER_REQUEST
+        else:
+            create, size = self._create_children, MAX_CHILDREN_PER_REQUEST
+
+        written = 0  # 文档已有的顶层块数（新文档为空）
+        failed = 0
+        for i in range(0, len(blocks), size):
+            batch = blocks[i:i + size]
+            label = f"批次{i // size}"
+            created = create(doc_id, doc_id, batch, label)
+            if created is not None or self._reconcile_batch(doc_id, written, len(batch), label):
+                written += len(batch)
+            else:
+                failed += 1
+        return failed
+
+    def _reconcile_batch(self, doc_id: str, written: int, batch_size: int, label: str) -> bool:
+        """
+        批次重试耗尽后核对文档实际子块数
+
+        最后一次请求可能已被服务端执行（响应超时 / 丢失）：子块数正好多出一批时视为成功；
+        多出的块数不足一批时删除残留块，避免后续批次错位
+
+        Returns:
+            该批次是否已写入
+        """
+        count = self._count_children(doc_id, doc_id)
+        if count is None:
+            logger.warning(f"{label} 写入状态未知：无法读取文档子块数")
+            return False
+        if count == written + batch_size:
+            logger.info(f"{label} 已由服务端写入，不再重复写入")
+            return True
+        if count > written and not self._delete_children(doc_id, doc_id, written, count):
+            logger.warning(f"清理{label}残留的 {count - written} 个块失败")
+        return False
+
+    def _count_children(self, doc_id: str, block_id: str) -> Optional[int]:
+        """读取块的直接子块数，失败返回 None"""
+        try:
+            request = GetDocumentBlockRequest.builder() \
+                .document_id(doc_id) \
+                .block_id(block_id) \
+                .build()
+            response = self.client.docx.v1.document_block.get(request)
+            if response.success():
+                return len(response.data.block.children or [])
+            logger.warning(f"读取文档块失败: {response.code} - {response.msg}")
         except Exception as e:
-            logger.error(f"飞书文档操作异常: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return None
+            logger.warning(f"读取文档块异常: {e}")
+        return None
+
+    def _delete_children(self, doc_id: str, parent_id: str, start_index: int, end_index: int) -> bool:
+        """删除 parent_id 下 [start_index, end_index) 范围的子块"""
+        try:
+            request = BatchDeleteDocumentBlockChildrenRequest.builder() \
+                .document_id(doc_id) \
+                .block_id(parent_id) \
+                .request_body(BatchDeleteDocumentBlockChildrenRequestBody.builder()
+                              .start_index(start_index)
+                              .end_index(end_index)
+                              .build()) \
+                .build()
+            response = self.client.docx.v1.document_block_children.batch_delete(request)
+            if response.success():
+                return True
+            logger.warning(f"删除文档块失败: {response.code} - {response.msg}")
+        except Exception as e:
+            logger.warning(f"删除文档块异常: {e}")
+        return False
 
     def _markdown_to_sdk_blocks(self, md_text: str) -> List[Block]:
         """
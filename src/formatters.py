@@ -8,9 +8,11 @@
 """
 
 import re
-import time
 from typing import List, Callable
 
+from src.chunking import send_chunked
+from src.report_model import FORMAT_FEISHU, find_document
+
 
 def format_feishu_markdown(content: str) -> str:
     """
@@ -21,6 +23,8 @@ def format_feishu_markdown(content: str) -> str:
     - 引用块使用前缀替代
     - 分隔线统一为细线
     - 表格转换为条目列表
+
+    报告文档生成的内容直接返回文档的飞书渲染结果，不再逐行解析
     
     Args:
         content: 原始 Markdown 内容
@@ -36,6 +40,10 @@ def format_feishu_markdown(content: str) -> str:
         💬 引用
         • 列1：值1 | 列2：值2
     """
+    document = find_document(content)
+    if document is not None:
+        return document.render(FORMAT_FEISHU)
+
     def _flush_table_rows(buffer: List[str], output: List[str]) -> None:
         """将表格缓冲区中的行转换为飞书格式"""
         if not buffer:
@@ -107,165 +115,21 @@ def format_feishu_markdown(content: str) -> str:
     return "\n".join(lines).strip()
 
 
-def _chunk_by_lines(content: str, max_bytes: int, send_func: Callable[[str], bool]) -> bool:
-    """
-    强制按行分割发送（无法智能分割时的 fallback）
-    
-    Args:
-        content: 完整消息内容
-        max_bytes: 单条消息最大字节数
-        send_func: 发送单条消息的函数
-        
-    Returns:
-        是否全部发送成功
-    """
-    chunks = []
-    current_chunk = ""
-    
-    # 按行分割，确保不会在多字节字符中间截断
-    lines = content.split('\n')
-    
-    for line in lines:
-        test_chunk = current_chunk + ('\n' if current_chunk else '') + line
-        if len(test_chunk.encode('utf-8')) > max_bytes - 100:  # 预留空间给分页标记
-            if current_chunk:
-                chunks.append(current_chunk)
-            current_chunk = line
-        else:
-            current_chunk = test_chunk
-    
-    if current_chunk:
-        chunks.append(current_chunk)
-    
-    total_chunks = len(chunks)
-    success_count = 0
-    
-    for i, chunk in enumerate(chunks):
-        # 添加分页标记
-        page_marker = f"\n\n📄 ({i+1}/{total_chunks})" if total_chunks > 1 else ""
-        
-        try:
-            if send_func(chunk + page_marker):
-                success_count += 1
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"飞书第 {i+1}/{total_chunks} 批发送异常: {e}")
-        
-        # 批次间隔，避免触发频率限制
-        if i < total_chunks - 1:
-            time.sleep(1)
-    
-    return success_count == total_chunks
-
-
 def chunk_feishu_content(content: str, max_bytes: int, send_func: Callable[[str], bool]) -> bool:
     """
     将超长内容分段发送到飞书
     
-    智能分割策略：
-    1. 优先按 "---" 分隔（股票之间的分隔线）
-    2. 其次按 "### " 标题分割（每只股票的标题）
-    3. 最后按行强制分割
+    智能分割策略（见 src.chunking）：
+    1. 优先按分隔线分割（股票之间的分隔线）
+    2. 其次按标题 / 段落分割
+    3. 最后按行、按字符边界拆分（不丢内容）
     
     Args:
         content: 完整消息内容
-        max_bytes: 单条消息最大字节数
+        max_bytes: 单条消息最大字节数（含分页标记）
         send_func: 发送单条消息的函数，接收内容字符串，返回是否成功
         
     Returns:
         是否全部发送成功
     """
-    def get_bytes(s: str) -> int:
-        """获取字符串的 UTF-8 字节数"""
-        return len(s.encode('utf-8'))
-    
-    def _truncate_to_bytes(text: str, max_bytes: int) -> str:
-        """按字节截断文本，确保不会在多字节字符中间截断"""
-        encoded = text.encode('utf-8')
-        if len(encoded) <= max_bytes:
-            return text
-        
-        # 从最大字节数开始向前查找，找到完整的 UTF-8 字符边界
-        truncated = encoded[:max_bytes]
-        while truncated and (truncated[-1] & 0xC0) == 0x80:
-            truncated = truncated[:-1]
-        
-        return truncated.decode('utf-8', errors='ignore')
-    
-    # 智能分割：优先按 "---" 分隔（股票之间的分隔线）
-    # 如果没有分隔线，按 "### " 标题分割（每只股票的标题）
-    if "\n---\n" in content:
-        sections = content.split("\n---\n")
-        separator = "\n---\n"
-    elif "\n### " in content:
-        # 按 ### 分割，但保留 ### 前缀
-        parts = content.split("\n### ")
-        sections = [parts[0]] + [f"### {p}" for p in parts[1:]]
-        separator = "\n"
-    else:
-        # 无法智能分割，按行强制分割
-        return _chunk_by_lines(content, max_bytes, send_func)
-    
-    chunks = []
-    current_chunk = []
-    current_bytes = 0
-    separator_bytes = get_bytes(separator)
-    
-    for section in sections:
-        section_bytes = get_bytes(section) + separator_bytes
-        
-        # 如果单个 section 就超长，需要强制截断
-        if section_bytes > max_bytes:
-            # 先发送当前积累的内容
-            if current_chunk:
-                chunks.append(separator.join(current_chunk))
-                current_chunk = []
-                current_bytes = 0
-            
-            # 强制截断这个超长 section（按字节截断）
-            truncated = _truncate_to_bytes(section, max_bytes - 200)
-            truncated += "\n\n...(本段内容过长已截断)"
-            chunks.append(truncated)
-            continue
-        
-        # 检查加入后是否超长
-        if current_bytes + section_bytes > max_bytes:
-            # 保存当前块，开始新块
-            if current_chunk:
-                chunks.append(separator.join(current_chunk))
-            current_chunk = [section]
-            current_bytes = section_bytes
-        else:
-            current_chunk.append(section)
-            current_bytes += section_bytes
-    
-    # 添加最后一块
-    if current_chunk:
-        chunks.append(separator.join(current_chunk))
-    
-    # 分批发送
-    total_chunks = len(chunks)
-    success_count = 0
-    
-    for i, chunk in enumerate(chunks):
-        # 添加分页标记
-        if total_chunks > 1:
-            page_marker = f"\n\n📄 ({i+1}/{total_chunks})"
-            chunk_with_marker = chunk + page_marker
-        else:
-            chunk_with_marker = chunk
-        
-        try:
-            if send_func(chunk_with_marker):
-                success_count += 1
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"飞书第 {i+1}/{total_chunks} 批发送异常: {e}")
-        
-        # 批次间隔，避免触发频率限制
-        if i < total_chunks - 1:
-            time.sleep(1)
-    
-    return success_count == total_chunks
+    return send_chunked(content, send_func, max_bytes=max_bytes, label="飞书")
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 共享 HTTP 连接池
+===================================
+
+职责：
+1. 按主机维护长连接会话，多段推送复用同一 TCP+TLS 连接（不再每段新建连接）
+2. 安装了 httpx + h2 时使用 HTTP/2，否则使用 requests 连接池（HTTP/1.1 keep-alive）
+3. 连接未建立（建连失败 / 建连超时）与 429 时重试；502/503/504 只对幂等方法重试
+   （POST 推送可能已被处理，重试会重复推送）。优先遵循 Retry-After，否则指数退避 + 随机抖动
+4. 按主机统计请求数、新建连接数、复用率与重试次数
+
+使用方式：
+    from src.http_client import get_http_client
+    response = get_http_client().post(url, json=payload, timeout=10)
+"""
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+try:
+    import httpx
+    import h2  # noqa: F401  HTTP/2 支持（httpx[http2]）
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 可重试的 HTTP 状态码（请求未被处理或服务端要求稍后重试）
+RETRY_STATUS = frozenset({429, 502, 503, 504})
+# 任何方法都可重试的状态码：限流表示请求被拒绝、未被处理
+RETRY_STATUS_ANY_METHOD = frozenset({429})
+# 幂等方法：网关错误时请求可能已被上游处理，只有这些方法可以安全重试
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+
+def parse_retry_after_header(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或 HTTP 日期），返回等待秒数"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostStats:
+    """单个主机的连接统计"""
+
+    __slots__ = ('requests', 'connections', 'retries', 'errors')
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.retries = 0
+        self.errors = 0
+
+
+class _RequestsSession:
+    """requests 会话（HTTP/1.1 keep-alive），新建连接数取自 urllib3 连接池计数"""
+
+    def __init__(self, pool_maxsize: int):
+        self.http_version = "HTTP/1.1"
+        self._session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self._session.mount('https://', self._adapter)
+        self._session.mount('http://', self._adapter)
+
+    def request(self, method: str, url: str, stats: _HostStats, **kwargs: Any):
+        return self._session.request(method, url, **kwargs)
+
+    def connections_opened(self) -> Optional[int]:
+        pools = self._adapter.poolmanager.pools
+        return sum(getattr(pools[key], 'num_connections', 0) for key in list(pools.keys()))
+
+    def close(self) -> None:
+        self._session.close()
+
+
+class _Http2Session:
+    """httpx 会话（HTTP/2 多路复用），通过 trace 回调统计新建连接"""
+
+    def __init__(self, pool_maxsize: int):
+        self.http_version = "HTTP/2"
+        self._client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+        )
+
+    def request(self, method: str, url: str, stats: _HostStats, **kwargs: Any):
+        # 兼容 requests 参数：字节 / 字符串请求体对应 httpx 的 content
+        data = kwargs.get('data')
+        if isinstance(data, (bytes, str)):
+            kwargs['content'] = kwargs.pop('data')
+
+        def trace(event_name: str, info: Dict[str, Any]) -> None:
+            if event_name == 'connection.connect_tcp.complete':
+                stats.connections += 1
+
+        return self._client.request(method, url, extensions={'trace': trace}, **kwargs)
+
+    def connections_opened(self) -> Optional[int]:
+        return None  # 由 trace 回调直接计入统计
+
+    def close(self) -> None:
+        self._client.close()
+
+
+class PooledHttpClient:
+    """
+    按主机复用连接的 HTTP 客户端（线程安全）
+
+    返回的响应对象与 requests.Response 兼容（status_code / text / json()）
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        pool_maxsize: int = 4,
+        http2: Optional[bool] = None,
+    ):
+        """
+        Args:
+            max_retries: 最大重试次数（不含首次请求）
+            backoff_base: 无 Retry-After 时的退避基数（秒）
+            backoff_max: 单次等待上限（秒），Retry-After 超过该值时不再重试
+            pool_maxsize: 每个主机的最大连接数（多渠道并发推送时同一主机的并发上限）
+            http2: 是否使用 HTTP/2，None 表示依赖可用时自动启用
+        """
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_maxsize = pool_maxsize
+        self.http2 = HTTP2_AVAILABLE if http2 is None else (http2 and HTTP2_AVAILABLE)
+
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Any] = {}
+        self._stats: Dict[str, _HostStats] = {}
+
+    def _get_session(self, host: str):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = _Http2Session(self.pool_maxsize) if self.http2 else _RequestsSession(self.pool_maxsize)
+                self._sessions[host] = session
+                self._stats[host] = _HostStats()
+                logger.debug(f"[HTTP] 新建 {host} 连接池 ({session.http_version})")
+            return session, self._stats[host]
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """重试等待时间：优先 Retry-After（加少量抖动），否则全抖动指数退避"""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, min(1.0, self.backoff_base))
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method: str, url: str, **kwargs: Any):
+        """
+        发送请求
+
+        连接未建立与 429 会重试，502/503/504 只对幂等方法重试；重试耗尽后返回最后一次响应，
+        连接异常则原样抛出（与 requests 行为一致）。
+        """
+        retry_status = RETRY_STATUS if method.upper() in IDEMPOTENT_METHODS else RETRY_STATUS_ANY_METHOD
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        session, stats = self._get_session(host)
+
+        attempt = 0
+        while True:
+            with self._lock:
+                stats.requests += 1
+            try:
+                response = session.request(method, url, stats, **kwargs)
+            except Exception as e:
+                # 只重试连接阶段失败，读超时可能已送达，重试会导致重复推送
+                if attempt >= self.max_retries or not self._is_connect_error(e):
+                    with self._lock:
+                        stats.errors += 1
+                    raise
+                delay = self._retry_delay(attempt, None)
+                logger.warning(f"[HTTP] {host} 连接失败，{delay:.1f}s 后重试: {e}")
+            else:
+                if response.status_code not in retry_status or attempt >= self.max_retries:
+                    return response
+                retry_after = parse_retry_after_header(response.headers.get('Retry-After'))
+                if retry_after is not None and retry_after > self.backoff_max:
+                    logger.warning(f"[HTTP] {host} 要求等待 {retry_after:.0f}s，超过上限，不再重试")
+                    return response
+                delay = self._retry_delay(attempt, retry_after)
+                logger.warning(f"[HTTP] {host} 返回 {response.status_code}，{delay:.1f}s 后重试")
+
+            with self._lock:
+                stats.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    @staticmethod
+    def _is_connect_error(error: Exception) -> bool:
+        """
+        是否为连接未建立的错误（请求一定未发出，可安全重试）
+
+        requests 的 ConnectionError 还包含 "Connection aborted" / 连接被重置等已发送请求体后的失败，
+        只认 urllib3 的建连失败（含 DNS 解析失败）与建连超时
+        """
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError):
+            reason = getattr(error.args[0], 'reason', None) if error.args else None
+            return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+        if HTTP2_AVAILABLE and isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return True
+        return False
+
+    def post(self, url: str, **kwargs: Any):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any):
+        return self.request('GET', url, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按主机返回 请求数 / 新建连接数 / 复用率 / 重试次数"""
+        result: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            items = list(self._sessions.items())
+        for host, session in items:
+            stats = self._stats[host]
+            opened = session.connections_opened()
+            connections = stats.connections if opened is None else opened
+            requests_count = stats.requests
+            result[host] = {
+                'protocol': session.http_version,
+                'requests': requests_count,
+                'connections': connections,
+                'reuse_rate': round(1 - connections / requests_count, 4) if requests_count else 0.0,
+                'retries': stats.retries,
+                'errors': stats.errors,
+            }
+        return result
+
+    def log_summary(self) -> None:
+        """输出连接复用汇总日志"""
+        for host, item in self.get_stats().items():
+            logger.info(
+                f"[HTTP] {host} ({item['protocol']}): 请求 {item['requests']} 次, "
+                f"新建连接 {item['connections']} 个 (复用率 {item['reuse_rate']:.1%}), 重试 {item['retries']} 次"
+            )
+
+    def close(self) -> None:
+        """关闭所有连接"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            self._stats.clear()
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+
+# 全局客户端实例
+_http_client: Optional[PooledHttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> PooledHttpClient:
+    """获取进程级共享 HTTP 客户端"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = PooledHttpClient()
+                logger.debug(f"[HTTP] 共享连接池已创建 (HTTP/2: {_http_client.http2})")
+    return _http_client
+
+
+def get_http_stats() -> Dict[str, Dict[str, Any]]:
+    """返回共享 HTTP 客户端的统计（尚未创建时返回空字典，不触发创建）"""
+    client = _http_client
+    return client.get_stats() if client is not None else {}
+
+
+def reset_http_client() -> None:
+    """关闭并重置共享 HTTP 客户端（主要用于测试）"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+        _http_client = None
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - LLM 响应缓存
+===================================
+
+职责：
+1. 按 (模型, 温度, 提示词) 指纹缓存 LLM 原始响应和解析结果
+2. 磁盘持久化，支持 TTL 过期与按数量淘汰
+3. 相同请求（机器人重复 /analyze、WebUI 重复提交、定时任务失败重跑）直接命中，不再调用模型
+4. 默认关闭（LLM_CACHE_ENABLED=true 开启）：TTL 内同一提示词返回同一份分析，
+   盘中行情未变化时生成的提示词相同，开启后不会再得到新的模型输出
+
+存储结构：
+    {cache_dir}/{key[:2]}/{key}.json
+    每个文件内容: {"created_at": ..., "model": ..., "raw_response": ..., "result": {...}}
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    内容寻址的 LLM 响应缓存
+
+    设计说明：
+    - 缓存键为 sha256(model | temperature | max_output_tokens | system_prompt | prompt)
+    - 写入采用临时文件 + os.replace，保证并发/崩溃下文件完整
+    - 读取以磁盘为准，多个进程（分片工作者等）共用同一目录时可互相命中
+    - 内存中维护 {key: 写入时间} 索引，仅用于超出 max_entries 时淘汰最旧条目
+    - 锁只保护索引与统计，文件读写与目录扫描都在锁外进行
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "./data/llm_cache",
+        ttl_seconds: int = 86400,
+        max_entries: int = 2000,
+    ):
+        """
+        Args:
+            cache_dir: 缓存目录
+            ttl_seconds: 缓存有效期（秒），<=0 表示永不过期
+            max_entries: 最大缓存条目数，超出后淘汰最旧条目
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, float]] = None  # 懒加载的 {key: mtime} 索引
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(
+        model: str,
+        temperature: float,
+        prompt: str,
+        system_prompt: str = "",
+        max_output_tokens: int = 0,
+    ) -> str:
+        """
+        计算请求指纹
+
+        Args:
+            model: 模型名称
+            temperature: 温度参数
+            prompt: 用户提示词
+            system_prompt: 系统提示词（变更后自动失效）
+            max_output_tokens: 最大输出 token 数
+
+        Returns:
+            64 位十六进制 sha256 字符串
+        """
+        hasher = hashlib.sha256()
+        for part in (model or "", f"{float(temperature):.4f}", str(max_output_tokens), system_prompt, prompt):
+            hasher.update(part.encode('utf-8'))
+            hasher.update(b'\x00')  # 分隔符，避免字段拼接歧义
+        return hasher.hexdigest()
+
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _scan_index(self) -> Dict[str, float]:
+        """扫描缓存目录建立 {key: mtime} 索引（不持锁，目录较大时耗时）"""
+        index: Dict[str, float] = {}
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob('*/*.json'):
+                try:
+                    index[path.stem] = path.stat().st_mtime
+                except OSError:
+                    continue
+        return index
+
+    def _ensure_index(self) -> None:
+        """首次访问时建立索引：扫描在锁外进行，完成后再设置"""
+        if self._index is not None:
+            return
+        index = self._scan_index()
+        with self._lock:
+            if self._index is None:
+                self._index = index
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and (time.time() - created_at) > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存
+
+        以磁盘为准：索引只用于容量淘汰，索引未命中时仍读取文件，
+        其他进程（分片工作者、WebUI / 定时任务）写入的条目也能命中
+
+        Returns:
+            缓存条目字典（含 raw_response / result），未命中或已过期返回 None
+        """
+        path = self._path_for(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            entry = None
+        except (OSError, ValueError) as e:
+            logger.debug(f"[LLM缓存] 读取失败，丢弃条目 {key[:12]}: {e}")
+            self._remove([key])
+            entry = None
+
+        if entry is not None and self._is_expired(entry.get('created_at', 0)):
+            logger.debug(f"[LLM缓存] 条目已过期: {key[:12]}")
+            self._remove([key])
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            if self._index is not None:
+                self._index.setdefault(key, entry.get('created_at', 0))
+        return entry
+
+    def set(
+        self,
+        key: str,
+        raw_response: str,
+        result: Dict[str, Any],
+        model: str = "",
+    ) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 请求指纹
+            raw_response: 模型原始响应文本
+            result: 解析后的 AnalysisResult 字典
+            model: 模型名称（仅用于排查）
+        """
+        entry = {
+            'created_at': time.time(),
+            'model': model,
+            'raw_response': raw_response,
+            'result': result,
+        }
+        path = self._path_for(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+
+        # 文件写入不持锁：临时文件名按进程 / 线程区分，os.replace 原子替换
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"[LLM缓存] 写入失败: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return
+
+        self._ensure_index()
+        with self._lock:
+            self._index[key] = entry['created_at']
+            evicted = self._select_evictions(self._index)
+        self._remove(evicted)
+
+    def _select_evictions(self, index: Dict[str, float]) -> List[str]:
+        """
+        选出过期条目，以及超出容量时按写入时间最旧的条目，并从索引移除（调用方需持有锁）
+
+        索引是本进程的视图（启动时扫描 + 之后本进程读写的条目），多进程共用目录时容量为近似值
+        """
+        evicted: List[str] = []
+        if self.ttl_seconds > 0:
+            evicted = [k for k, ts in index.items() if self._is_expired(ts)]
+            for k in evicted:
+                index.pop(k, None)
+
+        overflow = len(index) - self.max_entries
+        if self.max_entries > 0 and overflow > 0:
+            oldest = sorted(index.items(), key=lambda kv: kv[1])[:overflow]
+            for k, _ in oldest:
+                index.pop(k, None)
+                evicted.append(k)
+            logger.debug(f"[LLM缓存] 容量超限，淘汰 {overflow} 条")
+        return evicted
+
+    def _remove(self, keys: List[str]) -> None:
+        """删除条目（不持锁调用：先更新索引，文件删除在锁外进行）"""
+        if not keys:
+            return
+        with self._lock:
+            if self._index is not None:
+                for key in keys:
+                    self._index.pop(key, None)
+        for key in keys:
+            try:
+                self._path_for(key).unlink()
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """清空全部缓存（以磁盘为准，包括其他进程写入的条目）"""
+        self._remove(list(self._scan_index().keys()))
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取命中统计"""
+        with self._lock:
+            size = len(self._index) if self._index is not None else 0
+            return {'hits': self._hits, 'misses': self._misses, 'size': size}
+
+
+# 全局缓存实例（多个 GeminiAnalyzer 共享同一份磁盘缓存）
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    获取全局 LLM 响应缓存
+
+    Returns:
+        LLMResponseCache 实例；配置关闭缓存时返回 None
+    """
+    global _llm_cache
+
+    from src.config import get_config
+    config = get_config()
+    if not config.llm_cache_enabled:
+        return None
+
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache(
+                    cache_dir=config.llm_cache_dir,
+                    ttl_seconds=config.llm_cache_ttl,
+                    max_entries=config.llm_cache_max_entries,
+                )
+                logger.info(f"[LLM缓存] 已启用 (目录: {config.llm_cache_dir}, TTL: {config.llm_cache_ttl}s)")
+    return _llm_cache
+
+
+def reset_llm_cache() -> None:
+    """重置全局缓存实例（主要用于测试）"""
+    global _llm_cache
+    _llm_cache = None
+
+
+if __name__ == "__main__":
+    # 两个实例模拟两个进程共用缓存目录：对方写入的条目在本进程索引建立之后也能命中
+    import tempfile
+
+    logging.basicConfig(level=logging.DEBUG)
+    with tempfile.TemporaryDirectory() as tmp:
+        worker_a = LLMResponseCache(cache_dir=tmp, max_entries=3)
+        worker_b = LLMResponseCache(cache_dir=tmp, max_entries=3)
+        worker_b.set(LLMResponseCache.make_key('m', 0.7, 'warmup'), 'raw', {'code': '000000'})
+
+        key = LLMResponseCache.make_key('m', 0.7, 'prompt-600519')
+        assert worker_a.get(key) is None
+        worker_b.set(key, 'raw', {'code': '600519'})
+        entry = worker_a.get(key)
+        assert entry is not None and entry['result']['code'] == '600519', "其他进程写入的条目应命中"
+
+        # 容量淘汰：超出 max_entries 后删除最旧文件
+        for i in range(5):
+            worker_a.set(LLMResponseCache.make_key('m', 0.7, f'p{i}'), 'raw', {'code': str(i)})
+        assert len(list(Path(tmp).glob('*/*.json'))) <= 4
+        print(f"多进程共用缓存命中验证通过: {worker_a.get_stats()}")
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - LLM 调用调度器
+===================================
+
+职责：
+1. 按模型维护 RPM（每分钟请求数）/ TPM（每分钟 token 数）滑动窗口预算
+2. 控制同时在途的请求数，有预算即放行，不再固定 sleep
+3. 仅在真实 429 时进入冷却（优先使用 Retry-After），成功后自动恢复
+4. 其他错误（5xx / 连接错误等）由调用方按 error_backoff() 指数退避 + 抖动后重试
+
+使用方式：
+    dispatcher = get_llm_dispatcher(model_name)
+    with dispatcher.slot(estimated_tokens) as slot:
+        response = client.call(...)
+        slot.record_tokens(actual_tokens)
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 中日韩字符范围（用于 token 估算）
+_CJK_RE = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+# 限流异常类型名（openai / google.api_core / httpx 等）
+_RATE_LIMIT_ERROR_TYPES = frozenset({'RateLimitError', 'ResourceExhausted', 'TooManyRequests'})
+# 限流错误文本：独立的 429 状态码、gRPC RESOURCE_EXHAUSTED、HTTP 429 原因短语
+_RATE_LIMIT_TEXT_RE = re.compile(r'(?<!\d)429(?!\d)|resource[_ ]exhausted|too many requests', re.IGNORECASE)
+
+# Retry-After 提示（兼容 "retry after 12s" / "retry_delay { seconds: 12 }" / "Retry-After: 12"）
+_RETRY_AFTER_RE = re.compile(
+    r'retry[\s_-]*(?:after|delay)[^0-9]{0,20}?(\d+(?:\.\d+)?)\s*s?',
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    粗略估算文本 token 数
+
+    经验值：中文约 1 字 / token，英文与数字约 4 字符 / token
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    判断异常是否为限流（HTTP 429 / RESOURCE_EXHAUSTED）
+
+    依次检查 SDK 异常类型（openai.RateLimitError / google.api_core ResourceExhausted，按类名匹配，
+    无需导入可选依赖）、HTTP 状态码与错误文本；不做 'rate' / 'quota' 之类的子串匹配，
+    以免 "GenerateContentRequest" 等普通错误被误判为限流而触发全局冷却
+    """
+    if any(cls.__name__ in _RATE_LIMIT_ERROR_TYPES for cls in type(error).__mro__):
+        return True
+    response = getattr(error, 'response', None)
+    for status in (getattr(error, 'status_code', None), getattr(error, 'code', None),
+                   getattr(response, 'status_code', None)):
+        if not callable(status) and status == 429:
+            return True
+    return bool(_RATE_LIMIT_TEXT_RE.search(str(error)))
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """
+    从限流异常中提取服务端建议的等待时间（秒）
+
+    优先读取 HTTP 响应头 Retry-After（OpenAI SDK），其次匹配错误文本（Gemini）
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers:
+        try:
+            value = headers.get('retry-after') or headers.get('Retry-After')
+            if value:
+                return float(value)
+        except (TypeError, ValueError):
+            pass
+
+    match = _RETRY_AFTER_RE.search(str(error))
+    if match:
+        try:
+            return float(match.group(1))
+        except ValueError:
+            return None
+    return None
+
+
+class _Slot:
+    """单次请求占用的预算记录"""
+
+    def __init__(self, dispatcher: 'LLMDispatcher', entry: List[float]):
+        self._dispatcher = dispatcher
+        self._entry = entry  # [时间戳, token 数]，与调度器窗口共享同一对象
+
+    def record_tokens(self, tokens: int) -> None:
+        """用实际消耗的 token 数修正预估值"""
+        if tokens and tokens > 0:
+            with self._dispatcher._cond:
+                self._entry[1] = float(tokens)
+                self._dispatcher._cond.notify_all()
+
+
+class LLMDispatcher:
+    """
+    LLM 请求调度器（单模型）
+
+    设计说明：
+    - 滑动窗口记录最近 60 秒内的请求及其 token 数，RPM/TPM 任一超限则等待
+    - 信号量语义限制在途请求数（max_concurrency）
+    - 429 时进入冷却：有 Retry-After 用 Retry-After，否则指数退避（base * 2^n，最大 60s）
+    - 所有线程共享同一个 Condition，预算释放或冷却结束时唤醒等待者
+    """
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(
+        self,
+        name: str,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+        max_concurrency: int = 3,
+        backoff_base: float = 5.0,
+        backoff_max: float = 60.0,
+    ):
+        """
+        Args:
+            name: 调度器名称（通常为模型名）
+            rpm_limit: 每分钟最大请求数，0 表示不限制
+            tpm_limit: 每分钟最大 token 数，0 表示不限制
+            max_concurrency: 最大在途请求数
+            backoff_base: 429 无 Retry-After 时 / 非限流错误重试的退避基数（秒）
+            backoff_max: 单次冷却最长时间（秒）
+        """
+        self.name = name
+        self.rpm_limit = max(0, rpm_limit)
+        self.tpm_limit = max(0, tpm_limit)
+        self.max_concurrency = max(1, max_concurrency)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._cond = threading.Condition()
+        self._window: Deque[List[float]] = deque()  # [[时间戳, token 数], ...]
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        self._consecutive_429 = 0
+
+        # 统计
+        self._total_requests = 0
+        self._total_rate_limited = 0
+        self._total_wait = 0.0
+
+    def set_limits(self, rpm_limit: int, tpm_limit: int, max_concurrency: int) -> None:
+        """调整预算（保留滑动窗口记录，已用额度继续计入新预算）"""
+        with self._cond:
+            self.rpm_limit = max(0, rpm_limit)
+            self.tpm_limit = max(0, tpm_limit)
+            self.max_concurrency = max(1, max_concurrency)
+            self._cond.notify_all()
+
+    def _prune(self, now: float) -> None:
+        """移除窗口外的记录"""
+        cutoff = now - self.WINDOW_SECONDS
+        while self._window and self._window[0][0] <= cutoff:
+            self._window.popleft()
+
+    def _compute_wait(self, now: float, tokens: int) -> float:
+        """计算距离预算可用还需等待的秒数（0 表示可立即放行）"""
+        wait = max(0.0, self._cooldown_until - now)
+
+        if self.rpm_limit and len(self._window) >= self.rpm_limit:
+            oldest = self._window[len(self._window) - self.rpm_limit][0]
+            wait = max(wait, oldest + self.WINDOW_SECONDS - now)
+
+        if self.tpm_limit and self._window:
+            used = sum(entry[1] for entry in self._window)
+            # 单次请求超过整个 TPM 预算时，只要求窗口清空后放行，避免永久阻塞
+            need = used + min(tokens, self.tpm_limit) - self.tpm_limit
+            if need > 0:
+                released = 0.0
+                for ts, cost in self._window:
+                    released += cost
+                    if released >= need:
+                        wait = max(wait, ts + self.WINDOW_SECONDS - now)
+                        break
+
+        return wait
+
+    @contextmanager
+    def slot(self, estimated_tokens: int = 0, timeout: Optional[float] = None) -> Iterator[_Slot]:
+        """
+        申请一次请求预算（阻塞直到可用）
+
+        Args:
+            estimated_tokens: 预估 token 数（输入 + 预期输出）
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Raises:
+            TimeoutError: 超过 timeout 仍无可用预算
+        """
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                wait = self._compute_wait(now, estimated_tokens)
+                if wait <= 0 and self._in_flight < self.max_concurrency:
+                    break
+                if timeout is not None and now - start >= timeout:
+                    raise TimeoutError(f"[LLM调度] {self.name} 等待预算超时 ({timeout}s)")
+                if wait > 1:
+                    logger.debug(f"[LLM调度] {self.name} 预算不足，等待 {wait:.1f}s (在途 {self._in_flight})")
+                # wait 为 0 表示仅受并发限制，等待其他请求完成时被唤醒
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+            entry = [now, float(estimated_tokens)]
+            self._window.append(entry)
+            self._in_flight += 1
+            self._total_requests += 1
+            self._total_wait += now - start
+
+        try:
+            yield _Slot(self, entry)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def report_success(self) -> None:
+        """请求成功，重置 429 退避计数"""
+        with self._cond:
+            self._consecutive_429 = 0
+
+    def report_rate_limit(self, retry_after: Optional[float] = None) -> float:
+        """
+        收到 429，进入冷却
+
+        Args:
+            retry_after: 服务端建议的等待时间（秒）
+
+        Returns:
+            实际冷却时长（秒）
+        """
+        with self._cond:
+            self._consecutive_429 += 1
+            self._total_rate_limited += 1
+            if retry_after is not None and retry_after > 0:
+                delay = min(retry_after, self.backoff_max)
+            else:
+                delay = min(self.backoff_base * (2 ** (self._consecutive_429 - 1)), self.backoff_max)
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        logger.warning(f"[LLM调度] {self.name} 触发限流，冷却 {delay:.1f}s")
+        return delay
+
+    def error_backoff(self, attempt: int) -> float:
+        """
+        非限流错误（5xx / 连接错误等）重试前的等待时间
+
+        只影响当前调用方，不让同模型的其他请求一起冷却。
+        base * 2^attempt（最大 backoff_max），取其 50%~100% 作为抖动，
+        避免并发请求同时失败后在同一时刻集中重试
+
+        Args:
+            attempt: 已失败的尝试序号（从 0 开始）
+        """
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def get_stats(self) -> Dict[str, float]:
+        """获取调度统计"""
+        with self._cond:
+            self._prune(time.monotonic())
+            return {
+                'requests': self._total_requests,
+                'rate_limited': self._total_rate_limited,
+                'total_wait_seconds': round(self._total_wait, 2),
+                'in_flight': self._in_flight,
+                'window_requests': len(self._window),
+                'window_tokens': int(sum(entry[1] for entry in self._window)),
+            }
+
+
+# 全局调度器注册表：同一模型在进程内共享预算
+_dispatchers: Dict[str, LLMDispatcher] = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_llm_dispatcher(model_name: Optional[str]) -> LLMDispatcher:
+    """
+    获取指定模型的共享调度器
+
+    RPM 未显式配置时，由 GEMINI_REQUEST_DELAY 推导（60 / delay），
+    保持旧配置的请求速率上限，但不再在每次请求前固定等待。
+    """
+    key = model_name or 'default'
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(key)
+        if dispatcher is None:
+            from src.config import get_config
+            config = get_config()
+
+            rpm_limit = config.llm_rpm_limit
+            if rpm_limit <= 0 and config.gemini_request_delay > 0:
+                rpm_limit = max(1, int(60 / config.gemini_request_delay))
+
+            dispatcher = LLMDispatcher(
+                name=key,
+                rpm_limit=rpm_limit,
+                tpm_limit=config.llm_tpm_limit,
+                max_concurrency=config.llm_max_concurrency,
+                backoff_base=config.gemini_retry_delay,
+            )
+            _dispatchers[key] = dispatcher
+            logger.info(
+                f"[LLM调度] {key} 预算: RPM={rpm_limit or '不限'}, "
+                f"TPM={config.llm_tpm_limit or '不限'}, 并发={config.llm_max_concurrency}"
+            )
+        return dispatcher
+
+
+def update_llm_dispatcher_limits(rpm_limit: int, tpm_limit: int, max_concurrency: int) -> None:
+    """调整所有已创建调度器的预算（分片运行中工作者数量变化时调用）"""
+    with _dispatchers_lock:
+        dispatchers = list(_dispatchers.values())
+    for dispatcher in dispatchers:
+        dispatcher.set_limits(rpm_limit, tpm_limit, max_concurrency)
+
+
+def reset_llm_dispatchers() -> None:
+    """清空调度器注册表（主要用于测试）"""
+    with _dispatchers_lock:
+        _dispatchers.clear()
+
+
+if __name__ == "__main__":
+    # 回归检查：限流判定只认 429 / RESOURCE_EXHAUSTED / SDK 限流类型
+    from types import SimpleNamespace
+
+    class RateLimitError(Exception):
+        pass
+
+    class ResourceExhausted(Exception):
+        code = 429
+
+    class ServerError(Exception):
+        pass
+
+    rate_limited = [
+        RateLimitError("Error code: 429 - Rate limit reached for requests"),
+        ResourceExhausted("Resource has been exhausted (e.g. check quota)."),
+        Exception("429 Too Many Requests"),
+        Exception("RESOURCE_EXHAUSTED: quota exceeded"),
+        type('APIStatusError', (Exception,), {'status_code': 429})("slow down"),
+        type('HTTPError', (Exception,), {'response': SimpleNamespace(status_code=429)})("error"),
+    ]
+    not_rate_limited = [
+        ServerError("500 Internal error encountered while processing GenerateContentRequest"),
+        Exception("Invalid generate_content argument: temperature"),
+        Exception("Connection aborted: operation rate unknown"),
+        Exception("prompt has 14290 tokens, exceeds quota of context window"),
+        type('GrpcError', (Exception,), {'code': lambda self: 14})("unavailable"),
+    ]
+    for error in rate_limited:
+        assert is_rate_limit_error(error), f"应判定为限流: {error!r}"
+    for error in not_rate_limited:
+        assert not is_rate_limit_error(error), f"不应判定为限流: {error!r}"
+    print("限流判定验证通过")
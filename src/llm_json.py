@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - LLM JSON 处理工具
+===================================
+
+职责：
+1. 流式响应的增量 JSON 扫描：识别最外层对象何时完整闭合，便于提前结束生成
+2. 单遍提取模型输出中的最外层 JSON（跳过说明文字/代码块标记，同时清理注释、尾随逗号、Python 布尔值）
+3. 决策仪表盘字段校验
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+
+class IncrementalJSONScanner:
+    """
+    增量 JSON 对象扫描器
+
+    逐块喂入流式响应文本，跟踪字符串/转义状态与括号深度，
+    在第一个最外层 JSON 对象闭合时报告完成。
+
+    使用方式：
+        scanner = IncrementalJSONScanner()
+        for chunk in stream:
+            if scanner.feed(chunk):
+                break  # 仪表盘 JSON 已完整，后续输出可丢弃
+        json_text = scanner.json_text
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._length = 0
+        self._start = -1  # 最外层 '{' 的绝对位置
+        self._end = -1  # 最外层 '}' 之后的绝对位置
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._has_key = False  # 最外层对象内是否出现过 "key": 结构
+        self._after_string = False  # 最外层上一个非空白记号是否为已闭合的字符串
+
+    @property
+    def complete(self) -> bool:
+        """最外层对象是否已闭合"""
+        return self._end >= 0
+
+    @property
+    def received_chars(self) -> int:
+        """已接收的字符数"""
+        return self._length
+
+    @property
+    def text(self) -> str:
+        """已接收的完整文本"""
+        return ''.join(self._parts)
+
+    @property
+    def json_text(self) -> Optional[str]:
+        """已闭合的最外层 JSON 对象文本，未完成时返回 None"""
+        if not self.complete:
+            return None
+        return self.text[self._start:self._end]
+
+    def feed(self, chunk: str) -> bool:
+        """
+        喂入一段文本
+
+        Returns:
+            最外层对象是否已闭合
+        """
+        if not chunk:
+            return self.complete
+        offset = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        if self.complete:
+            return True
+
+        depth = self._depth
+        in_string = self._in_string
+        escape = self._escape
+        has_key = self._has_key
+        after_string = self._after_string
+        for i, ch in enumerate(chunk):
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+                    after_string = depth == 1
+                continue
+            if depth == 0:
+                # 对象开始前的说明文字、```json 标记等直接跳过
+                if ch == '{':
+                    self._start = offset + i
+                    depth = 1
+                continue
+            if ch.isspace():
+                continue
+            # 只有紧跟在字符串之后的 ':' 才是 "key": 结构（排除说明文字中的 {注: xxx}）
+            if ch == ':' and depth == 1 and after_string:
+                has_key = True
+            after_string = False
+            if ch == '"':
+                in_string = True
+            elif ch == '{' or ch == '[':
+                depth += 1
+            elif ch == '}' or ch == ']':
+                depth -= 1
+                if depth == 0:
+                    if has_key:
+                        self._end = offset + i + 1
+                        break
+                    # 说明文字中的 {xxx} 之类片段不是 JSON 对象，继续寻找下一个 '{'
+                    self._start = -1
+
+        self._depth = depth
+        self._in_string = in_string
+        self._escape = escape
+        self._has_key = has_key
+        self._after_string = after_string
+        return self.complete
+
+
+# 需要处理的记号：完整字符串（一次匹配整段，含转义）、括号、冒号、逗号、注释起始、Python 风格字面量；
+# 末尾单独的 '"' 只会在字符串未闭合（输出被截断）时匹配到
+_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]:,]|//|/\*|\b(?:True|False|None)\b|"', re.DOTALL)
+# 逗号之后的空白与注释（用于判断是否为尾随逗号）
+_GAP_RE = re.compile(r'(?:\s+|//[^\n]*|/\*.*?\*/)*', re.DOTALL)
+_LITERALS = {'True': 'true', 'False': 'false', 'None': 'null'}
+
+
+def extract_json(text: Optional[str], container: str = '{') -> Optional[str]:
+    """
+    单遍提取文本中第一个完整的最外层 JSON 对象（或数组），并顺带修复常见格式问题
+
+    - 跳过对象之前的说明文字、```json 代码块标记
+    - 正确处理字符串内的括号、引号转义与 URL 中的 //
+    - 删除字符串外的 // 与 /* */ 注释、尾随逗号，将 True/False/None 转为 JSON 字面量
+    - 说明文字中不含 "key": 的 {xxx} 片段不视为结果，继续向后查找
+
+    Args:
+        text: 模型原始输出
+        container: '{' 提取对象，'[' 提取数组（数组需至少包含一个对象元素）
+
+    Returns:
+        可直接 json.loads 的文本；未找到完整结构（如输出被截断）时返回 None
+    """
+    if not text:
+        return None
+    close = '}' if container == '{' else ']'
+    search_from = 0
+    length = len(text)
+
+    while True:
+        start = text.find(container, search_from)
+        if start < 0:
+            return None
+
+        parts: List[str] = []
+        seg_start = start
+        depth = 0
+        valid = False  # 对象：最外层出现过 "key":；数组：最外层出现过对象元素
+        key_end = -1  # 最外层上一个字符串的结束位置
+        pos = start
+
+        while pos < length:
+            match = _TOKEN_RE.search(text, pos)
+            if match is None:
+                return None  # 未闭合（输出被截断）
+            token = match.group()
+            at = match.start()
+            pos = match.end()
+
+            if token[0] == '"':
+                if len(token) == 1:
+                    return None  # 字符串未闭合
+                if depth == 1:
+                    key_end = pos
+            elif token == '{' or token == '[':
+                if depth == 1 and container == '[' and token == '{':
+                    valid = True
+                depth += 1
+            elif token == '}' or token == ']':
+                depth -= 1
+                if depth == 0:
+                    break
+            elif token == ':':
+                # 冒号前只能是字符串（允许空白），说明文字中的 {注: xxx} 不算
+                if depth == 1 and container == '{' and key_end >= 0 and not text[key_end:at].strip():
+                    valid = True
+            elif token == ',':
+                gap = _GAP_RE.match(text, pos)
+                if gap.end() < length and text[gap.end()] in '}]':
+                    parts.append(text[seg_start:at])
+                    seg_start = pos
+            elif token == '//':
+                newline = text.find('\n', pos)
+                end = length if newline < 0 else newline
+                parts.append(text[seg_start:at])
+                seg_start = pos = end
+            elif token == '/*':
+                comment_end = text.find('*/', pos)
+                end = length if comment_end < 0 else comment_end + 2
+                parts.append(text[seg_start:at])
+                seg_start = pos = end
+            else:
+                parts.append(text[seg_start:at])
+                parts.append(_LITERALS[token])
+                seg_start = pos
+
+        if depth != 0:
+            return None
+        if valid and text[pos - 1] == close:
+            parts.append(text[seg_start:pos])
+            return ''.join(parts)
+        # 说明文字中的 {xxx} 片段，继续寻找下一个结构
+        search_from = start + 1
+
+
+# 决策仪表盘顶层字段类型（缺失字段由调用方使用默认值，这里只校验已给出字段的类型）
+DASHBOARD_FIELD_TYPES = {
+    'stock_name': str,
+    'trend_prediction': str,
+    'operation_advice': str,
+    'confidence_level': str,
+    'dashboard': dict,
+    'analysis_summary': str,
+    'risk_warning': str,
+    'buy_reason': str,
+}
+DASHBOARD_SECTIONS = ('core_conclusion', 'data_perspective', 'intelligence', 'battle_plan')
+
+
+def validate_dashboard(data: Any) -> Dict[str, str]:
+    """
+    校验决策仪表盘 JSON
+
+    Args:
+        data: json.loads 的结果
+
+    Returns:
+        {字段路径: 问题描述}，为空表示校验通过；
+        顶层字段问题（如 sentiment_score 非数字）调用方应丢弃该字段改用默认值，
+        dashboard.* 子模块缺失仅作提示
+    """
+    if not isinstance(data, dict):
+        return {'$': f'顶层应为对象，实际为 {type(data).__name__}'}
+
+    problems: Dict[str, str] = {}
+    if 'sentiment_score' in data:
+        score = data['sentiment_score']
+        try:
+            if isinstance(score, bool):
+                raise ValueError
+            value = float(score)
+            if not 0 <= value <= 100:
+                problems['sentiment_score'] = f'超出 0-100 范围: {score}'
+        except (TypeError, ValueError):
+            problems['sentiment_score'] = f'不是数字: {score!r}'
+
+    for field, expected in DASHBOARD_FIELD_TYPES.items():
+        value = data.get(field)
+        if value is not None and not isinstance(value, expected):
+            problems[field] = f'类型应为 {expected.__name__}，实际为 {type(value).__name__}'
+
+    dashboard = data.get('dashboard')
+    if isinstance(dashboard, dict):
+        for section in DASHBOARD_SECTIONS:
+            if not isinstance(dashboard.get(section), dict):
+                problems[f'dashboard.{section}'] = '缺失或不是对象'
+
+    return problems
+
+
+if __name__ == "__main__":
+    # 模糊测试 + 与旧实现的正确性对比（改动出于健壮性，单遍提取并不比旧实现更快）
+    # 语料：./data/llm_cache 中缓存的真实模型响应（如有）+ 内置样例，并做随机变异
+    import glob
+    import json
+    import random
+
+    sample = {
+        "stock_name": "贵州茅台",
+        "sentiment_score": 72,
+        "trend_prediction": "看多",
+        "operation_advice": "持有",
+        "confidence_level": "中",
+        "dashboard": {
+            "core_conclusion": {"one_sentence": "回踩 MA5 {支撑} 有效，持股待涨", "signal_type": "🟡持有观望"},
+            "data_perspective": {"price_position": {"current_price": 1820.0, "bias_ma5": 0.55}},
+            "intelligence": {"risk_alerts": ["大股东减持: \"2%\"", "见 https://example.com/a//b"]},
+            "battle_plan": {"action_checklist": ["✅ 多头排列", "⚠️ 量能一般 [缩量]"]},
+        },
+        "analysis_summary": "趋势完好，" * 200,
+    }
+    corpus = [json.dumps(sample, ensure_ascii=False, indent=2)]
+    for path in glob.glob('./data/llm_cache/*/*.json'):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = json.load(f).get('raw_response')
+            if raw and extract_json(raw):
+                corpus.append(raw)
+        except (OSError, ValueError):
+            continue
+
+    def mutate(text: str, rng: random.Random) -> str:
+        """随机加入说明文字、代码块标记、注释、尾随逗号、Python 字面量"""
+        choice = rng.randrange(7)
+        if choice == 0:
+            return "好的，以下是分析结果 {仅供参考}：\n```json\n" + text + "\n```\n以上。"
+        if choice == 6:
+            return "说明 {注: 仅供参考}\n" + text  # 说明文字中带冒号的 {xxx}
+        if choice == 1:
+            return text.replace(',\n', ', // 注释\n', 3)
+        if choice == 2:
+            return text.replace('\n}', ',\n}').replace('\n  ]', ',\n  ]')
+        if choice == 3:
+            return text.replace(': true', ': True').replace(': false', ': False').replace(': null', ': None')
+        if choice == 4:
+            return text[:rng.randrange(1, len(text))]  # 截断
+        return text.replace('{\n', '{ /* 块注释 */\n', 2)
+
+    def legacy_extract(text: str) -> str:
+        """旧实现：多次全量 replace + 多遍正则"""
+        cleaned = text.replace('```json', '').replace('```', '')
+        json_str = cleaned[cleaned.find('{'):cleaned.rfind('}') + 1]
+        json_str = re.sub(r'//.*?\n', '\n', json_str)
+        json_str = re.sub(r'/\*.*?\*/', '', json_str, flags=re.DOTALL)
+        json_str = re.sub(r',\s*}', '}', json_str)
+        json_str = re.sub(r',\s*]', ']', json_str)
+        return json_str.replace('True', 'true').replace('False', 'false')
+
+    rng = random.Random(42)
+    checked = 0
+    legacy_errors = 0
+    for base in corpus:
+        expected = json.loads(extract_json(base))
+        for _ in range(300):
+            variant = mutate(base, rng)
+            extracted = extract_json(variant)
+            if extracted is not None:
+                assert json.loads(extracted) == expected, variant[:200]
+                # 流式扫描器应在同一个对象处判定完成
+                scanner = IncrementalJSONScanner()
+                for i in range(0, len(variant), 37):
+                    if scanner.feed(variant[i:i + 37]):
+                        break
+                assert scanner.complete and json.loads(extract_json(scanner.json_text)) == expected, variant[:200]
+                try:
+                    if json.loads(legacy_extract(variant)) != expected:
+                        legacy_errors += 1
+                except ValueError:
+                    legacy_errors += 1
+            checked += 1
+    print(f"模糊测试通过: {len(corpus)} 条语料, {checked} 个变异样本")
+    print(f"旧实现在新实现可解析的样本上解析失败 / 结果失真: {legacy_errors} 个"
+          f"（字符串内的 // 与括号、说明文字中的 {{xxx}}、None 字面量）")
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - LLM 用量统计
+===================================
+
+职责：
+1. 从 Gemini / OpenAI 兼容 API 的响应中提取 token 用量（含提示词缓存命中数）
+2. 按模型累计输入 / 缓存命中 / 输出 token，用于衡量提示词缓存的节省效果
+3. 支持快照 + 差值汇总，每次运行结束时输出本次运行的用量
+
+各平台缓存命中字段：
+    Gemini:   usage_metadata.cached_content_token_count
+    OpenAI:   usage.prompt_tokens_details.cached_tokens
+    DeepSeek: usage.prompt_cache_hit_tokens
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = ('requests', 'prompt_tokens', 'cached_tokens', 'output_tokens')
+
+
+def _get(obj: Any, name: str) -> int:
+    """兼容对象属性与字典两种形式读取整数字段"""
+    if obj is None:
+        return 0
+    value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def extract_gemini_usage(usage_metadata: Any) -> Optional[Dict[str, int]]:
+    """
+    提取 Gemini 响应用量
+
+    Args:
+        usage_metadata: response.usage_metadata（流式时取最后一个分块）
+
+    Returns:
+        {'prompt_tokens', 'cached_tokens', 'output_tokens'}，无用量信息时返回 None
+    """
+    if usage_metadata is None:
+        return None
+    return {
+        'prompt_tokens': _get(usage_metadata, 'prompt_token_count'),
+        'cached_tokens': _get(usage_metadata, 'cached_content_token_count'),
+        'output_tokens': _get(usage_metadata, 'candidates_token_count'),
+    }
+
+
+def extract_openai_usage(usage: Any) -> Optional[Dict[str, int]]:
+    """
+    提取 OpenAI 兼容 API 响应用量
+
+    Args:
+        usage: response.usage
+
+    Returns:
+        {'prompt_tokens', 'cached_tokens', 'output_tokens'}，无用量信息时返回 None
+    """
+    if usage is None:
+        return None
+    details = usage.get('prompt_tokens_details') if isinstance(usage, dict) else getattr(usage, 'prompt_tokens_details', None)
+    cached = _get(details, 'cached_tokens') or _get(usage, 'prompt_cache_hit_tokens')
+    return {
+        'prompt_tokens': _get(usage, 'prompt_tokens'),
+        'cached_tokens': cached,
+        'output_tokens': _get(usage, 'completion_tokens'),
+    }
+
+
+class LLMUsageTracker:
+    """
+    进程级 LLM 用量统计（线程安全）
+
+    使用方式：
+        tracker = get_llm_usage_tracker()
+        before = tracker.snapshot()
+        ...  # 运行分析
+        tracker.log_summary(since=before)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record(self, model: str, usage: Optional[Dict[str, int]]) -> None:
+        """记录一次请求的用量"""
+        if not usage:
+            return
+        with self._lock:
+            stats = self._stats.setdefault(model or 'unknown', dict.fromkeys(_FIELDS, 0))
+            stats['requests'] += 1
+            stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+            stats['cached_tokens'] += usage.get('cached_tokens', 0)
+            stats['output_tokens'] += usage.get('output_tokens', 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """获取当前累计值的副本"""
+        with self._lock:
+            return {model: dict(stats) for model, stats in self._stats.items()}
+
+    def get_stats(self, since: Optional[Dict[str, Dict[str, int]]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        获取用量统计
+
+        Args:
+            since: snapshot() 返回的快照，传入时只统计快照之后的增量
+
+        Returns:
+            {模型: {requests, prompt_tokens, cached_tokens, output_tokens, cache_hit_rate}}
+        """
+        since = since or {}
+        result: Dict[str, Dict[str, Any]] = {}
+        for model, stats in self.snapshot().items():
+            base = since.get(model, {})
+            delta: Dict[str, Any] = {key: stats[key] - base.get(key, 0) for key in _FIELDS}
+            if delta['requests'] <= 0:
+                continue
+            prompt_tokens = delta['prompt_tokens']
+            delta['cache_hit_rate'] = round(delta['cached_tokens'] / prompt_tokens, 4) if prompt_tokens else 0.0
+            result[model] = delta
+        return result
+
+    def log_summary(self, since: Optional[Dict[str, Dict[str, int]]] = None) -> None:
+        """输出用量汇总日志"""
+        stats = self.get_stats(since)
+        if not stats:
+            return
+        for model, item in stats.items():
+            logger.info(
+                f"[LLM用量] {model}: 请求 {item['requests']} 次, 输入 {item['prompt_tokens']} tokens "
+                f"(缓存命中 {item['cached_tokens']}, {item['cache_hit_rate']:.1%}), 输出 {item['output_tokens']} tokens"
+            )
+
+    def reset(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._stats.clear()
+
+
+# 全局用量统计实例
+_usage_tracker: Optional[LLMUsageTracker] = None
+_usage_tracker_lock = threading.Lock()
+
+
+def get_llm_usage_tracker() -> LLMUsageTracker:
+    """获取全局 LLM 用量统计实例"""
+    global _usage_tracker
+    if _usage_tracker is None:
+        with _usage_tracker_lock:
+            if _usage_tracker is None:
+                _usage_tracker = LLMUsageTracker()
+    return _usage_tracker
+
+
+def reset_llm_usage_tracker() -> None:
+    """重置全局用量统计实例（主要用于测试）"""
+    global _usage_tracker
+    _usage_tracker = None
+
+
+if __name__ == "__main__":
+    # 本地替身：按各平台响应结构构造用量对象，验证字段提取与汇总
+    from types import SimpleNamespace
+
+    logging.basicConfig(level=logging.INFO)
+
+    gemini_usage = SimpleNamespace(prompt_token_count=2600, cached_content_token_count=1900, candidates_token_count=900)
+    openai_usage = SimpleNamespace(
+        prompt_tokens=2600,
+        completion_tokens=800,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1920),
+    )
+    deepseek_usage = {'prompt_tokens': 2600, 'completion_tokens': 700, 'prompt_cache_hit_tokens': 1856}
+
+    assert extract_gemini_usage(gemini_usage) == {'prompt_tokens': 2600, 'cached_tokens': 1900, 'output_tokens': 900}
+    assert extract_openai_usage(openai_usage)['cached_tokens'] == 1920
+    assert extract_openai_usage(deepseek_usage)['cached_tokens'] == 1856
+    assert extract_gemini_usage(None) is None
+
+    tracker = LLMUsageTracker()
+    tracker.record('gemini-2.5-flash', extract_gemini_usage(gemini_usage))
+    before = tracker.snapshot()
+    tracker.record('gemini-2.5-flash', extract_gemini_usage(gemini_usage))
+    tracker.record('deepseek-chat', extract_openai_usage(deepseek_usage))
+
+    stats = tracker.get_stats(since=before)
+    assert stats['gemini-2.5-flash']['requests'] == 1
+    assert stats['deepseek-chat']['cached_tokens'] == 1856
+    tracker.log_summary(since=before)
+    print("用量提取与汇总验证通过")
+
+    # 请求结构：系统提示词（静态前缀）只进入 CachedContent，生成请求只发送个股数据（动态后缀）；
+    # OpenAI 兼容接口的消息顺序固定为 system -> user
+    import sys
+    import types
+    from unittest import mock
+
+    from src import analyzer as analyzer_module
+    from src.analyzer import GeminiAnalyzer
+
+    calls: Dict[str, Any] = {}
+
+    def fake_create(**kwargs):
+        if kwargs['model'].endswith('timeout'):
+            raise TimeoutError('deadline exceeded')
+        if kwargs['model'].endswith('legacy'):
+            raise type('InvalidArgument', (Exception,), {'code': 400})('model does not support caching')
+        calls['cache'] = kwargs
+        return 'cached-content'
+
+    def fake_generate(contents, **kwargs):
+        calls['contents'] = contents
+        return iter(())
+
+    caching = types.ModuleType('google.generativeai.caching')
+    caching.CachedContent = SimpleNamespace(create=fake_create)
+    genai = types.ModuleType('google.generativeai')
+    genai.caching = caching
+    genai.GenerativeModel = SimpleNamespace(
+        from_cached_content=lambda cached_content: SimpleNamespace(generate_content=fake_generate)
+    )
+    google = types.ModuleType('google')
+    google.generativeai = genai
+
+    analyzer = GeminiAnalyzer.__new__(GeminiAnalyzer)
+    analyzer._model = SimpleNamespace(generate_content=None)  # 未走缓存时的普通模型
+    analyzer._openai_client = None
+    config = analyzer_module.get_config()
+    with mock.patch.dict(sys.modules, {'google': google, 'google.generativeai': genai,
+                                       'google.generativeai.caching': caching}), \
+            mock.patch.object(config, 'gemini_context_cache_enabled', True):
+        analyzer._current_model_name = 'gemini-test'
+        analyzer._stream_gemini("## 个股数据 600519", {'temperature': 0.7})
+        assert calls['cache']['system_instruction'] == GeminiAnalyzer.SYSTEM_PROMPT
+        assert calls['cache']['model'] == 'models/gemini-test'
+        assert calls['contents'] == "## 个股数据 600519", "生成请求应只包含动态后缀"
+
+        # 临时失败（超时 / 429）稍后重试，不永久标记为不支持；400/404 才回退为隐式前缀缓存
+        analyzer._current_model_name = 'gemini-timeout'
+        assert analyzer._get_gemini_model() is analyzer._model
+        assert 'gemini-timeout' not in analyzer_module._context_cache_unsupported
+        assert 'gemini-timeout' in analyzer_module._context_cache_retry_at
+        analyzer._current_model_name = 'gemini-legacy'
+        assert analyzer._get_gemini_model() is analyzer._model
+        assert 'gemini-legacy' in analyzer_module._context_cache_unsupported
+
+    messages = analyzer._build_openai_messages("## 个股数据 600519")
+    assert [m['role'] for m in messages] == ['system', 'user']
+    assert messages[0]['content'] == GeminiAnalyzer.SYSTEM_PROMPT
+    assert messages[1]['content'] == "## 个股数据 600519"
+    print("上下文缓存请求结构验证通过")
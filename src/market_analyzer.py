@@ -19,6 +19,8 @@ from typing import Optional, Dict, Any, List
 import pandas as pd
 
 from src.config import get_config
+from src.llm_dispatcher import estimate_tokens, get_llm_dispatcher
+from src.llm_usage import extract_gemini_usage, get_llm_usage_tracker
 from src.search_service import SearchService
 from data_provider.base import DataFetcherManager
 
@@ -297,12 +299,18 @@ class MarketAnalyzer:
             # 根据 analyzer 使用的 API 类型调用
             if self.analyzer._use_openai:
                 # 使用 OpenAI 兼容 API
-                review = self.analyzer._call_openai_api(prompt, generation_config)
+                review = self.analyzer._call_openai_api(prompt, generation_config, stop_at_json=False)
             else:
-                # 使用 Gemini API
-                response = self.analyzer._model.generate_content(
-                    prompt,
-                    generation_config=generation_config,
+                # 使用 Gemini API（与个股分析共享同一模型的 RPM/TPM 预算）
+                dispatcher = get_llm_dispatcher(self.analyzer._current_model_name)
+                with dispatcher.slot(estimate_tokens(prompt) + generation_config['max_output_tokens']):
+                    response = self.analyzer._get_gemini_model().generate_content(
+                        prompt,
+                        generation_config=generation_config,
+                    )
+                get_llm_usage_tracker().record(
+                    self.analyzer._current_model_name,
+                    extract_gemini_usage(getattr(response, 'usage_metadata', None))
                 )
                 review = response.text.strip() if response and response.text else None
             
@@ -19,15 +19,18 @@ import logging
 import json
 import smtplib
 import re
+import time
 import markdown2
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
 from enum import Enum
 
-import requests
 try:
     import discord
     discord_available = True
@@ -35,13 +38,33 @@ except ImportError:
     discord_available = False
 
 from src.config import get_config
+from src.http_client import get_http_client
+from src.smtp_client import SmtpDeliveryUncertain, SmtpEndpoint, get_smtp_client
 from src.analyzer import AnalysisResult
 from src.formatters import format_feishu_markdown
+from src.chunking import PLAIN_SEPARATORS, chunk_text, send_chunked, truncate_to_bytes
+from src.report_builder import (
+    build_daily_document, build_dashboard_document, build_single_stock_digest, build_single_stock_document,
+    build_wechat_dashboard_document, get_signal_level,
+)
+from src.report_model import FORMAT_PLAIN, FORMAT_TELEGRAM, find_document, wrap_email_html
+from src.report_writer import atomic_write_text, get_reports_dir
 from bot.models import BotMessage
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=8)
+def _render_markdown_html(markdown_text: str) -> str:
+    """markdown2 转换邮件 HTML（同一内容只转换一次，发件箱重试 / 多次推送直接复用）"""
+    # 使用 markdown2 转换，开启表格和其他扩展支持
+    html_content = markdown2.markdown(
+        markdown_text,
+        extras=["tables", "fenced-code-blocks", "break-on-newline", "cuddled-lists"]
+    )
+    return wrap_email_html(html_content)
+
+
 class NotificationChannel(Enum):
     """通知渠道类型"""
     WECHAT = "wechat"      # 企业微信
@@ -104,6 +127,30 @@ class ChannelDetector:
         return names.get(channel, "未知渠道")
 
 
+@dataclass
+class ChannelDeliveryResult:
+    """
+    单个渠道的投递结果
+
+    超过时限的渠道仍在后台发送，结果未知（in_flight）：既不算成功也不算失败，调用方不应重发
+    """
+    channel: str  # 渠道名称
+    success: bool = False
+    elapsed: float = 0.0  # 耗时（秒），超时渠道为截止时的耗时
+    timed_out: bool = False
+    error: Optional[str] = None
+
+    @property
+    def in_flight(self) -> bool:
+        """超过时限、仍在后台发送（可能已送达）"""
+        return self.timed_out
+
+    @property
+    def failed(self) -> bool:
+        """确定未送达（可以重发）"""
+        return not self.success and not self.timed_out
+
+
 class NotificationService:
     """
     通知服务
@@ -329,183 +376,7 @@ class NotificationService:
         Returns:
             Markdown 格式的日报内容
         """
-        if report_date is None:
-            report_date = datetime.now().strftime('%Y-%m-%d')
-
-        # 标题
-        report_lines = [
-            f"# 📅 {report_date} 股票智能分析报告",
-            "",
-            f"> 共分析 **{len(results)}** 只股票 | 报告生成时间：{datetime.now().strftime('%H:%M:%S')}",
-            "",
-            "---",
-            "",
-        ]
-        
-        # 按评分排序（高分在前）
-        sorted_results = sorted(
-            results, 
-            key=lambda x: x.sentiment_score, 
-            reverse=True
-        )
-        
-        # 统计信息
-        buy_count = sum(1 for r in results if r.operation_advice in ['买入', '加仓', '强烈买入'])
-        sell_count = sum(1 for r in results if r.operation_advice in ['卖出', '减仓', '强烈卖出'])
-        hold_count = sum(1 for r in results if r.operation_advice in ['持有', '观望'])
-        avg_score = sum(r.sentiment_score for r in results) / len(results) if results else 0
-        
-        report_lines.extend([
-            "## 📊 操作建议汇总",
-            "",
-            "| 指标 | 数值 |",
-            "|------|------|",
-            f"| 🟢 建议买入/加仓 | **{buy_count}** 只 |",
-            f"| 🟡 建议持有/观望 | **{hold_count}** 只 |",
-            f"| 🔴 建议减仓/卖出 | **{sell_count}** 只 |",
-            f"| 📈 平均看多评分 | **{avg_score:.1f}** 分 |",
-            "",
-            "---",
-            "",
-            "## 📈 个股详细分析",
-            "",
-        ])
-        
-        # 逐个股票的详细分析
-        for result in sorted_results:
-            emoji = result.get_emoji()
-            confidence_stars = result.get_confidence_stars() if hasattr(result, 'get_confidence_stars') else '⭐⭐'
-            
-            report_lines.extend([
-                f"### {emoji} {result.name} ({result.code})",
-                "",
-                f"**操作建议：{result.operation_advice}** | **综合评分：{result.sentiment_score}分** | **趋势预测：{result.trend_prediction}** | **置信度：{confidence_stars}**",
-                "",
-            ])
-            
-            # 核心看点
-            if hasattr(result, 'key_points') and result.key_points:
-                report_lines.extend([
-                    f"**🎯 核心看点**：{result.key_points}",
-                    "",
-                ])
-            
-            # 买入/卖出理由
-            if hasattr(result, 'buy_reason') and result.buy_reason:
-                report_lines.extend([
-                    f"**💡 操作理由**：{result.buy_reason}",
-                    "",
-                ])
-            
-            # 走势分析
-            if hasattr(result, 'trend_analysis') and result.trend_analysis:
-                report_lines.extend([
-                    "#### 📉 走势分析",
-                    f"{result.trend_analysis}",
-                    "",
-                ])
-            
-            # 短期/中期展望
-            outlook_lines = []
-            if hasattr(result, 'short_term_outlook') and result.short_term_outlook:
-                outlook_lines.append(f"- **短期（1-3日）**：{result.short_term_outlook}")
-            if hasattr(result, 'medium_term_outlook') and result.medium_term_outlook:
-                outlook_lines.append(f"- **中期（1-2周）**：{result.medium_term_outlook}")
-            if outlook_lines:
-                report_lines.extend([
-                    "#### 🔮 市场展望",
-                    *outlook_lines,
-                    "",
-                ])
-            
-            # 技术面分析
-            tech_lines = []
-            if result.technical_analysis:
-                tech_lines.append(f"**综合**：{result.technical_analysis}")
-            if hasattr(result, 'ma_analysis') and result.ma_analysis:
-                tech_lines.append(f"**均线**：{result.ma_analysis}")
-            if hasattr(result, 'volume_analysis') and result.volume_analysis:
-                tech_lines.append(f"**量能**：{result.volume_analysis}")
-            if hasattr(result, 'pattern_analysis') and result.pattern_analysis:
-                tech_lines.append(f"**形态**：{result.pattern_analysis}")
-            if tech_lines:
-                report_lines.extend([
-                    "#### 📊 技术面分析",
-                    *tech_lines,
-                    "",
-                ])
-            
-            # 基本面分析
-            fund_lines = []
-            if hasattr(result, 'fundamental_analysis') and result.fundamental_analysis:
-                fund_lines.append(result.fundamental_analysis)
-            if hasattr(result, 'sector_position') and result.sector_position:
-                fund_lines.append(f"**板块地位**：{result.sector_position}")
-            if hasattr(result, 'company_highlights') and result.company_highlights:
-                fund_lines.append(f"**公司亮点**：{result.company_highlights}")
-            if fund_lines:
-                report_lines.extend([
-                    "#### 🏢 基本面分析",
-                    *fund_lines,
-                    "",
-                ])
-            
-            # 消息面/情绪面
-            news_lines = []
-            if result.news_summary:
-                news_lines.append(f"**新闻摘要**：{result.news_summary}")
-            if hasattr(result, 'market_sentiment') and result.market_sentiment:
-                news_lines.append(f"**市场情绪**：{result.market_sentiment}")
-            if hasattr(result, 'hot_topics') and result.hot_topics:
-                news_lines.append(f"**相关热点**：{result.hot_topics}")
-            if news_lines:
-                report_lines.extend([
-                    "#### 📰 消息面/情绪面",
-                    *news_lines,
-                    "",
-                ])
-            
-            # 综合分析
-            if result.analysis_summary:
-                report_lines.extend([
-                    "#### 📝 综合分析",
-                    result.analysis_summary,
-                    "",
-                ])
-            
-            # 风险提示
-            if hasattr(result, 'risk_warning') and result.risk_warning:
-                report_lines.extend([
-                    f"⚠️ **风险提示**：{result.risk_warning}",
-                    "",
-                ])
-            
-            # 数据来源说明
-            if hasattr(result, 'search_performed') and result.search_performed:
-                report_lines.append("*🔍 已执行联网搜索*")
-            if hasattr(result, 'data_sources') and result.data_sources:
-                report_lines.append(f"*📋 数据来源：{result.data_sources}*")
-            
-            # 错误信息（如果有）
-            if not result.success and result.error_message:
-                report_lines.extend([
-                    "",
-                    f"❌ **分析异常**：{result.error_message[:100]}",
-                ])
-            
-            report_lines.extend([
-                "",
-                "---",
-                "",
-            ])
-        
-        # 底部信息（去除免责声明）
-        report_lines.extend([
-            "",
-            f"*报告生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*",
-        ])
-        
-        return "\n".join(report_lines)
+        return build_daily_document(results, report_date).markdown
     
     def _get_signal_level(self, result: AnalysisResult) -> tuple:
         """
@@ -514,23 +385,7 @@ class NotificationService:
         Returns:
             (信号文字, emoji, 颜色标记)
         """
-        advice = result.operation_advice
-        score = result.sentiment_score
-        
-        if advice in ['强烈买入'] or score >= 80:
-            return ('强烈买入', '💚', '强买')
-        elif advice in ['买入', '加仓'] or score >= 65:
-            return ('买入', '🟢', '买入')
-        elif advice in ['持有'] or 55 <= score < 65:
-            return ('持有', '🟡', '持有')
-        elif advice in ['观望'] or 45 <= score < 55:
-            return ('观望', '⚪', '观望')
-        elif advice in ['减仓'] or 35 <= score < 45:
-            return ('减仓', '🟠', '减仓')
-        elif advice in ['卖出', '强烈卖出'] or score < 35:
-            return ('卖出', '🔴', '卖出')
-        else:
-            return ('观望', '⚪', '观望')
+        return get_signal_level(result)
     
     def generate_dashboard_report(
         self,
@@ -547,272 +402,9 @@ class NotificationService:
             report_date: 报告日期（默认今天）
 
         Returns:
-            Markdown 格式的决策仪表盘日报
+            Markdown 格式的决策仪表盘日报（文档已登记，各渠道发送时直接取对应格式的渲染结果）
         """
-        if report_date is None:
-            report_date = datetime.now().strftime('%Y-%m-%d')
-
-        # 按评分排序（高分在前）
-        sorted_results = sorted(results, key=lambda x: x.sentiment_score, reverse=True)
-
-        # 统计信息
-        buy_count = sum(1 for r in results if r.operation_advice in ['买入', '加仓', '强烈买入'])
-        sell_count = sum(1 for r in results if r.operation_advice in ['卖出', '减仓', '强烈卖出'])
-        hold_count = sum(1 for r in results if r.operation_advice in ['持有', '观望'])
-
-        report_lines = [
-            f"# 🎯 {report_date} 决策仪表盘",
-            "",
-            f"> 共分析 **{len(results)}** 只股票 | 🟢买入:{buy_count} 🟡观望:{hold_count} 🔴卖出:{sell_count}",
-            "",
-        ]
-
-        # === 新增：分析结果摘要 (Issue #112) ===
-        if results:
-            report_lines.extend([
-                "## 📊 分析结果摘要",
-                "",
-            ])
-            for r in sorted_results:
-                emoji = r.get_emoji()
-                report_lines.append(
-                    f"{emoji} **{r.name}({r.code})**: {r.operation_advice} | "
-                    f"评分 {r.sentiment_score} | {r.trend_prediction}"
-                )
-            report_lines.extend([
-                "",
-                "---",
-                "",
-            ])
-
-        # 逐个股票的决策仪表盘
-        for result in sorted_results:
-            signal_text, signal_emoji, signal_tag = self._get_signal_level(result)
-            dashboard = result.dashboard if hasattr(result, 'dashboard') and result.dashboard else {}
-            
-            # 股票名称（优先使用 dashboard 或 result 中的名称）
-            stock_name = result.name if result.name and not result.name.startswith('股票') else f'股票{result.code}'
-            
-            report_lines.extend([
-                f"## {signal_emoji} {stock_name} ({result.code})",
-                "",
-            ])
-            
-            # ========== 舆情与基本面概览（放在最前面）==========
-            intel = dashboard.get('intelligence', {}) if dashboard else {}
-            if intel:
-                report_lines.extend([
-                    "### 📰 重要信息速览",
-                    "",
-                ])
-                
-                # 舆情情绪总结
-                if intel.get('sentiment_summary'):
-                    report_lines.append(f"**💭 舆情情绪**: {intel['sentiment_summary']}")
-                
-                # 业绩预期
-                if intel.get('earnings_outlook'):
-                    report_lines.append(f"**📊 业绩预期**: {intel['earnings_outlook']}")
-                
-                # 风险警报（醒目显示）
-                risk_alerts = intel.get('risk_alerts', [])
-                if risk_alerts:
-                    report_lines.append("")
-                    report_lines.append("**🚨 风险警报**:")
-                    for alert in risk_alerts:
-                        report_lines.append(f"- {alert}")
-                
-                # 利好催化
-                catalysts = intel.get('positive_catalysts', [])
-                if catalysts:
-                    report_lines.append("")
-                    report_lines.append("**✨ 利好催化**:")
-                    for cat in catalysts:
-                        report_lines.append(f"- {cat}")
-                
-                # 最新消息
-                if intel.get('latest_news'):
-                    report_lines.append("")
-                    report_lines.append(f"**📢 最新动态**: {intel['latest_news']}")
-                
-                report_lines.append("")
-            
-            # ========== 核心结论 ==========
-            core = dashboard.get('core_conclusion', {}) if dashboard else {}
-            one_sentence = core.get('one_sentence', result.analysis_summary)
-            time_sense = core.get('time_sensitivity', '本周内')
-            pos_advice = core.get('position_advice', {})
-            
-            report_lines.extend([
-                "### 📌 核心结论",
-                "",
-                f"**{signal_emoji} {signal_text}** | {result.trend_prediction}",
-                "",
-                f"> **一句话决策**: {one_sentence}",
-                "",
-                f"⏰ **时效性**: {time_sense}",
-                "",
-            ])
-            
-            # 持仓分类建议
-            if pos_advice:
-                report_lines.extend([
-                    "| 持仓情况 | 操作建议 |",
-                    "|---------|---------|",
-                    f"| 🆕 **空仓者** | {pos_advice.get('no_position', result.operation_advice)} |",
-                    f"| 💼 **持仓者** | {pos_advice.get('has_position', '继续持有')} |",
-                    "",
-                ])
-            
-            # ========== 数据透视 ==========
-            data_persp = dashboard.get('data_perspective', {}) if dashboard else {}
-            if data_persp:
-                trend_data = data_persp.get('trend_status', {})
-                price_data = data_persp.get('price_position', {})
-                vol_data = data_persp.get('volume_analysis', {})
-                chip_data = data_persp.get('chip_structure', {})
-                
-                report_lines.extend([
-                    "### 📊 数据透视",
-                    "",
-                ])
-                
-                # 趋势状态
-                if trend_data:
-                    is_bullish = "✅ 是" if trend_data.get('is_bullish', False) else "❌ 否"
-                    report_lines.extend([
-                        f"**均线排列**: {trend_data.get('ma_alignment', 'N/A')} | 多头排列: {is_bullish} | 趋势强度: {trend_data.get('trend_score', 'N/A')}/100",
-                        "",
-                    ])
-                
-                # 价格位置
-                if price_data:
-                    bias_status = price_data.get('bias_status', 'N/A')
-                    bias_emoji = "✅" if bias_status == "安全" else ("⚠️" if bias_status == "警戒" else "🚨")
-                    report_lines.extend([
-                        "| 价格指标 | 数值 |",
-                        "|---------|------|",
-                        f"| 当前价 | {price_data.get('current_price', 'N/A')} |",
-                        f"| MA5 | {price_data.get('ma5', 'N/A')} |",
-                        f"| MA10 | {price_data.get('ma10', 'N/A')} |",
-                        f"| MA20 | {price_data.get('ma20', 'N/A')} |",
-                        f"| 乖离率(MA5) | {price_data.get('bias_ma5', 'N/A')}% {bias_emoji}{bias_status} |",
-                        f"| 支撑位 | {price_data.get('support_level', 'N/A')} |",
-                        f"| 压力位 | {price_data.get('resistance_level', 'N/A')} |",
-                        "",
-                    ])
-                
-                # 量能分析
-                if vol_data:
-                    report_lines.extend([
-                        f"**量能**: 量比 {vol_data.get('volume_ratio', 'N/A')} ({vol_data.get('volume_status', '')}) | 换手率 {vol_data.get('turnover_rate', 'N/A')}%",
-                        f"💡 *{vol_data.get('volume_meaning', '')}*",
-                        "",
-                    ])
-                
-                # 筹码结构
-                if chip_data:
-                    chip_health = chip_data.get('chip_health', 'N/A')
-                    chip_emoji = "✅" if chip_health == "健康" else ("⚠️" if chip_health == "一般" else "🚨")
-                    report_lines.extend([
-                        f"**筹码**: 获利比例 {chip_data.get('profit_ratio', 'N/A')} | 平均成本 {chip_data.get('avg_cost', 'N/A')} | 集中度 {chip_data.get('concentration', 'N/A')} {chip_emoji}{chip_health}",
-                        "",
-                    ])
-            
-            # 舆情情报已移至顶部显示
-            
-            # ========== 作战计划 ==========
-            battle = dashboard.get('battle_plan', {}) if dashboard else {}
-            if battle:
-                report_lines.extend([
-                    "### 🎯 作战计划",
-                    "",
-                ])
-                
-                # 狙击点位
-                sniper = battle.get('sniper_points', {})
-                if sniper:
-                    report_lines.extend([
-                        "**📍 狙击点位**",
-                        "",
-                        "| 点位类型 | 价格 |",
-                        "|---------|------|",
-                        f"| 🎯 理想买入点 | {sniper.get('ideal_buy', 'N/A')} |",
-                        f"| 🔵 次优买入点 | {sniper.get('secondary_buy', 'N/A')} |",
-                        f"| 🛑 止损位 | {sniper.get('stop_loss', 'N/A')} |",
-                        f"| 🎊 目标位 | {sniper.get('take_profit', 'N/A')} |",
-                        "",
-                    ])
-                
-                # 仓位策略
-                position = battle.get('position_strategy', {})
-                if position:
-                    report_lines.extend([
-                        f"**💰 仓位建议**: {position.get('suggested_position', 'N/A')}",
-                        f"- 建仓策略: {position.get('entry_plan', 'N/A')}",
-                        f"- 风控策略: {position.get('risk_control', 'N/A')}",
-                        "",
-                    ])
-                
-                # 检查清单
-                checklist = battle.get('action_checklist', []) if battle else []
-                if checklist:
-                    report_lines.extend([
-                        "**✅ 检查清单**",
-                        "",
-                    ])
-                    for item in checklist:
-                        report_lines.append(f"- {item}")
-                    report_lines.append("")
-            
-            # 如果没有 dashboard，显示传统格式
-            if not dashboard:
-                # 操作理由
-                if result.buy_reason:
-                    report_lines.extend([
-                        f"**💡 操作理由**: {result.buy_reason}",
-                        "",
-                    ])
-                
-                # 风险提示
-                if result.risk_warning:
-                    report_lines.extend([
-                        f"**⚠️ 风险提示**: {result.risk_warning}",
-                        "",
-                    ])
-                
-                # 技术面分析
-                if result.ma_analysis or result.volume_analysis:
-                    report_lines.extend([
-                        "### 📊 技术面",
-                        "",
-                    ])
-                    if result.ma_analysis:
-                        report_lines.append(f"**均线**: {result.ma_analysis}")
-                    if result.volume_analysis:
-                        report_lines.append(f"**量能**: {result.volume_analysis}")
-                    report_lines.append("")
-                
-                # 消息面
-                if result.news_summary:
-                    report_lines.extend([
-                        "### 📰 消息面",
-                        f"{result.news_summary}",
-                        "",
-                    ])
-            
-            report_lines.extend([
-                "---",
-                "",
-            ])
-        
-        # 底部（去除免责声明）
-        report_lines.extend([
-            "",
-            f"*报告生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*",
-        ])
-        
-        return "\n".join(report_lines)
+        return build_dashboard_document(results, report_date).markdown
     
     def generate_wechat_dashboard(self, results: List[AnalysisResult]) -> str:
         """
@@ -826,128 +418,7 @@ class NotificationService:
         Returns:
             精简版决策仪表盘
         """
-        report_date = datetime.now().strftime('%Y-%m-%d')
-        
-        # 按评分排序
-        sorted_results = sorted(results, key=lambda x: x.sentiment_score, reverse=True)
-        
-        # 统计
-        buy_count = sum(1 for r in results if r.operation_advice in ['买入', '加仓', '强烈买入'])
-        sell_count = sum(1 for r in results if r.operation_advice in ['卖出', '减仓', '强烈卖出'])
-        hold_count = sum(1 for r in results if r.operation_advice in ['持有', '观望'])
-        
-        lines = [
-            f"## 🎯 {report_date} 决策仪表盘",
-            "",
-            f"> {len(results)}只股票 | 🟢买入:{buy_count} 🟡观望:{hold_count} 🔴卖出:{sell_count}",
-            "",
-        ]
-        
-        for result in sorted_results:
-            signal_text, signal_emoji, _ = self._get_signal_level(result)
-            dashboard = result.dashboard if hasattr(result, 'dashboard') and result.dashboard else {}
-            core = dashboard.get('core_conclusion', {}) if dashboard else {}
-            battle = dashboard.get('battle_plan', {}) if dashboard else {}
-            intel = dashboard.get('intelligence', {}) if dashboard else {}
-            
-            # 股票名称
-            stock_name = result.name if result.name and not result.name.startswith('股票') else f'股票{result.code}'
-            
-            # 标题行：信号等级 + 股票名称
-            lines.append(f"### {signal_emoji} **{signal_text}** | {stock_name}({result.code})")
-            lines.append("")
-            
-            # 核心决策（一句话）
-            one_sentence = core.get('one_sentence', result.analysis_summary) if core else result.analysis_summary
-            if one_sentence:
-                lines.append(f"📌 **{one_sentence[:80]}**")
-                lines.append("")
-            
-            # 重要信息区（舆情+基本面）
-            info_lines = []
-            
-            # 业绩预期
-            if intel.get('earnings_outlook'):
-                outlook = intel['earnings_outlook'][:60]
-                info_lines.append(f"📊 业绩: {outlook}")
-            
-            # 舆情情绪
-            if intel.get('sentiment_summary'):
-                sentiment = intel['sentiment_summary'][:50]
-                info_lines.append(f"💭 舆情: {sentiment}")
-            
-            if info_lines:
-                lines.extend(info_lines)
-                lines.append("")
-            
-            # 风险警报（最重要，醒目显示）
-            risks = intel.get('risk_alerts', []) if intel else []
-            if risks:
-                lines.append("🚨 **风险**:")
-                for risk in risks[:2]:  # 最多显示2条
-                    risk_text = risk[:50] + "..." if len(risk) > 50 else risk
-                    lines.append(f"   • {risk_text}")
-                lines.append("")
-            
-            # 利好催化
-            catalysts = intel.get('positive_catalysts', []) if intel else []
-            if catalysts:
-                lines.append("✨ **利好**:")
-                for cat in catalysts[:2]:  # 最多显示2条
-                    cat_text = cat[:50] + "..." if len(cat) > 50 else cat
-                    lines.append(f"   • {cat_text}")
-                lines.append("")
-            
-            # 狙击点位
-            sniper = battle.get('sniper_points', {}) if battle else {}
-            if sniper:
-                ideal_buy = sniper.get('ideal_buy', '')
-                stop_loss = sniper.get('stop_loss', '')
-                take_profit = sniper.get('take_profit', '')
-                
-                points = []
-                if ideal_buy:
-                    points.append(f"🎯买点:{ideal_buy[:15]}")
-                if stop_loss:
-                    points.append(f"🛑止损:{stop_loss[:15]}")
-                if take_profit:
-                    points.append(f"🎊目标:{take_profit[:15]}")
-                
-                if points:
-                    lines.append(" | ".join(points))
-                    lines.append("")
-            
-            # 持仓建议
-            pos_advice = core.get('position_advice', {}) if core else {}
-            if pos_advice:
-                no_pos = pos_advice.get('no_position', '')
-                has_pos = pos_advice.get('has_position', '')
-                if no_pos:
-                    lines.append(f"🆕 空仓者: {no_pos[:50]}")
-                if has_pos:
-                    lines.append(f"💼 持仓者: {has_pos[:50]}")
-                lines.append("")
-            
-            # 检查清单简化版
-            checklist = battle.get('action_checklist', []) if battle else []
-            if checklist:
-                # 只显示不通过的项目
-                failed_checks = [c for c in checklist if c.startswith('❌') or c.startswith('⚠️')]
-                if failed_checks:
-                    lines.append("**检查未通过项**:")
-                    for check in failed_checks[:3]:
-                        lines.append(f"   {check[:40]}")
-                    lines.append("")
-            
-            lines.append("---")
-            lines.append("")
-        
-        # 底部
-        lines.append(f"*生成时间: {datetime.now().strftime('%H:%M')}*")
-        
-        content = "\n".join(lines)
-        
-        return content
+        return build_wechat_dashboard_document(results).markdown
     
     def generate_wechat_summary(self, results: List[AnalysisResult]) -> str:
         """
@@ -1025,105 +496,21 @@ class NotificationService:
         Returns:
             Markdown 格式的单股报告
         """
-        report_date = datetime.now().strftime('%Y-%m-%d %H:%M')
-        signal_text, signal_emoji, _ = self._get_signal_level(result)
-        dashboard = result.dashboard if hasattr(result, 'dashboard') and result.dashboard else {}
-        core = dashboard.get('core_conclusion', {}) if dashboard else {}
-        battle = dashboard.get('battle_plan', {}) if dashboard else {}
-        intel = dashboard.get('intelligence', {}) if dashboard else {}
-        
-        # 股票名称
-        stock_name = result.name if result.name and not result.name.startswith('股票') else f'股票{result.code}'
-        
-        lines = [
-            f"## {signal_emoji} {stock_name} ({result.code})",
-            "",
-            f"> {report_date} | 评分: **{result.sentiment_score}** | {result.trend_prediction}",
-            "",
-        ]
-        
-        # 核心决策（一句话）
-        one_sentence = core.get('one_sentence', result.analysis_summary) if core else result.analysis_summary
-        if one_sentence:
-            lines.extend([
-                "### 📌 核心结论",
-                "",
-                f"**{signal_text}**: {one_sentence}",
-                "",
-            ])
-        
-        # 重要信息（舆情+基本面）
-        info_added = False
-        if intel:
-            if intel.get('earnings_outlook'):
-                if not info_added:
-                    lines.append("### 📰 重要信息")
-                    lines.append("")
-                    info_added = True
-                lines.append(f"📊 **业绩预期**: {intel['earnings_outlook'][:100]}")
-            
-            if intel.get('sentiment_summary'):
-                if not info_added:
-                    lines.append("### 📰 重要信息")
-                    lines.append("")
-                    info_added = True
-                lines.append(f"💭 **舆情情绪**: {intel['sentiment_summary'][:80]}")
-            
-            # 风险警报
-            risks = intel.get('risk_alerts', [])
-            if risks:
-                if not info_added:
-                    lines.append("### 📰 重要信息")
-                    lines.append("")
-                    info_added = True
-                lines.append("")
-                lines.append("🚨 **风险警报**:")
-                for risk in risks[:3]:
-                    lines.append(f"- {risk[:60]}")
-            
-            # 利好催化
-            catalysts = intel.get('positive_catalysts', [])
-            if catalysts:
-                lines.append("")
-                lines.append("✨ **利好催化**:")
-                for cat in catalysts[:3]:
-                    lines.append(f"- {cat[:60]}")
-        
-        if info_added:
-            lines.append("")
-        
-        # 狙击点位
-        sniper = battle.get('sniper_points', {}) if battle else {}
-        if sniper:
-            lines.extend([
-                "### 🎯 操作点位",
-                "",
-                "| 买点 | 止损 | 目标 |",
-                "|------|------|------|",
-            ])
-            ideal_buy = sniper.get('ideal_buy', '-')
-            stop_loss = sniper.get('stop_loss', '-')
-            take_profit = sniper.get('take_profit', '-')
-            lines.append(f"| {ideal_buy} | {stop_loss} | {take_profit} |")
-            lines.append("")
-        
-        # 持仓建议
-        pos_advice = core.get('position_advice', {}) if core else {}
-        if pos_advice:
-            lines.extend([
-                "### 💼 持仓建议",
-                "",
-                f"- 🆕 **空仓者**: {pos_advice.get('no_position', result.operation_advice)}",
-                f"- 💼 **持仓者**: {pos_advice.get('has_position', '继续持有')}",
-                "",
-            ])
-        
-        lines.extend([
-            "---",
-            "*AI生成，仅供参考，不构成投资建议*",
-        ])
-        
-        return "\n".join(lines)
+        return build_single_stock_document(result).markdown
+
+    def generate_single_stock_digest(self, results: List[AnalysisResult]) -> str:
+        """
+        生成多只股票的合并精简报告（单股推送合并模式，一个时间窗口内完成的股票合并为一条消息）
+
+        Args:
+            results: 按完成顺序排列的分析结果
+
+        Returns:
+            Markdown 格式的合并报告
+        """
+        if len(results) == 1:
+            return self.generate_single_stock_report(results[0])
+        return build_single_stock_digest(results).markdown
     
     def send_to_wechat(self, content: str) -> bool:
         """
@@ -1180,7 +567,7 @@ class NotificationService:
         """
         分批发送长消息到企业微信
         
-        按股票分析块（以 --- 或 ### 分隔）智能分割，确保每批不超过限制
+        按股票分析块（--- 分隔线 > 标题 > 段落 > 行）分割，确保每批（含分页标记）不超过限制
         
         Args:
             content: 完整消息内容
@@ -1189,173 +576,18 @@ class NotificationService:
         Returns:
             是否全部发送成功
         """
-        import time
-        
-        def get_bytes(s: str) -> int:
-            """获取字符串的 UTF-8 字节数"""
-            return len(s.encode('utf-8'))
-        
-        # 智能分割：优先按 "---" 分隔（股票之间的分隔线）
-        # 其次尝试各级标题分割
-        if "\n---\n" in content:
-            sections = content.split("\n---\n")
-            separator = "\n---\n"
-        elif "\n### " in content:
-            # 按 ### 分割
-            parts = content.split("\n### ")
-            sections = [parts[0]] + [f"### {p}" for p in parts[1:]]
-            separator = "\n"
-        elif "\n## " in content:
-            # 按 ## 分割 (兼容二级标题)
-            parts = content.split("\n## ")
-            sections = [parts[0]] + [f"## {p}" for p in parts[1:]]
-            separator = "\n"
-        elif "\n**" in content:
-            # 按 ** 加粗标题分割 (兼容 AI 未输出标准 Markdown 标题的情况)
-            parts = content.split("\n**")
-            sections = [parts[0]] + [f"**{p}" for p in parts[1:]]
-            separator = "\n"
-        else:
-            # 无法智能分割，按字符强制分割
-            return self._send_wechat_force_chunked(content, max_bytes)
-        
-        chunks = []
-        current_chunk = []
-        current_bytes = 0
-        separator_bytes = get_bytes(separator)
-        
-        for section in sections:
-            section_bytes = get_bytes(section) + separator_bytes
-            
-            # 如果单个 section 就超长，需要强制截断
-            if section_bytes > max_bytes:
-                # 先发送当前积累的内容
-                if current_chunk:
-                    chunks.append(separator.join(current_chunk))
-                    current_chunk = []
-                    current_bytes = 0
-                
-                # 强制截断这个超长 section（按字节截断）
-                truncated = self._truncate_to_bytes(section, max_bytes - 200)
-                truncated += "\n\n...(本段内容过长已截断)"
-                chunks.append(truncated)
-                continue
-            
-            # 检查加入后是否超长
-            if current_bytes + section_bytes > max_bytes:
-                # 保存当前块，开始新块
-                if current_chunk:
-                    chunks.append(separator.join(current_chunk))
-                current_chunk = [section]
-                current_bytes = section_bytes
-            else:
-                current_chunk.append(section)
-                current_bytes += section_bytes
-        
-        # 添加最后一块
-        if current_chunk:
-            chunks.append(separator.join(current_chunk))
-        
-        # 分批发送
-        total_chunks = len(chunks)
-        success_count = 0
-        
-        logger.info(f"企业微信分批发送：共 {total_chunks} 批")
-        
-        for i, chunk in enumerate(chunks):
-            # 添加分页标记
-            if total_chunks > 1:
-                page_marker = f"\n\n📄 *({i+1}/{total_chunks})*"
-                chunk_with_marker = chunk + page_marker
-            else:
-                chunk_with_marker = chunk
-            
-            try:
-                if self._send_wechat_message(chunk_with_marker):
-                    success_count += 1
-                    logger.info(f"企业微信第 {i+1}/{total_chunks} 批发送成功")
-                else:
-                    logger.error(f"企业微信第 {i+1}/{total_chunks} 批发送失败")
-            except Exception as e:
-                logger.error(f"企业微信第 {i+1}/{total_chunks} 批发送异常: {e}")
-
-            # 批次间隔，避免触发频率限制
-            if i < total_chunks - 1:
-                time.sleep(2.5)  # 增加到 2.5s，避免企业微信限流
-
-        return success_count == total_chunks
-    
-    def _send_wechat_force_chunked(self, content: str, max_bytes: int) -> bool:
-        """
-        强制按字节分割发送（无法智能分割时的 fallback）
-        
-        Args:
-            content: 完整消息内容
-            max_bytes: 单条消息最大字节数
-        """
-        import time
-        
-        chunks = []
-        current_chunk = ""
-        
-        # 按行分割，确保不会在多字节字符中间截断
-        lines = content.split('\n')
-        
-        for line in lines:
-            test_chunk = current_chunk + ('\n' if current_chunk else '') + line
-            if len(test_chunk.encode('utf-8')) > max_bytes - 100:  # 预留空间给分页标记
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = line
-            else:
-                current_chunk = test_chunk
-        
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        total_chunks = len(chunks)
-        success_count = 0
-        
-        logger.info(f"企业微信强制分批发送：共 {total_chunks} 批")
-        
-        for i, chunk in enumerate(chunks):
-            page_marker = f"\n\n📄 *({i+1}/{total_chunks})*" if total_chunks > 1 else ""
-            
-            try:
-                if self._send_wechat_message(chunk + page_marker):
-                    success_count += 1
-            except Exception as e:
-                logger.error(f"企业微信第 {i+1}/{total_chunks} 批发送异常: {e}")
-            
-            if i < total_chunks - 1:
-                time.sleep(1)
-        
-        return success_count == total_chunks
+        return send_chunked(
+            content,
+            self._send_wechat_message,
+            max_bytes=max_bytes,
+            marker="\n\n📄 *({index}/{total})*",
+            interval=2.5,  # 避免企业微信限流
+            label="企业微信",
+        )
     
     def _truncate_to_bytes(self, text: str, max_bytes: int) -> str:
-        """
-        按字节数截断字符串，确保不会在多字节字符中间截断
-        
-        Args:
-            text: 要截断的字符串
-            max_bytes: 最大字节数
-            
-        Returns:
-            截断后的字符串
-        """
-        encoded = text.encode('utf-8')
-        if len(encoded) <= max_bytes:
-            return text
-        
-        # 从 max_bytes 位置往前找，确保不截断多字节字符
-        truncated = encoded[:max_bytes]
-        # 尝试解码，如果失败则继续往前
-        while truncated:
-            try:
-                return truncated.decode('utf-8')
-            except UnicodeDecodeError:
-                truncated = truncated[:-1]
-        return ""
+        """按字节数截断字符串，确保不会在多字节字符中间截断"""
+        return truncate_to_bytes(text, max_bytes)
     
     def _gen_wechat_payload(self, content: str) -> dict:
         """生成企业微信消息 payload"""
@@ -1378,7 +610,7 @@ class NotificationService:
         """发送企业微信消息"""
         payload = self._gen_wechat_payload(content)
         
-        response = requests.post(
+        response = get_http_client().post(
             self._wechat_url,
             json=payload,
             timeout=10
@@ -1444,7 +676,7 @@ class NotificationService:
         """
         分批发送长消息到飞书
         
-        按股票分析块（以 --- 或 ### 分隔）智能分割，确保每批不超过限制
+        按股票分析块（分隔线 > 标题 > 段落 > 行）分割，确保每批（含分页标记）不超过限制
         
         Args:
             content: 完整消息内容
@@ -1453,138 +685,7 @@ class NotificationService:
         Returns:
             是否全部发送成功
         """
-        import time
-        
-        def get_bytes(s: str) -> int:
-            """获取字符串的 UTF-8 字节数"""
-            return len(s.encode('utf-8'))
-        
-        # 智能分割：优先按 "---" 分隔（股票之间的分隔线）
-        # 如果没有分隔线，按 "### " 标题分割（每只股票的标题）
-        if "\n---\n" in content:
-            sections = content.split("\n---\n")
-            separator = "\n---\n"
-        elif "\n### " in content:
-            # 按 ### 分割，但保留 ### 前缀
-            parts = content.split("\n### ")
-            sections = [parts[0]] + [f"### {p}" for p in parts[1:]]
-            separator = "\n"
-        else:
-            # 无法智能分割，按行强制分割
-            return self._send_feishu_force_chunked(content, max_bytes)
-        
-        chunks = []
-        current_chunk = []
-        current_bytes = 0
-        separator_bytes = get_bytes(separator)
-        
-        for section in sections:
-            section_bytes = get_bytes(section) + separator_bytes
-            
-            # 如果单个 section 就超长，需要强制截断
-            if section_bytes > max_bytes:
-                # 先发送当前积累的内容
-                if current_chunk:
-                    chunks.append(separator.join(current_chunk))
-                    current_chunk = []
-                    current_bytes = 0
-                
-                # 强制截断这个超长 section（按字节截断）
-                truncated = self._truncate_to_bytes(section, max_bytes - 200)
-                truncated += "\n\n...(本段内容过长已截断)"
-                chunks.append(truncated)
-                continue
-            
-            # 检查加入后是否超长
-            if current_bytes + section_bytes > max_bytes:
-                # 保存当前块，开始新块
-                if current_chunk:
-                    chunks.append(separator.join(current_chunk))
-                current_chunk = [section]
-                current_bytes = section_bytes
-            else:
-                current_chunk.append(section)
-                current_bytes += section_bytes
-        
-        # 添加最后一块
-        if current_chunk:
-            chunks.append(separator.join(current_chunk))
-        
-        # 分批发送
-        total_chunks = len(chunks)
-        success_count = 0
-        
-        logger.info(f"飞书分批发送：共 {total_chunks} 批")
-        
-        for i, chunk in enumerate(chunks):
-            # 添加分页标记
-            if total_chunks > 1:
-                page_marker = f"\n\n📄 ({i+1}/{total_chunks})"
-                chunk_with_marker = chunk + page_marker
-            else:
-                chunk_with_marker = chunk
-            
-            try:
-                if self._send_feishu_message(chunk_with_marker):
-                    success_count += 1
-                    logger.info(f"飞书第 {i+1}/{total_chunks} 批发送成功")
-                else:
-                    logger.error(f"飞书第 {i+1}/{total_chunks} 批发送失败")
-            except Exception as e:
-                logger.error(f"飞书第 {i+1}/{total_chunks} 批发送异常: {e}")
-            
-            # 批次间隔，避免触发频率限制
-            if i < total_chunks - 1:
-                time.sleep(1)
-        
-        return success_count == total_chunks
-    
-    def _send_feishu_force_chunked(self, content: str, max_bytes: int) -> bool:
-        """
-        强制按字节分割发送（无法智能分割时的 fallback）
-        
-        Args:
-            content: 完整消息内容
-            max_bytes: 单条消息最大字节数
-        """
-        import time
-        
-        chunks = []
-        current_chunk = ""
-        
-        # 按行分割，确保不会在多字节字符中间截断
-        lines = content.split('\n')
-        
-        for line in lines:
-            test_chunk = current_chunk + ('\n' if current_chunk else '') + line
-            if len(test_chunk.encode('utf-8')) > max_bytes - 100:  # 预留空间给分页标记
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = line
-            else:
-                current_chunk = test_chunk
-        
-        if current_chunk:
-            chunks.append(current_chunk)
-        
-        total_chunks = len(chunks)
-        success_count = 0
-        
-        logger.info(f"飞书强制分批发送：共 {total_chunks} 批")
-        
-        for i, chunk in enumerate(chunks):
-            page_marker = f"\n\n📄 ({i+1}/{total_chunks})" if total_chunks > 1 else ""
-            
-            try:
-                if self._send_feishu_message(chunk + page_marker):
-                    success_count += 1
-            except Exception as e:
-                logger.error(f"飞书第 {i+1}/{total_chunks} 批发送异常: {e}")
-            
-            if i < total_chunks - 1:
-                time.sleep(1)
-        
-        return success_count == total_chunks
+        return send_chunked(content, self._send_feishu_message, max_bytes=max_bytes, label="飞书")
     
     def _send_feishu_message(self, content: str) -> bool:
         """发送单条飞书消息（优先使用 Markdown 卡片）"""
@@ -1592,7 +693,7 @@ class NotificationService:
             logger.debug(f"飞书请求 URL: {self._feishu_url}")
             logger.debug(f"飞书请求 payload 长度: {len(content)} 字符")
 
-            response = requests.post(
+            response = get_http_client().post(
                 self._feishu_url,
                 json=payload,
                 timeout=30
@@ -1657,6 +758,8 @@ class NotificationService:
     def send_to_email(self, content: str, subject: Optional[str] = None) -> bool:
         """
         通过 SMTP 发送邮件（自动识别 SMTP 服务器）
+
+        复用进程内已登录的 SMTP 连接（见 src.smtp_client）；报告的 HTML 只渲染一次
         
         Args:
             content: 邮件内容（支持 Markdown，会转换为 HTML）
@@ -1702,7 +805,7 @@ class NotificationService:
                 smtp_server = smtp_config['server']
                 smtp_port = smtp_config['port']
                 use_ssl = smtp_config['ssl']
-                logger.info(f"自动识别邮箱类型: {domain} -> {smtp_server}:{smtp_port}")
+                logger.debug(f"自动识别邮箱类型: {domain} -> {smtp_server}:{smtp_port}")
             else:
                 # 未知邮箱，尝试通用配置
                 smtp_server = f"smtp.{domain}"
@@ -1710,22 +813,17 @@ class NotificationService:
                 use_ssl = True
                 logger.warning(f"未知邮箱类型 {domain}，尝试通用配置: {smtp_server}:{smtp_port}")
             
-            # 根据配置选择连接方式
-            if use_ssl:
-                # SSL 连接（端口 465）
-                server = smtplib.SMTP_SSL(smtp_server, smtp_port, timeout=30)
-            else:
-                # TLS 连接（端口 587）
-                server = smtplib.SMTP(smtp_server, smtp_port, timeout=30)
-                server.starttls()
-            
-            server.login(sender, password)
-            server.send_message(msg)
-            server.quit()
+            # 复用已登录的共享连接（断线自动重连），不再每封邮件重新握手
+            endpoint = SmtpEndpoint(smtp_server, smtp_port, use_ssl, sender)
+            get_smtp_client().send_message(endpoint, password, msg)
             
             logger.info(f"邮件发送成功，收件人: {receivers}")
             return True
             
+        except SmtpDeliveryUncertain as e:
+            # 服务端可能已接收：按已发送处理，避免发件箱重试导致重复邮件
+            logger.warning(f"邮件可能已送达，不再重发: {e}")
+            return True
         except smtplib.SMTPAuthenticationError:
             logger.error("邮件发送失败：认证错误，请检查邮箱和授权码是否正确")
             return False
@@ -1740,130 +838,17 @@ class NotificationService:
         """
         将 Markdown 转换为 HTML，支持表格并优化排版
 
-        使用 markdown2 库进行转换，并添加优化的 CSS 样式
+        报告文档生成的内容直接使用文档的 HTML 渲染结果；
+        其他内容使用 markdown2 库进行转换，并添加优化的 CSS 样式
         解决问题：
         1. 邮件表格未渲染问题
         2. 邮件内容排版过于松散问题
         """
-        # 使用 markdown2 转换，开启表格和其他扩展支持
-        html_content = markdown2.markdown(
-            markdown_text,
-            extras=["tables", "fenced-code-blocks", "break-on-newline", "cuddled-lists"]
-        )
+        document = find_document(markdown_text)
+        if document is not None:
+            return document.to_html()
 
-        # 优化 CSS 样式：更紧凑的排版，美观的表格
-        css_style = """
-            body {
-                font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Helvetica, Arial, sans-serif;
-                line-height: 1.5;
-                color: #24292e;
-                font-size: 14px;
-                padding: 15px;
-                max-width: 900px;
-                margin: 0 auto;
-            }
-            h1 {
-                font-size: 20px;
-                border-bottom: 1px solid #eaecef;
-                padding-bottom: 0.3em;
-                margin-top: 1.2em;
-                margin-bottom: 0.8em;
-                color: #0366d6;
-            }
-            h2 {
-                font-size: 18px;
-                border-bottom: 1px solid #eaecef;
-                padding-bottom: 0.3em;
-                margin-top: 1.0em;
-                margin-bottom: 0.6em;
-            }
-            h3 {
-                font-size: 16px;
-                margin-top: 0.8em;
-                margin-bottom: 0.4em;
-            }
-            p {
-                margin-top: 0;
-                margin-bottom: 8px;
-            }
-            /* 表格样式优化 */
-            table {
-                border-collapse: collapse;
-                width: 100%;
-                margin: 12px 0;
-                display: block;
-                overflow-x: auto;
-                font-size: 13px;
-            }
-            th, td {
-                border: 1px solid #dfe2e5;
-                padding: 6px 10px;
-                text-align: left;
-            }
-            th {
-                background-color: #f6f8fa;
-                font-weight: 600;
-            }
-            tr:nth-child(2n) {
-                background-color: #f8f8f8;
-            }
-            tr:hover {
-                background-color: #f1f8ff;
-            }
-            /* 引用块样式 */
-            blockquote {
-                color: #6a737d;
-                border-left: 0.25em solid #dfe2e5;
-                padding: 0 1em;
-                margin: 0 0 10px 0;
-            }
-            /* 代码块样式 */
-            code {
-                padding: 0.2em 0.4em;
-                margin: 0;
-                font-size: 85%;
-                background-color: rgba(27,31,35,0.05);
-                border-radius: 3px;
-                font-family: SFMono-Regular, Consolas, "Liberation Mono", Menlo, monospace;
-            }
-            pre {
-                padding: 12px;
-                overflow: auto;
-                line-height: 1.45;
-                background-color: #f6f8fa;
-                border-radius: 3px;
-                margin-bottom: 10px;
-            }
-            hr {
-                height: 0.25em;
-                padding: 0;
-                margin: 16px 0;
-                background-color: #e1e4e8;
-                border: 0;
-            }
-            ul, ol {
-                padding-left: 20px;
-                margin-bottom: 10px;
-            }
-            li {
-                margin: 2px 0;
-            }
-        """
-
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                {css_style}
-            </style>
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-        """
+        return _render_markdown_html(markdown_text)
     
     def send_to_telegram(self, content: str) -> bool:
         """
@@ -1896,6 +881,18 @@ class NotificationService:
             
             # Telegram 消息最大长度 4096 字符
             max_length = 4096
+
+            # 报告文档生成的内容直接使用 MarkdownV2 渲染结果，不再逐段正则转换
+            document = find_document(content)
+            if document is not None:
+                return send_chunked(
+                    document.render(FORMAT_TELEGRAM),
+                    lambda chunk: self._send_telegram_message(api_url, chat_id, chunk, parse_mode="MarkdownV2"),
+                    max_chars=max_length,
+                    marker=None,
+                    interval=0,
+                    label="Telegram ",
+                )
             
             if len(content) <= max_length:
                 # 单条消息发送
@@ -1910,20 +907,28 @@ class NotificationService:
             logger.debug(traceback.format_exc())
             return False
     
-    def _send_telegram_message(self, api_url: str, chat_id: str, text: str) -> bool:
-        """发送单条 Telegram 消息"""
-        # 转换 Markdown 为 Telegram 支持的格式
-        # Telegram 的 Markdown 格式稍有不同，做简单处理
-        telegram_text = self._convert_to_telegram_markdown(text)
+    def _send_telegram_message(self, api_url: str, chat_id: str, text: str, parse_mode: str = "Markdown") -> bool:
+        """
+        发送单条 Telegram 消息
+
+        parse_mode 为 Markdown 时先转换标准 Markdown；为 MarkdownV2 时 text 已是渲染好的内容
+        """
+        if parse_mode == "MarkdownV2":
+            telegram_text = text
+            # 解析失败时的纯文本版本：去掉转义符
+            text = re.sub(r'\\(.)', r'\1', text)
+        else:
+            # Telegram 的 Markdown 格式稍有不同，做简单处理
+            telegram_text = self._convert_to_telegram_markdown(text)
         
         payload = {
             "chat_id": chat_id,
             "text": telegram_text,
-            "parse_mode": "Markdown",
+            "parse_mode": parse_mode,
             "disable_web_page_preview": True
         }
         
-        response = requests.post(api_url, json=payload, timeout=10)
+        response = get_http_client().post(api_url, json=payload, timeout=10)
         
         if response.status_code == 200:
             result = response.json()
@@ -1941,7 +946,7 @@ class NotificationService:
                     payload['text'] = text  # 使用原始文本
                     del payload['parse_mode']
                     
-                    response = requests.post(api_url, json=payload, timeout=10)
+                    response = get_http_client().post(api_url, json=payload, timeout=10)
                     if response.status_code == 200 and response.json().get('ok'):
                         logger.info("Telegram 消息发送成功（纯文本）")
                         return True
@@ -1953,42 +958,15 @@ class NotificationService:
             return False
     
     def _send_telegram_chunked(self, api_url: str, chat_id: str, content: str, max_length: int) -> bool:
-        """分段发送长 Telegram 消息"""
-        # 按段落分割
-        sections = content.split("\n---\n")
-        
-        current_chunk = []
-        current_length = 0
-        all_success = True
-        chunk_index = 1
-        
-        for section in sections:
-            section_length = len(section) + 5  # +5 for "\n---\n"
-            
-            if current_length + section_length > max_length:
-                # 发送当前块
-                if current_chunk:
-                    chunk_content = "\n---\n".join(current_chunk)
-                    logger.info(f"发送 Telegram 消息块 {chunk_index}...")
-                    if not self._send_telegram_message(api_url, chat_id, chunk_content):
-                        all_success = False
-                    chunk_index += 1
-                
-                # 重置
-                current_chunk = [section]
-                current_length = section_length
-            else:
-                current_chunk.append(section)
-                current_length += section_length
-        
-        # 发送最后一块
-        if current_chunk:
-            chunk_content = "\n---\n".join(current_chunk)
-            logger.info(f"发送 Telegram 消息块 {chunk_index}（最后）...")
-            if not self._send_telegram_message(api_url, chat_id, chunk_content):
-                all_success = False
-        
-        return all_success
+        """分段发送长 Telegram 消息（按字符数限制）"""
+        return send_chunked(
+            content,
+            lambda chunk: self._send_telegram_message(api_url, chat_id, chunk),
+            max_chars=max_length,
+            marker=None,
+            interval=0,
+            label="Telegram ",
+        )
     
     def _convert_to_telegram_markdown(self, text: str) -> str:
         """
@@ -2072,8 +1050,12 @@ class NotificationService:
         """
         将 Markdown 转换为纯文本
         
-        移除 Markdown 格式标记，保留可读性
+        移除 Markdown 格式标记，保留可读性（报告文档生成的内容直接使用文档的纯文本渲染）
         """
+        document = find_document(markdown_text)
+        if document is not None:
+            return document.render(FORMAT_PLAIN)
+
         text = markdown_text
         
         # 移除标题标记 # ## ###
@@ -2132,7 +1114,7 @@ class NotificationService:
                 "priority": priority,
             }
             
-            response = requests.post(api_url, data=payload, timeout=30)
+            response = get_http_client().post(api_url, data=payload, timeout=30)
             
             if response.status_code == 200:
                 result = response.json()
@@ -2164,45 +1146,11 @@ class NotificationService:
         """
         分段发送长 Pushover 消息
         
-        按段落分割，确保每段不超过最大长度
+        按段落分割，确保每段不超过最大长度，分页标记加在标题上
         """
         import time
         
-        # 按段落（分隔线或双换行）分割
-        if "────────" in content:
-            sections = content.split("────────")
-            separator = "────────"
-        else:
-            sections = content.split("\n\n")
-            separator = "\n\n"
-        
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        
-        for section in sections:
-            # 计算添加这个 section 后的实际长度
-            # join() 只在元素之间放置分隔符，不是每个元素后面
-            # 所以：第一个元素不需要分隔符，后续元素需要一个分隔符连接
-            if current_chunk:
-                # 已有元素，添加新元素需要：当前长度 + 分隔符 + 新 section
-                new_length = current_length + len(separator) + len(section)
-            else:
-                # 第一个元素，不需要分隔符
-                new_length = len(section)
-            
-            if new_length > max_length:
-                if current_chunk:
-                    chunks.append(separator.join(current_chunk))
-                current_chunk = [section]
-                current_length = len(section)
-            else:
-                current_chunk.append(section)
-                current_length = new_length
-        
-        if current_chunk:
-            chunks.append(separator.join(current_chunk))
-        
+        chunks = chunk_text(content, max_chars=max_length, separators=PLAIN_SEPARATORS)
         total_chunks = len(chunks)
         success_count = 0
         
@@ -2294,7 +1242,7 @@ class NotificationService:
         if self._custom_webhook_bearer_token:
             headers['Authorization'] = f'Bearer {self._custom_webhook_bearer_token}'
         body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
-        response = requests.post(url, data=body, headers=headers, timeout=timeout)
+        response = get_http_client().post(url, data=body, headers=headers, timeout=timeout)
         if response.status_code == 200:
             return True
         logger.error(f"自定义 Webhook 推送失败: HTTP {response.status_code}")
@@ -2302,69 +1250,8 @@ class NotificationService:
         return False
 
     def _chunk_markdown_by_bytes(self, content: str, max_bytes: int) -> List[str]:
-        def get_bytes(s: str) -> int:
-            return len(s.encode('utf-8'))
-
-        def split_by_bytes(text: str, limit: int) -> List[str]:
-            parts: List[str] = []
-            remaining = text
-            while remaining:
-                part = self._truncate_to_bytes(remaining, limit)
-                if not part:
-                    break
-                parts.append(part)
-                remaining = remaining[len(part):]
-            return parts
-
-        # 优先按分隔线/标题分割，保证分页自然
-        if "\n---\n" in content:
-            sections = content.split("\n---\n")
-            separator = "\n---\n"
-        elif "\n### " in content:
-            parts = content.split("\n### ")
-            sections = [parts[0]] + [f"### {p}" for p in parts[1:]]
-            separator = "\n"
-        else:
-            # fallback：按行拼接
-            sections = content.split("\n")
-            separator = "\n"
-
-        chunks: List[str] = []
-        current_chunk: List[str] = []
-        current_bytes = 0
-        sep_bytes = get_bytes(separator)
-
-        for section in sections:
-            section_bytes = get_bytes(section)
-            extra = sep_bytes if current_chunk else 0
-
-            # 单段超长：截断
-            if section_bytes + extra > max_bytes:
-                if current_chunk:
-                    chunks.append(separator.join(current_chunk))
-                    current_chunk = []
-                    current_bytes = 0
-
-                # 无法按结构拆分时，按字节强制拆分，避免整段被截断丢失
-                for part in split_by_bytes(section, max(200, max_bytes - 200)):
-                    chunks.append(part)
-                continue
-
-            if current_bytes + section_bytes + extra > max_bytes:
-                chunks.append(separator.join(current_chunk))
-                current_chunk = [section]
-                current_bytes = section_bytes
-            else:
-                if current_chunk:
-                    current_bytes += sep_bytes
-                current_chunk.append(section)
-                current_bytes += section_bytes
-
-        if current_chunk:
-            chunks.append(separator.join(current_chunk))
-
-        # 移除空块
-        return [c for c in (c.strip() for c in chunks) if c]
+        """按字节限制分段（分隔线 > 标题 > 段落 > 行，超长段按字符边界拆分，不丢内容）"""
+        return [chunk.strip() for chunk in chunk_text(content, max_bytes=max_bytes)]
 
     def _send_dingtalk_chunked(self, url: str, content: str, max_bytes: int = 20000) -> bool:
         import time as _time
@@ -2499,7 +1386,8 @@ class NotificationService:
             是否发送成功
         """
         try:
-            from bot.platforms.feishu_stream import FeishuReplyClient, FEISHU_SDK_AVAILABLE
+            from bot.platforms.feishu_stream import get_feishu_reply_client, FEISHU_SDK_AVAILABLE
+            from bot.reply_pool import get_reply_pool
             if not FEISHU_SDK_AVAILABLE:
                 logger.warning("飞书 SDK 不可用，无法发送 Stream 回复")
                 return False
@@ -2514,17 +1402,20 @@ class NotificationService:
                 logger.warning("飞书 APP_ID 或 APP_SECRET 未配置")
                 return False
             
-            # 创建回复客户端
-            reply_client = FeishuReplyClient(app_id, app_secret)
+            # 复用共享回复客户端
+            reply_client = get_feishu_reply_client(app_id, app_secret)
             
             # 飞书文本消息有长度限制，需要分批发送
             max_bytes = getattr(config, 'feishu_max_bytes', 20000)
             content_bytes = len(content.encode('utf-8'))
             
-            if content_bytes > max_bytes:
-                return self._send_feishu_stream_chunked(reply_client, chat_id, content, max_bytes)
+            def send() -> bool:
+                if content_bytes > max_bytes:
+                    return self._send_feishu_stream_chunked(reply_client, chat_id, content, max_bytes)
+                return reply_client.send_to_chat(chat_id, content)
             
-            return reply_client.send_to_chat(chat_id, content)
+            # 经回复工作池发送：与该会话的命令回复保持先后顺序
+            return get_reply_pool().call(f"feishu:{chat_id}", send)
             
         except ImportError as e:
             logger.error(f"导入飞书 Stream 模块失败: {e}")
@@ -2552,55 +1443,14 @@ class NotificationService:
         Returns:
             是否全部发送成功
         """
-        import time
-        
-        def get_bytes(s: str) -> int:
-            return len(s.encode('utf-8'))
-        
-        # 按段落或分隔线分割
-        if "\n---\n" in content:
-            sections = content.split("\n---\n")
-            separator = "\n---\n"
-        elif "\n### " in content:
-            parts = content.split("\n### ")
-            sections = [parts[0]] + [f"### {p}" for p in parts[1:]]
-            separator = "\n"
-        else:
-            # 按行分割
-            sections = content.split("\n")
-            separator = "\n"
-        
-        chunks = []
-        current_chunk = []
-        current_bytes = 0
-        separator_bytes = get_bytes(separator)
-        
-        for section in sections:
-            section_bytes = get_bytes(section) + separator_bytes
-            
-            if current_bytes + section_bytes > max_bytes:
-                if current_chunk:
-                    chunks.append(separator.join(current_chunk))
-                current_chunk = [section]
-                current_bytes = section_bytes
-            else:
-                current_chunk.append(section)
-                current_bytes += section_bytes
-        
-        if current_chunk:
-            chunks.append(separator.join(current_chunk))
-        
-        # 发送每个分块
-        success = True
-        for i, chunk in enumerate(chunks):
-            if i > 0:
-                time.sleep(0.5)  # 避免请求过快
-            
-            if not reply_client.send_to_chat(chat_id, chunk):
-                success = False
-                logger.error(f"飞书 Stream 分块 {i+1}/{len(chunks)} 发送失败")
-        
-        return success
+        return send_chunked(
+            content,
+            lambda chunk: reply_client.send_to_chat(chat_id, chunk),
+            max_bytes=max_bytes,
+            marker=None,
+            interval=0.5,  # 避免请求过快
+            label="飞书 Stream ",
+        )
     
     def send_to_pushplus(self, content: str, title: Optional[str] = None) -> bool:
         """
@@ -2647,7 +1497,7 @@ class NotificationService:
                 "template": "markdown"  # 使用 Markdown 格式
             }
 
-            response = requests.post(api_url, json=payload, timeout=10)
+            response = get_http_client().post(api_url, json=payload, timeout=10)
 
             if response.status_code == 200:
                 result = response.json()
@@ -2706,7 +1556,7 @@ class NotificationService:
                 'avatar_url': 'https://picsum.photos/200'
             }
             
-            response = requests.post(
+            response = get_http_client().post(
                 self._discord_config['webhook_url'],
                 json=payload,
                 timeout=10
@@ -2743,7 +1593,7 @@ class NotificationService:
             }
             
             url = f'https://discord.com/api/v10/channels/{self._discord_config["channel_id"]}/messages'
-            response = requests.post(url, json=payload, headers=headers, timeout=10)
+            response = get_http_client().post(url, json=payload, headers=headers, timeout=10)
             
             if response.status_code == 200:
                 logger.info("Discord Bot 消息发送成功")
@@ -2755,110 +1605,140 @@ class NotificationService:
             logger.error(f"Discord Bot 发送异常: {e}")
             return False
     
-    def send(self, content: str) -> bool:
+    def _get_channel_sender(self, channel: NotificationChannel) -> Optional[Callable[[str], bool]]:
+        """获取渠道对应的发送方法"""
+        return {
+            NotificationChannel.WECHAT: self.send_to_wechat,
+            NotificationChannel.FEISHU: self.send_to_feishu,
+            NotificationChannel.TELEGRAM: self.send_to_telegram,
+            NotificationChannel.EMAIL: self.send_to_email,
+            NotificationChannel.PUSHOVER: self.send_to_pushover,
+            NotificationChannel.PUSHPLUS: self.send_to_pushplus,
+            NotificationChannel.CUSTOM: self.send_to_custom,
+            NotificationChannel.DISCORD: self.send_to_discord,
+        }.get(channel)
+
+    def send_to_channel(self, channel: NotificationChannel, content: str) -> bool:
+        """向指定渠道发送（供发件箱按渠道投递）"""
+        sender = self._get_channel_sender(channel)
+        if sender is None:
+            logger.warning(f"不支持的通知渠道: {channel}")
+            return False
+        return sender(content)
+
+    def deliver(
+        self,
+        content: str,
+        overrides: Optional[Dict[NotificationChannel, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, ChannelDeliveryResult]:
         """
-        统一发送接口 - 向所有已配置的渠道发送
+        并发向所有渠道投递消息
         
-        遍历所有已配置的渠道，逐一发送消息
+        每个渠道（含消息上下文渠道）在独立线程中发送，渠道内的分段仍按顺序发送；
+        单个渠道超过时限后不再等待，总耗时取决于最慢的渠道而非各渠道之和。
+        超时渠道的线程无法中止、可能随后送达，因此记为"进行中"（in_flight，结果未知）而非失败，
+        调用方不应重发；其最终结果在后台完成时记录到日志。
         
         Args:
             content: 消息内容（Markdown 格式）
+            overrides: 指定渠道使用的替代内容（如企业微信只发精简版）
+            timeout: 单渠道时限（秒），默认读取 NOTIFY_CHANNEL_TIMEOUT
             
         Returns:
-            是否至少有一个渠道发送成功
+            {渠道名称: ChannelDeliveryResult}
         """
-        context_success = self.send_to_context(content)
+        overrides = overrides or {}
+        if timeout is None:
+            timeout = getattr(get_config(), 'notify_channel_timeout', 60.0)
 
-        if not self._available_channels:
-            if context_success:
-                logger.info("已通过消息上下文渠道完成推送（无其他通知渠道）")
-                return True
-            logger.warning("通知服务不可用，跳过推送")
-            return False
-        
-        channel_names = self.get_channel_names()
-        logger.info(f"正在向 {len(self._available_channels)} 个渠道发送通知：{channel_names}")
-        
-        success_count = 0
-        fail_count = 0
-        
+        tasks: Dict[str, Callable[[], bool]] = {}
+        if self._has_context_channel():
+            tasks["会话回复"] = lambda: self.send_to_context(content)
         for channel in self._available_channels:
+            sender = self._get_channel_sender(channel)
             channel_name = ChannelDetector.get_channel_name(channel)
+            if sender is None:
+                logger.warning(f"不支持的通知渠道: {channel}")
+                continue
+            tasks[channel_name] = (lambda s=sender, c=overrides.get(channel, content): s(c))
+
+        results: Dict[str, ChannelDeliveryResult] = {}
+        if not tasks:
+            return results
+
+        def _run(name: str, task: Callable[[], bool]) -> ChannelDeliveryResult:
+            result = ChannelDeliveryResult(channel=name)
+            start = time.monotonic()
             try:
-                if channel == NotificationChannel.WECHAT:
-                    result = self.send_to_wechat(content)
-                elif channel == NotificationChannel.FEISHU:
-                    result = self.send_to_feishu(content)
-                elif channel == NotificationChannel.TELEGRAM:
-                    result = self.send_to_telegram(content)
-                elif channel == NotificationChannel.EMAIL:
-                    result = self.send_to_email(content)
-                elif channel == NotificationChannel.PUSHOVER:
-                    result = self.send_to_pushover(content)
-                elif channel == NotificationChannel.PUSHPLUS:
-                    result = self.send_to_pushplus(content)
-                elif channel == NotificationChannel.CUSTOM:
-                    result = self.send_to_custom(content)
-                elif channel == NotificationChannel.DISCORD:
-                    result = self.send_to_discord(content)
-                else:
-                    logger.warning(f"不支持的通知渠道: {channel}")
-                    result = False
-                
-                if result:
-                    success_count += 1
-                else:
-                    fail_count += 1
-                    
+                result.success = bool(task())
             except Exception as e:
-                logger.error(f"{channel_name} 发送失败: {e}")
-                fail_count += 1
+                logger.error(f"{name} 发送失败: {e}")
+                result.error = str(e)
+            result.elapsed = time.monotonic() - start
+            return result
+
+        def _log_late_result(future) -> None:
+            late = future.result()
+            outcome = "已送达" if late.success else f"失败（{late.error or '发送失败'}）"
+            logger.info(f"{late.channel} 超时后在后台完成: {outcome}，耗时 {late.elapsed:.1f}s")
+
+        start = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="notify_")
+        try:
+            futures = {executor.submit(_run, name, task): name for name, task in tasks.items()}
+            done, not_done = wait(futures, timeout=timeout if timeout and timeout > 0 else None)
+            for future in done:
+                result = future.result()
+                results[result.channel] = result
+            for future in not_done:
+                name = futures[future]
+                logger.warning(f"{name} 发送超过 {timeout:.0f} 秒，记为进行中（后台继续发送，结果未知，不重发）")
+                results[name] = ChannelDeliveryResult(
+                    channel=name,
+                    elapsed=time.monotonic() - start,
+                    timed_out=True,
+                    error="in flight",
+                )
+                future.add_done_callback(_log_late_result)
+        finally:
+            # 不等待超时渠道，其线程在后台发送完毕后自行退出
+            executor.shutdown(wait=False)
+
+        summary = ", ".join(
+            f"{name}:{'进行中' if r.in_flight else ('成功' if r.success else '失败')}({r.elapsed:.1f}s)"
+            for name, r in results.items()
+        )
+        logger.info(f"通知投递完成，耗时 {time.monotonic() - start:.1f}s：{summary}")
+        return results
+
+    def send(self, content: str) -> bool:
+        """
+        统一发送接口 - 向所有已配置的渠道发送
+        
+        各渠道并发发送（见 deliver），单个慢渠道不会拖慢其他渠道
         
-        logger.info(f"通知发送完成：成功 {success_count} 个，失败 {fail_count} 个")
-        return success_count > 0 or context_success
+        Args:
+            content: 消息内容（Markdown 格式）
+            
+        Returns:
+            是否至少有一个渠道发送成功或仍在发送（结果未知的渠道不重发）
+        """
+        if not self._available_channels and not self._has_context_channel():
+            logger.warning("通知服务不可用，跳过推送")
+            return False
+        
+        logger.info(f"正在向渠道发送通知：{self.get_channel_names()}")
+        results = self.deliver(content)
+        return any(r.success or r.in_flight for r in results.values())
     
     def _send_chunked_messages(self, content: str, max_length: int) -> bool:
         """
         分段发送长消息
         
-        按段落（---）分割，确保每段不超过最大长度
+        按分隔线 / 标题 / 段落分割，确保每段不超过最大长度
         """
-        # 按分隔线分割
-        sections = content.split("\n---\n")
-        
-        current_chunk = []
-        current_length = 0
-        all_success = True
-        chunk_index = 1
-        
-        for section in sections:
-            section_with_divider = section + "\n---\n"
-            section_length = len(section_with_divider)
-            
-            if current_length + section_length > max_length:
-                # 发送当前块
-                if current_chunk:
-                    chunk_content = "\n---\n".join(current_chunk)
-                    logger.info(f"发送消息块 {chunk_index}...")
-                    if not self.send(chunk_content):
-                        all_success = False
-                    chunk_index += 1
-                
-                # 重置
-                current_chunk = [section]
-                current_length = section_length
-            else:
-                current_chunk.append(section)
-                current_length += section_length
-        
-        # 发送最后一块
-        if current_chunk:
-            chunk_content = "\n---\n".join(current_chunk)
-            logger.info(f"发送消息块 {chunk_index}（最后）...")
-            if not self.send(chunk_content):
-                all_success = False
-        
-        return all_success
+        return send_chunked(content, self.send, max_chars=max_length, marker=None, interval=0, label="消息")
     
     def save_report_to_file(
         self, 
@@ -2875,20 +1755,13 @@ class NotificationService:
         Returns:
             保存的文件路径
         """
-        from pathlib import Path
-        
         if filename is None:
             date_str = datetime.now().strftime('%Y%m%d')
             filename = f"report_{date_str}.md"
         
-        # 确保 reports 目录存在（使用项目根目录下的 reports）
-        reports_dir = Path(__file__).parent.parent / 'reports'
-        reports_dir.mkdir(parents=True, exist_ok=True)
-        
-        filepath = reports_dir / filename
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # 项目根目录下的 reports；先写临时文件再原子替换，不会留下写了一半的报告
+        filepath = get_reports_dir() / filename
+        atomic_write_text(filepath, content)
         
         logger.info(f"日报已保存到: {filepath}")
         return str(filepath)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 提示词 token 预算
+===================================
+
+职责：
+1. 按段落估算提示词 token 数
+2. 超出预算时按价值从低到高压缩：先舍弃次要数据段（量价变化、筹码、行情、趋势），
+   最后才按排名截断新闻（提示词中的重点区域）
+3. 必需段落（基础信息、技术面、分析任务）始终保留
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from src.llm_dispatcher import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# format_intel_report 输出中的条目行："  1. 标题 [日期]"，其后一行为摘要
+_ITEM_RE = re.compile(r'^ {2}\d+\. ')
+
+
+@dataclass
+class PromptSection:
+    """
+    提示词段落
+
+    Attributes:
+        name: 段落名称（用于日志）
+        text: 段落文本
+        priority: 价值优先级，数值越小越先被压缩
+        required: 必需段落，不参与压缩
+        shrink: 压缩函数 (目标 token 数) -> 压缩后文本；为 None 时超预算直接舍弃整段
+    """
+    name: str
+    text: str
+    priority: int = 0
+    required: bool = False
+    shrink: Optional[Callable[[int], str]] = None
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def fit_sections(sections: List[PromptSection], budget: int) -> Tuple[str, int, int]:
+    """
+    将段落拼接为不超过预算的提示词
+
+    Args:
+        sections: 按输出顺序排列的段落
+        budget: token 预算，<=0 表示不限制
+
+    Returns:
+        (提示词, 压缩前 token 数, 压缩后 token 数)
+    """
+    before = sum(section.tokens for section in sections)
+    total = before
+    if budget > 0 and total > budget:
+        for section in sorted((s for s in sections if not s.required), key=lambda s: s.priority):
+            over = total - budget
+            if over <= 0:
+                break
+            current = section.tokens
+            if section.shrink is not None:
+                section.text = section.shrink(max(0, current - over))
+            else:
+                section.text = ''
+            total += section.tokens - current
+            logger.debug(f"[Prompt预算] 压缩段落 {section.name}: {current} -> {section.tokens} tokens")
+
+    return ''.join(section.text for section in sections), before, total
+
+
+def truncate_intel_report(report: str, max_tokens: int) -> str:
+    """
+    按条目截断情报报告（format_intel_report 的输出）
+
+    各维度内排名靠后的条目价值最低，优先删除；同一排名时先删除靠后的维度。
+    无法识别条目结构的文本按行从末尾截断。
+
+    Args:
+        report: 情报报告文本
+        max_tokens: 目标 token 数
+
+    Returns:
+        截断后的文本（目标过小时仅保留维度标题）
+    """
+    if estimate_tokens(report) <= max_tokens:
+        return report
+
+    lines = report.split('\n')
+    # 条目 = (维度序号, 维度内排名, 行号列表)
+    items: List[Tuple[int, int, List[int]]] = []
+    dimension = -1
+    rank = 0
+    for i, line in enumerate(lines):
+        if _ITEM_RE.match(line):
+            rank += 1
+            items.append((dimension, rank, [i]))
+        elif items and items[-1][0] == dimension and line.startswith('     ') and len(items[-1][2]) == 1:
+            items[-1][2].append(i)  # 摘要行
+        elif line.strip() and not line.startswith(' '):
+            dimension += 1  # 报告标题或维度标题
+            rank = 0
+
+    if not items:
+        kept = list(lines)
+        while kept and estimate_tokens('\n'.join(kept)) > max_tokens:
+            kept.pop()
+        return '\n'.join(kept)
+
+    removed = set()
+    tokens = estimate_tokens(report)
+    for _, _, line_numbers in sorted(items, key=lambda item: (-item[1], -item[0])):
+        if tokens <= max_tokens:
+            break
+        for n in line_numbers:
+            removed.add(n)
+            tokens -= estimate_tokens(lines[n] + '\n')
+
+    kept = [line for i, line in enumerate(lines) if i not in removed]
+    if len(removed) == sum(len(item[2]) for item in items):
+        kept.append("  （新闻条目因长度限制已省略）")
+    return '\n'.join(kept)
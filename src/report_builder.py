@@ -0,0 +1,604 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 报告构建
+===================================
+
+职责：
+1. 将分析结果构建为 ReportDocument（决策仪表盘 / 企业微信精简版 / 单股报告 / 详细日报）
+2. 每只股票的段落按 (报告类型, 结果对象) 缓存，单股推送时构建的段落在汇总日报中直接复用
+
+NotificationService.generate_* 通过本模块生成 Markdown，
+各渠道发送时经 find_document() 直接取文档的渲染结果。
+"""
+
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional, Sequence
+
+from src.report_model import (
+    DIVIDER, Block, ReportDocument, StockSection, bold, bullets, get_section, heading, inline, italic,
+    paragraph, quote, table,
+)
+
+if TYPE_CHECKING:
+    from src.analyzer import AnalysisResult
+
+BUY_ADVICES = ('买入', '加仓', '强烈买入')
+SELL_ADVICES = ('卖出', '减仓', '强烈卖出')
+HOLD_ADVICES = ('持有', '观望')
+
+
+def get_signal_level(result: 'AnalysisResult') -> tuple:
+    """
+    根据操作建议获取信号等级和颜色
+
+    Returns:
+        (信号文字, emoji, 颜色标记)
+    """
+    advice = result.operation_advice
+    score = result.sentiment_score
+
+    if advice in ['强烈买入'] or score >= 80:
+        return ('强烈买入', '💚', '强买')
+    elif advice in ['买入', '加仓'] or score >= 65:
+        return ('买入', '🟢', '买入')
+    elif advice in ['持有'] or 55 <= score < 65:
+        return ('持有', '🟡', '持有')
+    elif advice in ['观望'] or 45 <= score < 55:
+        return ('观望', '⚪', '观望')
+    elif advice in ['减仓'] or 35 <= score < 45:
+        return ('减仓', '🟠', '减仓')
+    elif advice in ['卖出', '强烈卖出'] or score < 35:
+        return ('卖出', '🔴', '卖出')
+    else:
+        return ('观望', '⚪', '观望')
+
+
+def _advice_counts(results: Sequence['AnalysisResult']) -> tuple:
+    buy_count = sum(1 for r in results if r.operation_advice in BUY_ADVICES)
+    sell_count = sum(1 for r in results if r.operation_advice in SELL_ADVICES)
+    hold_count = sum(1 for r in results if r.operation_advice in HOLD_ADVICES)
+    return buy_count, hold_count, sell_count
+
+
+def _sorted_by_score(results: Sequence['AnalysisResult']) -> List['AnalysisResult']:
+    # 按评分排序（高分在前）
+    return sorted(results, key=lambda x: x.sentiment_score, reverse=True)
+
+
+def _stock_name(result: 'AnalysisResult') -> str:
+    return result.name if result.name and not result.name.startswith('股票') else f'股票{result.code}'
+
+
+def _dashboard(result: 'AnalysisResult') -> dict:
+    return result.dashboard if getattr(result, 'dashboard', None) else {}
+
+
+def _clip(text: str, limit: int) -> str:
+    return text[:limit] + "..." if len(text) > limit else text
+
+
+# ============================================================
+# 决策仪表盘（详细版）
+# ============================================================
+
+def _dashboard_blocks(result: 'AnalysisResult') -> List[Block]:
+    signal_text, signal_emoji, _ = get_signal_level(result)
+    dashboard = _dashboard(result)
+    blocks: List[Block] = [heading(2, f"{signal_emoji} {_stock_name(result)} ({result.code})")]
+
+    # ========== 舆情与基本面概览（放在最前面）==========
+    intel = dashboard.get('intelligence', {})
+    if intel:
+        blocks.append(heading(3, "📰 重要信息速览"))
+        lines = []
+        if intel.get('sentiment_summary'):
+            lines.append(inline(bold("💭 舆情情绪"), f": {intel['sentiment_summary']}"))
+        if intel.get('earnings_outlook'):
+            lines.append(inline(bold("📊 业绩预期"), f": {intel['earnings_outlook']}"))
+        if lines:
+            blocks.append(paragraph(*lines))
+        # 风险警报（醒目显示）
+        if intel.get('risk_alerts'):
+            blocks.append(paragraph(inline(bold("🚨 风险警报"), ":")))
+            blocks.append(bullets(intel['risk_alerts']))
+        if intel.get('positive_catalysts'):
+            blocks.append(paragraph(inline(bold("✨ 利好催化"), ":")))
+            blocks.append(bullets(intel['positive_catalysts']))
+        if intel.get('latest_news'):
+            blocks.append(paragraph(inline(bold("📢 最新动态"), f": {intel['latest_news']}")))
+
+    # ========== 核心结论 ==========
+    core = dashboard.get('core_conclusion', {})
+    pos_advice = core.get('position_advice', {})
+    blocks.extend([
+        heading(3, "📌 核心结论"),
+        paragraph(inline(bold(f"{signal_emoji} {signal_text}"), f" | {result.trend_prediction}")),
+        quote(bold("一句话决策"), f": {core.get('one_sentence', result.analysis_summary)}"),
+        paragraph(inline("⏰ ", bold("时效性"), f": {core.get('time_sensitivity', '本周内')}")),
+    ])
+    # 持仓分类建议
+    if pos_advice:
+        blocks.append(table(["持仓情况", "操作建议"], [
+            [inline("🆕 ", bold("空仓者")), pos_advice.get('no_position', result.operation_advice)],
+            [inline("💼 ", bold("持仓者")), pos_advice.get('has_position', '继续持有')],
+        ]))
+
+    # ========== 数据透视 ==========
+    data_persp = dashboard.get('data_perspective', {})
+    if data_persp:
+        trend_data = data_persp.get('trend_status', {})
+        price_data = data_persp.get('price_position', {})
+        vol_data = data_persp.get('volume_analysis', {})
+        chip_data = data_persp.get('chip_structure', {})
+        blocks.append(heading(3, "📊 数据透视"))
+
+        if trend_data:
+            is_bullish = "✅ 是" if trend_data.get('is_bullish', False) else "❌ 否"
+            blocks.append(paragraph(inline(
+                bold("均线排列"),
+                f": {trend_data.get('ma_alignment', 'N/A')} | 多头排列: {is_bullish} | "
+                f"趋势强度: {trend_data.get('trend_score', 'N/A')}/100",
+            )))
+
+        if price_data:
+            bias_status = price_data.get('bias_status', 'N/A')
+            bias_emoji = "✅" if bias_status == "安全" else ("⚠️" if bias_status == "警戒" else "🚨")
+            blocks.append(table(["价格指标", "数值"], [
+                ["当前价", price_data.get('current_price', 'N/A')],
+                ["MA5", price_data.get('ma5', 'N/A')],
+                ["MA10", price_data.get('ma10', 'N/A')],
+                ["MA20", price_data.get('ma20', 'N/A')],
+                ["乖离率(MA5)", f"{price_data.get('bias_ma5', 'N/A')}% {bias_emoji}{bias_status}"],
+                ["支撑位", price_data.get('support_level', 'N/A')],
+                ["压力位", price_data.get('resistance_level', 'N/A')],
+            ]))
+
+        if vol_data:
+            blocks.append(paragraph(
+                inline(bold("量能"), f": 量比 {vol_data.get('volume_ratio', 'N/A')} "
+                                   f"({vol_data.get('volume_status', '')}) | 换手率 {vol_data.get('turnover_rate', 'N/A')}%"),
+                inline("💡 ", italic(vol_data.get('volume_meaning', ''))),
+            ))
+
+        if chip_data:
+            chip_health = chip_data.get('chip_health', 'N/A')
+            chip_emoji = "✅" if chip_health == "健康" else ("⚠️" if chip_health == "一般" else "🚨")
+            blocks.append(paragraph(inline(
+                bold("筹码"),
+                f": 获利比例 {chip_data.get('profit_ratio', 'N/A')} | 平均成本 {chip_data.get('avg_cost', 'N/A')} | "
+                f"集中度 {chip_data.get('concentration', 'N/A')} {chip_emoji}{chip_health}",
+            )))
+
+    # ========== 作战计划 ==========
+    battle = dashboard.get('battle_plan', {})
+    if battle:
+        blocks.append(heading(3, "🎯 作战计划"))
+        sniper = battle.get('sniper_points', {})
+        if sniper:
+            blocks.append(paragraph(bold("📍 狙击点位")))
+            blocks.append(table(["点位类型", "价格"], [
+                ["🎯 理想买入点", sniper.get('ideal_buy', 'N/A')],
+                ["🔵 次优买入点", sniper.get('secondary_buy', 'N/A')],
+                ["🛑 止损位", sniper.get('stop_loss', 'N/A')],
+                ["🎊 目标位", sniper.get('take_profit', 'N/A')],
+            ]))
+        position = battle.get('position_strategy', {})
+        if position:
+            blocks.append(paragraph(inline(bold("💰 仓位建议"), f": {position.get('suggested_position', 'N/A')}")))
+            blocks.append(bullets([
+                f"建仓策略: {position.get('entry_plan', 'N/A')}",
+                f"风控策略: {position.get('risk_control', 'N/A')}",
+            ]))
+        checklist = battle.get('action_checklist', [])
+        if checklist:
+            blocks.append(paragraph(bold("✅ 检查清单")))
+            blocks.append(bullets(checklist))
+
+    # 如果没有 dashboard，显示传统格式
+    if not dashboard:
+        if result.buy_reason:
+            blocks.append(paragraph(inline(bold("💡 操作理由"), f": {result.buy_reason}")))
+        if result.risk_warning:
+            blocks.append(paragraph(inline(bold("⚠️ 风险提示"), f": {result.risk_warning}")))
+        if result.ma_analysis or result.volume_analysis:
+            blocks.append(heading(3, "📊 技术面"))
+            lines = []
+            if result.ma_analysis:
+                lines.append(inline(bold("均线"), f": {result.ma_analysis}"))
+            if result.volume_analysis:
+                lines.append(inline(bold("量能"), f": {result.volume_analysis}"))
+            blocks.append(paragraph(*lines))
+        if result.news_summary:
+            blocks.extend([heading(3, "📰 消息面"), paragraph(result.news_summary)])
+
+    blocks.append(DIVIDER)
+    return blocks
+
+
+def build_dashboard_section(result: 'AnalysisResult') -> StockSection:
+    """单只股票的决策仪表盘段落（缓存，增量报告写入与汇总日报共用）"""
+    return get_section('dashboard', result, lambda: _dashboard_blocks(result))
+
+
+def build_dashboard_document(
+    results: Sequence['AnalysisResult'],
+    report_date: Optional[str] = None,
+) -> ReportDocument:
+    """构建决策仪表盘日报（市场概览 + 重要信息 + 核心结论 + 数据透视 + 作战计划）"""
+    if report_date is None:
+        report_date = datetime.now().strftime('%Y-%m-%d')
+    sorted_results = _sorted_by_score(results)
+    buy_count, hold_count, sell_count = _advice_counts(results)
+
+    header: List[Block] = [
+        heading(1, f"🎯 {report_date} 决策仪表盘"),
+        quote("共分析 ", bold(len(results)), f" 只股票 | 🟢买入:{buy_count} 🟡观望:{hold_count} 🔴卖出:{sell_count}"),
+    ]
+    # 分析结果摘要 (Issue #112)
+    if results:
+        header.append(heading(2, "📊 分析结果摘要"))
+        header.append(paragraph(*[
+            inline(f"{r.get_emoji()} ", bold(f"{r.name}({r.code})"),
+                   f": {r.operation_advice} | 评分 {r.sentiment_score} | {r.trend_prediction}")
+            for r in sorted_results
+        ]))
+        header.append(DIVIDER)
+
+    sections = [build_dashboard_section(r) for r in sorted_results]
+    footer = [paragraph(italic(f"报告生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"))]
+    return ReportDocument(header, sections, footer)
+
+
+# ============================================================
+# 企业微信精简版仪表盘（控制在 4000 字符内，只保留核心结论和狙击点位）
+# ============================================================
+
+def _wechat_blocks(result: 'AnalysisResult') -> List[Block]:
+    signal_text, signal_emoji, _ = get_signal_level(result)
+    dashboard = _dashboard(result)
+    core = dashboard.get('core_conclusion', {})
+    battle = dashboard.get('battle_plan', {})
+    intel = dashboard.get('intelligence', {})
+
+    blocks: List[Block] = [heading(3, f"{signal_emoji} ", bold(signal_text), f" | {_stock_name(result)}({result.code})")]
+
+    # 核心决策（一句话）
+    one_sentence = core.get('one_sentence', result.analysis_summary) if core else result.analysis_summary
+    if one_sentence:
+        blocks.append(paragraph(inline("📌 ", bold(one_sentence[:80]))))
+
+    # 重要信息区（舆情+基本面）
+    info_lines = []
+    if intel.get('earnings_outlook'):
+        info_lines.append(f"📊 业绩: {intel['earnings_outlook'][:60]}")
+    if intel.get('sentiment_summary'):
+        info_lines.append(f"💭 舆情: {intel['sentiment_summary'][:50]}")
+    if info_lines:
+        blocks.append(paragraph(*info_lines))
+
+    # 风险警报 / 利好催化（各最多 2 条）
+    if intel.get('risk_alerts'):
+        blocks.append(paragraph(inline("🚨 ", bold("风险"), ":"),
+                                *[f"   • {_clip(risk, 50)}" for risk in intel['risk_alerts'][:2]]))
+    if intel.get('positive_catalysts'):
+        blocks.append(paragraph(inline("✨ ", bold("利好"), ":"),
+                                *[f"   • {_clip(cat, 50)}" for cat in intel['positive_catalysts'][:2]]))
+
+    # 狙击点位
+    sniper = battle.get('sniper_points', {})
+    points = []
+    if sniper.get('ideal_buy'):
+        points.append(f"🎯买点:{sniper['ideal_buy'][:15]}")
+    if sniper.get('stop_loss'):
+        points.append(f"🛑止损:{sniper['stop_loss'][:15]}")
+    if sniper.get('take_profit'):
+        points.append(f"🎊目标:{sniper['take_profit'][:15]}")
+    if points:
+        blocks.append(paragraph(" | ".join(points)))
+
+    # 持仓建议
+    pos_advice = core.get('position_advice', {})
+    pos_lines = []
+    if pos_advice.get('no_position'):
+        pos_lines.append(f"🆕 空仓者: {pos_advice['no_position'][:50]}")
+    if pos_advice.get('has_position'):
+        pos_lines.append(f"💼 持仓者: {pos_advice['has_position'][:50]}")
+    if pos_lines:
+        blocks.append(paragraph(*pos_lines))
+
+    # 检查清单只显示不通过的项目
+    failed_checks = [c for c in battle.get('action_checklist', []) if c.startswith('❌') or c.startswith('⚠️')]
+    if failed_checks:
+        blocks.append(paragraph(inline(bold("检查未通过项"), ":"), *[f"   {c[:40]}" for c in failed_checks[:3]]))
+
+    blocks.append(DIVIDER)
+    return blocks
+
+
+def build_wechat_dashboard_document(results: Sequence['AnalysisResult']) -> ReportDocument:
+    """构建企业微信精简版决策仪表盘"""
+    report_date = datetime.now().strftime('%Y-%m-%d')
+    buy_count, hold_count, sell_count = _advice_counts(results)
+    header = [
+        heading(2, f"🎯 {report_date} 决策仪表盘"),
+        quote(f"{len(results)}只股票 | 🟢买入:{buy_count} 🟡观望:{hold_count} 🔴卖出:{sell_count}"),
+    ]
+    sections = [get_section('wechat', r, lambda r=r: _wechat_blocks(r)) for r in _sorted_by_score(results)]
+    footer = [paragraph(italic(f"生成时间: {datetime.now().strftime('%H:%M')}"))]
+    return ReportDocument(header, sections, footer)
+
+
+# ============================================================
+# 单股报告（单股推送模式 #55）
+# ============================================================
+
+def _single_stock_blocks(result: 'AnalysisResult') -> List[Block]:
+    signal_text, _, _ = get_signal_level(result)
+    dashboard = _dashboard(result)
+    core = dashboard.get('core_conclusion', {})
+    battle = dashboard.get('battle_plan', {})
+    intel = dashboard.get('intelligence', {})
+    blocks: List[Block] = []
+
+    # 核心决策（一句话）
+    one_sentence = core.get('one_sentence', result.analysis_summary) if core else result.analysis_summary
+    if one_sentence:
+        blocks.extend([heading(3, "📌 核心结论"), paragraph(inline(bold(signal_text), f": {one_sentence}"))])
+
+    # 重要信息（舆情+基本面）
+    if intel and any(intel.get(k) for k in ('earnings_outlook', 'sentiment_summary', 'risk_alerts', 'positive_catalysts')):
+        blocks.append(heading(3, "📰 重要信息"))
+        lines = []
+        if intel.get('earnings_outlook'):
+            lines.append(inline("📊 ", bold("业绩预期"), f": {intel['earnings_outlook'][:100]}"))
+        if intel.get('sentiment_summary'):
+            lines.append(inline("💭 ", bold("舆情情绪"), f": {intel['sentiment_summary'][:80]}"))
+        if lines:
+            blocks.append(paragraph(*lines))
+        if intel.get('risk_alerts'):
+            blocks.append(paragraph(inline("🚨 ", bold("风险警报"), ":")))
+            blocks.append(bullets([risk[:60] for risk in intel['risk_alerts'][:3]]))
+        if intel.get('positive_catalysts'):
+            blocks.append(paragraph(inline("✨ ", bold("利好催化"), ":")))
+            blocks.append(bullets([cat[:60] for cat in intel['positive_catalysts'][:3]]))
+
+    # 狙击点位
+    sniper = battle.get('sniper_points', {})
+    if sniper:
+        blocks.append(heading(3, "🎯 操作点位"))
+        blocks.append(table(["买点", "止损", "目标"], [[
+            sniper.get('ideal_buy', '-'), sniper.get('stop_loss', '-'), sniper.get('take_profit', '-'),
+        ]]))
+
+    # 持仓建议
+    pos_advice = core.get('position_advice', {})
+    if pos_advice:
+        blocks.append(heading(3, "💼 持仓建议"))
+        blocks.append(bullets([
+            inline("🆕 ", bold("空仓者"), f": {pos_advice.get('no_position', result.operation_advice)}"),
+            inline("💼 ", bold("持仓者"), f": {pos_advice.get('has_position', '继续持有')}"),
+        ]))
+    return blocks
+
+
+def _single_stock_header(result: 'AnalysisResult', report_date: str) -> List[Block]:
+    _, signal_emoji, _ = get_signal_level(result)
+    return [
+        heading(2, f"{signal_emoji} {_stock_name(result)} ({result.code})"),
+        quote(f"{report_date} | 评分: ", bold(result.sentiment_score), f" | {result.trend_prediction}"),
+    ]
+
+
+_DISCLAIMER = paragraph(italic("AI生成，仅供参考，不构成投资建议"))
+
+
+def build_single_stock_document(result: 'AnalysisResult') -> ReportDocument:
+    """构建单只股票的精简报告"""
+    header = _single_stock_header(result, datetime.now().strftime('%Y-%m-%d %H:%M'))
+    section = get_section('single', result, lambda: _single_stock_blocks(result))
+    return ReportDocument(header, [section], [DIVIDER, _DISCLAIMER])
+
+
+def build_single_stock_digest(results: Sequence['AnalysisResult']) -> ReportDocument:
+    """构建合并推送的多只股票精简报告（按完成顺序，各股正文段落复用缓存）"""
+    report_date = datetime.now().strftime('%Y-%m-%d %H:%M')
+    sections: List[StockSection] = []
+    for result in results:
+        sections.append(StockSection(_single_stock_header(result, report_date)))
+        sections.append(get_section('single', result, lambda r=result: _single_stock_blocks(r)))
+        sections.append(StockSection([DIVIDER]))
+    return ReportDocument([], sections, [_DISCLAIMER])
+
+
+# ============================================================
+# 详细日报
+# ============================================================
+
+def _daily_blocks(result: 'AnalysisResult') -> List[Block]:
+    confidence_stars = result.get_confidence_stars() if hasattr(result, 'get_confidence_stars') else '⭐⭐'
+    blocks: List[Block] = [
+        heading(3, f"{result.get_emoji()} {result.name} ({result.code})"),
+        paragraph(inline(
+            bold(f"操作建议：{result.operation_advice}"), " | ",
+            bold(f"综合评分：{result.sentiment_score}分"), " | ",
+            bold(f"趋势预测：{result.trend_prediction}"), " | ",
+            bold(f"置信度：{confidence_stars}"),
+        )),
+    ]
+    if result.key_points:
+        blocks.append(paragraph(inline(bold("🎯 核心看点"), f"：{result.key_points}")))
+    if result.buy_reason:
+        blocks.append(paragraph(inline(bold("💡 操作理由"), f"：{result.buy_reason}")))
+    if result.trend_analysis:
+        blocks.extend([heading(4, "📉 走势分析"), paragraph(result.trend_analysis)])
+
+    # 短期/中期展望
+    outlook = []
+    if result.short_term_outlook:
+        outlook.append(inline(bold("短期（1-3日）"), f"：{result.short_term_outlook}"))
+    if result.medium_term_outlook:
+        outlook.append(inline(bold("中期（1-2周）"), f"：{result.medium_term_outlook}"))
+    if outlook:
+        blocks.extend([heading(4, "🔮 市场展望"), bullets(outlook)])
+
+    # 技术面 / 基本面 / 消息面
+    groups = [
+        ("📊 技术面分析", [("综合", result.technical_analysis), ("均线", result.ma_analysis),
+                          ("量能", result.volume_analysis), ("形态", result.pattern_analysis)]),
+        ("🏢 基本面分析", [(None, result.fundamental_analysis), ("板块地位", result.sector_position),
+                          ("公司亮点", result.company_highlights)]),
+        ("📰 消息面/情绪面", [("新闻摘要", result.news_summary), ("市场情绪", result.market_sentiment),
+                            ("相关热点", result.hot_topics)]),
+    ]
+    for title, items in groups:
+        lines = [inline(bold(label), f"：{value}") if label else value for label, value in items if value]
+        if lines:
+            blocks.extend([heading(4, title), paragraph(*lines)])
+
+    if result.analysis_summary:
+        blocks.extend([heading(4, "📝 综合分析"), paragraph(result.analysis_summary)])
+    if result.risk_warning:
+        blocks.append(paragraph(inline("⚠️ ", bold("风险提示"), f"：{result.risk_warning}")))
+
+    # 数据来源说明
+    sources = []
+    if result.search_performed:
+        sources.append(italic("🔍 已执行联网搜索"))
+    if result.data_sources:
+        sources.append(italic(f"📋 数据来源：{result.data_sources}"))
+    if sources:
+        blocks.append(paragraph(*sources))
+
+    # 错误信息（如果有）
+    if not result.success and result.error_message:
+        blocks.append(paragraph(inline("❌ ", bold("分析异常"), f"：{result.error_message[:100]}")))
+
+    blocks.append(DIVIDER)
+    return blocks
+
+
+def build_daily_document(
+    results: Sequence['AnalysisResult'],
+    report_date: Optional[str] = None,
+) -> ReportDocument:
+    """构建详细日报"""
+    if report_date is None:
+        report_date = datetime.now().strftime('%Y-%m-%d')
+    buy_count, hold_count, sell_count = _advice_counts(results)
+    avg_score = sum(r.sentiment_score for r in results) / len(results) if results else 0
+
+    header: List[Block] = [
+        heading(1, f"📅 {report_date} 股票智能分析报告"),
+        quote("共分析 ", bold(len(results)), f" 只股票 | 报告生成时间：{datetime.now().strftime('%H:%M:%S')}"),
+        DIVIDER,
+        heading(2, "📊 操作建议汇总"),
+        table(["指标", "数值"], [
+            ["🟢 建议买入/加仓", inline(bold(buy_count), " 只")],
+            ["🟡 建议持有/观望", inline(bold(hold_count), " 只")],
+            ["🔴 建议减仓/卖出", inline(bold(sell_count), " 只")],
+            ["📈 平均看多评分", inline(bold(f"{avg_score:.1f}"), " 分")],
+        ]),
+        DIVIDER,
+        heading(2, "📈 个股详细分析"),
+    ]
+    sections = [get_section('daily', r, lambda r=r: _daily_blocks(r)) for r in _sorted_by_score(results)]
+    footer = [paragraph(italic(f"报告生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"))]
+    return ReportDocument(header, sections, footer)
+
+
+if __name__ == "__main__":
+    # 基准：500 只股票的报告生成耗时与内存峰值
+    # 旧方式 = 拼接 Markdown + 各渠道正则 / markdown2 二次解析；新方式 = 构建文档 + 直接渲染各格式
+    import time
+    import tracemalloc
+
+    from src import analyzer
+    from src.formatters import format_feishu_markdown
+    from src.notification import NotificationService
+    from src.report_model import (
+        FORMAT_FEISHU, FORMAT_HTML, FORMAT_PLAIN, FORMAT_TELEGRAM, reset_report_cache,
+    )
+
+    def make_result(i: int) -> "AnalysisResult":
+        score = (i * 37) % 100
+        return analyzer.AnalysisResult(
+            code=f"{600000 + i}", name=f"样本股{i}", sentiment_score=score,
+            trend_prediction="看多" if score >= 60 else "震荡", operation_advice="买入" if score >= 60 else "观望",
+            analysis_summary="均线多头排列，量能温和放大，短期有望延续上行。",
+            dashboard={
+                'core_conclusion': {
+                    'one_sentence': f"样本股{i} 回踩 MA5 附近低吸，跌破 MA20 止损。",
+                    'time_sensitivity': '本周内',
+                    'position_advice': {'no_position': '回踩 MA5 分批建仓', 'has_position': '继续持有，MA20 止损'},
+                },
+                'intelligence': {
+                    'sentiment_summary': '市场关注度提升，机构观点偏正面',
+                    'earnings_outlook': '三季报预告净利润同比增长 20%-30%',
+                    'risk_alerts': ['大股东减持计划 (不超过 1%)', '行业竞争加剧'],
+                    'positive_catalysts': ['新产品获批上市', '纳入指数成分股'],
+                    'latest_news': '公司发布回购公告，拟回购 1-2 亿元',
+                },
+                'data_perspective': {
+                    'trend_status': {'ma_alignment': '多头排列', 'is_bullish': True, 'trend_score': 75},
+                    'price_position': {'current_price': 12.34, 'ma5': 12.1, 'ma10': 11.8, 'ma20': 11.2,
+                                       'bias_ma5': 1.98, 'bias_status': '安全',
+                                       'support_level': 11.8, 'resistance_level': 13.0},
+                    'volume_analysis': {'volume_ratio': 1.35, 'volume_status': '温和放量',
+                                        'turnover_rate': 2.4, 'volume_meaning': '资金温和流入'},
+                    'chip_structure': {'profit_ratio': '68%', 'avg_cost': 11.5, 'concentration': '12%',
+                                       'chip_health': '健康'},
+                },
+                'battle_plan': {
+                    'sniper_points': {'ideal_buy': '12.10 (MA5)', 'secondary_buy': '11.80 (MA10)',
+                                      'stop_loss': '11.20', 'take_profit': '13.50'},
+                    'position_strategy': {'suggested_position': '3 成', 'entry_plan': '分两批建仓',
+                                          'risk_control': '跌破 MA20 止损'},
+                    'action_checklist': ['✅ 多头排列', '✅ 乖离率安全', '⚠️ 量能一般', '❌ 筹码偏散'],
+                },
+            },
+        )
+
+    results = [make_result(i) for i in range(500)]
+    service = NotificationService()
+
+    def legacy() -> int:
+        markdown = service.generate_dashboard_report(results)
+        reset_report_cache()  # 旧方式下各渠道只拿到 Markdown 字符串
+        outputs = [
+            markdown,
+            service._markdown_to_html(markdown),
+            "".join(service._convert_to_telegram_markdown(chunk) for chunk in markdown.split("\n---\n")),
+            format_feishu_markdown(markdown),
+            service._markdown_to_plain_text(markdown),
+        ]
+        return sum(len(o) for o in outputs)
+
+    def model() -> int:
+        document = build_dashboard_document(results)
+        outputs = [
+            document.markdown,
+            document.to_html(),
+            document.render(FORMAT_TELEGRAM),
+            document.render(FORMAT_FEISHU),
+            document.render(FORMAT_PLAIN),
+        ]
+        return sum(len(o) for o in outputs)
+
+    for name, func in (("旧方式（Markdown + 逐渠道解析）", legacy), ("文档模型（一次构建 + 直接渲染）", model)):
+        reset_report_cache()
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = func()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name}: {elapsed * 1000:.1f} ms, 内存峰值 {peak / 1024 / 1024:.1f} MB, 输出 {size} 字符")
+
+    # 单股推送后再生成汇总日报：段落直接复用
+    reset_report_cache()
+    for r in results:
+        build_dashboard_document([r]).markdown
+    start = time.perf_counter()
+    build_dashboard_document(results).render(FORMAT_HTML)
+    print(f"段落已缓存时生成汇总 HTML: {(time.perf_counter() - start) * 1000:.1f} ms")
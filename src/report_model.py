@@ -0,0 +1,582 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 报告文档模型
+===================================
+
+职责：
+1. 报告先构建为结构化文档（标题 / 段落 / 列表 / 引用 / 表格 / 分隔线），每次运行只遍历一次分析结果
+2. 由文档直接渲染各渠道格式：Markdown、HTML 邮件、Telegram MarkdownV2、飞书 lark_md、纯文本，
+   不再对 Markdown 逐渠道正则二次解析
+3. 每只股票的段落（StockSection）按格式只渲染一次并缓存，单股推送与汇总日报共用
+4. 生成的 Markdown 登记到进程内注册表，发送时可按内容找回文档，直接取对应渠道的渲染结果
+
+使用方式：
+    doc = ReportDocument(header=[...], sections=[...], footer=[...])
+    markdown = doc.markdown          # 登记后返回 Markdown
+    doc = find_document(markdown)    # 发送端按内容找回文档（找不到时回退正则转换）
+    html = doc.render(FORMAT_HTML)
+"""
+
+import html
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, TextIO, Tuple, Union
+
+# 渲染格式
+FORMAT_MARKDOWN = 'markdown'
+FORMAT_HTML = 'html'
+FORMAT_TELEGRAM = 'telegram'
+FORMAT_FEISHU = 'feishu'
+FORMAT_PLAIN = 'plain'
+
+# 飞书 / 纯文本 / Telegram 的分隔线（与 chunking.MARKDOWN_SEPARATORS 一致，保证可按股票分段）
+THIN_RULE = '────────'
+
+
+# ============================================================
+# 行内文本与块
+# ============================================================
+
+class Span(NamedTuple):
+    """行内文本片段"""
+    text: str
+    style: str = ''  # '' / 'bold' / 'italic'
+
+
+Inline = Tuple[Span, ...]
+InlineLike = Union[str, Span, Sequence[Union[str, Span]]]
+
+
+def bold(text: str) -> Span:
+    return Span(str(text), 'bold')
+
+
+def italic(text: str) -> Span:
+    return Span(str(text), 'italic')
+
+
+def inline(*parts: Union[str, Span]) -> Inline:
+    """拼接行内片段（字符串视为普通文本）"""
+    return tuple(p if isinstance(p, Span) else Span(str(p)) for p in parts if p != '')
+
+
+def _as_inline(value: InlineLike) -> Inline:
+    if isinstance(value, Span):
+        return (value,)
+    if isinstance(value, (list, tuple)):
+        return inline(*value)
+    return (Span(str(value)),)
+
+
+class Heading(NamedTuple):
+    level: int
+    content: Inline
+
+
+class Paragraph(NamedTuple):
+    """连续的若干行（Markdown 中不空行分隔）"""
+    lines: Tuple[Inline, ...]
+
+
+class BulletList(NamedTuple):
+    items: Tuple[Inline, ...]
+    marker: str = '-'  # Markdown 列表标记（企业微信精简版使用缩进圆点）
+
+
+class Quote(NamedTuple):
+    content: Inline
+
+
+class Table(NamedTuple):
+    header: Tuple[Inline, ...]
+    rows: Tuple[Tuple[Inline, ...], ...]
+
+
+class Divider(NamedTuple):
+    pass
+
+
+Block = Union[Heading, Paragraph, BulletList, Quote, Table, Divider]
+
+
+def heading(level: int, *parts: Union[str, Span]) -> Heading:
+    return Heading(level, inline(*parts))
+
+
+def paragraph(*lines: InlineLike) -> Paragraph:
+    return Paragraph(tuple(_as_inline(line) for line in lines))
+
+
+def bullets(items: Sequence[InlineLike], marker: str = '-') -> BulletList:
+    return BulletList(tuple(_as_inline(item) for item in items), marker)
+
+
+def quote(*parts: Union[str, Span]) -> Quote:
+    return Quote(inline(*parts))
+
+
+def table(header: Sequence[InlineLike], rows: Sequence[Sequence[InlineLike]]) -> Table:
+    return Table(
+        tuple(_as_inline(cell) for cell in header),
+        tuple(tuple(_as_inline(cell) for cell in row) for row in rows),
+    )
+
+
+DIVIDER = Divider()
+
+
+# ============================================================
+# 渲染器
+# ============================================================
+
+def _plain_text(content: Inline) -> str:
+    return ''.join(span.text for span in content)
+
+
+# --- Markdown ---
+
+def _md_inline(content: Inline) -> str:
+    parts = []
+    for span in content:
+        if span.style == 'bold':
+            parts.append(f"**{span.text}**")
+        elif span.style == 'italic':
+            parts.append(f"*{span.text}*")
+        else:
+            parts.append(span.text)
+    return ''.join(parts)
+
+
+def _md_block(block: Block) -> str:
+    if isinstance(block, Heading):
+        return f"{'#' * block.level} {_md_inline(block.content)}"
+    if isinstance(block, Paragraph):
+        return '\n'.join(_md_inline(line) for line in block.lines)
+    if isinstance(block, BulletList):
+        return '\n'.join(f"{block.marker} {_md_inline(item)}" for item in block.items)
+    if isinstance(block, Quote):
+        return f"> {_md_inline(block.content)}"
+    if isinstance(block, Table):
+        lines = [
+            '| ' + ' | '.join(_md_inline(cell) for cell in block.header) + ' |',
+            '|' + '|'.join('------' for _ in block.header) + '|',
+        ]
+        lines.extend('| ' + ' | '.join(_md_inline(cell) for cell in row) + ' |' for row in block.rows)
+        return '\n'.join(lines)
+    return '---'
+
+
+# --- HTML（邮件） ---
+
+def _html_inline(content: Inline) -> str:
+    parts = []
+    for span in content:
+        text = html.escape(span.text, quote=False).replace('\n', '<br />\n')
+        if span.style == 'bold':
+            parts.append(f"<strong>{text}</strong>")
+        elif span.style == 'italic':
+            parts.append(f"<em>{text}</em>")
+        else:
+            parts.append(text)
+    return ''.join(parts)
+
+
+def _html_block(block: Block) -> str:
+    if isinstance(block, Heading):
+        return f"<h{block.level}>{_html_inline(block.content)}</h{block.level}>"
+    if isinstance(block, Paragraph):
+        return '<p>' + '<br />\n'.join(_html_inline(line) for line in block.lines) + '</p>'
+    if isinstance(block, BulletList):
+        return '<ul>\n' + '\n'.join(f"<li>{_html_inline(item)}</li>" for item in block.items) + '\n</ul>'
+    if isinstance(block, Quote):
+        return f"<blockquote>\n<p>{_html_inline(block.content)}</p>\n</blockquote>"
+    if isinstance(block, Table):
+        head = ''.join(f"<th>{_html_inline(cell)}</th>" for cell in block.header)
+        body = '\n'.join(
+            '<tr>' + ''.join(f"<td>{_html_inline(cell)}</td>" for cell in row) + '</tr>'
+            for row in block.rows
+        )
+        return f"<table>\n<thead>\n<tr>{head}</tr>\n</thead>\n<tbody>\n{body}\n</tbody>\n</table>"
+    return '<hr />'
+
+
+# --- Telegram MarkdownV2 ---
+
+_TELEGRAM_SPECIAL = re.compile(r'([_*\[\]()~`>#+\-=|{}.!\\])')
+
+
+def escape_telegram(text: str) -> str:
+    """转义 MarkdownV2 保留字符"""
+    return _TELEGRAM_SPECIAL.sub(r'\\\1', text)
+
+
+def _tg_inline(content: Inline) -> str:
+    parts = []
+    for span in content:
+        text = escape_telegram(span.text)
+        if span.style == 'bold':
+            parts.append(f"*{text}*")
+        elif span.style == 'italic':
+            parts.append(f"_{text}_")
+        else:
+            parts.append(text)
+    return ''.join(parts)
+
+
+def _tg_block(block: Block) -> str:
+    # Telegram 不支持标题与表格：标题转加粗，表格转为「列名：值」条目
+    if isinstance(block, Heading):
+        return f"*{escape_telegram(_plain_text(block.content))}*"
+    if isinstance(block, Paragraph):
+        return '\n'.join(_tg_inline(line) for line in block.lines)
+    if isinstance(block, BulletList):
+        return '\n'.join(f"• {_tg_inline(item)}" for item in block.items)
+    if isinstance(block, Quote):
+        return f">{_tg_inline(block.content)}"
+    if isinstance(block, Table):
+        return '\n'.join(
+            '• ' + ' \\| '.join(_table_pairs(block, row, _tg_inline, escape_telegram))
+            for row in block.rows
+        )
+    return THIN_RULE
+
+
+# --- 飞书 lark_md ---
+
+def _table_pairs(block: Table, row: Tuple[Inline, ...], render: Callable[[Inline], str],
+                 escape: Callable[[str], str] = lambda s: s) -> List[str]:
+    pairs = []
+    for idx, cell in enumerate(row):
+        key = _plain_text(block.header[idx]) if idx < len(block.header) else f"列{idx + 1}"
+        pairs.append(f"{escape(key)}：{render(cell)}")
+    return pairs
+
+
+def _feishu_block(block: Block) -> str:
+    # 与 formatters.format_feishu_markdown 的转换规则一致
+    if isinstance(block, Heading):
+        return f"**{_plain_text(block.content)}**"
+    if isinstance(block, Paragraph):
+        return '\n'.join(_md_inline(line) for line in block.lines)
+    if isinstance(block, BulletList):
+        return '\n'.join(f"• {_md_inline(item)}" for item in block.items)
+    if isinstance(block, Quote):
+        return f"💬 {_md_inline(block.content)}"
+    if isinstance(block, Table):
+        return '\n'.join('• ' + ' | '.join(_table_pairs(block, row, _md_inline)) for row in block.rows)
+    return THIN_RULE
+
+
+# --- 纯文本 ---
+
+def _plain_block(block: Block) -> str:
+    if isinstance(block, Heading):
+        return _plain_text(block.content)
+    if isinstance(block, Paragraph):
+        return '\n'.join(_plain_text(line) for line in block.lines)
+    if isinstance(block, BulletList):
+        return '\n'.join(f"• {_plain_text(item)}" for item in block.items)
+    if isinstance(block, Quote):
+        return _plain_text(block.content)
+    if isinstance(block, Table):
+        return '\n'.join(
+            ' | '.join(_plain_text(cell) for cell in row)
+            for row in (block.header,) + block.rows
+        )
+    return THIN_RULE
+
+
+_BLOCK_RENDERERS: Dict[str, Tuple[Callable[[Block], str], str]] = {
+    # 格式: (块渲染函数, 块间连接符)
+    FORMAT_MARKDOWN: (_md_block, '\n\n'),
+    FORMAT_HTML: (_html_block, '\n'),
+    FORMAT_TELEGRAM: (_tg_block, '\n\n'),
+    FORMAT_FEISHU: (_feishu_block, '\n\n'),
+    FORMAT_PLAIN: (_plain_block, '\n\n'),
+}
+
+
+def render_blocks(blocks: Sequence[Block], fmt: str) -> str:
+    """将块序列渲染为指定格式"""
+    render, joiner = _BLOCK_RENDERERS[fmt]
+    return joiner.join(render(block) for block in blocks)
+
+
+# ============================================================
+# 文档
+# ============================================================
+
+class StockSection:
+    """单只股票的报告段落，各格式渲染结果按需生成并缓存"""
+
+    __slots__ = ('blocks', '_rendered')
+
+    def __init__(self, blocks: Sequence[Block]):
+        self.blocks: Tuple[Block, ...] = tuple(blocks)
+        self._rendered: Dict[str, str] = {}
+
+    def render(self, fmt: str) -> str:
+        text = self._rendered.get(fmt)
+        if text is None:
+            text = render_blocks(self.blocks, fmt)
+            self._rendered[fmt] = text
+        return text
+
+
+class ReportDocument:
+    """
+    报告文档：页眉块 + 股票段落 + 页脚块
+
+    render() 结果按格式缓存；markdown 属性会把文档登记到注册表，
+    发送端可通过 find_document() 取回文档并直接使用对应渠道的渲染结果
+    """
+
+    def __init__(
+        self,
+        header: Sequence[Block] = (),
+        sections: Sequence[StockSection] = (),
+        footer: Sequence[Block] = (),
+    ):
+        self.header = StockSection(header)
+        self.sections: List[StockSection] = list(sections)
+        self.footer = StockSection(footer)
+        self._rendered: Dict[str, str] = {}
+
+    def render(self, fmt: str) -> str:
+        text = self._rendered.get(fmt)
+        if text is None:
+            _, joiner = _BLOCK_RENDERERS[fmt]
+            parts = [part.render(fmt) for part in [self.header, *self.sections, self.footer] if part.blocks]
+            text = joiner.join(parts)
+            self._rendered[fmt] = text
+        return text
+
+    @property
+    def markdown(self) -> str:
+        text = self.render(FORMAT_MARKDOWN)
+        _registry.add(text, self)
+        return text
+
+    def to_html(self) -> str:
+        """完整 HTML 邮件（含样式）"""
+        return wrap_email_html(self.render(FORMAT_HTML))
+
+    def write_to(self, fp: TextIO, fmt: str = FORMAT_MARKDOWN) -> None:
+        """逐段写入文件，不拼接完整字符串（段落渲染结果来自缓存）"""
+        _, joiner = _BLOCK_RENDERERS[fmt]
+        first = True
+        for part in [self.header, *self.sections, self.footer]:
+            if not part.blocks:
+                continue
+            if not first:
+                fp.write(joiner)
+            fp.write(part.render(fmt))
+            first = False
+
+
+# ============================================================
+# 段落缓存与文档注册表
+# ============================================================
+
+class _SectionCache:
+    """
+    按 (段落类型, 分析结果对象) 缓存 StockSection
+
+    AnalysisResult 是可变 dataclass（不可哈希），按 id 建索引并用弱引用校验，
+    结果对象被回收时自动移除对应条目
+    """
+
+    def __init__(self):
+        self._items: Dict[Tuple[str, int], Tuple[weakref.ref, StockSection]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, result: object, build: Callable[[], Sequence[Block]]) -> StockSection:
+        key = (kind, id(result))
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry[0]() is result:
+                self.hits += 1
+                return entry[1]
+        section = StockSection(build())
+        try:
+            ref = weakref.ref(result, lambda _, k=key: self._items.pop(k, None))
+        except TypeError:
+            return section  # 不支持弱引用的对象不缓存
+        with self._lock:
+            self.misses += 1
+            self._items[key] = (ref, section)
+        return section
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+
+class _DocumentRegistry:
+    """按 Markdown 内容登记最近生成的文档（LRU，进程内）"""
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._items: 'OrderedDict[str, ReportDocument]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, markdown: str, document: ReportDocument) -> None:
+        with self._lock:
+            self._items[markdown] = document
+            self._items.move_to_end(markdown)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def find(self, markdown: str) -> Optional[ReportDocument]:
+        with self._lock:
+            return self._items.get(markdown)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+_section_cache = _SectionCache()
+_registry = _DocumentRegistry()
+
+
+def get_section(kind: str, result: object, build: Callable[[], Sequence[Block]]) -> StockSection:
+    """获取（或构建并缓存）某个分析结果的报告段落"""
+    return _section_cache.get(kind, result, build)
+
+
+def find_document(markdown: str) -> Optional[ReportDocument]:
+    """按 Markdown 内容查找已登记的报告文档，未找到返回 None（调用方回退正则转换）"""
+    if not markdown:
+        return None
+    return _registry.find(markdown)
+
+
+def reset_report_cache() -> None:
+    """清空段落缓存与文档注册表（主要用于测试）"""
+    _section_cache.clear()
+    _registry.clear()
+
+
+# ============================================================
+# HTML 邮件模板
+# ============================================================
+
+EMAIL_CSS = """
+    body {
+        font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Helvetica, Arial, sans-serif;
+        line-height: 1.5;
+        color: #24292e;
+        font-size: 14px;
+        padding: 15px;
+        max-width: 900px;
+        margin: 0 auto;
+    }
+    h1 {
+        font-size: 20px;
+        border-bottom: 1px solid #eaecef;
+        padding-bottom: 0.3em;
+        margin-top: 1.2em;
+        margin-bottom: 0.8em;
+        color: #0366d6;
+    }
+    h2 {
+        font-size: 18px;
+        border-bottom: 1px solid #eaecef;
+        padding-bottom: 0.3em;
+        margin-top: 1.0em;
+        margin-bottom: 0.6em;
+    }
+    h3 {
+        font-size: 16px;
+        margin-top: 0.8em;
+        margin-bottom: 0.4em;
+    }
+    p {
+        margin-top: 0;
+        margin-bottom: 8px;
+    }
+    /* 表格样式优化 */
+    table {
+        border-collapse: collapse;
+        width: 100%;
+        margin: 12px 0;
+        display: block;
+        overflow-x: auto;
+        font-size: 13px;
+    }
+    th, td {
+        border: 1px solid #dfe2e5;
+        padding: 6px 10px;
+        text-align: left;
+    }
+    th {
+        background-color: #f6f8fa;
+        font-weight: 600;
+    }
+    tr:nth-child(2n) {
+        background-color: #f8f8f8;
+    }
+    tr:hover {
+        background-color: #f1f8ff;
+    }
+    /* 引用块样式 */
+    blockquote {
+        color: #6a737d;
+        border-left: 0.25em solid #dfe2e5;
+        padding: 0 1em;
+        margin: 0 0 10px 0;
+    }
+    /* 代码块样式 */
+    code {
+        padding: 0.2em 0.4em;
+        margin: 0;
+        font-size: 85%;
+        background-color: rgba(27,31,35,0.05);
+        border-radius: 3px;
+        font-family: SFMono-Regular, Consolas, "Liberation Mono", Menlo, monospace;
+    }
+    pre {
+        padding: 12px;
+        overflow: auto;
+        line-height: 1.45;
+        background-color: #f6f8fa;
+        border-radius: 3px;
+        margin-bottom: 10px;
+    }
+    hr {
+        height: 0.25em;
+        padding: 0;
+        margin: 16px 0;
+        background-color: #e1e4e8;
+        border: 0;
+    }
+    ul, ol {
+        padding-left: 20px;
+        margin-bottom: 10px;
+    }
+    li {
+        margin: 2px 0;
+    }
+"""
+
+
+def wrap_email_html(body: str) -> str:
+    """包装为带样式的完整 HTML 邮件"""
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>{EMAIL_CSS}</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 增量报告写入
+===================================
+
+职责：
+1. 每只股票分析完成即把其报告段落追加到 reports/report_YYYYMMDD.<运行标识>.md.partial 并刷盘，
+   进程中途退出时已完成的股票仍有可读报告；运行标识含运行 ID 与进程号，
+   同一天并发的多次运行（机器人 /batch 与定时任务）各写各的临时文件
+2. 同步追加结构化结果到 JSONL 旁路文件（每行一只股票，便于脚本 / 表格二次处理）
+3. 运行结束后按评分排序逐段写出正式报告，临时文件 + os.replace 原子替换，
+   不会留下写了一半的正式报告
+
+使用方式：
+    writer = IncrementalReportWriter.open()
+    writer.add(result)          # 每完成一只
+    writer.finalize(results)    # 运行结束，返回正式报告路径
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Dict, List, Optional
+
+from src.report_builder import build_dashboard_document, build_dashboard_section
+from src.report_model import FORMAT_MARKDOWN, heading, quote, render_blocks
+
+if TYPE_CHECKING:
+    from src.analyzer import AnalysisResult
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_SUFFIX = '.partial'
+
+
+def get_reports_dir() -> Path:
+    """报告目录（项目根目录下的 reports）"""
+    reports_dir = Path(__file__).parent.parent / 'reports'
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    return reports_dir
+
+
+def atomic_write_text(path: Path, content: str) -> None:
+    """写入临时文件后原子替换目标文件"""
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def result_record(result: 'AnalysisResult') -> Dict[str, Any]:
+    """JSONL 旁路文件中的精简结构化结果"""
+    dashboard = result.dashboard or {}
+    core = dashboard.get('core_conclusion', {}) or {}
+    sniper = (dashboard.get('battle_plan', {}) or {}).get('sniper_points', {}) or {}
+    record = {
+        'code': result.code,
+        'name': result.name,
+        'sentiment_score': result.sentiment_score,
+        'operation_advice': result.operation_advice,
+        'trend_prediction': result.trend_prediction,
+        'confidence_level': result.confidence_level,
+        'one_sentence': core.get('one_sentence') or result.analysis_summary,
+        'ideal_buy': sniper.get('ideal_buy'),
+        'stop_loss': sniper.get('stop_loss'),
+        'take_profit': sniper.get('take_profit'),
+        'success': result.success,
+        'completed_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    if result.error_message:
+        record['error_message'] = result.error_message
+    return record
+
+
+class IncrementalReportWriter:
+    """
+    按完成顺序追加写入的决策仪表盘报告（线程安全）
+
+    写入中的文件带 .partial 后缀；finalize() 后替换为正式报告并删除 .partial。
+    临时文件名包含运行标识并以独占方式创建，并发运行不会截断或删除彼此的临时文件；
+    正式报告以最后完成的运行为准（与一次性保存时相同）。
+    """
+
+    def __init__(self, report_path: Path, sidecar_path: Path, run_tag: Optional[str] = None):
+        self.report_path = report_path
+        self.sidecar_path = sidecar_path
+        self.run_tag = run_tag or f"{uuid.uuid4().hex[:8]}-{os.getpid()}"
+        self.partial_path = self._run_file(report_path, PARTIAL_SUFFIX)
+        self.partial_sidecar_path = self._run_file(sidecar_path, PARTIAL_SUFFIX)
+
+        self._lock = threading.Lock()
+        self._report: Optional[IO[str]] = None
+        self._sidecar: Optional[IO[str]] = None
+        self._codes: set = set()
+
+    def _run_file(self, path: Path, suffix: str) -> Path:
+        """本次运行专用的临时文件：report_YYYYMMDD.<运行标识>.md<suffix>"""
+        return path.with_name(f"{path.stem}.{self.run_tag}{path.suffix}{suffix}")
+
+    @classmethod
+    def open(
+        cls,
+        report_date: Optional[str] = None,
+        reports_dir: Optional[Path] = None,
+        run_id: Optional[str] = None,
+    ) -> 'IncrementalReportWriter':
+        """
+        在报告目录创建本次运行的 .md.partial 与 .jsonl.partial
+
+        Args:
+            run_id: 运行 ID（可选），与进程号组成临时文件名中的运行标识
+        """
+        date_str = (report_date or datetime.now().strftime('%Y-%m-%d')).replace('-', '')
+        reports_dir = reports_dir or get_reports_dir()
+        run_tag = f"{run_id}-{os.getpid()}" if run_id else None
+        writer = cls(reports_dir / f"report_{date_str}.md", reports_dir / f"report_{date_str}.jsonl", run_tag)
+        writer._start(report_date or datetime.now().strftime('%Y-%m-%d'))
+        return writer
+
+    def _start(self, report_date: str) -> None:
+        # 独占创建：同名文件已存在（标识冲突）时报错，由调用方回退为一次性保存
+        self._report = open(self.partial_path, 'x', encoding='utf-8')
+        try:
+            self._sidecar = open(self.partial_sidecar_path, 'x', encoding='utf-8')
+        except OSError:
+            self._report.close()
+            self.partial_path.unlink(missing_ok=True)
+            raise
+        self._report.write(render_blocks([
+            heading(1, f"🎯 {report_date} 决策仪表盘（生成中）"),
+            quote(f"按完成顺序追加，开始于 {datetime.now().strftime('%H:%M:%S')}，运行结束后整理为正式报告"),
+        ], FORMAT_MARKDOWN))
+        self._report.flush()
+        logger.debug(f"增量报告写入: {self.partial_path}")
+
+    def add(self, result: 'AnalysisResult') -> None:
+        """追加一只股票的报告段落与结构化结果（同一股票只写一次）"""
+        section = build_dashboard_section(result)
+        line = json.dumps(result_record(result), ensure_ascii=False, separators=(',', ':'), default=str)
+        with self._lock:
+            if self._report is None or result.code in self._codes:
+                return
+            self._codes.add(result.code)
+            try:
+                self._report.write("\n\n" + section.render(FORMAT_MARKDOWN))
+                self._report.flush()
+                self._sidecar.write(line + "\n")
+                self._sidecar.flush()
+            except OSError as e:
+                logger.warning(f"[{result.code}] 增量报告写入失败: {e}")
+
+    def finalize(self, results: List['AnalysisResult'], report_date: Optional[str] = None) -> str:
+        """
+        按评分排序逐段写出正式报告并原子替换，旁路文件同步转正
+
+        Returns:
+            正式报告路径
+        """
+        with self._lock:
+            self._close_files()
+            document = build_dashboard_document(results, report_date)
+            tmp = self._run_file(self.report_path, '.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                document.write_to(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.report_path)
+            if self.partial_sidecar_path.exists():
+                os.replace(self.partial_sidecar_path, self.sidecar_path)
+            self.partial_path.unlink(missing_ok=True)
+        logger.info(f"日报已保存到: {self.report_path}（结构化结果: {self.sidecar_path.name}）")
+        return str(self.report_path)
+
+    def discard(self) -> None:
+        """没有结果时删除临时文件"""
+        with self._lock:
+            self._close_files()
+            self.partial_path.unlink(missing_ok=True)
+            self.partial_sidecar_path.unlink(missing_ok=True)
+
+    def _close_files(self) -> None:
+        for fp in (self._report, self._sidecar):
+            if fp is not None:
+                try:
+                    fp.close()
+                except OSError:
+                    pass
+        self._report = self._sidecar = None
+
+
+if __name__ == "__main__":
+    # 回归检查：同一天两次运行并发写入，临时文件互不截断 / 删除
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    from src import analyzer
+
+    def make_result(code: str) -> 'AnalysisResult':
+        return analyzer.AnalysisResult(
+            code=code, name=f"样本{code}", sentiment_score=60,
+            trend_prediction="震荡", operation_advice="观望",
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reports_dir = Path(tmp)
+        batch = IncrementalReportWriter.open('2026-01-19', reports_dir, run_id='batch')
+        scheduled = IncrementalReportWriter.open('2026-01-19', reports_dir, run_id='daily')
+        assert batch.partial_path != scheduled.partial_path
+
+        batch_results = [make_result(f"{600000 + i}") for i in range(20)]
+        daily_results = [make_result(f"{i:06d}") for i in range(20)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(batch.add, batch_results))
+            list(executor.map(scheduled.add, daily_results))
+
+        batch.finalize(batch_results, '2026-01-19')
+        assert not batch.partial_path.exists()
+        partial = scheduled.partial_path.read_text(encoding='utf-8')
+        assert all(r.code in partial for r in daily_results), "另一次运行的临时报告应保持完整"
+        assert not any(r.code in partial for r in batch_results), "临时报告不应混入其他运行的段落"
+
+        scheduled.finalize(daily_results, '2026-01-19')
+        leftovers = sorted(p.name for p in reports_dir.iterdir())
+        assert leftovers == ['report_20260119.jsonl', 'report_20260119.md'], leftovers
+    print("并发运行增量报告隔离验证通过")
@@ -92,6 +92,19 @@ class SearchResponse:
         return "\n".join(lines)
 
 
+def _text_shingles(text: str) -> set:
+    """新闻文本的字符 2-gram 集合（忽略空白与标点），用于近似重复判断"""
+    normalized = ''.join(ch for ch in text.lower() if ch.isalnum())
+    return {normalized[i:i + 2] for i in range(len(normalized) - 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    """两个集合的 Jaccard 相似度"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
 class BaseSearchProvider(ABC):
     """搜索引擎基类"""
     
@@ -968,6 +981,11 @@ class SearchService:
         # 维度展示顺序
         display_order = ['latest_news', 'market_analysis', 'risk_check', 'earnings', 'industry']
         
+        # 跨维度去重：同一篇新闻常被多个维度的查询同时命中（或被不同站点转载）
+        seen_urls = set()
+        seen_shingles: List[set] = []
+        duplicates = 0
+        
         for dim_name in display_order:
             if dim_name not in intel_results:
                 continue
@@ -985,15 +1003,33 @@ class SearchService:
             lines.append(f"\n{dim_desc} (来源: {resp.provider}):")
             if resp.success and resp.results:
                 # 增加显示条数
-                for i, r in enumerate(resp.results[:4], 1):
+                shown = 0
+                for r in resp.results[:4]:
+                    shingles = _text_shingles(f"{r.title}{r.snippet[:80]}")
+                    if (r.url and r.url in seen_urls) or any(
+                        _jaccard(shingles, seen) >= 0.8 for seen in seen_shingles
+                    ):
+                        duplicates += 1
+                        continue
+                    if r.url:
+                        seen_urls.add(r.url)
+                    seen_shingles.append(shingles)
+                    
+                    shown += 1
                     date_str = f" [{r.published_date}]" if r.published_date else ""
-                    lines.append(f"  {i}. {r.title}{date_str}")
-                    # 如果摘要太短，可能信息量不足
-                    snippet = r.snippet[:150] if len(r.snippet) > 20 else r.snippet
+                    title = ' '.join(r.title.split())
+                    lines.append(f"  {shown}. {title}{date_str}")
+                    # 如果摘要太短，可能信息量不足；折叠换行，保证每条新闻固定两行
+                    snippet = ' '.join((r.snippet[:150] if len(r.snippet) > 20 else r.snippet).split())
                     lines.append(f"     {snippet}...")
+                if not shown:
+                    lines.append("  （与上方消息重复，已省略）")
             else:
                 lines.append("  未找到相关信息")
         
+        if duplicates:
+            logger.debug(f"[情报] {stock_name} 跨维度去重 {duplicates} 条新闻")
+        
         return "\n".join(lines)
     
     def batch_search(
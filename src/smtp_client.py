@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 共享 SMTP 连接
+===================================
+
+职责：
+1. 按 (服务器, 端口, 发件人) 保持一条已登录的 SMTP 连接，单股推送逐只发邮件时不再每封重新握手 TLS + 认证
+2. 后台线程在空闲时发送 NOOP 保活，空闲超过 SMTP_IDLE_TIMEOUT 后主动断开
+3. 连接被服务端关闭（421 / 断线）时透明重连并重发当前邮件；
+   断线发生在邮件正文（DATA）发出之后时服务端可能已接收，不再重发，抛出 SmtpDeliveryUncertain
+
+使用方式：
+    from src.smtp_client import SmtpEndpoint, get_smtp_client
+    endpoint = SmtpEndpoint("smtp.qq.com", 465, True, sender)
+    get_smtp_client().send_message(endpoint, password, msg)
+"""
+
+import atexit
+import logging
+import smtplib
+import threading
+import time
+from email.message import Message
+from typing import Any, Dict, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SmtpEndpoint(NamedTuple):
+    """SMTP 连接目标（同一目标复用同一条连接）"""
+    server: str
+    port: int
+    ssl: bool
+    user: str
+
+
+class SmtpDeliveryUncertain(smtplib.SMTPException):
+    """邮件正文发出后连接断开：服务端可能已接收，重发可能导致重复邮件"""
+
+
+class _DataTrackingMixin:
+    """记录当前邮件是否已进入 DATA 阶段（此前断线可安全重发，此后不能）"""
+
+    data_started = False
+
+    def data(self, msg):
+        self.data_started = True
+        return super().data(msg)
+
+
+class _SMTP(_DataTrackingMixin, smtplib.SMTP):
+    pass
+
+
+class _SMTP_SSL(_DataTrackingMixin, smtplib.SMTP_SSL):
+    pass
+
+
+def _is_disconnect_error(error: Exception) -> bool:
+    """连接已失效（可重连后重发）的错误；认证失败、收件人被拒等不重试"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421:
+        return True
+    return isinstance(error, (ConnectionError, TimeoutError, BrokenPipeError))
+
+
+class _Connection:
+    """单个目标的连接与统计"""
+
+    def __init__(self, endpoint: SmtpEndpoint, password: str):
+        self.endpoint = endpoint
+        self.password = password
+        self.lock = threading.Lock()
+        self.smtp: Optional[smtplib.SMTP] = None
+        self.last_used = 0.0
+        self.connections = 0
+        self.messages = 0
+        self.reconnects = 0
+        self.noops = 0
+
+
+class PooledSmtpClient:
+    """
+    复用登录态的 SMTP 客户端（线程安全）
+
+    smtplib 连接不支持并发，同一目标的发送在连接锁内串行执行
+    """
+
+    def __init__(self, keepalive_interval: float = 60.0, idle_timeout: float = 300.0, timeout: float = 30.0):
+        """
+        Args:
+            keepalive_interval: 空闲多久后发送 NOOP 保活 / 发送前探测连接（秒）
+            idle_timeout: 空闲超过该时长主动断开（秒），0 表示运行期间一直保持
+            timeout: 建连与单次命令超时（秒）
+        """
+        self.keepalive_interval = max(1.0, keepalive_interval)
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._connections: Dict[SmtpEndpoint, _Connection] = {}
+        self._stop = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+    def _get_connection(self, endpoint: SmtpEndpoint, password: str) -> _Connection:
+        with self._lock:
+            conn = self._connections.get(endpoint)
+            if conn is None:
+                conn = _Connection(endpoint, password)
+                self._connections[endpoint] = conn
+            else:
+                conn.password = password
+            if self._keepalive_thread is None or not self._keepalive_thread.is_alive():
+                self._stop.clear()
+                self._keepalive_thread = threading.Thread(
+                    target=self._keepalive_loop, name="smtp_keepalive", daemon=True
+                )
+                self._keepalive_thread.start()
+            return conn
+
+    def _open(self, conn: _Connection) -> None:
+        """建立连接并登录（调用方持有连接锁）"""
+        self._close_quietly(conn)
+        endpoint = conn.endpoint
+        if endpoint.ssl:
+            # SSL 连接（端口 465）
+            smtp = _SMTP_SSL(endpoint.server, endpoint.port, timeout=self.timeout)
+        else:
+            # TLS 连接（端口 587）
+            smtp = _SMTP(endpoint.server, endpoint.port, timeout=self.timeout)
+            smtp.starttls()
+        try:
+            smtp.login(endpoint.user, conn.password)
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+            raise
+        conn.smtp = smtp
+        conn.connections += 1
+        conn.last_used = time.monotonic()
+        logger.debug(f"[SMTP] 已连接 {endpoint.server}:{endpoint.port} ({endpoint.user})")
+
+    @staticmethod
+    def _close_quietly(conn: _Connection) -> None:
+        if conn.smtp is None:
+            return
+        try:
+            conn.smtp.quit()
+        except Exception:
+            try:
+                conn.smtp.close()
+            except Exception:
+                pass
+        conn.smtp = None
+
+    def _is_alive(self, conn: _Connection) -> bool:
+        """空闲超过保活间隔的连接在复用前先 NOOP 探测"""
+        if conn.smtp is None:
+            return False
+        if time.monotonic() - conn.last_used < self.keepalive_interval:
+            return True
+        try:
+            code, _ = conn.smtp.noop()
+            conn.noops += 1
+            return code == 250
+        except Exception:
+            return False
+
+    def send_message(self, endpoint: SmtpEndpoint, password: str, msg: Message) -> None:
+        """
+        发送单封邮件
+
+        连接失效时重连并重发（最多一次），仅限断线发生在 DATA 之前（MAIL / RCPT 阶段或连接已失效）；
+        DATA 之后断线抛出 SmtpDeliveryUncertain，认证失败等其他错误原样抛出
+        """
+        conn = self._get_connection(endpoint, password)
+        with conn.lock:
+            if not self._is_alive(conn):
+                if conn.smtp is not None:
+                    conn.reconnects += 1
+                self._open(conn)
+            try:
+                self._send(conn, msg)
+            except SmtpDeliveryUncertain:
+                raise
+            except Exception as e:
+                if not _is_disconnect_error(e):
+                    raise
+                logger.info(f"[SMTP] 连接已断开（{e}），邮件正文尚未发出，重连后重发")
+                conn.reconnects += 1
+                self._open(conn)
+                self._send(conn, msg)
+            conn.last_used = time.monotonic()
+            conn.messages += 1
+
+    def _send(self, conn: _Connection, msg: Message) -> None:
+        """在当前连接上发送（调用方持有连接锁）"""
+        conn.smtp.data_started = False
+        try:
+            conn.smtp.send_message(msg)
+        except Exception as e:
+            if conn.smtp.data_started and _is_disconnect_error(e):
+                self._close_quietly(conn)
+                raise SmtpDeliveryUncertain(f"邮件正文发出后连接断开，服务端可能已接收: {e}") from e
+            raise
+
+    def _keepalive_loop(self) -> None:
+        while not self._stop.wait(self.keepalive_interval):
+            with self._lock:
+                conns = list(self._connections.values())
+            for conn in conns:
+                # 正在发送的连接无需保活
+                if not conn.lock.acquire(blocking=False):
+                    continue
+                try:
+                    if conn.smtp is None:
+                        continue
+                    idle = time.monotonic() - conn.last_used
+                    if self.idle_timeout and idle >= self.idle_timeout:
+                        logger.debug(f"[SMTP] {conn.endpoint.server} 空闲 {idle:.0f}s，断开连接")
+                        self._close_quietly(conn)
+                    elif idle >= self.keepalive_interval:
+                        try:
+                            conn.smtp.noop()
+                            conn.noops += 1
+                        except Exception:
+                            # 下次发送时重连
+                            self._close_quietly(conn)
+                finally:
+                    conn.lock.release()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按目标返回 连接数 / 发送数 / 重连数 / NOOP 次数"""
+        with self._lock:
+            conns = list(self._connections.values())
+        return {
+            f"{c.endpoint.server}:{c.endpoint.port}": {
+                'connected': c.smtp is not None,
+                'connections': c.connections,
+                'messages': c.messages,
+                'reconnects': c.reconnects,
+                'noops': c.noops,
+            }
+            for c in conns
+        }
+
+    def log_summary(self) -> None:
+        """输出连接复用汇总日志"""
+        for target, item in self.get_stats().items():
+            logger.info(
+                f"[SMTP] {target}: 发送 {item['messages']} 封, 建立连接 {item['connections']} 次, "
+                f"重连 {item['reconnects']} 次"
+            )
+
+    def close(self) -> None:
+        """断开所有连接并停止保活线程"""
+        self._stop.set()
+        with self._lock:
+            conns = list(self._connections.values())
+            self._connections.clear()
+        for conn in conns:
+            with conn.lock:
+                self._close_quietly(conn)
+
+
+# 全局客户端实例
+_smtp_client: Optional[PooledSmtpClient] = None
+_smtp_client_lock = threading.Lock()
+
+
+def get_smtp_client() -> PooledSmtpClient:
+    """获取进程级共享 SMTP 客户端"""
+    global _smtp_client
+    if _smtp_client is None:
+        with _smtp_client_lock:
+            if _smtp_client is None:
+                from src.config import get_config
+                config = get_config()
+                _smtp_client = PooledSmtpClient(
+                    keepalive_interval=config.smtp_keepalive_interval,
+                    idle_timeout=config.smtp_idle_timeout,
+                )
+    return _smtp_client
+
+
+def get_smtp_stats() -> Dict[str, Dict[str, Any]]:
+    """返回共享 SMTP 客户端的统计（尚未创建时返回空字典，不触发创建）"""
+    client = _smtp_client
+    return client.get_stats() if client is not None else {}
+
+
+def reset_smtp_client() -> None:
+    """断开并重置共享 SMTP 客户端（主要用于测试）"""
+    global _smtp_client
+    with _smtp_client_lock:
+        if _smtp_client is not None:
+            _smtp_client.close()
+        _smtp_client = None
+
+
+# 进程退出前礼貌地 QUIT
+atexit.register(reset_smtp_client)
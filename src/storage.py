@@ -12,6 +12,7 @@ A股自选股智能分析系统 - 存储层
 """
 
 import atexit
+import json
 import logging
 from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict, Any
@@ -26,13 +27,20 @@ from sqlalchemy import (
     Date,
     DateTime,
     Integer,
+    Text,
     Index,
     UniqueConstraint,
     select,
+    update,
+    delete,
     and_,
+    or_,
     desc,
+    func,
 )
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import (
+    aliased,
     declarative_base,
     sessionmaker,
     Session,
@@ -120,6 +128,174 @@ class StockDaily(Base):
         }
 
 
+class AnalysisTask(Base):
+    """
+    分析任务记录（WebUI / 机器人提交的异步分析任务）
+    
+    内存中只保留最近的任务，完整历史持久化在此表，按保留天数清理
+    """
+    __tablename__ = 'analysis_task'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(String(64), nullable=False, unique=True, index=True)
+    code = Column(String(10), nullable=False, index=True)
+    status = Column(String(16), nullable=False)  # queued / running / completed / failed
+    report_type = Column(String(16))
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime)
+    result = Column(Text)  # 结果摘要 JSON
+    error = Column(Text)
+    
+    __table_args__ = (
+        Index('ix_task_start_time', 'start_time'),
+        Index('ix_task_status_start_time', 'status', 'start_time'),
+    )
+    
+    def __repr__(self):
+        return f"<AnalysisTask(task_id={self.task_id}, status={self.status})>"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为与 AnalysisService 内存任务一致的字典"""
+        data = {
+            'task_id': self.task_id,
+            'code': self.code,
+            'status': self.status,
+            'start_time': self.start_time.isoformat() if self.start_time else None,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'progress': None,
+            'report_type': self.report_type,
+        }
+        if self.end_time:
+            data['end_time'] = self.end_time.isoformat()
+        return data
+
+
+class AnalysisResultRecord(Base):
+    """
+    AI 分析结果历史（每次分析一条）
+    
+    核心指标单独成列，便于按股票查询最新结果与评分走势；
+    完整结果（含决策仪表盘）以 JSON 保存在 data 列
+    """
+    __tablename__ = 'analysis_result'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    code = Column(String(10), nullable=False)
+    name = Column(String(50))
+    analysis_date = Column(Date, nullable=False)
+    run_id = Column(String(32))
+    
+    sentiment_score = Column(Integer)
+    trend_prediction = Column(String(20))
+    operation_advice = Column(String(20))
+    confidence_level = Column(String(10))
+    analysis_summary = Column(Text)
+    data = Column(Text)  # AnalysisResult.to_dict() JSON
+    
+    created_at = Column(DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        Index('ix_result_code_date', 'code', 'analysis_date'),
+        Index('ix_result_date', 'analysis_date'),
+        # 同一运行中每只股票只保留一条（--resume 重新保存时覆盖）；run_id 为空的单次分析不受限制
+        UniqueConstraint('run_id', 'code', name='uix_result_run_code'),
+    )
+    
+    def __repr__(self):
+        return f"<AnalysisResultRecord(code={self.code}, date={self.analysis_date}, score={self.sentiment_score})>"
+    
+    def to_dict(self, include_data: bool = False) -> Dict[str, Any]:
+        """转换为字典（include_data=True 时附带完整分析结果）"""
+        item = {
+            'code': self.code,
+            'name': self.name,
+            'date': self.analysis_date.isoformat() if self.analysis_date else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sentiment_score': self.sentiment_score,
+            'trend_prediction': self.trend_prediction,
+            'operation_advice': self.operation_advice,
+            'confidence_level': self.confidence_level,
+            'analysis_summary': self.analysis_summary,
+        }
+        if include_data:
+            item['result'] = json.loads(self.data) if self.data else None
+        return item
+
+
+class PipelineCheckpoint(Base):
+    """
+    流水线阶段检查点（每次运行、每只股票、每个阶段一条）
+    
+    阶段：fetch / search / context / prompt / llm_response / result，
+    --resume 时跳过已完成阶段，从中断处继续
+    """
+    __tablename__ = 'pipeline_checkpoint'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String(32), nullable=False)
+    code = Column(String(10), nullable=False)
+    stage = Column(String(16), nullable=False)
+    payload = Column(Text)  # 阶段输出 JSON
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    
+    __table_args__ = (
+        UniqueConstraint('run_id', 'code', 'stage', name='uix_run_code_stage'),
+    )
+    
+    def __repr__(self):
+        return f"<PipelineCheckpoint(run_id={self.run_id}, code={self.code}, stage={self.stage})>"
+
+
+class NotificationOutbox(Base):
+    """
+    通知发件箱（每条渲染好的消息 × 每个渠道一条）
+    
+    状态：pending（待发送）→ sending（发送中）→ sent（已送达）；
+    多次失败后进入 dead（死信），可通过 --outbox-replay 重新投递
+    """
+    __tablename__ = 'notification_outbox'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    idempotency_key = Column(String(64), nullable=False, unique=True)  # 相同消息重复入队时去重
+    channel = Column(String(16), nullable=False)
+    content = Column(Text, nullable=False)
+    status = Column(String(10), nullable=False, default='pending')
+    attempts = Column(Integer, default=0)
+    chunks_sent = Column(Integer, default=0)  # 分段消息已送达的段数，重试时从下一段继续
+    next_attempt_at = Column(DateTime, default=datetime.now)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    sent_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index('ix_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+    
+    def __repr__(self):
+        return f"<NotificationOutbox(id={self.id}, channel={self.channel}, status={self.status})>"
+    
+    def to_dict(self, include_content: bool = False) -> Dict[str, Any]:
+        """转换为字典（默认不含消息正文）"""
+        data = {
+            'id': self.id,
+            'idempotency_key': self.idempotency_key,
+            'channel': self.channel,
+            'status': self.status,
+            'attempts': self.attempts,
+            'chunks_sent': self.chunks_sent or 0,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'size': len(self.content or ''),
+        }
+        if include_content:
+            data['content'] = self.content
+        return data
+
+
 class DatabaseManager:
     """
     数据库管理器 - 单例模式
@@ -278,6 +454,22 @@ class DatabaseManager:
             
             return list(results)
     
+    def get_history_df(self, code: str, days: int = 60) -> Optional[pd.DataFrame]:
+        """
+        获取最近 N 个交易日的日线 DataFrame（按日期升序，供趋势分析使用）
+        
+        Args:
+            code: 股票代码
+            days: 交易日数
+            
+        Returns:
+            DataFrame（date/open/high/low/close/volume/...），无数据时返回 None
+        """
+        records = self.get_latest_data(code, days=days)
+        if not records:
+            return None
+        return pd.DataFrame([record.to_dict() for record in reversed(records)])
+    
     def get_data_range(
         self, 
         code: str, 
@@ -485,6 +677,496 @@ class DatabaseManager:
         else:
             return "震荡整理 ↔️"
 
+    
+    # === 分析任务 ===
+    
+    def save_analysis_task(self, task: Dict[str, Any]) -> None:
+        """
+        保存分析任务（存在则更新）
+        
+        Args:
+            task: AnalysisService 任务字典（task_id/code/status/start_time/end_time/result/error/report_type）
+        """
+        def parse_time(value: Optional[str]) -> Optional[datetime]:
+            return datetime.fromisoformat(value) if value else None
+        
+        values = {
+            'code': task['code'],
+            'status': task['status'],
+            'report_type': task.get('report_type'),
+            'start_time': parse_time(task.get('start_time')) or datetime.now(),
+            'end_time': parse_time(task.get('end_time')),
+            'result': json.dumps(task['result'], ensure_ascii=False) if task.get('result') else None,
+            'error': task.get('error'),
+        }
+        with self.get_session() as session:
+            try:
+                updated = session.execute(
+                    update(AnalysisTask)
+                    .where(AnalysisTask.task_id == task['task_id'])
+                    .values(**values)
+                ).rowcount
+                if not updated:
+                    session.add(AnalysisTask(task_id=task['task_id'], **values))
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+    
+    def get_analysis_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """按任务 ID 查询分析任务"""
+        with self.get_session() as session:
+            record = session.execute(
+                select(AnalysisTask).where(AnalysisTask.task_id == task_id)
+            ).scalar_one_or_none()
+            return record.to_dict() if record else None
+    
+    def list_analysis_tasks(
+        self,
+        limit: int = 20,
+        status: Optional[str] = None,
+        since: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        查询最近的分析任务（按开始时间倒序，走 start_time / status+start_time 索引）
+        
+        Args:
+            limit: 最大返回条数
+            status: 按状态过滤（可选）
+            since: 只返回该时间之后开始的任务（可选）
+        """
+        conditions = []
+        if status:
+            conditions.append(AnalysisTask.status == status)
+        if since:
+            conditions.append(AnalysisTask.start_time >= since)
+        
+        query = select(AnalysisTask)
+        if conditions:
+            query = query.where(and_(*conditions))
+        
+        with self.get_session() as session:
+            records = session.execute(
+                query.order_by(desc(AnalysisTask.start_time)).limit(limit)
+            ).scalars().all()
+            return [record.to_dict() for record in records]
+    
+    def fail_stale_analysis_tasks(self, error: str = "服务重启，任务已中断") -> int:
+        """将上次进程遗留的 queued / running 任务标记为失败，返回处理条数"""
+        with self.get_session() as session:
+            try:
+                count = session.execute(
+                    update(AnalysisTask)
+                    .where(AnalysisTask.status.in_(['queued', 'running']))
+                    .values(status='failed', end_time=datetime.now(), error=error)
+                ).rowcount
+                session.commit()
+                return count
+            except Exception:
+                session.rollback()
+                raise
+    
+    def prune_analysis_tasks(self, retention_days: int) -> int:
+        """
+        删除超过保留天数的分析任务
+        
+        Args:
+            retention_days: 保留天数，<=0 表示不清理
+            
+        Returns:
+            删除条数
+        """
+        if retention_days <= 0:
+            return 0
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        with self.get_session() as session:
+            try:
+                count = session.execute(
+                    delete(AnalysisTask).where(AnalysisTask.start_time < cutoff)
+                ).rowcount
+                session.commit()
+                return count
+            except Exception:
+                session.rollback()
+                raise
+
+    
+    def save_analysis_results(
+        self,
+        results: List[Dict[str, Any]],
+        run_id: Optional[str] = None,
+        analysis_date: Optional[date] = None
+    ) -> int:
+        """
+        批量保存分析结果
+        
+        同一运行（run_id, code）已有结果时覆盖而非重复插入（--resume 会重新保存恢复的结果）
+        
+        Args:
+            results: AnalysisResult.to_dict() 列表
+            run_id: 所属运行 ID（可选）
+            analysis_date: 分析日期（默认今天）
+            
+        Returns:
+            保存条数
+        """
+        if not results:
+            return 0
+        analysis_date = analysis_date or date.today()
+        now = datetime.now()
+        rows = [
+            {
+                'code': item['code'],
+                'name': item.get('name'),
+                'analysis_date': analysis_date,
+                'run_id': run_id,
+                'sentiment_score': item.get('sentiment_score'),
+                'trend_prediction': item.get('trend_prediction'),
+                'operation_advice': item.get('operation_advice'),
+                'confidence_level': item.get('confidence_level'),
+                'analysis_summary': item.get('analysis_summary'),
+                'data': json.dumps(item, ensure_ascii=False, default=str),
+                'created_at': now,
+            }
+            for item in results
+        ]
+        stmt = sqlite_insert(AnalysisResultRecord)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['run_id', 'code'],
+            set_={
+                column: stmt.excluded[column]
+                for column in rows[0]
+                if column not in ('code', 'run_id', 'created_at')
+            },
+        )
+        with self.get_session() as session:
+            try:
+                session.execute(stmt, rows)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+        logger.info(f"保存 {len(rows)} 条分析结果")
+        return len(rows)
+    
+    @staticmethod
+    def _code_variants(code: str) -> List[str]:
+        """股票代码大小写变体（美股代码在不同入口大小写不一致）"""
+        return list({code, code.upper(), code.lower()})
+    
+    def get_latest_results(
+        self,
+        codes: Optional[List[str]] = None,
+        include_data: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        获取每只股票最近一次的分析结果
+        
+        Args:
+            codes: 股票代码列表（None 表示全部股票）
+            include_data: 是否附带完整分析结果
+            
+        Returns:
+            {股票代码: 结果字典}
+        """
+        latest = select(func.max(AnalysisResultRecord.id)).group_by(AnalysisResultRecord.code)
+        if codes:
+            variants = [v for code in codes for v in self._code_variants(code)]
+            latest = latest.where(AnalysisResultRecord.code.in_(variants))
+        
+        with self.get_session() as session:
+            records = session.execute(
+                select(AnalysisResultRecord).where(AnalysisResultRecord.id.in_(latest))
+            ).scalars().all()
+            return {record.code: record.to_dict(include_data) for record in records}
+    
+    def get_score_history(self, code: str, days: int = 30, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        获取股票的评分历史（按时间正序，走 code+analysis_date 索引）
+        
+        Args:
+            code: 股票代码
+            days: 查询最近天数
+            limit: 最大返回条数（取最近的 limit 条）
+        """
+        start_date = date.today() - timedelta(days=days)
+        with self.get_session() as session:
+            records = session.execute(
+                select(AnalysisResultRecord)
+                .where(and_(
+                    AnalysisResultRecord.code.in_(self._code_variants(code)),
+                    AnalysisResultRecord.analysis_date >= start_date,
+                ))
+                .order_by(desc(AnalysisResultRecord.analysis_date), desc(AnalysisResultRecord.id))
+                .limit(limit)
+            ).scalars().all()
+            return [record.to_dict() for record in reversed(records)]
+    
+    def save_pipeline_checkpoint(self, run_id: str, code: str, stage: str, payload: Any) -> None:
+        """
+        保存阶段检查点（同一运行、股票、阶段重复保存时覆盖）
+        
+        Args:
+            run_id: 运行 ID
+            code: 股票代码
+            stage: 阶段名称
+            payload: 阶段输出（可 JSON 序列化，日期等对象按字符串保存）
+        """
+        data = json.dumps(payload, ensure_ascii=False, default=str)
+        with self.get_session() as session:
+            try:
+                updated = session.execute(
+                    update(PipelineCheckpoint)
+                    .where(and_(
+                        PipelineCheckpoint.run_id == run_id,
+                        PipelineCheckpoint.code == code,
+                        PipelineCheckpoint.stage == stage,
+                    ))
+                    .values(payload=data, created_at=datetime.now())
+                ).rowcount
+                if not updated:
+                    session.add(PipelineCheckpoint(run_id=run_id, code=code, stage=stage, payload=data))
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+    
+    def get_pipeline_checkpoints(self, run_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        获取一次运行的全部检查点
+        
+        Returns:
+            {股票代码: {阶段: 阶段输出}}
+        """
+        checkpoints: Dict[str, Dict[str, Any]] = {}
+        with self.get_session() as session:
+            rows = session.execute(
+                select(PipelineCheckpoint.code, PipelineCheckpoint.stage, PipelineCheckpoint.payload)
+                .where(PipelineCheckpoint.run_id == run_id)
+            ).all()
+        for code, stage, payload in rows:
+            checkpoints.setdefault(code, {})[stage] = json.loads(payload) if payload else None
+        return checkpoints
+    
+    def get_latest_checkpoint_run_id(self) -> Optional[str]:
+        """获取最近一次写入检查点的运行 ID"""
+        with self.get_session() as session:
+            return session.execute(
+                select(PipelineCheckpoint.run_id)
+                .order_by(desc(PipelineCheckpoint.created_at))
+                .limit(1)
+            ).scalar_one_or_none()
+    
+    def prune_pipeline_checkpoints(self, retention_days: int) -> int:
+        """
+        删除超过保留天数的检查点
+        
+        Args:
+            retention_days: 保留天数，<=0 表示不清理
+            
+        Returns:
+            删除条数
+        """
+        if retention_days <= 0:
+            return 0
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        with self.get_session() as session:
+            try:
+                count = session.execute(
+                    delete(PipelineCheckpoint).where(PipelineCheckpoint.created_at < cutoff)
+                ).rowcount
+                session.commit()
+                return count
+            except Exception:
+                session.rollback()
+                raise
+
+    def enqueue_notifications(self, items: List[Dict[str, str]]) -> int:
+        """
+        消息入队（幂等：idempotency_key 已存在的消息跳过）
+        
+        使用 INSERT ... ON CONFLICT DO NOTHING，多个进程同时入队同一消息时
+        只有一方写入，另一方视为已入队，不会报错或重复发送
+        
+        Args:
+            items: [{'idempotency_key', 'channel', 'content'}]
+            
+        Returns:
+            新入队条数
+        """
+        if not items:
+            return 0
+        now = datetime.now()
+        with self.get_session() as session:
+            try:
+                count = 0
+                for item in items:
+                    count += session.execute(
+                        sqlite_insert(NotificationOutbox)
+                        .values(**item, status='pending', attempts=0, chunks_sent=0, next_attempt_at=now,
+                                created_at=now, updated_at=now)
+                        .on_conflict_do_nothing(index_elements=['idempotency_key'])
+                    ).rowcount
+                session.commit()
+                return count
+            except Exception:
+                session.rollback()
+                raise
+    
+    def claim_due_notifications(
+        self,
+        limit: int = 50,
+        exclude_channels: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        领取到期的待发送消息（标记为 sending，按入队顺序返回，含正文）
+        
+        同一渠道中排在前面的消息仍在发送中或退避等待时，后面的消息不会被领取：
+        失败的消息重试成功（或进入死信）之前，该渠道后续消息一直排在它后面
+        
+        Args:
+            limit: 最大领取条数
+            exclude_channels: 跳过的渠道（仍有消息在发送中的渠道，保证渠道内顺序）
+        """
+        now = datetime.now()
+        earlier = aliased(NotificationOutbox)
+        blocked_by_earlier = select(earlier.id).where(and_(
+            earlier.channel == NotificationOutbox.channel,
+            earlier.id < NotificationOutbox.id,
+            or_(
+                earlier.status == 'sending',
+                and_(earlier.status == 'pending', earlier.next_attempt_at > now),
+            ),
+        )).exists()
+        conditions = [
+            NotificationOutbox.status == 'pending',
+            NotificationOutbox.next_attempt_at <= now,
+            ~blocked_by_earlier,
+        ]
+        if exclude_channels:
+            conditions.append(NotificationOutbox.channel.notin_(exclude_channels))
+        with self.get_session() as session:
+            try:
+                records = session.execute(
+                    select(NotificationOutbox)
+                    .where(and_(*conditions))
+                    .order_by(NotificationOutbox.id)
+                    .limit(limit)
+                ).scalars().all()
+                if not records:
+                    return []
+                # 逐条带状态条件更新：多个投递线程 / 进程同时领取时，只有更新成功的一方拿到该消息
+                items = []
+                for record in records:
+                    item = record.to_dict(include_content=True)
+                    claimed = session.execute(
+                        update(NotificationOutbox)
+                        .where(and_(NotificationOutbox.id == item['id'], NotificationOutbox.status == 'pending'))
+                        .values(status='sending', updated_at=now)
+                    ).rowcount
+                    if claimed:
+                        items.append(item)
+                session.commit()
+                return items
+            except Exception:
+                session.rollback()
+                raise
+    
+    def update_notification(self, outbox_id: int, **values: Any) -> None:
+        """更新发件箱消息状态（status / attempts / chunks_sent / next_attempt_at / last_error / sent_at）"""
+        values['updated_at'] = datetime.now()
+        with self.get_session() as session:
+            try:
+                session.execute(
+                    update(NotificationOutbox).where(NotificationOutbox.id == outbox_id).values(**values)
+                )
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+    
+    def requeue_notifications(
+        self,
+        ids: Optional[List[int]] = None,
+        status: str = 'sending',
+        reset_attempts: bool = False,
+        stale_before: Optional[datetime] = None
+    ) -> int:
+        """
+        将消息重新置为待发送
+        
+        Args:
+            ids: 指定消息 ID（None 表示该状态下的全部消息）
+            status: 原状态（sending：进程中断遗留；dead：死信重放）
+            reset_attempts: 是否清零失败次数
+            stale_before: 只处理最后更新时间早于该时刻的消息
+                （恢复 sending 时避开其他进程正在发送的消息）
+            
+        Returns:
+            处理条数
+        """
+        conditions = [NotificationOutbox.status == status]
+        if ids:
+            conditions.append(NotificationOutbox.id.in_(ids))
+        if stale_before is not None:
+            conditions.append(NotificationOutbox.updated_at < stale_before)
+        values: Dict[str, Any] = {'status': 'pending', 'next_attempt_at': datetime.now(), 'updated_at': datetime.now()}
+        if reset_attempts:
+            values['attempts'] = 0
+        with self.get_session() as session:
+            try:
+                count = session.execute(
+                    update(NotificationOutbox).where(and_(*conditions)).values(**values)
+                ).rowcount
+                session.commit()
+                return count
+            except Exception:
+                session.rollback()
+                raise
+    
+    def list_notifications(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """按 ID 倒序列出发件箱消息（不含正文）"""
+        query = select(NotificationOutbox).order_by(desc(NotificationOutbox.id)).limit(limit)
+        if status:
+            query = query.where(NotificationOutbox.status == status)
+        with self.get_session() as session:
+            return [record.to_dict() for record in session.execute(query).scalars().all()]
+    
+    def get_outbox_counts(self) -> Dict[str, int]:
+        """各状态消息数"""
+        with self.get_session() as session:
+            rows = session.execute(
+                select(NotificationOutbox.status, func.count()).group_by(NotificationOutbox.status)
+            ).all()
+        return {status: count for status, count in rows}
+    
+    def get_next_notification_time(self) -> Optional[datetime]:
+        """最早一条待发送消息的计划发送时间"""
+        with self.get_session() as session:
+            return session.execute(
+                select(func.min(NotificationOutbox.next_attempt_at))
+                .where(NotificationOutbox.status == 'pending')
+            ).scalar_one_or_none()
+    
+    def prune_notifications(self, retention_days: int) -> int:
+        """删除超过保留天数的已送达消息，返回删除条数"""
+        if retention_days <= 0:
+            return 0
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        with self.get_session() as session:
+            try:
+                count = session.execute(
+                    delete(NotificationOutbox).where(and_(
+                        NotificationOutbox.status == 'sent',
+                        NotificationOutbox.sent_at < cutoff,
+                    ))
+                ).rowcount
+                session.commit()
+                return count
+            except Exception:
+                session.rollback()
+                raise
+
 
 # 便捷函数
 def get_db() -> DatabaseManager:
@@ -527,3 +1209,24 @@ if __name__ == "__main__":
     # 测试获取上下文
     context = db.get_analysis_context('600519')
     print(f"分析上下文: {context}")
+    
+    # 分析结果按 (run_id, code) 覆盖写入：--resume 重新保存不产生重复行
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        DatabaseManager.reset_instance()
+        check_db = DatabaseManager(db_url=f"sqlite:///{tmp_dir}/check.db")
+        first = [{'code': '600519', 'name': '贵州茅台', 'sentiment_score': 60},
+                 {'code': '000001', 'name': '平安银行', 'sentiment_score': 40}]
+        check_db.save_analysis_results(first, run_id='run-1')
+        check_db.save_analysis_results([{**first[0], 'sentiment_score': 75}], run_id='run-1')
+        check_db.save_analysis_results(first[:1], run_id=None)
+        check_db.save_analysis_results(first[:1], run_id=None)
+        with check_db.get_session() as session:
+            rows = session.execute(
+                select(AnalysisResultRecord.run_id, AnalysisResultRecord.sentiment_score)
+                .where(AnalysisResultRecord.code == '600519')
+            ).all()
+        assert sorted(rows, key=str) == sorted([('run-1', 75), (None, 60), (None, 60)], key=str), rows
+        DatabaseManager.reset_instance()
+    print("分析结果覆盖写入验证通过")
@@ -26,6 +26,10 @@ from typing import Dict, Any, TYPE_CHECKING
 from web.services import get_config_service, get_analysis_service
 from web.templates import render_config_page
 from src.enums import ReportType
+from src.storage import get_db
+from src.http_client import get_http_stats
+from src.smtp_client import get_smtp_stats
+from bot.reply_pool import get_reply_pool_stats
 
 if TYPE_CHECKING:
     from http.server import BaseHTTPRequestHandler
@@ -139,13 +143,20 @@ class ApiHandler:
             {
                 "status": "ok",
                 "timestamp": "2026-01-19T10:30:00",
-                "service": "stock-analysis-webui"
+                "service": "stock-analysis-webui",
+                "http_pool": {...},  # 各推送主机的请求数 / 新建连接数 / 复用率
+                "smtp_pool": {...},  # 各 SMTP 服务器的发送数 / 建连次数 / 重连次数
+                "bot_reply_pool": {...}  # 机器人回复工作池排队数 / ACK 耗时 p50、p99（未创建时为空）
             }
         """
         data = {
             "status": "ok",
             "timestamp": datetime.now().isoformat(),
-            "service": "stock-analysis-webui"
+            "service": "stock-analysis-webui",
+            # 只读取已创建的连接池，健康检查不触发创建
+            "http_pool": get_http_stats(),
+            "smtp_pool": get_smtp_stats(),
+            "bot_reply_pool": get_reply_pool_stats(),
         }
         return JsonResponse(data)
     
@@ -193,6 +204,8 @@ class ApiHandler:
         # 提交异步分析任务
         try:
             result = self.analysis_service.submit_analysis(code, report_type=report_type)
+            if result.get("rejected"):
+                return JsonResponse(result, status=HTTPStatus.TOO_MANY_REQUESTS)
             return JsonResponse(result)
         except Exception as e:
             logger.error(f"[ApiHandler] 提交分析任务失败: {e}")
@@ -248,6 +261,57 @@ class ApiHandler:
         
         return JsonResponse({"success": True, "task": task})
 
+    
+    def handle_results(self, query: Dict[str, list]) -> Response:
+        """
+        查询各股票最近一次分析结果 GET /results?codes=600519,000001
+        
+        Args:
+            query: URL 查询参数 (可选 codes，逗号分隔，缺省返回全部股票；可选 full=1 返回完整结果)
+        """
+        codes_param = query.get("codes", [""])[0]
+        codes = [code.strip() for code in codes_param.split(",") if code.strip()] or None
+        include_data = query.get("full", ["0"])[0] in ("1", "true")
+        
+        try:
+            results = get_db().get_latest_results(codes, include_data=include_data)
+        except Exception as e:
+            logger.error(f"[ApiHandler] 查询分析结果失败: {e}")
+            return JsonResponse(
+                {"success": False, "error": f"查询失败: {str(e)}"},
+                status=HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+        return JsonResponse({"success": True, "results": results})
+    
+    def handle_history(self, query: Dict[str, list]) -> Response:
+        """
+        查询股票评分历史 GET /history?code=600519&days=30
+        
+        Args:
+            query: URL 查询参数 (必填 code，可选 days)
+        """
+        code_list = query.get("code", [])
+        if not code_list or not code_list[0].strip():
+            return JsonResponse(
+                {"success": False, "error": "缺少必填参数: code (股票代码)"},
+                status=HTTPStatus.BAD_REQUEST
+            )
+        code = code_list[0].strip()
+        try:
+            days = int(query.get("days", ["30"])[0])
+        except ValueError:
+            days = 30
+        
+        try:
+            history = get_db().get_score_history(code, days=days)
+        except Exception as e:
+            logger.error(f"[ApiHandler] 查询评分历史失败: {e}")
+            return JsonResponse(
+                {"success": False, "error": f"查询失败: {str(e)}"},
+                status=HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+        return JsonResponse({"success": True, "code": code, "history": history})
+
 
 # ============================================================
 # Bot Webhook 处理器
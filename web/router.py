@@ -322,6 +322,18 @@ def create_default_router() -> Router:
         "查询任务状态"
     )
     
+    router.register(
+        "/results", "GET",
+        lambda q: api_handler.handle_results(q),
+        "查询最新分析结果"
+    )
+    
+    router.register(
+        "/history", "GET",
+        lambda q: api_handler.handle_history(q),
+        "查询评分历史"
+    )
+    
     # === Bot Webhook 路由 ===
     # 注意：Bot Webhook 路由在 dispatch_post 中特殊处理
     # 这里只是为了在路由列表中显示
@@ -15,13 +15,20 @@ import os
 import re
 import logging
 import threading
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from typing import Optional, Dict, Any, List, Union
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Optional, Dict, Any, List, Tuple, Union, TYPE_CHECKING
 
+from src.core.job_queue import JobPriority, QueueFullError, get_job_scheduler
 from src.enums import ReportType
+from src.storage import get_db
 from bot.models import BotMessage
 
+if TYPE_CHECKING:
+    from src.analyzer import AnalysisResult
+
 logger = logging.getLogger(__name__)
 
 # ============================================================
@@ -139,16 +146,35 @@ class AnalysisService:
     1. 管理异步分析任务
     2. 执行股票分析
     3. 触发通知推送
+    4. 请求合并：同一 (股票, 报告类型, 交易日) 的并发请求只执行一次分析，
+       后到的请求挂到进行中的任务上，完成后各自收到报告；
+       刚完成的结果在短期内直接复用（ANALYSIS_RESULT_CACHE_TTL）
+    
+    任务存储：
+    - 内存中只保留最近 ANALYSIS_TASK_MEMORY_LIMIT 个任务（按提交顺序的有界环），含实时进度
+    - 全部任务持久化到 SQLite analysis_task 表，重启不丢失，超过 ANALYSIS_TASK_RETENTION_DAYS 的记录定期清理
     """
     
     _instance: Optional['AnalysisService'] = None
     _lock = threading.Lock()
     
-    def __init__(self, max_workers: int = 3):
-        self._executor: Optional[ThreadPoolExecutor] = None
-        self._max_workers = max_workers
-        self._tasks: Dict[str, Dict[str, Any]] = {}
+    # 清理过期任务的最小间隔（秒）
+    PRUNE_INTERVAL = 3600
+    
+    def __init__(self):
+        from src.config import get_config
+        config = get_config()
+        self._memory_limit = max(1, config.analysis_task_memory_limit)
+        self._retention_days = config.analysis_task_retention_days
+        self._last_prune = 0.0
+        
+        # 最近任务环：按提交顺序排列，超出容量淘汰最早的任务（已持久化，仍可从数据库查询）
+        self._tasks: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
         self._tasks_lock = threading.Lock()
+        # 进行中的任务：{合并键: {'task_id': ..., 'subscribers': [后到请求的来源消息]}}
+        self._inflight: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        # 最近完成的结果：{合并键: (过期时间, task_id, AnalysisResult)}
+        self._recent: Dict[Tuple[str, str, str], Tuple[float, str, 'AnalysisResult']] = {}
     
     @classmethod
     def get_instance(cls) -> 'AnalysisService':
@@ -157,17 +183,87 @@ class AnalysisService:
             with cls._lock:
                 if cls._instance is None:
                     cls._instance = cls()
+                    cls._instance._init_task_store()
         return cls._instance
     
-    @property
-    def executor(self) -> ThreadPoolExecutor:
-        """获取或创建线程池"""
-        if self._executor is None:
-            self._executor = ThreadPoolExecutor(
-                max_workers=self._max_workers,
-                thread_name_prefix="analysis_"
-            )
-        return self._executor
+    def _init_task_store(self) -> None:
+        """启动时处理上次进程遗留的 running 任务，并清理过期记录"""
+        try:
+            db = get_db()
+            stale = db.fail_stale_analysis_tasks()
+            if stale:
+                logger.info(f"[AnalysisService] {stale} 个未完成任务因服务重启标记为失败")
+        except Exception as e:
+            logger.warning(f"[AnalysisService] 任务存储初始化失败: {e}")
+        self._prune_tasks()
+    
+    def _prune_tasks(self) -> None:
+        """按保留天数清理持久化任务（限频）"""
+        now = time.time()
+        if now - self._last_prune < self.PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        try:
+            removed = get_db().prune_analysis_tasks(self._retention_days)
+            if removed:
+                logger.info(f"[AnalysisService] 已清理 {removed} 个超过 {self._retention_days} 天的任务记录")
+        except Exception as e:
+            logger.warning(f"[AnalysisService] 清理任务记录失败: {e}")
+    
+    def _register_task(self, task: Dict[str, Any]) -> None:
+        """登记新任务到内存环并持久化"""
+        with self._tasks_lock:
+            self._tasks[task["task_id"]] = task
+            while len(self._tasks) > self._memory_limit:
+                self._tasks.popitem(last=False)
+            snapshot = dict(task)
+        self._persist_task(snapshot)
+    
+    def _start_task(self, task_id: str, code: str, report_type: ReportType) -> Dict[str, Any]:
+        """将排队中的任务标记为 running（任务已被挤出内存环时重新登记）"""
+        with self._tasks_lock:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task["status"] = "running"
+                snapshot = dict(task)
+        if task is None:
+            task = {
+                "task_id": task_id,
+                "code": code,
+                "status": "running",
+                "start_time": datetime.now().isoformat(),
+                "result": None,
+                "error": None,
+                "progress": None,
+                "report_type": report_type.value
+            }
+            self._register_task(task)
+        else:
+            self._persist_task(snapshot)
+        return task
+    
+    def _finish_task(self, task: Dict[str, Any], **fields: Any) -> None:
+        """更新任务终态并持久化（任务即使已被挤出内存环也能正确落库）"""
+        with self._tasks_lock:
+            task.update(fields)
+            task["progress"] = None
+            snapshot = dict(task)
+        self._persist_task(snapshot)
+    
+    def _persist_task(self, task: Dict[str, Any]) -> None:
+        """写入数据库，失败不影响分析流程"""
+        try:
+            get_db().save_analysis_task(task)
+        except Exception as e:
+            logger.warning(f"[AnalysisService] 任务 {task.get('task_id')} 持久化失败: {e}")
+        self._prune_tasks()
+    
+    @staticmethod
+    def _job_user(source_message: Optional[BotMessage]) -> str:
+        """任务调度的用户标识（与机器人 RateLimiter 一致，WebUI 请求统一归为 webui）"""
+        if source_message is not None and source_message.user_id:
+            return source_message.user_id
+        return "webui"
     
     def submit_analysis(
         self, 
@@ -189,10 +285,87 @@ class AnalysisService:
         if isinstance(report_type, str):
             report_type = ReportType.from_str(report_type)
         
-        task_id = f"{code}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        key = self._coalesce_key(code, report_type)
+        now = time.time()
+        with self._tasks_lock:
+            # 清理过期的结果缓存
+            for expired in [k for k, v in self._recent.items() if v[0] <= now]:
+                del self._recent[expired]
+            
+            recent = self._recent.get(key)
+            inflight = self._inflight.get(key)
+            if recent is None and inflight is not None and source_message is not None:
+                inflight['subscribers'].append(source_message)
+            if recent is None and inflight is None:
+                task_id = f"{code}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+                self._inflight[key] = {'task_id': task_id, 'subscribers': []}
         
-        # 提交到线程池
-        self.executor.submit(self._run_analysis, code, task_id, report_type, source_message)
+        if recent is not None:
+            # 命中刚完成的结果：只向本次请求的会话回复，不重复推送全局渠道
+            _, cached_task_id, result = recent
+            if source_message is not None:
+                try:
+                    get_job_scheduler().submit(
+                        self._deliver_to_subscribers, result, report_type, [source_message],
+                        priority=JobPriority.INTERACTIVE,
+                        user_id=self._job_user(source_message),
+                        name=f"deliver_{code}",
+                    )
+                except QueueFullError as e:
+                    logger.warning(f"[AnalysisService] 股票 {code} 结果回复未能排队: {e}")
+            logger.info(f"[AnalysisService] 股票 {code} 命中最近的分析结果, task_id={cached_task_id}")
+            return {
+                "success": True,
+                "message": "已复用最近的分析结果",
+                "code": code,
+                "task_id": cached_task_id,
+                "report_type": report_type.value,
+                "cached": True
+            }
+        
+        if inflight is not None:
+            logger.info(f"[AnalysisService] 股票 {code} 已有进行中的分析，合并到 task_id={inflight['task_id']}")
+            return {
+                "success": True,
+                "message": "相同股票的分析正在进行，已合并到该任务，完成后将推送结果",
+                "code": code,
+                "task_id": inflight['task_id'],
+                "report_type": report_type.value,
+                "coalesced": True
+            }
+        
+        # 先登记为排队中：返回的 task_id 在工作线程取到任务前即可查询
+        task = {
+            "task_id": task_id,
+            "code": code,
+            "status": "queued",
+            "start_time": datetime.now().isoformat(),
+            "result": None,
+            "error": None,
+            "progress": None,
+            "report_type": report_type.value
+        }
+        self._register_task(task)
+        
+        # 提交到任务调度器（交互式优先级），队列已满时立即拒绝
+        try:
+            get_job_scheduler().submit(
+                self._run_analysis, code, task_id, report_type, source_message, key,
+                priority=JobPriority.INTERACTIVE,
+                user_id=self._job_user(source_message),
+                name=f"analysis_{code}",
+            )
+        except QueueFullError as e:
+            with self._tasks_lock:
+                self._inflight.pop(key, None)
+            self._finish_task(task, status="failed", error=str(e), end_time=datetime.now().isoformat())
+            logger.warning(f"[AnalysisService] 拒绝股票 {code} 的分析任务: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "code": code,
+                "rejected": True
+            }
         
         logger.info(f"[AnalysisService] 已提交股票 {code} 的分析任务, task_id={task_id}, report_type={report_type.value}")
         
@@ -205,71 +378,177 @@ class AnalysisService:
         }
     
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """获取任务状态"""
+        """获取任务状态（内存优先，已淘汰或重启前的任务从数据库查询）"""
         with self._tasks_lock:
-            return self._tasks.get(task_id)
+            task = self._tasks.get(task_id)
+            if task is not None:
+                return dict(task)
+        try:
+            return get_db().get_analysis_task(task_id)
+        except Exception as e:
+            logger.warning(f"[AnalysisService] 查询任务 {task_id} 失败: {e}")
+            return None
+    
+    def list_tasks(self, limit: int = 20, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        列出最近的任务（按开始时间倒序）
+        
+        内存环足够时直接从尾部取 limit 条，否则走数据库索引查询，复杂度均为 O(limit)
+        
+        Args:
+            limit: 最大返回条数
+            status: 按状态过滤（可选，走数据库 status+start_time 索引）
+        """
+        with self._tasks_lock:
+            if status is None and len(self._tasks) >= limit:
+                return [dict(task) for task in islice(reversed(self._tasks.values()), limit)]
+            recent = {task_id: dict(task) for task_id, task in self._tasks.items()}
+        
+        try:
+            tasks = get_db().list_analysis_tasks(limit=limit, status=status)
+        except Exception as e:
+            logger.warning(f"[AnalysisService] 查询任务列表失败，仅返回内存中的任务: {e}")
+            tasks = [task for task in reversed(list(recent.values())) if status is None or task["status"] == status]
+            return tasks[:limit]
+        
+        # 内存中的任务带有实时进度，优先使用
+        return [recent.get(task["task_id"], task) for task in tasks]
+    
+    @staticmethod
+    def _coalesce_key(code: str, report_type: ReportType) -> Tuple[str, str, str]:
+        """请求合并键：(股票代码, 报告类型, 交易日)，周末归入上一个周五"""
+        day = date.today()
+        if day.weekday() >= 5:
+            day -= timedelta(days=day.weekday() - 4)
+        return code.strip().upper(), report_type.value, day.isoformat()
+    
+    def _deliver_to_subscribers(
+        self,
+        result: 'AnalysisResult',
+        report_type: ReportType,
+        messages: List[BotMessage]
+    ) -> None:
+        """将已完成的分析报告回复到合并进来的各个会话（仅消息上下文渠道，全局渠道已由首个任务推送）"""
+        from src.notification import NotificationService
+        
+        for message in messages:
+            try:
+                notifier = NotificationService(source_message=message)
+                if report_type == ReportType.FULL:
+                    report = notifier.generate_dashboard_report([result])
+                else:
+                    report = notifier.generate_single_stock_report(result)
+                notifier.send_to_context(report)
+            except Exception as e:
+                logger.error(f"[AnalysisService] 向合并请求回复 {result.code} 报告失败: {e}")
+    
+    def _notify_subscribers_failure(self, code: str, error: str, messages: List[BotMessage]) -> None:
+        """分析失败时告知合并进来的各个会话（否则它们只收到"已合并"而永远等不到结果）"""
+        from src.notification import NotificationService
+        
+        for message in messages:
+            try:
+                NotificationService(source_message=message).send_to_context(
+                    f"❌ 股票 {code} 分析失败: {error[:100]}"
+                )
+            except Exception as e:
+                logger.error(f"[AnalysisService] 向合并请求回复 {code} 失败信息失败: {e}")
     
-    def list_tasks(self, limit: int = 20) -> List[Dict[str, Any]]:
-        """列出最近的任务"""
+    def _update_progress(self, task_id: str, progress: Dict[str, Any]) -> None:
+        """更新任务的实时进度（LLM 流式接收字符数等）"""
         with self._tasks_lock:
-            tasks = list(self._tasks.values())
-        # 按开始时间倒序
-        tasks.sort(key=lambda x: x.get('start_time', ''), reverse=True)
-        return tasks[:limit]
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task["progress"] = progress
     
     def _run_analysis(
         self, 
         code: str, 
         task_id: str, 
         report_type: ReportType = ReportType.SIMPLE,
-        source_message: Optional[BotMessage] = None
+        source_message: Optional[BotMessage] = None,
+        coalesce_key: Optional[Tuple[str, str, str]] = None
     ) -> Dict[str, Any]:
         """
         执行单只股票分析
         
-        内部方法，在线程池中运行
+        内部方法，在任务调度器的工作线程中运行
         
         Args:
             code: 股票代码
             task_id: 任务ID
             report_type: 报告类型枚举
+            source_message: 来源消息（机器人场景）
+            coalesce_key: 请求合并键，任务结束时释放并通知合并进来的请求
         """
-        # 初始化任务状态
-        with self._tasks_lock:
-            self._tasks[task_id] = {
-                "task_id": task_id,
-                "code": code,
-                "status": "running",
-                "start_time": datetime.now().isoformat(),
-                "result": None,
-                "error": None,
-                "report_type": report_type.value
-            }
+        result = None
+        error = "分析异常中断"
+        try:
+            response = self._execute_analysis(code, task_id, report_type, source_message)
+            result = response.pop("_result", None)
+            error = response.get("error") or error
+            return response
+        finally:
+            if coalesce_key is not None:
+                with self._tasks_lock:
+                    entry = self._inflight.pop(coalesce_key, None)
+                    ttl = self._result_cache_ttl()
+                    if result is not None and ttl > 0:
+                        self._recent[coalesce_key] = (time.time() + ttl, task_id, result)
+                subscribers = entry['subscribers'] if entry else []
+                if result is not None and subscribers:
+                    logger.info(f"[AnalysisService] 股票 {code} 分析完成，回复 {len(subscribers)} 个合并请求")
+                    self._deliver_to_subscribers(result, report_type, subscribers)
+                elif subscribers:
+                    logger.info(f"[AnalysisService] 股票 {code} 分析失败，通知 {len(subscribers)} 个合并请求")
+                    self._notify_subscribers_failure(code, error, subscribers)
+    
+    @staticmethod
+    def _result_cache_ttl() -> int:
+        from src.config import get_config
+        return get_config().analysis_result_cache_ttl
+    
+    def _execute_analysis(
+        self,
+        code: str,
+        task_id: str,
+        report_type: ReportType,
+        source_message: Optional[BotMessage]
+    ) -> Dict[str, Any]:
+        """执行分析并更新任务状态，成功时通过 "_result" 键带回 AnalysisResult"""
+        # 提交时已登记为 queued，开始执行后转为 running
+        task = self._start_task(task_id, code, report_type)
         
         try:
             # 延迟导入避免循环依赖
-            from src.config import get_config
-            from main import StockAnalysisPipeline
+            from src.core.container import get_service_container
             
             logger.info(f"[AnalysisService] 开始分析股票: {code}")
             
-            # 创建分析管道
-            config = get_config()
-            pipeline = StockAnalysisPipeline(
-                config=config,
+            # 创建分析管道（复用进程级共享组件，仅通知服务按请求新建）
+            pipeline = get_service_container().create_pipeline(
                 max_workers=1,
                 source_message=source_message
             )
             
-            # 执行单只股票分析（启用单股推送）
-            result = pipeline.process_single_stock(
-                code=code,
-                skip_analysis=False,
-                single_stock_notify=True,
-                report_type=report_type
-            )
+            # 单次请求无需合并推送，结果立即回复给请求方；推送按任务去重
+            pipeline.coalesce_single_stock_notify = False
+            pipeline.push_scope = task_id
+            
+            # 执行单只股票分析（启用单股推送），流式进度写入任务状态供轮询
+            try:
+                result = pipeline.process_single_stock(
+                    code=code,
+                    skip_analysis=False,
+                    single_stock_notify=True,
+                    report_type=report_type,
+                    progress_callback=lambda progress: self._update_progress(task_id, progress)
+                )
+            finally:
+                pipeline.flush_single_stock_notifications()
             
             if result:
+                pipeline.save_results([result])
                 result_data = {
                     "code": result.code,
                     "name": result.name,
@@ -279,22 +558,22 @@ class AnalysisService:
                     "analysis_summary": result.analysis_summary,
                 }
                 
-                with self._tasks_lock:
-                    self._tasks[task_id].update({
-                        "status": "completed",
-                        "end_time": datetime.now().isoformat(),
-                        "result": result_data
-                    })
+                self._finish_task(
+                    task,
+                    status="completed",
+                    end_time=datetime.now().isoformat(),
+                    result=result_data
+                )
                 
                 logger.info(f"[AnalysisService] 股票 {code} 分析完成: {result.operation_advice}")
-                return {"success": True, "task_id": task_id, "result": result_data}
+                return {"success": True, "task_id": task_id, "result": result_data, "_result": result}
             else:
-                with self._tasks_lock:
-                    self._tasks[task_id].update({
-                        "status": "failed",
-                        "end_time": datetime.now().isoformat(),
-                        "error": "分析返回空结果"
-                    })
+                self._finish_task(
+                    task,
+                    status="failed",
+                    end_time=datetime.now().isoformat(),
+                    error="分析返回空结果"
+                )
                 
                 logger.warning(f"[AnalysisService] 股票 {code} 分析失败: 返回空结果")
                 return {"success": False, "task_id": task_id, "error": "分析返回空结果"}
@@ -303,12 +582,12 @@ class AnalysisService:
             error_msg = str(e)
             logger.error(f"[AnalysisService] 股票 {code} 分析异常: {error_msg}")
             
-            with self._tasks_lock:
-                self._tasks[task_id].update({
-                    "status": "failed",
-                    "end_time": datetime.now().isoformat(),
-                    "error": error_msg
-                })
+            self._finish_task(
+                task,
+                status="failed",
+                end_time=datetime.now().isoformat(),
+                error=error_msg
+            )
             
             return {"success": False, "task_id": task_id, "error": error_msg}
 
@@ -797,7 +797,7 @@ def render_config_page(
         
         tasks.forEach((taskData, taskId) => {
             const status = taskData.task?.status;
-            if (status === 'running' || status === 'pending' || !status) {
+            if (status === 'running' || status === 'queued' || status === 'pending' || !status) {
                 hasRunning = true;
                 taskData.pollCount = (taskData.pollCount || 0) + 1;
                 
@@ -830,7 +830,7 @@ def render_config_page(
         let hasRunning = false;
         tasks.forEach((taskData) => {
             const status = taskData.task?.status;
-            if (status === 'running' || status === 'pending' || !status) {
+            if (status === 'running' || status === 'queued' || status === 'pending' || !status) {
                 hasRunning = true;
             }
         });